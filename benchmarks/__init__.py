@@ -0,0 +1,2 @@
+# benchmarks/__init__.py
+"""Testes de carga offline da API (PostgREST e OpenAI substituídos por servidores locais)."""
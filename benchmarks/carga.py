@@ -0,0 +1,284 @@
+# benchmarks/carga.py
+"""
+Teste de carga da API real contra um PostgREST falso e uma OpenAI falsa (nada sai da máquina).
+
+Sobe os dois servidores falsos e a API (uvicorn, com N workers) em subprocessos, e executa
+os cenários em sequência, reportando vazão e latência p50/p95/p99 de cada um:
+
+- login:     todos os alunos fazem POST /auth/token ao mesmo tempo (início de aula);
+- painel:    todos carregam GET /api/painel e, em seguida, revalidam com If-None-Match;
+- liberacao: o admin libera um conteúdo para a turma T1 e todos os alunos dela recarregam o painel;
+- avaliacao: todos enviam uma resposta em POST /api/respostas/registrar (prazo final).
+
+    python -m benchmarks.carga --turmas 5 --alunos-por-turma 200 --concorrencia 200 --workers 2
+    python -m benchmarks.carga --cenarios avaliacao --latencia-llm lognormal:4:0.5 --erro-429 0.05
+
+Com --url, usa uma API já em execução (que precisa apontar para os servidores falsos).
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional
+import httpx
+from .dados import CPF_ADMIN, cpf_do_aluno
+from .relatorio import Medicao, imprimir, salvar
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CENARIOS = ("login", "painel", "liberacao", "avaliacao")
+
+
+# --- Processos ---
+class Processos:
+    """Subprocessos (servidores falsos e API), encerrados juntos ao final."""
+    def __init__(self, verboso: bool = False):
+        self.processos: List[subprocess.Popen] = []
+        self.verboso = verboso
+        self.logs = tempfile.mkdtemp(prefix="pbl-carga-")
+
+    def iniciar(self, nome: str, argumentos: List[str], env: Optional[dict] = None) -> subprocess.Popen:
+        saida = None if self.verboso else open(os.path.join(self.logs, f"{nome}.log"), "w")
+        processo = subprocess.Popen([sys.executable, *argumentos], cwd=RAIZ, env={**os.environ, **(env or {})},
+                                    stdout=saida, stderr=subprocess.STDOUT)
+        self.processos.append(processo)
+        return processo
+
+    @staticmethod
+    async def aguardar(url: str, processo: subprocess.Popen, timeout: float = 60):
+        limite = time.monotonic() + timeout
+        async with httpx.AsyncClient() as client:
+            while time.monotonic() < limite:
+                if processo.poll() is not None:
+                    raise RuntimeError(f"Processo encerrou antes de responder em {url} (código {processo.returncode}).")
+                try:
+                    await client.get(url, timeout=1)
+                    return
+                except httpx.HTTPError:
+                    await asyncio.sleep(0.2)
+        raise TimeoutError(f"{url} não respondeu em {timeout:.0f}s.")
+
+    def encerrar(self):
+        for processo in reversed(self.processos):
+            processo.terminate()
+        for processo in self.processos:
+            try:
+                processo.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                processo.kill()
+
+
+async def subir_ambiente(args, processos: Processos) -> str:
+    """Sobe PostgREST falso, OpenAI falsa e a API; retorna a URL da API."""
+    porta_db, porta_llm, porta_api = args.porta_base, args.porta_base + 1, args.porta_base + 2
+    db = processos.iniciar("postgrest", [
+        "-m", "benchmarks.fake_postgrest", "--porta", str(porta_db), "--turmas", str(args.turmas),
+        "--alunos-por-turma", str(args.alunos_por_turma), "--modulos", str(args.modulos),
+        "--aulas-por-modulo", str(args.aulas_por_modulo), "--latencia-ms", args.latencia_db_ms,
+    ])
+    llm = processos.iniciar("openai", [
+        "-m", "benchmarks.fake_openai", "--porta", str(porta_llm), "--latencia", args.latencia_llm,
+        "--erro-429", str(args.erro_429), "--erro-500", str(args.erro_500),
+    ])
+    await Processos.aguardar(f"http://127.0.0.1:{porta_db}/_estado", db)
+    await Processos.aguardar(f"http://127.0.0.1:{porta_llm}/_estado", llm)
+
+    env = {
+        "SUPABASE_URL": f"http://127.0.0.1:{porta_db}",
+        "SUPABASE_SERVICE_ROLE_KEY": "benchmark",
+        "OPENAI_API_KEY": "benchmark",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{porta_llm}/v1",
+        "JWT_SECRET": os.getenv("JWT_SECRET", "benchmark"),
+        "ENV": "production",
+    }
+    if not args.com_limite:
+        env["RATE_LIMIT_ATIVO"] = "false"  # todos os clientes saem do mesmo IP
+    api = processos.iniciar("api", [
+        "-m", "uvicorn", "fastapi_backend.main:app", "--host", "127.0.0.1", "--port", str(porta_api),
+        "--workers", str(args.workers), "--log-level", "warning", "--no-access-log",
+    ], env)
+    url = f"http://127.0.0.1:{porta_api}"
+    await Processos.aguardar(f"{url}/", api)
+    return url
+
+
+# --- Execução dos cenários ---
+async def disparar(medicao: Medicao, chamadas: List[Callable[[], Awaitable[httpx.Response]]], concorrencia: int) -> List:
+    """Executa as chamadas com no máximo `concorrencia` simultâneas; retorna as respostas (ou exceções)."""
+    semaforo = asyncio.Semaphore(concorrencia)
+
+    async def executar(chamada):
+        async with semaforo:
+            inicio = time.perf_counter()
+            try:
+                resposta = await chamada()
+                medicao.registrar(time.perf_counter() - inicio, resposta.status_code)
+                return resposta
+            except Exception as e:
+                medicao.registrar(time.perf_counter() - inicio, type(e).__name__)
+                return e
+
+    return await asyncio.gather(*(executar(c) for c in chamadas))
+
+
+class Carga:
+    def __init__(self, client: httpx.AsyncClient, args):
+        self.client = client
+        self.args = args
+        total = args.turmas * args.alunos_por_turma
+        self.alunos = [cpf_do_aluno(i) for i in range(total)]
+        self.turma = {cpf: f"T{i // args.alunos_por_turma + 1}" for i, cpf in enumerate(self.alunos)}
+        self.tokens: Dict[str, str] = {}
+        self.paineis: Dict[str, dict] = {}
+        self.resumos: List[dict] = []
+
+    def _auth(self, cpf: str) -> dict:
+        return {"Authorization": f"Bearer {self.tokens[cpf]}"}
+
+    def _concluir(self, medicao: Medicao, **extra):
+        resumo = medicao.encerrar().resumo()
+        if extra:
+            resumo["extra"] = extra
+        self.resumos.append(resumo)
+        print(f"[CARGA] {resumo['cenario']}: {resumo['requisicoes']} req, {resumo['vazao_rps']} req/s, "
+              f"p50 {resumo['p50_ms']} ms, p99 {resumo['p99_ms']} ms")
+
+    async def login(self, medir: bool = True):
+        medicao = Medicao("login")
+        cpfs = self.alunos + [CPF_ADMIN]
+        respostas = await disparar(medicao, [
+            (lambda cpf=cpf: self.client.post("/auth/token", data={"username": cpf, "password": "x"})) for cpf in cpfs
+        ], self.args.concorrencia)
+        for cpf, resposta in zip(cpfs, respostas):
+            if isinstance(resposta, httpx.Response) and resposta.status_code == 200:
+                self.tokens[cpf] = resposta.json()["access_token"]
+        if medir:
+            self._concluir(medicao)
+
+    async def painel(self, medir: bool = True):
+        medicao = Medicao("painel")
+        cpfs = [c for c in self.alunos if c in self.tokens]
+        respostas = await disparar(medicao, [
+            (lambda cpf=cpf: self.client.get("/api/painel", headers=self._auth(cpf))) for cpf in cpfs
+        ], self.args.concorrencia)
+        etags = {}
+        for cpf, resposta in zip(cpfs, respostas):
+            if isinstance(resposta, httpx.Response) and resposta.status_code == 200:
+                self.paineis[cpf] = resposta.json()
+                etags[cpf] = resposta.headers.get("etag")
+        if not medir:
+            return
+        self._concluir(medicao)
+
+        revalidacao = Medicao("painel_revalidacao")
+        await disparar(revalidacao, [
+            (lambda cpf=cpf: self.client.get("/api/painel", headers={**self._auth(cpf), "If-None-Match": etags[cpf] or ""}))
+            for cpf in etags
+        ], self.args.concorrencia)
+        self._concluir(revalidacao)
+
+    async def liberacao(self):
+        # Último micro do último módulo: não liberado na massa de dados
+        modulo, aula = self.args.modulos, self.args.aulas_por_modulo
+        conteudo_id = f"m{modulo}a{aula}"
+        alunos_t1 = [c for c in self.alunos if self.turma[c] == "T1" and c in self.tokens]
+
+        admin = Medicao("liberacao_admin")
+        await disparar(admin, [lambda: self.client.post("/api/admin/liberar", headers=self._auth(CPF_ADMIN), json={
+            "conteudo_id": conteudo_id, "modulo": f"Módulo {modulo:02d}", "aula": f"Aula {aula:02d}",
+            "turmas": ["T1"], "data_iso": datetime.now().isoformat(),
+        })], 1)
+        self._concluir(admin)
+
+        medicao = Medicao("liberacao_painel")
+        respostas = await disparar(medicao, [
+            (lambda cpf=cpf: self.client.get("/api/painel", headers=self._auth(cpf))) for cpf in alunos_t1
+        ], self.args.concorrencia)
+        # Com vários workers, o índice de liberações dos outros processos só vê a mudança após o TTL
+        viram = sum(1 for r in respostas if isinstance(r, httpx.Response) and r.status_code == 200 and any(
+            d.get("conteudo_id") == conteudo_id and d.get("desafio_liberado")
+            for m in r.json()["modulos"] for d in m["micros"]
+        ))
+        self._concluir(medicao, alunos_que_viram_a_liberacao=viram, alunos_da_turma=len(alunos_t1))
+
+    async def avaliacao(self):
+        if not self.paineis:
+            await self.painel(medir=False)
+        envios = []
+        for cpf, painel in self.paineis.items():
+            micro = next((d for m in painel["modulos"] for d in m["micros"] if d.get("desafio_liberado")), None)
+            if micro is not None:
+                envios.append((cpf, micro["id"]))
+        parametros = {"assincrono": "true"} if self.args.avaliacao_assincrona else None
+        medicao = Medicao("avaliacao_assincrona" if parametros else "avaliacao")
+        await disparar(medicao, [
+            (lambda cpf=cpf, desafio_id=desafio_id: self.client.post(
+                "/api/respostas/registrar", headers=self._auth(cpf), params=parametros, json={
+                    "desafio_id": desafio_id, "tentativa": 1,
+                    "resposta": f"Aluno {cpf}: renegociaria o barter e investiria em armazenagem na entressafra.",
+                }))
+            for cpf, desafio_id in envios
+        ], self.args.concorrencia)
+        self._concluir(medicao)
+
+
+async def executar(args) -> List[dict]:
+    cenarios = [c.strip() for c in args.cenarios.split(",") if c.strip()]
+    desconhecidos = set(cenarios) - set(CENARIOS)
+    if desconhecidos:
+        raise SystemExit(f"Cenários desconhecidos: {', '.join(sorted(desconhecidos))}")
+
+    processos = Processos(args.verboso)
+    try:
+        url = args.url or await subir_ambiente(args, processos)
+        limites = httpx.Limits(max_connections=args.concorrencia, max_keepalive_connections=args.concorrencia)
+        async with httpx.AsyncClient(base_url=url, limits=limites, timeout=args.timeout) as client:
+            carga = Carga(client, args)
+            await carga.login(medir="login" in cenarios)
+            for cenario in cenarios:
+                if cenario != "login":
+                    await getattr(carga, cenario)()
+            if not args.url:
+                estado_llm = (await client.get(f"http://127.0.0.1:{args.porta_base + 1}/_estado")).json()
+                print(f"[CARGA] OpenAI falsa: {estado_llm}")
+        return carga.resumos
+    finally:
+        processos.encerrar()
+        if not args.verboso and not args.url:
+            print(f"[CARGA] Logs dos processos em {processos.logs}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cenarios", default=",".join(CENARIOS))
+    parser.add_argument("--turmas", type=int, default=5)
+    parser.add_argument("--alunos-por-turma", type=int, default=100)
+    parser.add_argument("--modulos", type=int, default=5)
+    parser.add_argument("--aulas-por-modulo", type=int, default=5)
+    parser.add_argument("--concorrencia", type=int, default=200, help="requisições simultâneas")
+    parser.add_argument("--workers", type=int, default=1, help="workers do uvicorn")
+    parser.add_argument("--latencia-llm", default="lognormal:2.5:0.6", help="ver benchmarks/fake_openai.py")
+    parser.add_argument("--erro-429", type=float, default=0.0)
+    parser.add_argument("--erro-500", type=float, default=0.0)
+    parser.add_argument("--latencia-db-ms", default="2:8", help="latência por consulta, 'min:max' em ms")
+    parser.add_argument("--avaliacao-assincrona", action="store_true", help="envia com ?assincrono=true (202)")
+    parser.add_argument("--com-limite", action="store_true", help="mantém o limite de taxa da API ativo")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--porta-base", type=int, default=18000)
+    parser.add_argument("--url", help="API já em execução (não sobe processos)")
+    parser.add_argument("--saida", help="grava os resultados em JSON")
+    parser.add_argument("--verboso", action="store_true", help="mostra a saída dos subprocessos")
+    args = parser.parse_args()
+
+    resumos = asyncio.run(executar(args))
+    print()
+    imprimir(resumos)
+    if args.saida:
+        salvar(resumos, args.saida)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+# benchmarks/dados.py
+"""
+Massa de dados sintética para o PostgREST falso: turmas, alunos, conteúdos (um macro e
+N aulas por módulo), os desafios já gerados de cada aluno e o cronograma de liberações
+(uma fração dos conteúdos já liberada para todas as turmas).
+"""
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List
+
+CPF_ADMIN = "00000000000"
+TEXTO_DESAFIO = (
+    "Uma cooperativa do cerrado enfrenta queda de margem na soja após a alta dos fertilizantes "
+    "e do frete. O conselho precisa decidir entre renegociar contratos de barter, rever o mix "
+    "de culturas da safrinha ou investir em armazenagem própria. "
+) * 8
+
+
+def cpf_do_aluno(indice: int) -> str:
+    return f"{indice + 1:011d}"
+
+
+def gerar_dados(turmas: int = 5, alunos_por_turma: int = 100, modulos: int = 5, aulas_por_modulo: int = 5,
+                fracao_liberada: float = 0.5) -> Dict[str, List[dict]]:
+    agora = datetime.now(timezone.utc)
+    usuarios = [{"id": str(uuid.uuid4()), "cpf": CPF_ADMIN, "nome": "Admin", "turma": None, "role": "admin"}]
+    for t in range(turmas):
+        for a in range(alunos_por_turma):
+            indice = t * alunos_por_turma + a
+            usuarios.append({
+                "id": str(uuid.uuid4()), "cpf": cpf_do_aluno(indice), "nome": f"Aluno {indice + 1}",
+                "turma": f"T{t + 1}", "role": None, "cargo": "Gerente agrícola", "regiao": "Centro-Oeste",
+                "cadeia": "Soja", "desafios": "Custos de insumos", "observacoes": "",
+            })
+
+    conteudos = []
+    for m in range(modulos):
+        nome = f"Módulo {m + 1:02d}"
+        conteudos.append({"id": f"m{m + 1}", "modulo": nome, "aula": None, "ementa": f"Ementa do {nome}", "ativo": True})
+        for a in range(aulas_por_modulo):
+            conteudos.append({"id": f"m{m + 1}a{a + 1}", "modulo": nome, "aula": f"Aula {a + 1:02d}",
+                              "ementa": f"Ementa da aula {a + 1}", "ativo": True})
+
+    liberados = {c["id"] for c in conteudos[:int(len(conteudos) * fracao_liberada)]}
+    desafios = []
+    for usuario in usuarios[1:]:
+        for c in conteudos:
+            desafios.append({
+                "id": str(uuid.uuid4()), "cpf": usuario["cpf"], "tipo": "micro" if c["aula"] else "macro",
+                "conteudo_id": c["id"], "texto_desafio": TEXTO_DESAFIO, "titulo": f"Desafio {c['id']}",
+                "desafio_liberado": c["id"] in liberados, "status_gerado": "ok",
+                "data_criacao": agora.isoformat(),
+            })
+
+    ontem = agora - timedelta(days=1)
+    todas_as_turmas = [f"T{t + 1}" for t in range(turmas)]
+    liberacoes = [{
+        "id": str(uuid.uuid4()), "conteudo_id": c["id"], "modulo": c["modulo"], "aula": c["aula"] or "",
+        "turmas": todas_as_turmas, "data_liberacao": ontem.date().isoformat(),
+        "hora_liberacao": "08:00:00", "liberado": True, "created_at": ontem.isoformat(),
+    } for c in conteudos if c["id"] in liberados]
+
+    return {
+        "PBL - usuarios": usuarios,
+        "PBL - conteudo": conteudos,
+        "PBL - desafios": desafios,
+        "PBL - liberacoes_agendadas": liberacoes,
+        "PBL - respostas": [],
+        "PBL - geracao_jobs": [],
+        "PBL - uso_llm": [],
+    }
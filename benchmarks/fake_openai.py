@@ -0,0 +1,114 @@
+# benchmarks/fake_openai.py
+"""
+Servidor compatível com a API de chat completions da OpenAI, com latência sorteada de
+uma distribuição configurável e taxa de erros opcional (429 com Retry-After, 500).
+
+    python -m benchmarks.fake_openai --porta 8089 --latencia lognormal:2.5:0.6 --erro-429 0.02
+    OPENAI_BASE_URL=http://127.0.0.1:8089/v1 OPENAI_API_KEY=x uvicorn fastapi_backend.main:app
+
+Distribuições (segundos): constante:S, uniforme:MIN:MAX, lognormal:MEDIANA:SIGMA.
+A latência é multiplicada pelo tamanho pedido (max_tokens) em relação a 800 tokens, com
+piso de 10%, para que títulos (max_tokens=20) sejam bem mais rápidos que desafios.
+"""
+import argparse
+import asyncio
+import math
+import random
+import time
+import uuid
+from typing import Callable
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+TOKENS_REFERENCIA = 800
+
+RESPOSTA_AVALIACAO = (
+    "Nota: {nota:.1f}\n"
+    "A resposta usa os dados do enunciado e propõe uma decisão coerente para a cooperativa, "
+    "mas poderia quantificar melhor os riscos de preço e de crédito. Considere comparar os "
+    "cenários de barter e de compra à vista com base no custo de oportunidade do caixa."
+)
+RESPOSTA_DESAFIO = (
+    "Em março de 2025, a Cooperativa Vale Verde, no oeste da Bahia, viu a margem da soja "
+    "cair pela metade com a alta do cloreto de potássio e do frete até o porto. "
+) * 6
+
+
+def distribuicao(especificacao: str) -> Callable[[], float]:
+    nome, *parametros = especificacao.split(":")
+    valores = [float(p) for p in parametros]
+    if nome == "constante":
+        return lambda: valores[0]
+    if nome == "uniforme":
+        return lambda: random.uniform(valores[0], valores[1])
+    if nome == "lognormal":
+        mediana, sigma = valores
+        return lambda: random.lognormvariate(math.log(mediana), sigma)
+    raise ValueError(f"Distribuição desconhecida: {especificacao}")
+
+
+def criar_app(latencia: str = "lognormal:2.5:0.6", erro_429: float = 0.0, erro_500: float = 0.0) -> Starlette:
+    sortear = distribuicao(latencia)
+    estado = {"chamadas": 0, "erros": 0, "em_andamento": 0, "pico": 0}
+
+    async def completions(request: Request):
+        corpo = await request.json()
+        estado["chamadas"] += 1
+        sorteio = random.random()
+        if sorteio < erro_429:
+            estado["erros"] += 1
+            return JSONResponse({"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}},
+                                status_code=429, headers={"retry-after": "1"})
+        if sorteio < erro_429 + erro_500:
+            estado["erros"] += 1
+            return JSONResponse({"error": {"message": "Internal error", "type": "server_error"}}, status_code=500)
+
+        prompt = corpo["messages"][-1]["content"]
+        max_tokens = corpo.get("max_tokens") or TOKENS_REFERENCIA
+        estado["em_andamento"] += 1
+        estado["pico"] = max(estado["pico"], estado["em_andamento"])
+        try:
+            await asyncio.sleep(sortear() * max(0.1, min(1.0, max_tokens / TOKENS_REFERENCIA)))
+        finally:
+            estado["em_andamento"] -= 1
+
+        if "avaliador" in prompt.lower():
+            conteudo = RESPOSTA_AVALIACAO.format(nota=random.uniform(5, 10))
+        elif max_tokens <= 50:
+            conteudo = "Margem sob pressão no cerrado"
+        else:
+            conteudo = RESPOSTA_DESAFIO
+        tokens_prompt = max(1, len(prompt) // 4)
+        tokens_resposta = max(1, len(conteudo) // 4)
+        return JSONResponse({
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": corpo.get("model", "gpt-4o"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": conteudo}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": tokens_prompt, "completion_tokens": tokens_resposta,
+                      "total_tokens": tokens_prompt + tokens_resposta},
+        })
+
+    async def consultar_estado(request: Request):
+        return JSONResponse(estado)
+
+    return Starlette(routes=[
+        Route("/v1/chat/completions", completions, methods=["POST"]),
+        Route("/_estado", consultar_estado),
+    ])
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=8089)
+    parser.add_argument("--latencia", default="lognormal:2.5:0.6")
+    parser.add_argument("--erro-429", type=float, default=0.0, help="fração de respostas 429")
+    parser.add_argument("--erro-500", type=float, default=0.0, help="fração de respostas 500")
+    args = parser.parse_args()
+    uvicorn.run(criar_app(args.latencia, args.erro_429, args.erro_500), host=args.host, port=args.porta, log_level="warning")
@@ -0,0 +1,339 @@
+# benchmarks/fake_postgrest.py
+"""
+PostgREST falso, em memória, para as tabelas "PBL - *" — o suficiente para o que a API e
+o supabase-py usam: select com colunas, filtros eq/neq/lt/lte/gt/gte/in/is, or/and (com
+valores entre aspas), order (nullsfirst/nullslast), limit, offset, count=exact (Content-Range), single() (vnd.pgrst.object+json), insert/upsert
+(on_conflict), update, delete e as funções RPC de sql/.
+
+    python -m benchmarks.fake_postgrest --porta 54321 --turmas 5 --alunos-por-turma 100
+    SUPABASE_URL=http://127.0.0.1:54321 SUPABASE_SERVICE_ROLE_KEY=x uvicorn fastapi_backend.main:app
+"""
+import argparse
+import asyncio
+import csv
+import random
+import uuid
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, unquote
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+from .dados import gerar_dados
+
+PARAMETROS_RESERVADOS = {"select", "order", "limit", "offset", "on_conflict", "columns"}
+
+
+def _texto(valor) -> str:
+    if isinstance(valor, bool):
+        return "true" if valor else "false"
+    if valor is None:
+        return "null"
+    return str(valor)
+
+
+def _comparar(valor, texto: str) -> Optional[int]:
+    """-1/0/1 comparando o valor da linha com o literal do filtro (None se a linha for NULL)."""
+    if valor is None:
+        return None
+    if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+        try:
+            alvo = float(texto)
+            return (valor > alvo) - (valor < alvo)
+        except ValueError:
+            pass
+    atual = _texto(valor)
+    return (atual > texto) - (atual < texto)
+
+
+def _lista(texto: str) -> List[str]:
+    """Literal de lista do PostgREST: (a,"b c") ou {a,b}."""
+    miolo = texto.strip()[1:-1]
+    return next(csv.reader([miolo], skipinitialspace=True)) if miolo else []
+
+
+def _filtro(coluna: str, expressao: str) -> Callable[[dict], bool]:
+    negar = expressao.startswith("not.")
+    if negar:
+        expressao = expressao[4:]
+    operador, _, literal = expressao.partition(".")
+
+    def testar(linha: dict) -> bool:
+        valor = linha.get(coluna)
+        if operador == "is":
+            return _texto(valor) == literal.lower()
+        if operador == "in":
+            return _texto(valor) in _lista(literal)
+        if operador == "cs":
+            return set(_lista(literal)) <= {_texto(v) for v in (valor or [])}
+        if operador == "ov":
+            return bool(set(_lista(literal)) & {_texto(v) for v in (valor or [])})
+        comparacao = _comparar(valor, literal)
+        if comparacao is None:
+            return False
+        return {
+            "eq": comparacao == 0, "neq": comparacao != 0, "lt": comparacao < 0,
+            "lte": comparacao <= 0, "gt": comparacao > 0, "gte": comparacao >= 0,
+        }[operador]
+
+    return (lambda linha: not testar(linha)) if negar else testar
+
+
+def _termos(texto: str) -> List[str]:
+    """Separa os termos de or=(...)/and(...) nas vírgulas de nível zero (fora de aspas e parênteses)."""
+    termos, atual, nivel, aspas, escape = [], [], 0, False, False
+    for ch in texto:
+        if escape:
+            atual.append(ch)
+            escape = False
+        elif ch == "\\" and aspas:
+            atual.append(ch)
+            escape = True
+        elif ch == '"':
+            aspas = not aspas
+            atual.append(ch)
+        elif ch == "," and nivel == 0 and not aspas:
+            termos.append("".join(atual))
+            atual = []
+        else:
+            nivel += (ch == "(") - (ch == ")") if not aspas else 0
+            atual.append(ch)
+    if atual:
+        termos.append("".join(atual))
+    return [t.strip() for t in termos if t.strip()]
+
+
+def _sem_aspas(literal: str) -> str:
+    if len(literal) >= 2 and literal[0] == literal[-1] == '"':
+        return literal[1:-1].replace('\\"', '"').replace("\\\\", "\\")
+    return literal
+
+
+def _logico(operador: str, expressao: str) -> Callable[[dict], bool]:
+    """Filtros or=(a.eq.1,and(b.lt.2,c.is.null)) e and=(...)."""
+    negar = operador.startswith("not.")
+    operador = operador[4:] if negar else operador
+    filhos = []
+    for termo in _termos(expressao.strip()[1:-1]):
+        for logico in ("not.and", "not.or", "and", "or"):
+            if termo.startswith(logico + "("):
+                filhos.append(_logico(logico, termo[len(logico):]))
+                break
+        else:
+            coluna, _, resto = termo.partition(".")
+            negado = resto.startswith("not.")
+            resto = resto[4:] if negado else resto
+            op, _, literal = resto.partition(".")
+            filhos.append(_filtro(coluna, ("not." if negado else "") + f"{op}.{_sem_aspas(literal)}"))
+    combinar = any if operador == "or" else all
+
+    def testar(linha: dict) -> bool:
+        return combinar(f(linha) for f in filhos) != negar
+
+    return testar
+
+
+def _erro(status: int, codigo: str, mensagem: str) -> JSONResponse:
+    return JSONResponse({"code": codigo, "message": mensagem, "details": None, "hint": None}, status_code=status)
+
+
+class BancoFalso:
+    def __init__(self, tabelas: Dict[str, List[dict]]):
+        self.tabelas = tabelas
+        self.latencia: Tuple[float, float] = (0.0, 0.0)
+        self.consultas = 0
+
+    def _tabela(self, nome: str) -> List[dict]:
+        return self.tabelas.setdefault(nome, [])
+
+    @staticmethod
+    def _parametros(request: Request):
+        filtros, especiais = [], {}
+        for chave, valor in parse_qsl(request.url.query, keep_blank_values=True):
+            if chave in PARAMETROS_RESERVADOS:
+                especiais[chave] = valor
+            elif chave in ("or", "and", "not.or", "not.and"):
+                filtros.append(_logico(chave, valor))
+            else:
+                filtros.append(_filtro(chave, valor))
+        return filtros, especiais
+
+    @staticmethod
+    def _projetar(linhas: List[dict], select: str) -> List[dict]:
+        colunas = [c.strip() for c in (select or "*").split(",") if c.strip()]
+        if not colunas or "*" in colunas:
+            return [dict(l) for l in linhas]
+        return [{c: l.get(c) for c in colunas} for l in linhas]
+
+    @staticmethod
+    def _ordenar(linhas: List[dict], order: str) -> List[dict]:
+        for termo in reversed([t for t in order.split(",") if t]):
+            coluna, *modificadores = termo.split(".")
+            decrescente = "desc" in modificadores
+            # Como no Postgres: NULLs por último na crescente e primeiro na decrescente, salvo nullsfirst/nullslast
+            nulos_primeiro = "nullsfirst" in modificadores or (decrescente and "nullslast" not in modificadores)
+            linhas = sorted(linhas, key=lambda l: _texto(l.get(coluna)) if l.get(coluna) is not None else "", reverse=decrescente)
+            linhas = sorted(linhas, key=lambda l: (l.get(coluna) is None) != nulos_primeiro)
+        return linhas
+
+    def _responder(self, request: Request, linhas: List[dict], status: int = 200, total: Optional[int] = None) -> Response:
+        cabecalhos = {}
+        prefer = request.headers.get("prefer", "")
+        if "count=" in prefer:
+            total = len(linhas) if total is None else total
+            cabecalhos["Content-Range"] = f"0-{max(len(linhas) - 1, 0)}/{total}" if linhas else f"*/{total}"
+        if request.method != "GET" and "return=representation" not in prefer:
+            return Response(status_code=204 if status == 200 else status, headers=cabecalhos)
+        if "vnd.pgrst.object" in request.headers.get("accept", ""):
+            if len(linhas) != 1:
+                return _erro(406, "PGRST116", f"JSON object requested, multiple (or no) rows returned ({len(linhas)})")
+            return JSONResponse(linhas[0], status_code=status, headers=cabecalhos)
+        return JSONResponse(linhas, status_code=status, headers=cabecalhos)
+
+    async def atender(self, request: Request) -> Response:
+        self.consultas += 1
+        if self.latencia[1] > 0:
+            await asyncio.sleep(random.uniform(*self.latencia))
+        alvo = unquote(request.path_params["alvo"])
+        if alvo.startswith("rpc/"):
+            return await self._rpc(request, alvo[4:])
+        filtros, especiais = self._parametros(request)
+        tabela = self._tabela(alvo)
+
+        if request.method in ("GET", "HEAD"):
+            linhas = [l for l in tabela if all(f(l) for f in filtros)]
+            total = len(linhas)
+            if especiais.get("order"):
+                linhas = self._ordenar(linhas, especiais["order"])
+            inicio = int(especiais.get("offset", 0))
+            fim = inicio + int(especiais["limit"]) if "limit" in especiais else None
+            linhas = self._projetar(linhas[inicio:fim], especiais.get("select"))
+            return self._responder(request, linhas, total=total)
+
+        if request.method == "POST":
+            corpo = await request.json()
+            novas = corpo if isinstance(corpo, list) else [corpo]
+            upsert = "resolution=" in request.headers.get("prefer", "")
+            chaves = [c for c in especiais.get("on_conflict", "id").split(",") if c]
+            gravadas = []
+            for nova in novas:
+                existente = None
+                if upsert:
+                    existente = next((l for l in tabela if all(_texto(l.get(c)) == _texto(nova.get(c)) for c in chaves)), None)
+                if existente is not None:
+                    existente.update(nova)
+                    gravadas.append(existente)
+                    continue
+                linha = {"id": str(uuid.uuid4()), "created_at": datetime.now(timezone.utc).isoformat(), **nova}
+                tabela.append(linha)
+                gravadas.append(linha)
+            return self._responder(request, self._projetar(gravadas, especiais.get("select")), status=201)
+
+        if request.method == "PATCH":
+            mudancas = await request.json()
+            alteradas = [l for l in tabela if all(f(l) for f in filtros)]
+            for linha in alteradas:
+                linha.update(mudancas)
+            return self._responder(request, self._projetar(alteradas, especiais.get("select")))
+
+        if request.method == "DELETE":
+            removidas = [l for l in tabela if all(f(l) for f in filtros)]
+            self.tabelas[alvo] = [l for l in tabela if l not in removidas]
+            return self._responder(request, removidas)
+
+        return _erro(405, "PGRST000", f"Método {request.method} não suportado")
+
+    # --- Funções de sql/ ---
+    async def _rpc(self, request: Request, nome: str) -> Response:
+        p = await request.json() if request.method == "POST" else dict(request.query_params)
+        funcao = getattr(self, f"_rpc_{nome}", None)
+        if funcao is None:
+            return _erro(404, "PGRST202", f"Função {nome} não encontrada")
+        return JSONResponse(funcao(**p))
+
+    def _rpc_pbl_liberar_conteudo(self, p_conteudo_id, p_tipo, p_turmas, p_agendamento_id=None):
+        if p_agendamento_id is not None:
+            agendamento = next((a for a in self._tabela("PBL - liberacoes_agendadas")
+                                if str(a.get("id")) == p_agendamento_id and a.get("liberado") is not True), None)
+            if agendamento is None:
+                return -1
+            agendamento["liberado"] = True
+        cpfs = {u["cpf"] for u in self._tabela("PBL - usuarios") if u.get("turma") in (p_turmas or [])}
+        n = 0
+        for d in self._tabela("PBL - desafios"):
+            if (d.get("cpf") in cpfs and str(d.get("conteudo_id")) == p_conteudo_id
+                    and d.get("tipo") == p_tipo and d.get("desafio_liberado") is not True):
+                d["desafio_liberado"] = True
+                n += 1
+        return n
+
+    def _rpc_pbl_enfileirar_geracao(self, p_cpfs):
+        agora = datetime.now(timezone.utc).isoformat()
+        novo = {"status": "pendente", "tentativas": 0, "itens_feitos": 0, "itens_total": 0, "ultimo_erro": None,
+                "proxima_tentativa": agora, "iniciado_em": None, "finalizado_em": None, "atualizado_em": agora}
+        jobs = self._tabela("PBL - geracao_jobs")
+        enfileirados = []
+        for cpf in dict.fromkeys(c for c in p_cpfs if c is not None):
+            job = next((j for j in jobs if j.get("cpf") == cpf), None)
+            if job is None:
+                job = {"id": str(uuid.uuid4()), "cpf": cpf, "created_at": agora}
+                jobs.append(job)
+            elif job.get("status") in ("pendente", "executando"):
+                continue
+            job.update(novo)
+            enfileirados.append(dict(job))
+        return enfileirados
+
+    def _uso_desde(self, p_desde: str, p_turma: Optional[str] = None):
+        return [u for u in self._tabela("PBL - uso_llm")
+                if u.get("criado_em", "") >= p_desde and (p_turma is None or u.get("turma") == p_turma)]
+
+    def _rpc_pbl_uso_llm_total(self, p_desde, p_cpf=None, p_turma=None):
+        return sum(u["prompt_tokens"] + u["completion_tokens"] for u in self._uso_desde(p_desde, p_turma)
+                   if p_cpf is None or u.get("cpf") == p_cpf)
+
+    def _rpc_pbl_uso_llm_resumo(self, p_desde, p_agrupar="turma", p_turma=None):
+        grupos: Dict[str, dict] = {}
+        for u in self._uso_desde(p_desde, p_turma):
+            chave = u.get({"cpf": "cpf", "tipo": "tipo"}.get(p_agrupar, "turma"))
+            g = grupos.setdefault(chave, {"grupo": chave, "chamadas": 0, "prompt_tokens": 0, "completion_tokens": 0, "custo_usd": 0.0})
+            g["chamadas"] += 1
+            g["prompt_tokens"] += u["prompt_tokens"]
+            g["completion_tokens"] += u["completion_tokens"]
+            g["custo_usd"] += u["custo_usd"]
+        return sorted(grupos.values(), key=lambda g: -g["custo_usd"])
+
+
+def criar_app(tabelas: Optional[Dict[str, List[dict]]] = None, latencia: Tuple[float, float] = (0.0, 0.0)) -> Starlette:
+    """`latencia` = (mínima, máxima) em segundos, sorteada a cada consulta (simula a rede até o Supabase)."""
+    banco = BancoFalso(tabelas if tabelas is not None else gerar_dados())
+    banco.latencia = latencia
+
+    async def estado(request: Request):
+        return JSONResponse({"consultas": banco.consultas, "linhas": {t: len(l) for t, l in banco.tabelas.items()}})
+
+    app = Starlette(routes=[
+        Route("/rest/v1/{alvo:path}", banco.atender, methods=["GET", "HEAD", "POST", "PATCH", "DELETE"]),
+        Route("/_estado", estado),
+    ])
+    app.state.banco = banco
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=54321)
+    parser.add_argument("--turmas", type=int, default=5)
+    parser.add_argument("--alunos-por-turma", type=int, default=100)
+    parser.add_argument("--modulos", type=int, default=5)
+    parser.add_argument("--aulas-por-modulo", type=int, default=5)
+    parser.add_argument("--latencia-ms", default="2:8", help="latência por consulta, 'min:max' em ms")
+    args = parser.parse_args()
+    minimo, _, maximo = args.latencia_ms.partition(":")
+    dados = gerar_dados(args.turmas, args.alunos_por_turma, args.modulos, args.aulas_por_modulo)
+    app = criar_app(dados, (float(minimo) / 1000, float(maximo or minimo) / 1000))
+    uvicorn.run(app, host=args.host, port=args.porta, log_level="warning")
@@ -0,0 +1,66 @@
+# benchmarks/relatorio.py
+"""Coleta de latências e relatório (vazão, p50/p95/p99) dos cenários de carga."""
+import json
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+
+def percentil(valores: List[float], p: float) -> float:
+    """Percentil por interpolação linear (p entre 0 e 100)."""
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    posicao = (len(ordenados) - 1) * p / 100
+    base = int(posicao)
+    proximo = min(base + 1, len(ordenados) - 1)
+    return ordenados[base] + (ordenados[proximo] - ordenados[base]) * (posicao - base)
+
+
+class Medicao:
+    """Latências (segundos) e resultados de um cenário."""
+    def __init__(self, nome: str):
+        self.nome = nome
+        self.latencias: List[float] = []
+        self.resultados: Counter = Counter()
+        self.inicio = time.perf_counter()
+        self.fim: Optional[float] = None
+
+    def registrar(self, segundos: float, resultado) -> None:
+        self.latencias.append(segundos)
+        self.resultados[str(resultado)] += 1
+
+    def encerrar(self) -> "Medicao":
+        self.fim = time.perf_counter()
+        return self
+
+    def resumo(self) -> Dict:
+        duracao = (self.fim or time.perf_counter()) - self.inicio
+        ms = [v * 1000 for v in self.latencias]
+        return {
+            "cenario": self.nome,
+            "requisicoes": len(ms),
+            "resultados": dict(self.resultados),
+            "duracao_s": round(duracao, 2),
+            "vazao_rps": round(len(ms) / duracao, 1) if duracao > 0 else 0.0,
+            "p50_ms": round(percentil(ms, 50), 1),
+            "p95_ms": round(percentil(ms, 95), 1),
+            "p99_ms": round(percentil(ms, 99), 1),
+            "max_ms": round(max(ms), 1) if ms else 0.0,
+        }
+
+
+def imprimir(resumos: List[Dict]) -> None:
+    colunas = ("cenario", "requisicoes", "vazao_rps", "p50_ms", "p95_ms", "p99_ms", "max_ms")
+    larguras = [max(len(c), *(len(str(r.get(c, ""))) for r in resumos)) for c in colunas]
+    print("  ".join(c.ljust(l) for c, l in zip(colunas, larguras)))
+    for r in resumos:
+        print("  ".join(str(r.get(c, "")).ljust(l) for c, l in zip(colunas, larguras)))
+    for r in resumos:
+        print(f"  {r['cenario']}: {json.dumps(r['resultados'], ensure_ascii=False)}"
+              + (f" {json.dumps(r['extra'], ensure_ascii=False)}" if r.get("extra") else ""))
+
+
+def salvar(resumos: List[Dict], caminho: str) -> None:
+    with open(caminho, "w", encoding="utf-8") as f:
+        json.dump(resumos, f, ensure_ascii=False, indent=2)
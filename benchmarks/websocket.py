@@ -0,0 +1,464 @@
+# benchmarks/websocket.py
+"""
+Carga de WebSockets no /ws da API: milhares de clientes conectados ao mesmo tempo, cada um
+mandando "ping" a cada 15 s (como o useBackendWS de cada aba aberta), e liberações do admin
+(POST /api/admin/liberar para todas as turmas) disparando o broadcast para todos.
+
+Reporta a latência de conexão, do ping/pong e do fan-out (do início do POST até cada cliente
+receber a mensagem "liberacao"), as entregas perdidas e a memória (RSS) da API por conexão.
+
+    python -m benchmarks.websocket --turmas 10 --alunos-por-turma 300 --abas 2 --broadcasts 10
+
+Modo soak (--soak-segundos): mantém os clientes por horas, reconectando uma fração deles a
+cada intervalo (metade com fechamento normal, metade derrubando o TCP, como uma aba fechada
+ou uma rede que cai) e amostrando as conexões abertas e o RSS. Ao final fecha todos e confere
+se a API voltou a zero conexões e se o RSS parou de crescer.
+
+    python -m benchmarks.websocket --soak-segundos 14400 --churn 0.05 --saida soak.json
+
+Use --workers 1 (padrão): /api/admin/ws e o RSS medidos são os de um processo. Com --url, o RSS
+só é medido se --pid-api for informado (o processo principal do uvicorn; os filhos são somados).
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import time
+from collections import deque
+from datetime import datetime
+from typing import Deque, Dict, List, Optional
+import httpx
+from .carga import Carga, Processos, subir_ambiente
+from .dados import CPF_ADMIN
+from .relatorio import Medicao, imprimir, salvar
+
+try:
+    from websockets.asyncio.client import connect
+    from websockets.exceptions import ConnectionClosed
+except ImportError:  # pragma: no cover - dependência só do benchmark
+    connect = None
+    ConnectionClosed = Exception
+
+ORIGEM = "http://localhost:5173"
+
+
+# --- Memória do processo da API ---
+def _rss_kb(pid: int) -> int:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for linha in f:
+                if linha.startswith("VmRSS:"):
+                    return int(linha.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def _filhos(pid: int) -> List[int]:
+    filhos = []
+    for nome in os.listdir("/proc"):
+        if not nome.isdigit():
+            continue
+        try:
+            with open(f"/proc/{nome}/stat") as f:
+                # O nome do comando vem entre parênteses e pode ter espaços
+                campos = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        if int(campos[1]) == pid:
+            filhos.append(int(nome))
+    return filhos
+
+
+def rss_mb(pid: Optional[int]) -> Optional[float]:
+    """RSS do processo e dos filhos (workers do uvicorn), em MB; None se não houver pid."""
+    if not pid:
+        return None
+    pids = [pid]
+    for p in pids:
+        pids.extend(_filhos(p))
+    return round(sum(_rss_kb(p) for p in pids) / 1024, 1)
+
+
+def tendencia_mb_por_hora(amostras: List[dict]) -> float:
+    """Inclinação (mínimos quadrados) do RSS na segunda metade das amostras, em MB/h."""
+    pontos = [(a["t"], a["rss_mb"]) for a in amostras[len(amostras) // 2:] if a.get("rss_mb") is not None]
+    if len(pontos) < 2:
+        return 0.0
+    media_t = sum(t for t, _ in pontos) / len(pontos)
+    media_r = sum(r for _, r in pontos) / len(pontos)
+    variancia = sum((t - media_t) ** 2 for t, _ in pontos)
+    if variancia == 0:
+        return 0.0
+    return round(sum((t - media_t) * (r - media_r) for t, r in pontos) / variancia * 3600, 2)
+
+
+def elevar_limite_arquivos(necessarios: int) -> int:
+    """Cada cliente é um descritor de arquivo; sobe o soft limit até o hard limit se preciso."""
+    atual, maximo = resource.getrlimit(resource.RLIMIT_NOFILE)
+    desejado = necessarios + 256
+    if atual < desejado:
+        novo = desejado if maximo == resource.RLIM_INFINITY else min(desejado, maximo)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (novo, maximo))
+        atual = novo
+    return atual
+
+
+# --- Clientes ---
+class ClienteWS:
+    def __init__(self, indice: int, cpf: str, turma: str, token: str):
+        self.indice = indice
+        self.cpf = cpf
+        self.turma = turma
+        self.token = token
+        self.conexao = None
+        self.tarefas: List[asyncio.Task] = []
+        self.pings: Deque[float] = deque()
+        self.encerrando = False
+
+
+class Rodada:
+    """Um broadcast: quem estava conectado quando começou e quando cada um recebeu."""
+    def __init__(self, conteudo_id: str, esperados: List[int]):
+        self.conteudo_id = conteudo_id
+        self.esperados = set(esperados)
+        self.inicio = time.perf_counter()
+        self.recebidos: Dict[int, float] = {}
+        self.completa = asyncio.Event()
+        if not self.esperados:
+            self.completa.set()
+
+
+class BancadaWS:
+    def __init__(self, client: httpx.AsyncClient, args, url: str, pid_api: Optional[int]):
+        self.client = client
+        self.args = args
+        self.url_ws = url.replace("http", "ws", 1).rstrip("/") + "/ws"
+        self.pid_api = pid_api
+        self.clientes: List[ClienteWS] = []
+        self.tokens: Dict[str, str] = {}
+        self.conexao_medicao = Medicao("ws_conexao")
+        self.ping_medicao = Medicao("ws_ping_pong")
+        self.fanout_medicao = Medicao("ws_fanout")
+        self.admin_medicao = Medicao("ws_liberacao_admin")
+        self.rodada: Optional[Rodada] = None
+        self.rodadas = 0
+        self.perdidas = 0
+        self.quedas = 0
+        self.amostras: List[dict] = []
+        self.resumos: List[dict] = []
+        self.inicio = time.monotonic()
+
+    # Conexões
+    async def conectar(self, cliente: ClienteWS):
+        inicio = time.perf_counter()
+        try:
+            cliente.conexao = await connect(
+                f"{self.url_ws}?token={cliente.token}", origin=ORIGEM, proxy=None, ping_interval=None,
+                open_timeout=self.args.timeout, compression=None if self.args.sem_compressao else "deflate",
+            )
+        except Exception as e:
+            self.conexao_medicao.registrar(time.perf_counter() - inicio, type(e).__name__)
+            cliente.conexao = None
+            return
+        self.conexao_medicao.registrar(time.perf_counter() - inicio, "ok")
+        cliente.encerrando = False
+        cliente.pings.clear()
+        cliente.tarefas = [asyncio.create_task(self._ler(cliente)), asyncio.create_task(self._batimentos(cliente))]
+
+    async def conectar_todos(self, clientes: List[ClienteWS]):
+        semaforo = asyncio.Semaphore(self.args.concorrencia)
+
+        async def conectar(cliente):
+            async with semaforo:
+                await self.conectar(cliente)
+
+        await asyncio.gather(*(conectar(c) for c in clientes))
+
+    async def desconectar(self, cliente: ClienteWS, abrupto: bool = False):
+        cliente.encerrando = True
+        for tarefa in cliente.tarefas:
+            tarefa.cancel()
+        cliente.tarefas = []
+        conexao, cliente.conexao = cliente.conexao, None
+        if conexao is None:
+            return
+        if abrupto:
+            # Sem frame de fechamento: o servidor só descobre ao ler ou escrever
+            conexao.transport.abort()
+            return
+        try:
+            await asyncio.wait_for(conexao.close(), timeout=self.args.timeout)
+        except Exception:
+            conexao.transport.abort()
+
+    async def _ler(self, cliente: ClienteWS):
+        try:
+            async for mensagem in cliente.conexao:
+                agora = time.perf_counter()
+                if mensagem == "pong":
+                    if cliente.pings:
+                        self.ping_medicao.registrar(agora - cliente.pings.popleft(), "ok")
+                    continue
+                try:
+                    dados = json.loads(mensagem)
+                except ValueError:
+                    continue
+                rodada = self.rodada
+                if (rodada is not None and dados.get("tipo") == "liberacao" and dados.get("conteudo_id") == rodada.conteudo_id
+                        and cliente.indice in rodada.esperados and cliente.indice not in rodada.recebidos):
+                    rodada.recebidos[cliente.indice] = agora
+                    self.fanout_medicao.registrar(agora - rodada.inicio, "ok")
+                    if len(rodada.recebidos) == len(rodada.esperados):
+                        rodada.completa.set()
+        except ConnectionClosed:
+            pass
+        if not cliente.encerrando:
+            # Fechada pelo servidor (ex.: descartada por lentidão)
+            self.quedas += 1
+            cliente.conexao = None
+
+    async def _batimentos(self, cliente: ClienteWS):
+        intervalo = self.args.intervalo_ping
+        # Abas abertas em momentos diferentes: os pings não saem sincronizados
+        await asyncio.sleep(random.uniform(0, intervalo))
+        while True:
+            cliente.pings.append(time.perf_counter())
+            try:
+                await cliente.conexao.send("ping")
+            except Exception:
+                self.ping_medicao.registrar(time.perf_counter() - cliente.pings.pop(), "falha_envio")
+                return
+            await asyncio.sleep(intervalo * random.uniform(0.9, 1.1))
+
+    def conectados(self) -> List[ClienteWS]:
+        return [c for c in self.clientes if c.conexao is not None]
+
+    # Broadcast
+    async def broadcast(self):
+        """Libera um conteúdo para todas as turmas e espera a mensagem chegar a todos os conectados."""
+        modulo = self.rodadas % self.args.modulos + 1
+        aula = self.rodadas // self.args.modulos % self.args.aulas_por_modulo + 1
+        self.rodadas += 1
+        conteudo_id = f"m{modulo}a{aula}"
+        self.rodada = rodada = Rodada(conteudo_id, [c.indice for c in self.conectados()])
+        try:
+            resposta = await self.client.post("/api/admin/liberar", headers=self._auth_admin(), json={
+                "conteudo_id": conteudo_id, "modulo": f"Módulo {modulo:02d}", "aula": f"Aula {aula:02d}",
+                "turmas": [f"T{t + 1}" for t in range(self.args.turmas)], "data_iso": datetime.now().isoformat(),
+            })
+            self.admin_medicao.registrar(time.perf_counter() - rodada.inicio, resposta.status_code)
+        except Exception as e:
+            self.admin_medicao.registrar(time.perf_counter() - rodada.inicio, type(e).__name__)
+            return
+        try:
+            await asyncio.wait_for(rodada.completa.wait(), timeout=self.args.timeout_broadcast)
+        except asyncio.TimeoutError:
+            pass
+        perdidas = len(rodada.esperados) - len(rodada.recebidos)
+        self.perdidas += perdidas
+        self.fanout_medicao.resultados["perdida"] += perdidas
+        self.rodada = None
+
+    def _auth_admin(self) -> dict:
+        return {"Authorization": f"Bearer {self.tokens[CPF_ADMIN]}"}
+
+    # Amostras
+    async def _coletar(self, etapa: str) -> dict:
+        try:
+            servidor = (await self.client.get("/api/admin/ws", headers=self._auth_admin())).json()
+        except Exception as e:
+            servidor = {"erro": type(e).__name__}
+        return {
+            "t": round(time.monotonic() - self.inicio, 1), "etapa": etapa, "clientes": len(self.conectados()),
+            "conexoes_servidor": servidor.get("conexoes"), "alunos_servidor": servidor.get("alunos"),
+            "enfileiradas": servidor.get("mensagens_enfileiradas"),
+            "descartadas_por_lentidao": servidor.get("descartadas_por_lentidao"),
+            "rss_mb": rss_mb(self.pid_api),
+        }
+
+    async def amostrar(self, etapa: str) -> dict:
+        amostra = await self._coletar(etapa)
+        self.amostras.append(amostra)
+        print(f"[WS] {amostra['t']:>8}s {etapa}: clientes {amostra['clientes']}, servidor {amostra['conexoes_servidor']}, "
+              f"RSS {amostra['rss_mb']} MB")
+        return amostra
+
+    async def aguardar_servidor(self, conexoes: int, timeout: float = 30) -> dict:
+        """Consulta até a API reportar `conexoes` conexões abertas (ou estourar o timeout)."""
+        limite = time.monotonic() + timeout
+        while True:
+            amostra = await self._coletar("aguardando")
+            if amostra["conexoes_servidor"] == conexoes or time.monotonic() > limite:
+                return amostra
+            await asyncio.sleep(1)
+
+    # Execução
+    def _concluir(self, medicao: Medicao, **extra):
+        resumo = medicao.encerrar().resumo()
+        if extra:
+            resumo["extra"] = extra
+        self.resumos.append(resumo)
+
+    async def preparar(self, carga: Carga):
+        await carga.login(medir=False)
+        self.tokens = carga.tokens
+        if CPF_ADMIN not in self.tokens:
+            raise SystemExit("[WS] Login do admin falhou; confira a API e o PostgREST falso.")
+        indice = 0
+        for _ in range(self.args.abas):
+            for cpf in carga.alunos:
+                if cpf in self.tokens:
+                    self.clientes.append(ClienteWS(indice, cpf, carga.turma[cpf], self.tokens[cpf]))
+                    indice += 1
+
+    async def rajada(self) -> dict:
+        antes = await self.aguardar_servidor(0, timeout=5)
+        await self.conectar_todos(self.clientes)
+        depois = await self.aguardar_servidor(len(self.conectados()))
+        await self.amostrar("conectados")
+
+        # Heartbeats rodando enquanto os broadcasts acontecem
+        for _ in range(self.args.broadcasts):
+            await asyncio.sleep(self.args.intervalo_broadcast)
+            await self.broadcast()
+        restante = self.args.duracao_batimentos - self.args.broadcasts * self.args.intervalo_broadcast
+        if restante > 0:
+            await asyncio.sleep(restante)
+        return self._memoria(antes, depois)
+
+    async def soak(self):
+        await self.conectar_todos(self.clientes)
+        await self.aguardar_servidor(len(self.conectados()))
+        await self.amostrar("conectados")
+        fim = time.monotonic() + self.args.soak_segundos
+        proximo_churn = time.monotonic() + self.args.intervalo_churn
+        proximo_broadcast = time.monotonic() + self.args.intervalo_broadcast
+        proxima_amostra = time.monotonic() + self.args.intervalo_amostra
+        while time.monotonic() < fim:
+            await asyncio.sleep(1)
+            agora = time.monotonic()
+            if agora >= proximo_churn:
+                proximo_churn = agora + self.args.intervalo_churn
+                await self.churn()
+            if agora >= proximo_broadcast:
+                proximo_broadcast = agora + self.args.intervalo_broadcast
+                await self.broadcast()
+            if agora >= proxima_amostra:
+                proxima_amostra = agora + self.args.intervalo_amostra
+                await self.amostrar("soak")
+
+    async def churn(self):
+        """Reconecta uma fração dos clientes (e quem o servidor derrubou)."""
+        conectados = self.conectados()
+        sorteados = random.sample(conectados, int(len(conectados) * self.args.churn))
+        await asyncio.gather(*(self.desconectar(c, abrupto=i % 2 == 1) for i, c in enumerate(sorteados)))
+        await self.conectar_todos(sorteados + [c for c in self.clientes if c.conexao is None and c not in sorteados])
+
+    def _memoria(self, antes: dict, depois: dict) -> dict:
+        if antes.get("rss_mb") is None or depois.get("rss_mb") is None or not depois.get("conexoes_servidor"):
+            return {}
+        diferenca_kb = (depois["rss_mb"] - antes["rss_mb"]) * 1024
+        return {"rss_antes_mb": antes["rss_mb"], "rss_conectados_mb": depois["rss_mb"],
+                "kb_por_conexao": round(diferenca_kb / depois["conexoes_servidor"], 1)}
+
+    async def encerrar(self) -> dict:
+        """Fecha todos os clientes e confere se o servidor liberou as conexões."""
+        await asyncio.gather(*(self.desconectar(c) for c in self.clientes))
+        final = await self.aguardar_servidor(0, timeout=self.args.timeout)
+        await self.amostrar("encerrado")
+        return {
+            "conexoes_servidor_apos_fechar": final["conexoes_servidor"],
+            "alunos_servidor_apos_fechar": final["alunos_servidor"],
+            "rss_apos_fechar_mb": final["rss_mb"],
+            "quedas_pelo_servidor": self.quedas,
+        }
+
+
+async def executar(args) -> Dict:
+    if connect is None:
+        raise SystemExit("O benchmark de WebSocket precisa do pacote websockets (pip install websockets).")
+    limite = elevar_limite_arquivos(args.turmas * args.alunos_por_turma * args.abas + args.concorrencia)
+    print(f"[WS] Limite de arquivos abertos: {limite}")
+
+    processos = Processos(args.verboso)
+    try:
+        url = args.url or await subir_ambiente(args, processos)
+        pid_api = args.pid_api or (processos.processos[-1].pid if not args.url else None)
+        limites = httpx.Limits(max_connections=args.concorrencia, max_keepalive_connections=args.concorrencia)
+        async with httpx.AsyncClient(base_url=url, limits=limites, timeout=args.timeout) as client:
+            carga = Carga(client, args)
+            bancada = BancadaWS(client, args, url, pid_api)
+            await bancada.preparar(carga)
+            print(f"[WS] {len(bancada.clientes)} clientes ({args.abas} aba(s) por aluno) em {bancada.url_ws}")
+
+            memoria = {}
+            if args.soak_segundos:
+                await bancada.soak()
+            else:
+                memoria = await bancada.rajada()
+            fechamento = await bancada.encerrar()
+
+        bancada._concluir(bancada.conexao_medicao)
+        bancada._concluir(bancada.ping_medicao)
+        bancada._concluir(bancada.admin_medicao)
+        bancada._concluir(bancada.fanout_medicao, broadcasts=bancada.rodadas, entregas_perdidas=bancada.perdidas)
+        resultado = {**memoria, **fechamento}
+        if args.soak_segundos:
+            resultado["rss_tendencia_mb_por_hora"] = tendencia_mb_por_hora(
+                [a for a in bancada.amostras if a["etapa"] == "soak"])
+            resultado["pico_conexoes_servidor"] = max((a["conexoes_servidor"] or 0) for a in bancada.amostras)
+        resultado["vazamento_suspeito"] = bool(fechamento["conexoes_servidor_apos_fechar"]
+                                               or fechamento["alunos_servidor_apos_fechar"])
+        return {"resumos": bancada.resumos, "resultado": resultado, "amostras": bancada.amostras}
+    finally:
+        processos.encerrar()
+        if not args.verboso and not args.url:
+            print(f"[WS] Logs dos processos em {processos.logs}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turmas", type=int, default=5)
+    parser.add_argument("--alunos-por-turma", type=int, default=200)
+    parser.add_argument("--abas", type=int, default=1, help="conexões por aluno (abas abertas)")
+    parser.add_argument("--modulos", type=int, default=5)
+    parser.add_argument("--aulas-por-modulo", type=int, default=5)
+    parser.add_argument("--concorrencia", type=int, default=200, help="logins/conexões simultâneos na abertura")
+    parser.add_argument("--intervalo-ping", type=float, default=15, help="segundos entre pings de cada cliente")
+    parser.add_argument("--broadcasts", type=int, default=5, help="liberações disparadas (modo rajada)")
+    parser.add_argument("--intervalo-broadcast", type=float, default=5, help="segundos entre liberações")
+    parser.add_argument("--timeout-broadcast", type=float, default=30, help="espera máxima pelas entregas")
+    parser.add_argument("--duracao-batimentos", type=float, default=45,
+                        help="segundos com os clientes conectados no modo rajada (mede o ping/pong)")
+    parser.add_argument("--sem-compressao", action="store_true", help="não negocia permessage-deflate")
+    parser.add_argument("--soak-segundos", type=float, default=0, help="ativa o modo soak por N segundos")
+    parser.add_argument("--churn", type=float, default=0.05, help="fração reconectada a cada intervalo (soak)")
+    parser.add_argument("--intervalo-churn", type=float, default=60)
+    parser.add_argument("--intervalo-amostra", type=float, default=30)
+    parser.add_argument("--workers", type=int, default=1, help="workers do uvicorn")
+    parser.add_argument("--latencia-llm", default="constante:0.5", help="ver benchmarks/fake_openai.py")
+    parser.add_argument("--erro-429", type=float, default=0.0)
+    parser.add_argument("--erro-500", type=float, default=0.0)
+    parser.add_argument("--latencia-db-ms", default="2:8", help="latência por consulta, 'min:max' em ms")
+    parser.add_argument("--com-limite", action="store_true", help="mantém o limite de taxa da API ativo")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--porta-base", type=int, default=18000)
+    parser.add_argument("--url", help="API já em execução (não sobe processos)")
+    parser.add_argument("--pid-api", type=int, help="pid da API (com --url) para medir o RSS")
+    parser.add_argument("--saida", help="grava resumos, resultado e amostras em JSON")
+    parser.add_argument("--verboso", action="store_true", help="mostra a saída dos subprocessos")
+    args = parser.parse_args()
+
+    relatorio = asyncio.run(executar(args))
+    print()
+    imprimir(relatorio["resumos"])
+    print(f"  resultado: {json.dumps(relatorio['resultado'], ensure_ascii=False)}")
+    if args.saida:
+        salvar(relatorio, args.saida)
+
+
+if __name__ == "__main__":
+    main()
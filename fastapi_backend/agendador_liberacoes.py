@@ -0,0 +1,176 @@
+# fastapi_backend/agendador_liberacoes.py
+"""
+Agendador de liberações dentro da API.
+
+Os agendamentos pendentes de "PBL - liberacoes_agendadas" ficam em um min-heap ordenado
+pelo instante de liberação. Uma única tarefa dorme até o próximo instante, libera o
+agendamento com uma escrita em lote (liberador.liberar_agendamento) e avisa as turmas
+afetadas pelo WebSocket. No startup, e periodicamente, os agendamentos pendentes são
+recarregados do banco — assim o agendador sobrevive a restarts e enxerga agendamentos
+criados pelo pbl_admin.
+"""
+import os
+import asyncio
+import heapq
+import time
+import traceback
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from .conexoes import manager
+from .db import get_supabase_async
+from .indice_liberacoes import TABELA_LIBERACOES, instante_liberacao
+from .liberador import liberar_agendamento, tipo_do_agendamento
+
+AGENDADOR_LIBERACOES_ATIVO = os.getenv("AGENDADOR_LIBERACOES_ATIVO", "true").lower() in ("1", "true", "sim", "yes")
+# Intervalo de recarga dos pendentes (agendamentos criados fora desta API)
+AGENDADOR_LIBERACOES_SYNC_SEGUNDOS = float(os.getenv("AGENDADOR_LIBERACOES_SYNC_SEGUNDOS", "300"))
+# Espera antes de tentar de novo um agendamento cuja liberação falhou
+AGENDADOR_LIBERACOES_RETRY_SEGUNDOS = float(os.getenv("AGENDADOR_LIBERACOES_RETRY_SEGUNDOS", "30"))
+# Sono máximo: relógio de parede pode mudar, então o próximo instante é reavaliado
+ESPERA_MAXIMA_SEGUNDOS = 60.0
+
+
+def mensagem_liberacao(agendamento: dict) -> dict:
+    return {
+        "tipo": "liberacao",
+        "conteudo_id": agendamento.get("conteudo_id"),
+        "tipo_desafio": tipo_do_agendamento(agendamento),
+        "modulo": agendamento.get("modulo"),
+        "aula": agendamento.get("aula"),
+        "turmas": agendamento.get("turmas") or [],
+    }
+
+
+class AgendadorLiberacoes:
+    def __init__(self):
+        self._heap: List[Tuple[datetime, str]] = []
+        self._pendentes: Dict[str, dict] = {}
+        self._tarefa: Optional[asyncio.Task] = None
+        self._acordar: Optional[asyncio.Event] = None
+        self._sincronizado_em = 0.0
+        self.liberados = 0
+        self.desafios_liberados = 0
+        self.falhas = 0
+
+    async def iniciar(self):
+        if self._tarefa is not None:
+            return
+        self._acordar = asyncio.Event()
+        try:
+            await self.recarregar_pendentes()
+        except Exception as e:
+            print(f"[LIBERACOES] Aviso: não foi possível carregar os agendamentos pendentes: {e}")
+        self._tarefa = asyncio.create_task(self._executar())
+        print(f"[LIBERACOES] Agendador iniciado com {len(self._pendentes)} agendamento(s) pendente(s).")
+
+    async def parar(self):
+        if self._tarefa is None:
+            return
+        self._tarefa.cancel()
+        await asyncio.gather(self._tarefa, return_exceptions=True)
+        self._tarefa = None
+
+    def _incluir(self, agendamento: dict, retentar_em: Optional[datetime] = None):
+        if agendamento.get("liberado") or agendamento.get("id") is None:
+            return
+        original = instante_liberacao(agendamento)
+        if original is None:
+            print(f"[LIBERACOES] Aviso: data/hora inválida no agendamento {agendamento.get('id')}.")
+            return
+        # Depois de uma falha, só após o backoff (mesmo que a recarga o reencontre no banco)
+        instante = max(original, retentar_em) if retentar_em else original
+        chave = str(agendamento["id"])
+        self._pendentes[chave] = {**agendamento, "_instante": instante, "_original": original, "_retentar_em": retentar_em}
+        heapq.heappush(self._heap, (instante, chave))
+        self._acordar.set()
+
+    async def recarregar_pendentes(self):
+        supabase = await get_supabase_async()
+        res = await (
+            supabase.table(TABELA_LIBERACOES)
+            .select("id, conteudo_id, modulo, aula, turmas, data_liberacao, hora_liberacao, liberado")
+            .eq("liberado", False)
+            .execute()
+        )
+        vistos = set()
+        for agendamento in res.data or []:
+            vistos.add(str(agendamento["id"]))
+            atual = self._pendentes.get(str(agendamento["id"]))
+            # Não duplica entradas do heap se o horário do banco não mudou; reagendado, mantém o backoff
+            if atual is None or atual["_original"] != instante_liberacao(agendamento):
+                self._incluir(agendamento, atual["_retentar_em"] if atual else None)
+        # Agendamentos liberados/removidos por fora: as entradas antigas do heap são ignoradas
+        for chave in set(self._pendentes) - vistos:
+            del self._pendentes[chave]
+        self._sincronizado_em = time.monotonic()
+
+    def _proximo(self) -> Optional[Tuple[datetime, str]]:
+        """Topo do heap, descartando entradas obsoletas (removidas ou reagendadas)."""
+        while self._heap:
+            instante, chave = self._heap[0]
+            agendamento = self._pendentes.get(chave)
+            if agendamento is not None and agendamento["_instante"] == instante:
+                return instante, chave
+            heapq.heappop(self._heap)
+        return None
+
+    async def _executar(self):
+        while True:
+            try:
+                if time.monotonic() - self._sincronizado_em >= AGENDADOR_LIBERACOES_SYNC_SEGUNDOS:
+                    await self.recarregar_pendentes()
+
+                proximo = self._proximo()
+                espera = ESPERA_MAXIMA_SEGUNDOS
+                if proximo is not None:
+                    espera = min(espera, (proximo[0] - datetime.now()).total_seconds())
+                if espera > 0:
+                    self._acordar.clear()
+                    try:
+                        await asyncio.wait_for(self._acordar.wait(), timeout=espera)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+
+                instante, chave = heapq.heappop(self._heap)
+                await self._liberar(self._pendentes.pop(chave))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                print("[LIBERACOES] Erro inesperado no agendador:")
+                traceback.print_exc()
+                await asyncio.sleep(AGENDADOR_LIBERACOES_RETRY_SEGUNDOS)
+
+    async def _liberar(self, agendamento: dict):
+        try:
+            liberados = await liberar_agendamento(agendamento)
+        except Exception as e:
+            self.falhas += 1
+            print(f"[LIBERACOES] Falha ao liberar agendamento {agendamento['id']}: {e}; nova tentativa em {AGENDADOR_LIBERACOES_RETRY_SEGUNDOS:.0f}s.")
+            self._incluir(agendamento, retentar_em=datetime.now() + timedelta(seconds=AGENDADOR_LIBERACOES_RETRY_SEGUNDOS))
+            return
+        if liberados < 0:
+            # Outro processo (ou o pbl_admin) já liberou este agendamento
+            return
+        self.liberados += 1
+        self.desafios_liberados += liberados
+        print(f"[LIBERACOES] Agendamento {agendamento['id']} liberado: {liberados} desafio(s) para as turmas {agendamento.get('turmas')}.")
+        try:
+            await manager.enviar_para_turmas(agendamento.get("turmas") or [], mensagem_liberacao(agendamento))
+        except Exception as e:
+            print(f"[LIBERACOES] Aviso: falha ao avisar as conexões WebSocket: {e}")
+
+    def estatisticas(self) -> dict:
+        """Deve ser chamado no event loop (rota async)."""
+        proximo = self._proximo()
+        return {
+            "ativo": self._tarefa is not None and not self._tarefa.done(),
+            "pendentes": len(self._pendentes),
+            "proxima_liberacao": proximo[0].isoformat() if proximo else None,
+            "liberados": self.liberados,
+            "desafios_liberados": self.desafios_liberados,
+            "falhas": self.falhas,
+        }
+
+
+agendador_liberacoes = AgendadorLiberacoes()
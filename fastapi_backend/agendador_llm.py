@@ -0,0 +1,260 @@
+# fastapi_backend/agendador_llm.py
+"""
+Agendador global das chamadas à OpenAI.
+
+Mantém dois token buckets (requisições por minuto e tokens por minuto) e libera as
+chamadas em rodízio entre as chaves (normalmente o CPF do aluno), de forma que a
+geração de uma turma inteira respeite os limites da conta e nenhum aluno monopolize
+a cota enquanto os outros esperam.
+
+Os buckets ficam em memória: cada processo (workers do uvicorn, com seus pools de jobs e
+de avaliação, e o fastapi_backend.worker) tem os seus. Com OPENAI_LIMITES_URL=redis://...
+(por padrão, o mesmo RATE_LIMIT_URL do limite de taxa) eles são compartilhados e os
+limites valem para a conta, somando todos os processos; se o Redis falhar, cada processo
+volta aos buckets em memória até ele voltar. O rodízio entre alunos é sempre por processo.
+"""
+import os
+import asyncio
+import time
+from collections import OrderedDict, deque
+from typing import Optional
+
+OPENAI_RPM = int(os.getenv("OPENAI_RPM", "500"))
+OPENAI_TPM = int(os.getenv("OPENAI_TPM", "300000"))
+OPENAI_LIMITES_URL = os.getenv("OPENAI_LIMITES_URL", os.getenv("RATE_LIMIT_URL", ""))
+# Tokens de resposta assumidos quando a chamada não define max_tokens
+TOKENS_RESPOSTA_PADRAO = int(os.getenv("OPENAI_TOKENS_RESPOSTA_PADRAO", "1000"))
+
+
+def estimar_tokens(prompt: str, max_tokens: Optional[int] = None) -> int:
+    """Estimativa conservadora (~3 caracteres por token em português) + resposta."""
+    return len(prompt) // 3 + (max_tokens or TOKENS_RESPOSTA_PADRAO)
+
+
+class TokenBucket:
+    """Balde de fichas reposto continuamente a `capacidade` fichas por minuto."""
+    def __init__(self, capacidade_por_minuto: int):
+        self.capacidade = float(capacidade_por_minuto)
+        self.taxa = self.capacidade / 60.0
+        self.saldo = self.capacidade
+        self.atualizado = time.monotonic()
+
+    def _repor(self):
+        agora = time.monotonic()
+        self.saldo = min(self.capacidade, self.saldo + (agora - self.atualizado) * self.taxa)
+        self.atualizado = agora
+
+    def tempo_para(self, quantidade: float) -> float:
+        """Segundos até haver `quantidade` fichas disponíveis (0 se já houver)."""
+        self._repor()
+        quantidade = min(quantidade, self.capacidade)
+        if self.saldo >= quantidade:
+            return 0.0
+        return (quantidade - self.saldo) / self.taxa
+
+    def consumir(self, quantidade: float):
+        """Consome fichas; ajustes posteriores podem deixar o saldo negativo (dívida)."""
+        self._repor()
+        self.saldo -= min(quantidade, self.capacidade) if quantidade > 0 else quantidade
+
+
+class BucketsRedis:
+    """Buckets de RPM/TPM em Redis, compartilhados por todos os processos."""
+    # KEYS: requisições, tokens; ARGV: rpm, tpm, tokens da chamada. Reserva as duas quantidades
+    # juntas (ou nenhuma) e retorna 0, ou os segundos até haver fichas
+    _RESERVAR = """
+local t = redis.call('TIME')
+local agora = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local caps = {tonumber(ARGV[1]), tonumber(ARGV[2])}
+local pedidos = {1, math.min(tonumber(ARGV[3]), caps[2])}
+local saldos, espera = {}, 0
+for i, chave in ipairs(KEYS) do
+  local d = redis.call('HMGET', chave, 's', 't')
+  local s = tonumber(d[1]) or caps[i]
+  local antes = tonumber(d[2]) or agora
+  s = math.min(caps[i], s + (agora - antes) * caps[i] / 60)
+  if s < pedidos[i] then espera = math.max(espera, (pedidos[i] - s) / (caps[i] / 60)) end
+  saldos[i] = s
+end
+for i, chave in ipairs(KEYS) do
+  local s = saldos[i]
+  if espera == 0 then s = s - pedidos[i] end
+  redis.call('HSET', chave, 's', s, 't', agora)
+  redis.call('EXPIRE', chave, 120)
+end
+return tostring(espera)
+"""
+    # KEYS: tokens; ARGV: tpm, diferença entre os tokens reais e os estimados (pode virar dívida)
+    _AJUSTAR = """
+local t = redis.call('TIME')
+local agora = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local cap = tonumber(ARGV[1])
+local d = redis.call('HMGET', KEYS[1], 's', 't')
+local s = tonumber(d[1]) or cap
+local antes = tonumber(d[2]) or agora
+s = math.min(cap, s + (agora - antes) * cap / 60 - tonumber(ARGV[2]))
+redis.call('HSET', KEYS[1], 's', s, 't', agora)
+redis.call('EXPIRE', KEYS[1], 120)
+return 1
+"""
+
+    def __init__(self, url: str, rpm: int, tpm: int):
+        try:
+            import redis.asyncio as redis_async
+        except ImportError as e:
+            raise RuntimeError("OPENAI_LIMITES_URL definido, mas o pacote 'redis' não está instalado.") from e
+        self.rpm, self.tpm = rpm, tpm
+        self._cliente = redis_async.from_url(url)
+        self._reservar = self._cliente.register_script(self._RESERVAR)
+        self._ajustar = self._cliente.register_script(self._AJUSTAR)
+
+    async def reservar(self, tokens: int) -> float:
+        return float(await self._reservar(keys=["pbl:llm:rpm", "pbl:llm:tpm"], args=[self.rpm, self.tpm, tokens]))
+
+    async def ajustar(self, diferenca: int):
+        await self._ajustar(keys=["pbl:llm:tpm"], args=[self.tpm, diferenca])
+
+
+class AgendadorLLM:
+    def __init__(self, rpm: int = OPENAI_RPM, tpm: int = OPENAI_TPM, url: str = OPENAI_LIMITES_URL):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.url = url
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._reiniciar()
+
+    def _criar_compartilhados(self):
+        return BucketsRedis(self.url, self.rpm, self.tpm) if self.url else None
+
+    def _reiniciar(self):
+        self._requisicoes = TokenBucket(self.rpm)
+        self._tokens = TokenBucket(self.tpm)
+        # O cliente Redis pertence ao event loop: recriado junto com o resto do estado
+        self._compartilhados = self._criar_compartilhados()
+        self._compartilhados_falhando = False
+        self._ajustes: set = set()
+        self._filas: "OrderedDict[str, deque]" = OrderedDict()
+        self._novo: Optional[asyncio.Event] = None
+        self._despachante: Optional[asyncio.Task] = None
+        self._pausado_ate = 0.0
+        self.total_requisicoes = 0
+        self.total_tokens = 0
+        self._iniciado_em = time.monotonic()
+
+    def _garantir_despachante(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Novo event loop (ex.: asyncio.run em scripts): descarta o estado do anterior
+            self._loop = loop
+            self._reiniciar()
+        if self._novo is None:
+            self._novo = asyncio.Event()
+        if self._despachante is None or self._despachante.done():
+            self._despachante = loop.create_task(self._despachar())
+
+    async def aguardar_vez(self, chave: str, tokens_estimados: int):
+        """Aguarda até que a chamada possa ser feita sem estourar RPM/TPM."""
+        self._garantir_despachante()
+        futuro = self._loop.create_future()
+        self._filas.setdefault(chave or "-", deque()).append((tokens_estimados, futuro))
+        self._novo.set()
+        await futuro
+
+    def ajustar(self, tokens_estimados: int, tokens_reais: Optional[int]):
+        """Corrige o bucket de tokens com o consumo real informado pela API."""
+        if tokens_reais is None:
+            return
+        diferenca = tokens_reais - tokens_estimados
+        self.total_tokens += diferenca
+        if self._compartilhados is not None and not self._compartilhados_falhando and self._loop is not None:
+            tarefa = self._loop.create_task(self._ajustar_compartilhados(diferenca))
+            self._ajustes.add(tarefa)
+            tarefa.add_done_callback(self._ajustes.discard)
+            return
+        self._tokens.consumir(diferenca)
+
+    async def _ajustar_compartilhados(self, diferenca: int):
+        try:
+            await self._compartilhados.ajustar(diferenca)
+        except Exception as e:
+            self._falha_compartilhados(e)
+            self._tokens.consumir(diferenca)
+
+    def _falha_compartilhados(self, erro: Exception):
+        if not self._compartilhados_falhando:
+            self._compartilhados_falhando = True
+            print(f"[LLM] Aviso: limites compartilhados da OpenAI indisponíveis ({erro}); usando os deste processo.")
+
+    async def _reservar(self, tokens: int) -> float:
+        """Reserva 1 requisição e `tokens` e retorna 0, ou retorna os segundos até haver fichas."""
+        if self._compartilhados is not None:
+            try:
+                espera = await self._compartilhados.reservar(tokens)
+            except Exception as e:
+                self._falha_compartilhados(e)
+            else:
+                if self._compartilhados_falhando:
+                    self._compartilhados_falhando = False
+                    print("[LLM] Limites compartilhados da OpenAI restabelecidos.")
+                return espera
+        espera = max(self._requisicoes.tempo_para(1), self._tokens.tempo_para(tokens))
+        if espera == 0:
+            self._requisicoes.consumir(1)
+            self._tokens.consumir(tokens)
+        return espera
+
+    def pausar(self, segundos: float):
+        """Suspende o despacho (usado quando a OpenAI responde 429)."""
+        self._pausado_ate = max(self._pausado_ate, time.monotonic() + segundos)
+
+    async def _despachar(self):
+        while True:
+            if not self._filas:
+                self._novo.clear()
+                await self._novo.wait()
+                continue
+
+            espera_pausa = self._pausado_ate - time.monotonic()
+            if espera_pausa > 0:
+                await asyncio.sleep(espera_pausa)
+                continue
+
+            # Rodízio: a chave atendida vai para o fim da fila
+            chave, fila = next(iter(self._filas.items()))
+            tokens, futuro = fila[0]
+            if futuro.cancelled():
+                fila.popleft()
+                if not fila:
+                    del self._filas[chave]
+                continue
+
+            espera = await self._reservar(tokens)
+            if espera > 0:
+                await asyncio.sleep(espera)
+                continue
+
+            self.total_requisicoes += 1
+            self.total_tokens += tokens
+            fila.popleft()
+            futuro.set_result(None)
+            if fila:
+                self._filas.move_to_end(chave)
+            else:
+                del self._filas[chave]
+
+    def estatisticas(self) -> dict:
+        minutos = max((time.monotonic() - self._iniciado_em) / 60.0, 1e-9)
+        return {
+            "rpm_configurado": self.rpm,
+            "tpm_configurado": self.tpm,
+            "limites": "memoria" if self._compartilhados is None or self._compartilhados_falhando else "redis",
+            "chamadas_na_fila": sum(len(f) for f in self._filas.values()),
+            "alunos_na_fila": len(self._filas),
+            "total_requisicoes": self.total_requisicoes,
+            "total_tokens": self.total_tokens,
+            "requisicoes_por_minuto": round(self.total_requisicoes / minutos, 2),
+            "tokens_por_minuto": round(self.total_tokens / minutos, 2),
+        }
+
+
+agendador = AgendadorLLM()
@@ -0,0 +1,131 @@
+# fastapi_backend/analytics.py
+"""
+Indicadores por turma para o painel administrativo: média das notas, distribuição do número
+de tentativas, taxa de conclusão por módulo e liberações pendentes.
+
+Tudo vem das tabelas de agregados de sql/007_analytics.sql, que os triggers atualizam a cada
+resposta avaliada, liberação ou mudança de turma de um aluno. Aqui só se juntam essas poucas
+linhas por turma com o catálogo em memória (módulo de cada conteúdo): nenhuma rota do painel
+varre "PBL - respostas" nem o histórico de liberações.
+"""
+import asyncio
+from collections import defaultdict
+from typing import Dict, List, Optional
+from .catalogo import catalogo
+from .db import get_supabase_async
+
+TABELA_TURMA = "PBL - analytics_turma"
+TABELA_CONTEUDO = "PBL - analytics_conteudo"
+TABELA_LIBERADOS = "PBL - analytics_liberados"
+TABELA_GERAL = "PBL - analytics_geral"
+
+CAMPOS_SOMADOS = ("respostas_avaliadas", "soma_notas", "alunos_responderam", "alunos_finalizaram",
+                  "alunos_1_tentativa", "alunos_2_tentativas", "alunos_3_tentativas")
+
+
+def _taxa(parte: float, total: float) -> Optional[float]:
+    return round(parte / total, 4) if total else None
+
+
+def _media(soma: float, n: int) -> Optional[float]:
+    return round(soma / n, 2) if n else None
+
+
+def resumir_turma(turma: str, linha_turma: Optional[dict], agregados: List[dict], liberados: List[dict],
+                  conteudos: Dict[str, dict], detalhar_modulos: bool = True) -> dict:
+    """Junta os agregados de uma turma por módulo (pelo catálogo) e calcula médias e taxas."""
+    alunos = (linha_turma or {}).get("alunos") or 0
+    liberados_ids = {str(l["conteudo_id"]) for l in liberados}
+    total = defaultdict(float)
+    modulos: Dict[str, dict] = {}
+    for a in agregados:
+        cid = str(a["conteudo_id"])
+        nome = (conteudos.get(cid) or {}).get("modulo") or "Desconhecido"
+        m = modulos.setdefault(nome, defaultdict(float))
+        for campo in CAMPOS_SOMADOS:
+            total[campo] += float(a.get(campo) or 0)
+            m[campo] += float(a.get(campo) or 0)
+        # Conclusão só conta conteúdos já liberados para a turma (o denominador)
+        if cid in liberados_ids:
+            m["responderam_liberados"] += a.get("alunos_responderam") or 0
+            m["finalizaram_liberados"] += a.get("alunos_finalizaram") or 0
+    for cid in liberados_ids:
+        nome = (conteudos.get(cid) or {}).get("modulo") or "Desconhecido"
+        modulos.setdefault(nome, defaultdict(float))["conteudos_liberados"] += 1
+
+    resumo = {
+        "turma": turma,
+        "alunos": alunos,
+        "liberacoes_pendentes": (linha_turma or {}).get("liberacoes_pendentes") or 0,
+        "respostas_avaliadas": int(total["respostas_avaliadas"]),
+        "media_nota": _media(total["soma_notas"], total["respostas_avaliadas"]),
+        "distribuicao_tentativas": {
+            "1": int(total["alunos_1_tentativa"]),
+            "2": int(total["alunos_2_tentativas"]),
+            "3+": int(total["alunos_3_tentativas"]),
+        },
+    }
+    if not detalhar_modulos:
+        return resumo
+
+    ordem = {c.get("modulo"): i for i, c in enumerate(conteudos.values())}
+    resumo["modulos"] = []
+    for nome in sorted(modulos, key=lambda n: (ordem.get(n, len(ordem)), n)):
+        m = modulos[nome]
+        esperado = alunos * int(m["conteudos_liberados"])
+        resumo["modulos"].append({
+            "modulo": nome,
+            "conteudos_liberados": int(m["conteudos_liberados"]),
+            "respostas_avaliadas": int(m["respostas_avaliadas"]),
+            "media_nota": _media(m["soma_notas"], m["respostas_avaliadas"]),
+            "alunos_responderam": int(m["alunos_responderam"]),
+            "alunos_finalizaram": int(m["alunos_finalizaram"]),
+            "taxa_conclusao": _taxa(m["responderam_liberados"], esperado),
+            "taxa_finalizacao": _taxa(m["finalizaram_liberados"], esperado),
+        })
+    return resumo
+
+
+async def _conteudos_por_id() -> Dict[str, dict]:
+    return {str(c["id"]): c for c in await catalogo.linhas_async()}
+
+
+async def resumo_turma(turma: str) -> Optional[dict]:
+    """Indicadores de uma turma, com o detalhe por módulo; None se a turma não tiver dados."""
+    supabase = await get_supabase_async()
+    linha, agregados, liberados, conteudos = await asyncio.gather(
+        supabase.table(TABELA_TURMA).select("*").eq("turma", turma).limit(1).execute(),
+        supabase.table(TABELA_CONTEUDO).select("*").eq("turma", turma).execute(),
+        supabase.table(TABELA_LIBERADOS).select("conteudo_id").eq("turma", turma).execute(),
+        _conteudos_por_id(),
+    )
+    if not (linha.data or agregados.data or liberados.data):
+        return None
+    return resumir_turma(turma, (linha.data or [None])[0], agregados.data or [], liberados.data or [], conteudos)
+
+
+async def resumo_turmas() -> dict:
+    """Visão geral: totais por turma e agendamentos pendentes (cada agendamento contado uma vez)."""
+    supabase = await get_supabase_async()
+    turmas, agregados, geral = await asyncio.gather(
+        supabase.table(TABELA_TURMA).select("*").order("turma").execute(),
+        supabase.table(TABELA_CONTEUDO).select(", ".join(("turma", "conteudo_id", *CAMPOS_SOMADOS))).execute(),
+        supabase.table(TABELA_GERAL).select("valor").eq("chave", "liberacoes_pendentes").limit(1).execute(),
+    )
+    por_turma = defaultdict(list)
+    for a in agregados.data or []:
+        por_turma[a["turma"]].append(a)
+    linhas = {t["turma"]: t for t in turmas.data or []}
+    return {
+        "liberacoes_pendentes": (geral.data or [{}])[0].get("valor") or 0,
+        "turmas": [
+            resumir_turma(nome, linhas.get(nome), por_turma.get(nome, []), [], {}, detalhar_modulos=False)
+            for nome in sorted(set(linhas) | set(por_turma), key=str)
+        ],
+    }
+
+
+async def recalcular():
+    """Reconstrói os agregados a partir das tabelas de origem (pbl_analytics_recalcular)."""
+    supabase = await get_supabase_async()
+    await supabase.rpc("pbl_analytics_recalcular", {}).execute()
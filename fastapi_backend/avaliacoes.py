@@ -0,0 +1,211 @@
+# fastapi_backend/avaliacoes.py
+"""
+Avaliação assíncrona de respostas.
+
+A rota registra a tentativa como 'pendente' em "PBL - respostas" e devolve 202 na hora.
+Um pool de workers avalia a resposta com a IA, grava nota/feedback na mesma linha e
+envia o resultado ao aluno pelo WebSocket (/ws). O aluno também pode consultar o
+resultado por id (GET /api/respostas/{id}).
+"""
+import os
+import asyncio
+import traceback
+from datetime import datetime, timedelta
+from typing import List, Optional
+from uuid import uuid4
+from .db import get_supabase_client, get_supabase_async, executar_em_thread
+from .conexoes import manager
+from .avaliador import avaliar_resposta_com_ia
+from .llm import LLMIndisponivelError, LLM_CIRCUITO_RESET_SEGUNDOS
+from .consumo_llm import OrcamentoExcedidoError
+from .painel import turma_do_aluno
+
+TABELA_RESPOSTAS = "PBL - respostas"
+
+STATUS_PENDENTE = "pendente"
+STATUS_AVALIANDO = "avaliando"
+STATUS_AVALIADA = "avaliada"
+STATUS_ERRO = "erro"
+
+AVALIACAO_WORKERS = int(os.getenv("AVALIACAO_WORKERS", "4"))
+# Avaliações iniciadas ('avaliando') há mais tempo que isso voltam para a fila (verificado no
+# startup e a cada metade desse tempo: o worker que as avaliava caiu)
+AVALIACAO_TIMEOUT_SEGUNDOS = float(os.getenv("AVALIACAO_TIMEOUT_SEGUNDOS", "300"))
+
+
+async def registrar_resposta_pendente(cpf: str, desafio_id: str, conteudo_id: str, resposta: str, tentativa: int) -> dict:
+    """Grava a tentativa como pendente de avaliação e a coloca na fila dos workers."""
+    supabase = await get_supabase_async()
+    registro = {
+        "id": str(uuid4()),
+        "cpf": cpf,
+        "desafio_id": desafio_id,
+        "conteudo_id": conteudo_id,
+        "tentativa": tentativa,
+        "texto_resposta": resposta,
+        "data_envio": datetime.utcnow().isoformat(),
+        "tentativa_finalizada": tentativa >= 3,
+        "status_avaliacao": STATUS_PENDENTE,
+    }
+    await supabase.table(TABELA_RESPOSTAS).insert(registro).execute()
+    pool.enfileirar(registro["id"])
+    return registro
+
+
+def mensagem_avaliacao(resposta: dict) -> dict:
+    """Formato do resultado enviado pelo WebSocket e devolvido na consulta por id."""
+    return {
+        "tipo": "avaliacao",
+        "id": resposta.get("id"),
+        "desafio_id": resposta.get("desafio_id"),
+        "tentativa": resposta.get("tentativa"),
+        "status": resposta.get("status_avaliacao") or STATUS_AVALIADA,
+        "nota": resposta.get("nota"),
+        "feedback": resposta.get("feedback"),
+        "sugestao": resposta.get("resposta_ideal"),
+    }
+
+
+class AvaliacaoPool:
+    """Pool de workers assíncronos que avaliam as respostas pendentes."""
+    def __init__(self):
+        self._tarefas: list = []
+        self._fila: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def iniciar(self, workers: int = AVALIACAO_WORKERS):
+        if self._tarefas or workers <= 0:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._fila = asyncio.Queue()
+        self._tarefas = [asyncio.create_task(self._executar_worker(i)) for i in range(workers)]
+        try:
+            await self.recuperar_pendentes()
+        except Exception as e:
+            print(f"[AVALIACAO] Aviso: não foi possível recarregar avaliações pendentes: {e}")
+        self._tarefas.append(asyncio.create_task(self._recuperar_periodicamente()))
+        print(f"[AVALIACAO] Pool iniciado com {workers} worker(s).")
+
+    async def parar(self):
+        for tarefa in self._tarefas:
+            tarefa.cancel()
+        await asyncio.gather(*self._tarefas, return_exceptions=True)
+        self._tarefas = []
+
+    @property
+    def tamanho_fila(self) -> int:
+        return self._fila.qsize() if self._fila is not None else 0
+
+    def enfileirar(self, resposta_id: str):
+        """Coloca uma resposta na fila (pode ser chamado de qualquer thread)."""
+        if self._loop is None or self._loop.is_closed():
+            print(f"[AVALIACAO] Aviso: pool inativo; resposta {resposta_id} será avaliada no próximo startup.")
+            return
+        self._loop.call_soon_threadsafe(self._fila.put_nowait, resposta_id)
+
+    async def _devolver_abandonadas(self) -> List[dict]:
+        """Volta para 'pendente' (e retorna) as avaliações abandonadas por um worker que caiu."""
+        supabase = get_supabase_client()
+        limite = (datetime.utcnow() - timedelta(seconds=AVALIACAO_TIMEOUT_SEGUNDOS)).isoformat()
+        # Abandonadas: reservadas por um worker há mais que o timeout (não enviadas há mais que ele,
+        # o que devolveria à fila uma resposta que esperou muito e ainda está sendo avaliada).
+        # Sem início gravado: reservadas antes da coluna existir (sql/009).
+        res = await executar_em_thread(
+            supabase.table(TABELA_RESPOSTAS)
+            .update({"status_avaliacao": STATUS_PENDENTE, "avaliacao_iniciada_em": None})
+            .eq("status_avaliacao", STATUS_AVALIANDO)
+            .or_(f"avaliacao_iniciada_em.is.null,avaliacao_iniciada_em.lt.{limite}")
+        )
+        return (res.data or []) if res else []
+
+    async def _recuperar_periodicamente(self):
+        """
+        Depois de um restart rápido, a avaliação que o processo anterior fazia ainda não passou
+        do timeout no startup: esta tarefa a devolve à fila quando passar.
+        """
+        while True:
+            await asyncio.sleep(AVALIACAO_TIMEOUT_SEGUNDOS / 2)
+            try:
+                devolvidas = await self._devolver_abandonadas()
+            except Exception as e:
+                print(f"[AVALIACAO] Aviso: não foi possível verificar avaliações abandonadas: {e}")
+                continue
+            for row in devolvidas:
+                self._fila.put_nowait(row["id"])
+            if devolvidas:
+                print(f"[AVALIACAO] {len(devolvidas)} avaliação(ões) abandonada(s) recolocada(s) na fila.")
+
+    async def recuperar_pendentes(self):
+        """Recoloca na fila as respostas que ficaram pendentes após um restart."""
+        supabase = get_supabase_client()
+        await self._devolver_abandonadas()
+        res = await executar_em_thread(
+            supabase.table(TABELA_RESPOSTAS).select("id").eq("status_avaliacao", STATUS_PENDENTE).order("data_envio")
+        )
+        for row in (res.data or []) if res else []:
+            self._fila.put_nowait(row["id"])
+        if res and res.data:
+            print(f"[AVALIACAO] {len(res.data)} avaliação(ões) pendente(s) recolocada(s) na fila.")
+
+    async def _executar_worker(self, indice: int):
+        while True:
+            resposta_id = await self._fila.get()
+            try:
+                await self._avaliar(resposta_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                print(f"[AVALIACAO] Erro inesperado no worker {indice} (resposta {resposta_id}):")
+                traceback.print_exc()
+            finally:
+                self._fila.task_done()
+
+    async def _avaliar(self, resposta_id: str):
+        supabase = get_supabase_client()
+        # Reserva atômica: só avalia se a resposta ainda estiver pendente
+        reservada = await executar_em_thread(
+            supabase.table(TABELA_RESPOSTAS)
+            .update({"status_avaliacao": STATUS_AVALIANDO, "avaliacao_iniciada_em": datetime.utcnow().isoformat()})
+            .eq("id", resposta_id)
+            .eq("status_avaliacao", STATUS_PENDENTE)
+        )
+        if not (reservada and reservada.data):
+            return
+        resposta = reservada.data[0]
+
+        try:
+            desafio, turma = await asyncio.gather(
+                executar_em_thread(
+                    supabase.table("PBL - desafios").select("texto_desafio").eq("id", resposta["desafio_id"]).single()
+                ),
+                turma_do_aluno(resposta["cpf"]),
+            )
+            texto_desafio = desafio.data["texto_desafio"]
+            # Falha da IA levanta (não vira nota 0): nota 0 seria enviada ao aluno e contada nos agregados
+            nota, feedback, sugestao = await avaliar_resposta_com_ia(
+                resposta["texto_resposta"], texto_desafio, resposta["tentativa"], resposta["cpf"], turma,
+                propagar_erros=True,
+            )
+            atualizacao = {"nota": nota, "feedback": feedback, "resposta_ideal": sugestao, "status_avaliacao": STATUS_AVALIADA}
+        except (OrcamentoExcedidoError, LLMIndisponivelError) as e:
+            # Orçamento de IA esgotado ou OpenAI fora do ar (circuito aberto): a resposta volta a
+            # ficar pendente e é avaliada quando o orçamento renovar / o circuito fechar
+            print(f"[AVALIACAO] Resposta {resposta_id} adiada: {e}")
+            await executar_em_thread(
+                supabase.table(TABELA_RESPOSTAS)
+                .update({"status_avaliacao": STATUS_PENDENTE, "avaliacao_iniciada_em": None})
+                .eq("id", resposta_id)
+            )
+            espera = e.retry_after if isinstance(e, OrcamentoExcedidoError) else LLM_CIRCUITO_RESET_SEGUNDOS
+            self._loop.call_later(espera, self.enfileirar, resposta_id)
+            return
+        except Exception as e:
+            print(f"[AVALIACAO] Falha ao avaliar resposta {resposta_id}: {e}")
+            atualizacao = {"status_avaliacao": STATUS_ERRO, "feedback": "Não foi possível gerar feedback neste momento."}
+
+        await executar_em_thread(supabase.table(TABELA_RESPOSTAS).update(atualizacao).eq("id", resposta_id))
+        resposta.update(atualizacao)
+        await manager.enviar_para_cpf(resposta["cpf"], mensagem_avaliacao(resposta))
+
+
+pool = AvaliacaoPool()
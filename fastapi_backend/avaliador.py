@@ -1,12 +1,39 @@
 # fastapi_backend/avaliador.py
-import os
-import openai
 import re
-from .db import get_supabase_client # <-- MUDANÇA AQUI
+from typing import Optional
+from .cache_avaliacao import cache_avaliacoes, chave_avaliacao
+from .llm import completar
+from .consumo_llm import contexto_consumo, OrcamentoExcedidoError
 
-openai.api_key = os.getenv("OPENAI_API_KEY")
+# Incrementar sempre que o prompt ou o parsing mudarem (invalida o cache de avaliações)
+VERSAO_PROMPT = "1"
 
-def avaliar_resposta_com_ia(resposta_do_aluno: str, texto_microdesafio: str, tentativa: int) -> tuple:
+async def avaliar_resposta_com_ia(resposta_do_aluno: str, texto_microdesafio: str, tentativa: int,
+                                  cpf: Optional[str] = None, turma: Optional[str] = None,
+                                  propagar_erros: bool = False) -> tuple:
+    """
+    Avalia a resposta com a IA, reaproveitando avaliações idênticas já feitas (cache)
+    e aguardando a chamada em andamento quando o mesmo pedido chega em paralelo.
+    Levanta OrcamentoExcedidoError se o aluno ou a turma esgotou o orçamento de IA do dia.
+    Outras falhas da IA viram nota 0 com um feedback genérico, salvo com `propagar_erros`
+    (worker assíncrono, que marca a tentativa como erro em vez de dar nota 0).
+    """
+    chave = chave_avaliacao(texto_microdesafio, resposta_do_aluno, tentativa, VERSAO_PROMPT)
+    try:
+        with contexto_consumo(cpf=cpf, turma=turma):
+            return await cache_avaliacoes.obter_ou_calcular_async(
+                chave, lambda: _avaliar_sem_cache(resposta_do_aluno, texto_microdesafio, tentativa, cpf)
+            )
+    except OrcamentoExcedidoError:
+        raise
+    except Exception as e:
+        if propagar_erros:
+            raise
+        print("Erro na avaliação com IA:", e)
+        return 0.0, "Não foi possível gerar feedback neste momento.", ""
+
+async def _avaliar_sem_cache(resposta_do_aluno: str, texto_microdesafio: str, tentativa: int,
+                            cpf: Optional[str] = None) -> tuple:
     prompt = f"""
 Você é um avaliador automático de microdesafios do modelo Problem-Based Learning (PBL), aplicado ao MBA em Agronegócio. Avalie a resposta do aluno com rigor técnico e consistência, atuando como um professor experiente que busca o desenvolvimento do estudante.
 
@@ -44,29 +71,19 @@ Sua tarefa é retornar:
 {"- Inclua essa resposta ideal ao final." if tentativa >= 3 else ""}
 """
 
-    try:
-        completion = openai.chat.completions.create(
-            model="gpt-4o",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.3
-        )
-        resposta_modelo = completion.choices[0].message.content or ""
-
-        nota_match = re.search(r"nota[:\-]?\s*(\d+(?:[.,]\d+)?)", resposta_modelo, re.IGNORECASE)
-        nota = float(nota_match.group(1).replace(",", ".")) if nota_match else 0.0
+    resposta_modelo = await completar(prompt, tipo="avaliacao", chave=cpf, temperature=0.3)
 
-        resposta_sem_nota = re.sub(r"(?i)^nota[:\-]?\s*\d+(?:[.,]\d+)?\s*", "", resposta_modelo, flags=re.MULTILINE)
+    nota_match = re.search(r"nota[:\-]?\s*(\d+(?:[.,]\d+)?)", resposta_modelo, re.IGNORECASE)
+    nota = float(nota_match.group(1).replace(",", ".")) if nota_match else 0.0
 
-        resposta_ideal = ""
-        feedback = resposta_sem_nota.strip()
+    resposta_sem_nota = re.sub(r"(?i)^nota[:\-]?\s*\d+(?:[.,]\d+)?\s*", "", resposta_modelo, flags=re.MULTILINE)
 
-        if "resposta ideal" in feedback.lower():
-            partes = re.split(r"resposta ideal[:\-]?", feedback, flags=re.IGNORECASE)
-            feedback = partes[0].strip()
-            resposta_ideal = partes[1].strip() if len(partes) > 1 else ""
+    resposta_ideal = ""
+    feedback = resposta_sem_nota.strip()
 
-        return nota, feedback, resposta_ideal
+    if "resposta ideal" in feedback.lower():
+        partes = re.split(r"resposta ideal[:\-]?", feedback, flags=re.IGNORECASE)
+        feedback = partes[0].strip()
+        resposta_ideal = partes[1].strip() if len(partes) > 1 else ""
 
-    except Exception as e:
-        print("Erro na avaliação com IA:", e)
-        return 0.0, "Não foi possível gerar feedback neste momento.", ""
\ No newline at end of file
+    return nota, feedback, resposta_ideal
\ No newline at end of file
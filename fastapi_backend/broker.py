@@ -0,0 +1,111 @@
+# fastapi_backend/broker.py
+"""
+Broker de mensagens por trás do ConnectionManager (WebSocket).
+
+Com vários workers do uvicorn, cada processo só conhece os sockets que ele mesmo
+aceitou. Toda mensagem para alunos/turmas é publicada no broker, e cada processo
+entrega aos seus sockets locais o que receber dele.
+
+- BrokerMemoria: um único processo; a entrega é local e imediata.
+- BrokerRedis: pub/sub em um servidor compatível com Redis (WS_BROKER_URL=redis://...).
+  Requer o pacote `redis`.
+"""
+import os
+import asyncio
+import json
+import traceback
+from typing import Awaitable, Callable, Optional
+
+WS_BROKER_URL = os.getenv("WS_BROKER_URL", "")
+WS_BROKER_CANAL = os.getenv("WS_BROKER_CANAL", "pbl:ws")
+
+# Recebe (destino, texto) e entrega aos sockets locais
+Entregar = Callable[[dict, str], Awaitable[None]]
+
+
+class BrokerMemoria:
+    """Entrega direta, para uso com um único processo."""
+    def __init__(self):
+        self._entregar: Optional[Entregar] = None
+
+    async def iniciar(self, entregar: Entregar):
+        self._entregar = entregar
+
+    async def parar(self):
+        self._entregar = None
+
+    async def publicar(self, destino: dict, texto: str):
+        if self._entregar is not None:
+            await self._entregar(destino, texto)
+
+    def estatisticas(self) -> dict:
+        return {"tipo": "memoria"}
+
+
+class BrokerRedis:
+    """Pub/sub em Redis (ou servidor compatível): cada processo assina o mesmo canal."""
+    def __init__(self, url: str, canal: str = WS_BROKER_CANAL):
+        self.url = url
+        self.canal = canal
+        self._cliente = None
+        self._pubsub = None
+        self._tarefa: Optional[asyncio.Task] = None
+        self._entregar: Optional[Entregar] = None
+        self.publicadas = 0
+        self.recebidas = 0
+
+    async def iniciar(self, entregar: Entregar):
+        try:
+            import redis.asyncio as redis_async
+        except ImportError as e:
+            raise RuntimeError("WS_BROKER_URL definido, mas o pacote 'redis' não está instalado.") from e
+        self._entregar = entregar
+        self._cliente = redis_async.from_url(self.url)
+        self._pubsub = self._cliente.pubsub(ignore_subscribe_messages=True)
+        await self._pubsub.subscribe(self.canal)
+        self._tarefa = asyncio.create_task(self._escutar())
+        print(f"[BROKER] Assinando '{self.canal}' em {self.url}.")
+
+    async def parar(self):
+        if self._tarefa is not None:
+            self._tarefa.cancel()
+            await asyncio.gather(self._tarefa, return_exceptions=True)
+            self._tarefa = None
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+            self._pubsub = None
+        if self._cliente is not None:
+            await self._cliente.aclose()
+            self._cliente = None
+
+    async def publicar(self, destino: dict, texto: str):
+        envelope = json.dumps({"destino": destino, "texto": texto})
+        await self._cliente.publish(self.canal, envelope)
+        self.publicadas += 1
+
+    async def _escutar(self):
+        while True:
+            try:
+                async for mensagem in self._pubsub.listen():
+                    if mensagem.get("type") != "message":
+                        continue
+                    envelope = json.loads(mensagem["data"])
+                    self.recebidas += 1
+                    await self._entregar(envelope["destino"], envelope["texto"])
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                print("[BROKER] Erro na assinatura do canal; reconectando em 1s:")
+                traceback.print_exc()
+                await asyncio.sleep(1)
+                try:
+                    await self._pubsub.subscribe(self.canal)
+                except Exception:
+                    pass
+
+    def estatisticas(self) -> dict:
+        return {"tipo": "redis", "canal": self.canal, "publicadas": self.publicadas, "recebidas": self.recebidas}
+
+
+def criar_broker(url: str = WS_BROKER_URL):
+    return BrokerRedis(url) if url else BrokerMemoria()
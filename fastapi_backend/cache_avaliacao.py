@@ -0,0 +1,166 @@
+# fastapi_backend/cache_avaliacao.py
+"""
+Cache de avaliações da IA endereçado por conteúdo.
+
+A chave é um hash de (versão do prompt, texto do desafio, resposta normalizada,
+faixa da tentativa). O cache tem tamanho máximo (LRU), expiração por TTL e contadores
+de acertos/faltas. Pedidos idênticos simultâneos (ex.: duplo clique em "enviar")
+aguardam a primeira chamada em vez de disparar outra.
+"""
+import os
+import asyncio
+import hashlib
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Awaitable, Callable, Hashable, Optional, Tuple
+
+AVALIACAO_CACHE_MAX = int(os.getenv("AVALIACAO_CACHE_MAX", "2000"))
+AVALIACAO_CACHE_TTL = float(os.getenv("AVALIACAO_CACHE_TTL", str(24 * 3600)))
+
+
+def normalizar_resposta(texto: str) -> str:
+    """Normaliza Unicode e espaços, para que reenvios do mesmo texto gerem a mesma chave."""
+    texto = unicodedata.normalize("NFC", texto or "")
+    return re.sub(r"\s+", " ", texto).strip()
+
+
+def faixa_tentativa(tentativa: int) -> str:
+    """O prompt só muda na última tentativa (inclui a resposta ideal)."""
+    return "final" if tentativa >= 3 else "regular"
+
+
+def chave_avaliacao(texto_desafio: str, resposta: str, tentativa: int, versao_prompt: str) -> str:
+    partes = (versao_prompt, texto_desafio or "", normalizar_resposta(resposta), faixa_tentativa(tentativa))
+    return hashlib.sha256("\x1f".join(partes).encode("utf-8")).hexdigest()
+
+
+class CacheAvaliacoes:
+    """Cache LRU com TTL e coalescência de chamadas em andamento (thread-safe)."""
+    def __init__(self, max_itens: int = AVALIACAO_CACHE_MAX, ttl: float = AVALIACAO_CACHE_TTL):
+        self.max_itens = max_itens
+        self.ttl = ttl
+        self._itens: "OrderedDict[Hashable, Tuple[float, object]]" = OrderedDict()
+        self._em_andamento: dict = {}
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.faltas = 0
+        self.coalescidas = 0
+        self.expiradas = 0
+
+    def _buscar(self, chave) -> Tuple[bool, object]:
+        """Deve ser chamado com o lock adquirido."""
+        item = self._itens.get(chave)
+        if item is None:
+            return False, None
+        expira_em, valor = item
+        if expira_em < time.monotonic():
+            del self._itens[chave]
+            self.expiradas += 1
+            return False, None
+        self._itens.move_to_end(chave)
+        return True, valor
+
+    def _guardar(self, chave, valor):
+        """Deve ser chamado com o lock adquirido."""
+        self._itens[chave] = (time.monotonic() + self.ttl, valor)
+        self._itens.move_to_end(chave)
+        while len(self._itens) > self.max_itens:
+            self._itens.popitem(last=False)
+
+    def obter(self, chave) -> Optional[object]:
+        with self._lock:
+            encontrado, valor = self._buscar(chave)
+            return valor if encontrado else None
+
+    def obter_ou_calcular(self, chave, calcular: Callable[[], object]):
+        """
+        Retorna o valor em cache ou executa `calcular()`. Se outra thread já estiver
+        calculando a mesma chave, aguarda o resultado dela. Exceções não são cacheadas.
+        """
+        dono = False
+        with self._lock:
+            encontrado, valor = self._buscar(chave)
+            if encontrado:
+                self.acertos += 1
+                return valor
+            futuro = self._em_andamento.get(chave)
+            if futuro is not None:
+                self.coalescidas += 1
+            else:
+                self.faltas += 1
+                futuro = Future()
+                self._em_andamento[chave] = futuro
+                dono = True
+        if not dono:
+            return futuro.result()
+
+        try:
+            valor = calcular()
+        except BaseException as e:
+            with self._lock:
+                self._em_andamento.pop(chave, None)
+            futuro.set_exception(e)
+            raise
+        with self._lock:
+            self._guardar(chave, valor)
+            self._em_andamento.pop(chave, None)
+        futuro.set_result(valor)
+        return valor
+
+    async def obter_ou_calcular_async(self, chave, calcular: Callable[[], Awaitable[object]]):
+        """Versão assíncrona de `obter_ou_calcular` (compartilha o mesmo estado)."""
+        dono = False
+        with self._lock:
+            encontrado, valor = self._buscar(chave)
+            if encontrado:
+                self.acertos += 1
+                return valor
+            futuro = self._em_andamento.get(chave)
+            if futuro is not None:
+                self.coalescidas += 1
+            else:
+                self.faltas += 1
+                futuro = Future()
+                self._em_andamento[chave] = futuro
+                dono = True
+        if not dono:
+            return await asyncio.wrap_future(futuro)
+
+        try:
+            valor = await calcular()
+        except BaseException as e:
+            with self._lock:
+                self._em_andamento.pop(chave, None)
+            futuro.set_exception(e)
+            raise
+        with self._lock:
+            self._guardar(chave, valor)
+            self._em_andamento.pop(chave, None)
+        futuro.set_result(valor)
+        return valor
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+
+    def estatisticas(self) -> dict:
+        with self._lock:
+            consultas = self.acertos + self.faltas + self.coalescidas
+            return {
+                "itens": len(self._itens),
+                "max_itens": self.max_itens,
+                "ttl_segundos": self.ttl,
+                "acertos": self.acertos,
+                "faltas": self.faltas,
+                "coalescidas": self.coalescidas,
+                "expiradas": self.expiradas,
+                "em_andamento": len(self._em_andamento),
+                "taxa_acerto": round((self.acertos + self.coalescidas) / consultas, 4) if consultas else 0.0,
+            }
+
+
+cache_avaliacoes = CacheAvaliacoes()
@@ -0,0 +1,176 @@
+# fastapi_backend/catalogo.py
+"""
+Cache em memória do catálogo de conteúdos ("PBL - conteudo").
+
+A tabela muda poucas vezes por semestre, mas é lida a cada carregamento de página
+(GET /api/conteudos), pelo painel administrativo e pelo gerador de desafios. O catálogo
+é carregado inteiro em uma única consulta e as projeções pedidas (campos de
+ALLOWED_CONTEUDO_FIELDS, apenas ativos ou não) são montadas em memória e memorizadas.
+Expira por TTL e pode ser invalidado explicitamente após alterações (POST
+/api/admin/cache/conteudos/invalidar, que publica a mensagem de controle "catalogo" pelo
+broker do WebSocket: vale para todos os workers da API e para o worker de jobs).
+"""
+import os
+import asyncio
+import threading
+import time
+from typing import Iterable, List, Optional, Tuple
+from .db import get_supabase_client
+from .etag import calcular_etag, serializar
+
+TABELA_CONTEUDO = "PBL - conteudo"
+CATALOGO_TTL_SEGUNDOS = float(os.getenv("CATALOGO_TTL_SEGUNDOS", "600"))
+
+
+def _chave_ordenacao(row: dict) -> tuple:
+    # Mesma ordem do Postgres (ORDER BY modulo, aula): nulos por último
+    modulo, aula = row.get("modulo"), row.get("aula")
+    return (modulo is None, modulo or "", aula is None, aula or "")
+
+
+class _Carga:
+    """Uma leitura do catálogo: linhas, hash e projeções memorizadas (trocada por inteiro)."""
+    __slots__ = ("linhas", "assinatura", "projecoes")
+
+    def __init__(self, linhas: List[dict]):
+        self.linhas = linhas
+        # Hash do conteúdo: ETag estável entre processos e entre recargas sem mudança
+        self.assinatura = calcular_etag(serializar(linhas))
+        self.projecoes: dict = {}
+
+
+class CatalogoConteudos:
+    """
+    Catálogo de conteúdos com TTL, invalidação explícita e projeções memorizadas.
+
+    A consulta ao banco acontece fora de qualquer lock compartilhado com o event loop: threads
+    coalescem a recarga em `_lock_carga`; o loop, num asyncio.Lock. A leitura nova é publicada
+    com uma única atribuição, então as consultas async não precisam de lock.
+    """
+    def __init__(self, ttl: float = CATALOGO_TTL_SEGUNDOS):
+        self.ttl = ttl
+        self._carga: Optional[_Carga] = None
+        self._carregado_em = 0.0
+        self._descartes = 0
+        self._lock_carga = threading.Lock()
+        self._lock_async: Optional[asyncio.Lock] = None
+        self._lock_loop: Optional[asyncio.AbstractEventLoop] = None
+        self.acertos = 0
+        self.faltas = 0
+        self.recargas = 0
+        self.invalidacoes = 0
+
+    def _valido(self) -> bool:
+        return self._carga is not None and time.monotonic() - self._carregado_em < self.ttl
+
+    def _obter_lock(self) -> asyncio.Lock:
+        loop = asyncio.get_running_loop()
+        if self._lock_async is None or self._lock_loop is not loop:
+            self._lock_async, self._lock_loop = asyncio.Lock(), loop
+        return self._lock_async
+
+    def _carregar(self) -> List[dict]:
+        supabase = get_supabase_client()
+        res = supabase.table(TABELA_CONTEUDO).select("*").execute()
+        return sorted(res.data or [], key=_chave_ordenacao)
+
+    def _atual(self) -> _Carga:
+        """Leitura válida do catálogo, recarregando (uma thread por vez) se expirado."""
+        carga = self._carga
+        if carga is not None and self._valido():
+            self.acertos += 1
+            return carga
+        with self._lock_carga:
+            # Quem esperou enquanto outra thread recarregava já encontra o catálogo válido
+            if self._valido():
+                self.acertos += 1
+                return self._carga
+            self.faltas += 1
+            descartes = self._descartes
+            carga = _Carga(self._carregar())
+            self._carga = carga
+            # Invalidado durante a leitura: usa o resultado agora, mas recarrega na próxima
+            self._carregado_em = time.monotonic() if descartes == self._descartes else float("-inf")
+            self.recargas += 1
+            return carga
+
+    async def _atual_async(self) -> _Carga:
+        """Como `_atual`, mas só sai do event loop (uma vez por recarga) quando é preciso ir ao banco."""
+        carga = self._carga
+        if carga is not None and self._valido():
+            self.acertos += 1
+            return carga
+        async with self._obter_lock():
+            carga = self._carga
+            if carga is not None and self._valido():
+                self.acertos += 1
+                return carga
+            return await asyncio.to_thread(self._atual)
+
+    def linhas(self) -> List[dict]:
+        """Todas as linhas do catálogo (ordenadas por módulo e aula), recarregando se expirado."""
+        return self._atual().linhas
+
+    async def linhas_async(self) -> List[dict]:
+        return (await self._atual_async()).linhas
+
+    @staticmethod
+    def _projetar(carga: _Carga, campos: Tuple[str, ...], apenas_ativos: bool) -> Tuple[List[dict], str]:
+        chave = (campos, apenas_ativos)
+        memorizada = carga.projecoes.get(chave)
+        if memorizada is not None:
+            return memorizada
+        projecao = [
+            {c: row.get(c) for c in campos}
+            for row in carga.linhas
+            if not apenas_ativos or row.get("ativo")
+        ]
+        # Duas threads podem montar a mesma projeção; fica a primeira (setdefault é atômico)
+        return carga.projecoes.setdefault(chave, (projecao, calcular_etag(carga.assinatura, ",".join(campos), apenas_ativos)))
+
+    def conteudos(self, campos: Iterable[str], apenas_ativos: bool = True) -> List[dict]:
+        """Projeção do catálogo nos `campos` pedidos. O resultado é compartilhado: não altere."""
+        return self._projetar(self._atual(), tuple(sorted(set(campos))), apenas_ativos)[0]
+
+    async def conteudos_async(self, campos: Iterable[str], apenas_ativos: bool = True) -> List[dict]:
+        return (await self.conteudos_com_etag_async(campos, apenas_ativos))[0]
+
+    async def conteudos_com_etag_async(self, campos: Iterable[str], apenas_ativos: bool = True) -> Tuple[List[dict], str]:
+        """Projeção e o ETag correspondente (derivado do hash do catálogo, sem reserializar)."""
+        return self._projetar(await self._atual_async(), tuple(sorted(set(campos))), apenas_ativos)
+
+    def ativos(self) -> List[dict]:
+        """Linhas completas dos conteúdos ativos (usado pelo gerador de desafios)."""
+        return [row for row in self.linhas() if row.get("ativo")]
+
+    async def ativos_async(self) -> List[dict]:
+        return [row for row in await self.linhas_async() if row.get("ativo")]
+
+    def invalidar(self):
+        # Expira em vez de apagar: quem já leu o catálogo continua com a leitura anterior
+        self._descartes += 1
+        self._carregado_em = float("-inf")
+        self.invalidacoes += 1
+
+    def aplicar(self, dados: dict):
+        """Mensagem de controle "catalogo" recebida pelo broker (de qualquer processo)."""
+        self.invalidar()
+
+    def estatisticas(self) -> dict:
+        carga = self._carga
+        consultas = self.acertos + self.faltas
+        return {
+            "carregado": carga is not None,
+            "itens": len(carga.linhas) if carga is not None else 0,
+            "idade_segundos": round(time.monotonic() - self._carregado_em, 1) if self._valido() else None,
+            "ttl_segundos": self.ttl,
+            "projecoes": len(carga.projecoes) if carga is not None else 0,
+            "acertos": self.acertos,
+            "faltas": self.faltas,
+            "recargas": self.recargas,
+            "invalidacoes": self.invalidacoes,
+            "taxa_acerto": round(self.acertos / consultas, 4) if consultas else 0.0,
+        }
+
+
+catalogo = CatalogoConteudos()
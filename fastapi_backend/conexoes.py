@@ -0,0 +1,200 @@
+# fastapi_backend/conexoes.py
+"""
+Conexões WebSocket (/ws) dos alunos.
+
+Cada conexão é autenticada (token JWT) e inscrita nos canais do seu CPF e da sua turma,
+de forma que uma liberação para uma turma só acorda os clientes dessa turma. Cada
+conexão tem a sua própria fila de envio (limitada) e uma tarefa que a esvazia: publicar
+uma mensagem só enfileira, então um cliente lento não atrasa os demais. Quem deixa a
+fila encher ou demora demais para receber é desconectado (o cliente reconecta sozinho).
+
+As mensagens passam pelo broker (broker.py): com vários processos, cada um entrega
+aos sockets que ele mesmo aceitou.
+"""
+import os
+import asyncio
+import json
+import traceback
+from typing import Callable, Dict, Iterable, Optional, Set
+from fastapi import WebSocket
+from .broker import BrokerMemoria
+
+WS_FILA_MAX = int(os.getenv("WS_FILA_MAX", "100"))
+WS_TIMEOUT_ENVIO_SEGUNDOS = float(os.getenv("WS_TIMEOUT_ENVIO_SEGUNDOS", "5"))
+
+# 1013 = "Try Again Later": o cliente deve reconectar
+CODIGO_CLIENTE_LENTO = 1013
+
+
+class Conexao:
+    """Um WebSocket aberto, com fila de envio própria."""
+    def __init__(self, websocket: WebSocket, cpf: Optional[str], turma: Optional[str]):
+        self.websocket = websocket
+        self.cpf = cpf
+        self.turma = turma
+        self.fila: asyncio.Queue = asyncio.Queue(maxsize=WS_FILA_MAX)
+        self.tarefa: Optional[asyncio.Task] = None
+        self.descartada = False
+
+    def enfileirar(self, texto: str) -> bool:
+        """Não bloqueia: retorna False se a fila estiver cheia (cliente lento)."""
+        if self.descartada:
+            return False
+        try:
+            self.fila.put_nowait(texto)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    async def enviar_pendentes(self, manager: "ConnectionManager"):
+        try:
+            while True:
+                texto = await self.fila.get()
+                await asyncio.wait_for(self.websocket.send_text(texto), timeout=WS_TIMEOUT_ENVIO_SEGUNDOS)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"[WS] Falha ao enviar para {self.cpf or 'anônimo'}: {type(e).__name__}; desconectando.")
+            await manager.descartar(self)
+
+
+class ConnectionManager:
+    def __init__(self):
+        self.conexoes: Dict[WebSocket, Conexao] = {}
+        self.por_cpf: Dict[str, Set[Conexao]] = {}
+        self.por_turma: Dict[str, Set[Conexao]] = {}
+        self.mensagens_publicadas = 0
+        self.descartadas_por_lentidao = 0
+        self._descartes: Set[asyncio.Task] = set()
+        self.broker = None
+        # Mensagens de controle entre processos (ex.: alteração de papel de um usuário)
+        self._controles: Dict[str, Callable[[dict], None]] = {}
+
+    def registrar_controle(self, tipo: str, funcao: Callable[[dict], None]):
+        self._controles[tipo] = funcao
+
+    async def publicar_controle(self, tipo: str, dados: dict):
+        """Entrega `dados` à função registrada para `tipo` em todos os processos (inclusive este)."""
+        await self._enviar({"controle": tipo}, json.dumps(dados, default=str))
+
+    async def iniciar(self, broker=None):
+        """Conecta o manager ao broker (sem broker, a entrega é só local)."""
+        self.broker = broker or BrokerMemoria()
+        await self.broker.iniciar(self._entregar)
+
+    async def parar(self):
+        if self.broker is not None:
+            await self.broker.parar()
+            self.broker = None
+
+    @property
+    def active_connections(self) -> Set[WebSocket]:
+        return set(self.conexoes)
+
+    async def connect(self, websocket: WebSocket, cpf: Optional[str] = None, turma: Optional[str] = None):
+        await websocket.accept()
+        conexao = Conexao(websocket, cpf, turma)
+        conexao.tarefa = asyncio.create_task(conexao.enviar_pendentes(self))
+        self.conexoes[websocket] = conexao
+        if cpf:
+            self.por_cpf.setdefault(cpf, set()).add(conexao)
+        if turma:
+            self.por_turma.setdefault(turma, set()).add(conexao)
+        return conexao
+
+    def disconnect(self, websocket: WebSocket):
+        """Remove a conexão de todos os canais (idempotente)."""
+        conexao = self.conexoes.pop(websocket, None)
+        if conexao is None:
+            return
+        if conexao.tarefa is not None and conexao.tarefa is not asyncio.current_task():
+            conexao.tarefa.cancel()
+        for indice, chave in ((self.por_cpf, conexao.cpf), (self.por_turma, conexao.turma)):
+            canal = indice.get(chave)
+            if canal is not None:
+                canal.discard(conexao)
+                if not canal:
+                    del indice[chave]
+
+    async def descartar(self, conexao: Conexao, codigo: int = CODIGO_CLIENTE_LENTO):
+        """Desconecta um cliente que não acompanha o ritmo das mensagens."""
+        if conexao.descartada:
+            return
+        conexao.descartada = True
+        await self._fechar(conexao, codigo)
+
+    async def _fechar(self, conexao: Conexao, codigo: int):
+        self.disconnect(conexao.websocket)
+        try:
+            await asyncio.wait_for(conexao.websocket.close(code=codigo), timeout=WS_TIMEOUT_ENVIO_SEGUNDOS)
+        except Exception:
+            pass
+
+    def _publicar(self, conexoes: Iterable[Conexao], texto: str) -> int:
+        """Enfileira a mensagem (já serializada) em cada conexão; não espera nenhum envio."""
+        enfileiradas = 0
+        for conexao in list(conexoes):
+            if conexao.enfileirar(texto):
+                enfileiradas += 1
+            elif not conexao.descartada:
+                conexao.descartada = True
+                self.descartadas_por_lentidao += 1
+                print(f"[WS] Fila cheia para {conexao.cpf or 'anônimo'}; desconectando cliente lento.")
+                tarefa = asyncio.create_task(self._fechar(conexao, CODIGO_CLIENTE_LENTO))
+                self._descartes.add(tarefa)
+                tarefa.add_done_callback(self._descartes.discard)
+        self.mensagens_publicadas += enfileiradas
+        return enfileiradas
+
+    async def _entregar(self, destino: dict, texto: str):
+        """Entrega aos sockets deste processo (chamado pelo broker)."""
+        if destino.get("controle"):
+            funcao = self._controles.get(destino["controle"])
+            if funcao is not None:
+                # Roda no caminho de quem publicou (broker em memória): um erro aqui não pode voltar para ele
+                try:
+                    funcao(json.loads(texto))
+                except Exception:
+                    print(f"[WS] Erro ao aplicar a mensagem de controle {destino['controle']!r}:")
+                    traceback.print_exc()
+            return
+        if destino.get("todos"):
+            conexoes = self.conexoes.values()
+        elif destino.get("cpf"):
+            conexoes = self.por_cpf.get(destino["cpf"], ())
+        else:
+            conexoes = set()
+            for turma in destino.get("turmas") or []:
+                conexoes |= self.por_turma.get(turma, set())
+        self._publicar(conexoes, texto)
+
+    async def _enviar(self, destino: dict, texto: str):
+        if self.broker is None:
+            await self._entregar(destino, texto)
+        else:
+            await self.broker.publicar(destino, texto)
+
+    async def broadcast(self, message: str):
+        await self._enviar({"todos": True}, message)
+
+    async def enviar_para_cpf(self, cpf: str, mensagem: dict):
+        """Envia uma mensagem JSON para todas as conexões do aluno (em qualquer processo)."""
+        await self._enviar({"cpf": cpf}, json.dumps(mensagem, default=str))
+
+    async def enviar_para_turmas(self, turmas: Iterable[str], mensagem: dict):
+        """Envia uma mensagem JSON às conexões das turmas (serializada uma única vez)."""
+        await self._enviar({"turmas": list(turmas)}, json.dumps(mensagem, default=str))
+
+    def estatisticas(self) -> dict:
+        return {
+            "conexoes": len(self.conexoes),
+            "alunos": len(self.por_cpf),
+            "turmas": len(self.por_turma),
+            "mensagens_enfileiradas": sum(c.fila.qsize() for c in self.conexoes.values()),
+            "mensagens_publicadas": self.mensagens_publicadas,
+            "descartadas_por_lentidao": self.descartadas_por_lentidao,
+            "broker": self.broker.estatisticas() if self.broker is not None else None,
+        }
+
+
+manager = ConnectionManager()
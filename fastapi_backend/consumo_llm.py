@@ -0,0 +1,216 @@
+# fastapi_backend/consumo_llm.py
+"""
+Livro de consumo da OpenAI e orçamentos por aluno e por turma.
+
+Toda chamada bem-sucedida de llm.completar é registrada (tokens de prompt e de
+resposta, custo estimado) com o CPF, a turma e o tipo de chamada. Os registros
+são acumulados em memória e gravados em lote em "PBL - uso_llm" (somente
+inserção; ver sql/005_uso_llm.sql).
+
+O aluno e a turma vêm do contexto da tarefa (`contexto_consumo`), definido por
+quem inicia o trabalho (geração de desafios, avaliação); sem contexto, o CPF é a
+`chave` passada a `completar`.
+
+Com ORCAMENTO_TOKENS_ALUNO_DIA / ORCAMENTO_TOKENS_TURMA_DIA definidos, uma chamada
+de quem já estourou o orçamento do dia (UTC) levanta OrcamentoExcedidoError antes
+de chegar à OpenAI. O consumo do dia é lido do banco (somando todos os processos)
+a cada CONSUMO_SYNC_SEGUNDOS e complementado pelo que este processo registrou desde então.
+"""
+import os
+import asyncio
+import contextvars
+import time
+import traceback
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+from .db import get_supabase_async
+
+TABELA_USO_LLM = "PBL - uso_llm"
+
+# Orçamentos diários em tokens (prompt + resposta); 0 = sem limite
+ORCAMENTO_TOKENS_ALUNO_DIA = int(os.getenv("ORCAMENTO_TOKENS_ALUNO_DIA", "0"))
+ORCAMENTO_TOKENS_TURMA_DIA = int(os.getenv("ORCAMENTO_TOKENS_TURMA_DIA", "0"))
+# Preço por milhão de tokens (USD), para o custo estimado de cada registro
+LLM_PRECO_ENTRADA_1M = float(os.getenv("LLM_PRECO_ENTRADA_1M", "2.50"))
+LLM_PRECO_SAIDA_1M = float(os.getenv("LLM_PRECO_SAIDA_1M", "10.00"))
+CONSUMO_SYNC_SEGUNDOS = float(os.getenv("CONSUMO_SYNC_SEGUNDOS", "60"))
+CONSUMO_INTERVALO_SEGUNDOS = float(os.getenv("CONSUMO_INTERVALO_SEGUNDOS", "5"))
+CONSUMO_LOTE = int(os.getenv("CONSUMO_LOTE", "100"))
+# Registros não gravados (banco fora do ar) além disso são descartados
+CONSUMO_MAX_PENDENTES = 10_000
+
+_contexto: contextvars.ContextVar = contextvars.ContextVar("consumo_llm", default={})
+
+
+@contextmanager
+def contexto_consumo(cpf: Optional[str] = None, turma: Optional[str] = None):
+    """Atribui as chamadas à OpenAI feitas dentro do bloco (e das tarefas criadas nele) ao aluno/turma."""
+    token = _contexto.set({"cpf": cpf, "turma": turma})
+    try:
+        yield
+    finally:
+        _contexto.reset(token)
+
+
+def contexto_atual() -> dict:
+    return _contexto.get()
+
+
+def _inicio_do_dia(agora: Optional[datetime] = None) -> datetime:
+    agora = agora or datetime.now(timezone.utc)
+    return agora.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def custo_estimado(prompt_tokens: int, completion_tokens: int) -> float:
+    return round((prompt_tokens * LLM_PRECO_ENTRADA_1M + completion_tokens * LLM_PRECO_SAIDA_1M) / 1_000_000, 6)
+
+
+class OrcamentoExcedidoError(Exception):
+    """O aluno (ou a turma) já consumiu o orçamento de tokens do dia."""
+    def __init__(self, escopo: str, valor: str, usado: int, limite: int):
+        self.escopo = escopo
+        self.valor = valor
+        self.usado = usado
+        self.limite = limite
+        # Segundos até o orçamento renovar (meia-noite UTC)
+        amanha = _inicio_do_dia() + timedelta(days=1)
+        self.retry_after = max(1, int((amanha - datetime.now(timezone.utc)).total_seconds()))
+        nome = "do aluno" if escopo == "cpf" else "da turma"
+        super().__init__(f"Orçamento diário de IA {nome} esgotado ({usado}/{limite} tokens).")
+
+
+class RegistroConsumo:
+    def __init__(self):
+        self._pendentes: List[dict] = []
+        # (escopo, valor) -> [início do dia, tokens no banco, tokens locais desde a leitura, lido em]
+        self._totais: Dict[Tuple[str, str], list] = {}
+        self._tarefa: Optional[asyncio.Task] = None
+        self._acordar: Optional[asyncio.Event] = None
+        self.registrados = 0
+        self.gravados = 0
+        self.descartados = 0
+        self.rejeitadas = 0
+
+    # --- Registro ---
+    def registrar(self, tipo: str, modelo: str, uso, cpf: Optional[str] = None, turma: Optional[str] = None):
+        """Acrescenta uma chamada ao livro (gravada em lote pela tarefa de fundo)."""
+        contexto = contexto_atual()
+        cpf = contexto.get("cpf") or cpf
+        turma = contexto.get("turma") or turma
+        prompt = getattr(uso, "prompt_tokens", 0) or 0
+        resposta = getattr(uso, "completion_tokens", 0) or 0
+        self._pendentes.append({
+            "criado_em": datetime.now(timezone.utc).isoformat(),
+            "cpf": cpf, "turma": turma, "tipo": tipo, "modelo": modelo,
+            "prompt_tokens": prompt, "completion_tokens": resposta,
+            "custo_usd": custo_estimado(prompt, resposta),
+        })
+        self.registrados += 1
+        dia = _inicio_do_dia()
+        for chave in (("cpf", cpf), ("turma", turma)):
+            total = self._totais.get(chave)
+            if total is not None and total[0] == dia:
+                total[2] += prompt + resposta
+        if len(self._pendentes) >= CONSUMO_LOTE and self._acordar is not None:
+            self._acordar.set()
+
+    # --- Orçamentos ---
+    async def _usado(self, escopo: str, valor: str) -> int:
+        dia = _inicio_do_dia()
+        total = self._totais.get((escopo, valor))
+        if total is None or total[0] != dia or time.monotonic() - total[3] >= CONSUMO_SYNC_SEGUNDOS:
+            try:
+                supabase = await get_supabase_async()
+                res = await supabase.rpc("pbl_uso_llm_total", {"p_desde": dia.isoformat(), f"p_{escopo}": valor}).execute()
+                total = [dia, int(res.data or 0), 0, time.monotonic()]
+            except Exception as e:
+                # Sem o banco, segue com o que este processo conhece (não bloqueia os alunos)
+                print(f"[CONSUMO] Aviso: não foi possível ler o consumo de {escopo} {valor}: {e}")
+                if total is None or total[0] != dia:
+                    total = [dia, 0, 0, time.monotonic()]
+            self._totais[(escopo, valor)] = total
+        return total[1] + total[2]
+
+    async def verificar_orcamento(self, cpf: Optional[str] = None, turma: Optional[str] = None):
+        """Levanta OrcamentoExcedidoError se o aluno ou a turma já estourou o orçamento do dia."""
+        contexto = contexto_atual()
+        cpf = contexto.get("cpf") or cpf
+        turma = contexto.get("turma") or turma
+        for escopo, valor, limite in (("cpf", cpf, ORCAMENTO_TOKENS_ALUNO_DIA), ("turma", turma, ORCAMENTO_TOKENS_TURMA_DIA)):
+            if not valor or limite <= 0:
+                continue
+            usado = await self._usado(escopo, valor)
+            if usado >= limite:
+                self.rejeitadas += 1
+                raise OrcamentoExcedidoError(escopo, valor, usado, limite)
+
+    # --- Gravação em lote ---
+    async def iniciar(self):
+        if self._tarefa is not None:
+            return
+        self._acordar = asyncio.Event()
+        self._tarefa = asyncio.create_task(self._executar())
+
+    async def parar(self):
+        if self._tarefa is None:
+            return
+        self._tarefa.cancel()
+        await asyncio.gather(self._tarefa, return_exceptions=True)
+        self._tarefa = None
+        await self.descarregar()
+
+    async def _executar(self):
+        while True:
+            try:
+                try:
+                    await asyncio.wait_for(self._acordar.wait(), timeout=CONSUMO_INTERVALO_SEGUNDOS)
+                except asyncio.TimeoutError:
+                    pass
+                self._acordar.clear()
+                await self.descarregar()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                print("[CONSUMO] Erro inesperado ao gravar o consumo:")
+                traceback.print_exc()
+
+    async def descarregar(self):
+        """Grava os registros pendentes em um único INSERT."""
+        if not self._pendentes:
+            return
+        lote, self._pendentes = self._pendentes, []
+        try:
+            supabase = await get_supabase_async()
+            await supabase.table(TABELA_USO_LLM).insert(lote).execute()
+            self.gravados += len(lote)
+        except Exception as e:
+            print(f"[CONSUMO] Falha ao gravar {len(lote)} registro(s) de consumo: {e}; nova tentativa em seguida.")
+            self._pendentes = lote + self._pendentes
+            excesso = len(self._pendentes) - CONSUMO_MAX_PENDENTES
+            if excesso > 0:
+                del self._pendentes[:excesso]
+                self.descartados += excesso
+
+    def estatisticas(self) -> dict:
+        return {
+            "pendentes": len(self._pendentes),
+            "registrados": self.registrados,
+            "gravados": self.gravados,
+            "descartados": self.descartados,
+            "chamadas_rejeitadas": self.rejeitadas,
+            "orcamento_aluno_dia": ORCAMENTO_TOKENS_ALUNO_DIA,
+            "orcamento_turma_dia": ORCAMENTO_TOKENS_TURMA_DIA,
+        }
+
+
+consumo_llm = RegistroConsumo()
+
+
+async def resumo_consumo(desde: datetime, agrupar: str = "turma", turma: Optional[str] = None) -> List[dict]:
+    """Consumo agregado por turma, cpf ou tipo desde `desde` (via sql/005_uso_llm.sql)."""
+    supabase = await get_supabase_async()
+    res = await supabase.rpc(
+        "pbl_uso_llm_resumo", {"p_desde": desde.isoformat(), "p_agrupar": agrupar, "p_turma": turma}
+    ).execute()
+    return res.data or []
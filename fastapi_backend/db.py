@@ -1,7 +1,26 @@
 # fastapi_backend/db.py
 import os
-from supabase import create_client, Client
+import asyncio
+from typing import Optional
+import httpx
+from supabase import create_client, Client, ClientOptions, acreate_client, AsyncClient, AsyncClientOptions
 from functools import lru_cache
+from .metricas import HOOKS_SUPABASE, HOOKS_SUPABASE_ASYNC
+
+# Pool HTTP do cliente assíncrono (PostgREST)
+SUPABASE_TIMEOUT_SEGUNDOS = float(os.getenv("SUPABASE_TIMEOUT_SEGUNDOS", "30"))
+SUPABASE_MAX_CONEXOES = int(os.getenv("SUPABASE_MAX_CONEXOES", "200"))
+SUPABASE_MAX_KEEPALIVE = int(os.getenv("SUPABASE_MAX_KEEPALIVE", "50"))
+
+
+def _credenciais() -> tuple:
+    url = os.environ.get("SUPABASE_URL")
+    key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY") or os.environ.get("SUPABASE_API_KEY")
+
+    if not url or not key:
+        raise ValueError("As variáveis de ambiente SUPABASE_URL e SUPABASE_SERVICE_ROLE_KEY são necessárias.")
+    return url, key
+
 
 @lru_cache
 def get_supabase_client() -> Client:
@@ -10,10 +29,58 @@ def get_supabase_client() -> Client:
     recriações desnecessárias. As credenciais são lidas das variáveis
     de ambiente.
     """
-    url = os.environ.get("SUPABASE_URL")
-    key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY") or os.environ.get("SUPABASE_API_KEY")
+    url, key = _credenciais()
+    # Cliente httpx próprio só para medir a latência das consultas (/metrics)
+    http_client = httpx.Client(timeout=120, event_hooks=HOOKS_SUPABASE)
+    return create_client(url, key, options=ClientOptions(httpx_client=http_client))
 
-    if not url or not key:
-        raise ValueError("As variáveis de ambiente SUPABASE_URL e SUPABASE_SERVICE_ROLE_KEY são necessárias.")
 
-    return create_client(url, key)
\ No newline at end of file
+_cliente_async: Optional[AsyncClient] = None
+_cliente_async_loop: Optional[asyncio.AbstractEventLoop] = None
+_lock_async: Optional[asyncio.Lock] = None
+
+
+async def get_supabase_async() -> AsyncClient:
+    """
+    Retorna o cliente Supabase assíncrono compartilhado, usado pelas rotas `async def`.
+    As consultas usam um pool de conexões keep-alive e não ocupam threads: um único
+    worker mantém milhares de chamadas ao PostgREST em andamento. O pool pertence ao
+    event loop em que foi criado, então um novo cliente é criado se o loop mudar.
+    """
+    global _cliente_async, _cliente_async_loop, _lock_async
+    loop = asyncio.get_running_loop()
+    if _cliente_async is not None and _cliente_async_loop is loop:
+        return _cliente_async
+    if _lock_async is None or _cliente_async_loop is not loop:
+        _lock_async = asyncio.Lock()
+        _cliente_async_loop = loop
+        _cliente_async = None
+    async with _lock_async:
+        if _cliente_async is None:
+            url, key = _credenciais()
+            http_client = httpx.AsyncClient(
+                timeout=SUPABASE_TIMEOUT_SEGUNDOS,
+                event_hooks=HOOKS_SUPABASE_ASYNC,
+                limits=httpx.Limits(
+                    max_connections=SUPABASE_MAX_CONEXOES,
+                    max_keepalive_connections=SUPABASE_MAX_KEEPALIVE,
+                ),
+            )
+            _cliente_async = await acreate_client(url, key, options=AsyncClientOptions(httpx_client=http_client))
+    return _cliente_async
+
+
+async def fechar_supabase_async():
+    """Fecha o pool de conexões do cliente assíncrono (chamado no shutdown da API)."""
+    global _cliente_async, _cliente_async_loop
+    cliente, _cliente_async, _cliente_async_loop = _cliente_async, None, None
+    if cliente is not None and cliente.options.httpx_client is not None:
+        await cliente.options.httpx_client.aclose()
+
+
+async def executar_em_thread(query):
+    """
+    Executa uma query síncrona do Supabase em uma thread, sem bloquear o event loop.
+    Usado pelos processos assíncronos (gerador e workers de jobs).
+    """
+    return await asyncio.to_thread(query.execute)
@@ -0,0 +1,227 @@
+# fastapi_backend/diretorio.py
+"""
+Diretório de usuários em memória: cpf → (nome, turma, papel, formulário finalizado) e
+turma → cpfs.
+
+Login, turma do aluno (painel, /ws, respostas, avaliações), lista de turmas e alunos de
+uma turma no admin consultavam "PBL - usuarios" a cada chamada, sempre pelos mesmos
+poucos campos. O perfil usado pelo gerador de desafios continua sendo lido do banco a cada
+job: a invalidação abaixo depende do broker e não pode atrasar a entrada da IA. O diretório carrega a tabela inteira
+(em páginas, por cpf) e a renova por TTL.
+
+POST /api/usuarios e a troca de papel publicam a mensagem de controle "usuario" pelo broker
+do WebSocket: em todos os processos a entrada do CPF fica obsoleta e é relida (só aquela
+linha) na próxima consulta. Um CPF que não está no diretório (cadastrado depois da carga)
+também é buscado individualmente e passa a fazer parte dele.
+"""
+import os
+import asyncio
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Set
+from .db import get_supabase_client
+
+TABELA_USUARIOS = "PBL - usuarios"
+DIRETORIO_TTL_SEGUNDOS = float(os.getenv("DIRETORIO_TTL_SEGUNDOS", "300"))
+CAMPOS_DIRETORIO = ("cpf", "nome", "turma", "role", "formulario_finalizado")
+PAGINA_CARGA = 1000  # max-rows padrão do PostgREST no Supabase
+
+
+def _indexar(por_cpf: Dict[str, dict], por_turma: Dict[str, Set[str]], linha: dict):
+    cpf = linha["cpf"]
+    anterior = por_cpf.get(cpf)
+    if anterior is not None and anterior.get("turma") in por_turma:
+        por_turma[anterior["turma"]].discard(cpf)
+    por_cpf[cpf] = linha
+    if linha.get("turma"):
+        por_turma.setdefault(linha["turma"], set()).add(cpf)
+
+
+class DiretorioUsuarios:
+    """
+    Índices cpf → usuário e turma → cpfs com TTL e invalidação por CPF.
+
+    Nenhuma consulta ao banco acontece com `_lock` segurado: a recarga monta os índices novos
+    fora dele e só os troca no fim. O event loop nunca espera um lock de thread: as consultas
+    async leem só o dicionário por CPF (uma referência) e coalescem a recarga num asyncio.Lock.
+    """
+    def __init__(self, ttl: float = DIRETORIO_TTL_SEGUNDOS):
+        self.ttl = ttl
+        self._por_cpf: Optional[Dict[str, dict]] = None
+        self._por_turma: Dict[str, Set[str]] = {}
+        self._obsoletos: Set[str] = set()
+        self._carregado_em = 0.0
+        self._descartes = 0
+        # Seções curtas em memória (troca dos índices, releitura de linhas, consultas síncronas)
+        self._lock = threading.Lock()
+        # Uma recarga por vez entre threads (segurado durante a consulta; só threads esperam por ele)
+        self._lock_carga = threading.Lock()
+        self._lock_async: Optional[asyncio.Lock] = None
+        self._lock_loop: Optional[asyncio.AbstractEventLoop] = None
+        self.acertos = 0
+        self.faltas = 0
+        self.recargas = 0
+        self.invalidacoes = 0
+        self.leituras_individuais = 0
+
+    def _valido(self) -> bool:
+        return self._por_cpf is not None and time.monotonic() - self._carregado_em < self.ttl
+
+    def _obter_lock(self) -> asyncio.Lock:
+        loop = asyncio.get_running_loop()
+        if self._lock_async is None or self._lock_loop is not loop:
+            self._lock_async, self._lock_loop = asyncio.Lock(), loop
+        return self._lock_async
+
+    def _carregar(self) -> List[dict]:
+        supabase = get_supabase_client()
+        linhas, ultimo = [], None
+        while True:
+            query = supabase.table(TABELA_USUARIOS).select(", ".join(CAMPOS_DIRETORIO)).not_.is_("cpf", "null")
+            if ultimo is not None:
+                query = query.gt("cpf", ultimo)
+            pagina = query.order("cpf").limit(PAGINA_CARGA).execute().data or []
+            linhas.extend(pagina)
+            if len(pagina) < PAGINA_CARGA:
+                return linhas
+            ultimo = pagina[-1]["cpf"]
+
+    def _garantir(self):
+        """Carrega (ou recarrega, se expirado) o diretório inteiro."""
+        if self._valido():
+            self.acertos += 1
+            return
+        with self._lock_carga:
+            # Quem esperou enquanto outra thread recarregava já encontra o diretório válido
+            if self._valido():
+                self.acertos += 1
+                return
+            self.faltas += 1
+            descartes, obsoletos = self._descartes, set(self._obsoletos)
+            por_cpf, por_turma = {}, {}
+            for linha in self._carregar():
+                _indexar(por_cpf, por_turma, linha)
+            with self._lock:
+                self._por_cpf, self._por_turma = por_cpf, por_turma
+                # CPFs invalidados durante a carga continuam obsoletos (a linha lida pode ser anterior)
+                self._obsoletos.difference_update(obsoletos)
+                # Descartado durante a carga: usa o resultado agora, mas recarrega na próxima
+                self._carregado_em = time.monotonic() if descartes == self._descartes else float("-inf")
+                self.recargas += 1
+
+    async def _garantir_async(self):
+        """Como `_garantir`, mas só sai do event loop (uma vez por recarga) quando é preciso ir ao banco."""
+        if self._valido():
+            self.acertos += 1
+            return
+        async with self._obter_lock():
+            if self._valido():
+                self.acertos += 1
+                return
+            await asyncio.to_thread(self._garantir)
+
+    def _buscar(self, cpfs: List[str]) -> List[dict]:
+        supabase = get_supabase_client()
+        return supabase.table(TABELA_USUARIOS).select(", ".join(CAMPOS_DIRETORIO)).in_("cpf", cpfs).execute().data or []
+
+    def _reler(self, cpfs: Iterable[str]) -> List[dict]:
+        """Relê do banco só as linhas dos `cpfs` (novos ou obsoletos) e as devolve."""
+        cpfs = list(cpfs)
+        if not cpfs:
+            return []
+        linhas = self._buscar(cpfs)
+        with self._lock:
+            self.leituras_individuais += 1
+            por_cpf, por_turma = self._por_cpf, self._por_turma
+            if por_cpf is None:
+                return linhas
+            encontrados = {linha["cpf"] for linha in linhas}
+            for linha in linhas:
+                _indexar(por_cpf, por_turma, linha)
+            # Removidos do banco desde a carga
+            for cpf in set(cpfs) - encontrados:
+                anterior = por_cpf.pop(cpf, None)
+                if anterior is not None and anterior.get("turma") in por_turma:
+                    por_turma[anterior["turma"]].discard(cpf)
+            self._obsoletos.difference_update(cpfs)
+        return linhas
+
+    def _em_memoria(self, cpf: str) -> Optional[dict]:
+        # Sem lock: uma leitura de dicionário é atômica, e o índice é trocado por inteiro
+        por_cpf = self._por_cpf
+        if por_cpf is None or cpf in self._obsoletos:
+            return None
+        return por_cpf.get(cpf)
+
+    # --- Consultas (síncronas, para rotas def; e async) ---
+    def usuario(self, cpf: str) -> Optional[dict]:
+        """Linha do usuário (campos de CAMPOS_DIRETORIO) ou None. Compartilhada: não altere."""
+        self._garantir()
+        encontrado = self._em_memoria(cpf)
+        if encontrado is not None:
+            return encontrado
+        return next(iter(self._reler([cpf])), None)
+
+    async def usuario_async(self, cpf: str) -> Optional[dict]:
+        await self._garantir_async()
+        encontrado = self._em_memoria(cpf)
+        if encontrado is not None:
+            return encontrado
+        return next(iter(await asyncio.to_thread(self._reler, [cpf])), None)
+
+    async def turma_async(self, cpf: str) -> Optional[str]:
+        usuario = await self.usuario_async(cpf)
+        return usuario.get("turma") if usuario else None
+
+    def turmas(self) -> List[str]:
+        self._garantir()
+        self._reler(list(self._obsoletos))
+        with self._lock:
+            return sorted(t for t, cpfs in self._por_turma.items() if cpfs)
+
+    def cpfs_da_turma(self, turma: str, apenas_formulario_finalizado: bool = False) -> List[str]:
+        self._garantir()
+        # Perfis alterados desde a carga (ex.: formulário finalizado) são relidos antes do filtro
+        self._reler(list(self._obsoletos))
+        with self._lock:
+            por_cpf, por_turma = self._por_cpf, self._por_turma
+            cpfs = sorted(por_turma.get(turma, ()))
+            if apenas_formulario_finalizado:
+                cpfs = [c for c in cpfs if por_cpf[c].get("formulario_finalizado") is True]
+            return cpfs
+
+    # --- Invalidação (chamada no event loop, pelo broker: sem lock, só operações atômicas) ---
+    def invalidar(self, cpf: Optional[str] = None):
+        """Sem CPF, descarta tudo; com CPF, só a linha dele é relida na próxima consulta."""
+        self.invalidacoes += 1
+        if cpf is None:
+            # Expira em vez de apagar: quem já passou por `_garantir` continua lendo o índice antigo
+            self._descartes += 1
+            self._carregado_em = float("-inf")
+        else:
+            self._obsoletos.add(cpf)
+
+    def aplicar(self, dados: dict):
+        """Mensagem de controle "usuario" recebida pelo broker (de qualquer processo)."""
+        self.invalidar(dados.get("cpf"))
+
+    def estatisticas(self) -> dict:
+        por_cpf = self._por_cpf
+        consultas = self.acertos + self.faltas
+        return {
+            "carregado": por_cpf is not None,
+            "usuarios": len(por_cpf or {}),
+            "turmas": sum(1 for cpfs in list(self._por_turma.values()) if cpfs),
+            "obsoletos": len(self._obsoletos),
+            "idade_segundos": round(time.monotonic() - self._carregado_em, 1) if self._valido() else None,
+            "ttl_segundos": self.ttl,
+            "acertos": self.acertos,
+            "faltas": self.faltas,
+            "recargas": self.recargas,
+            "invalidacoes": self.invalidacoes,
+            "leituras_individuais": self.leituras_individuais,
+            "taxa_acerto": round(self.acertos / consultas, 4) if consultas else 0.0,
+        }
+
+
+diretorio = DiretorioUsuarios()
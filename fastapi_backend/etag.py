@@ -0,0 +1,63 @@
+# fastapi_backend/etag.py
+"""
+GET condicional para as rotas de leitura do aluno.
+
+A resposta leva um ETag forte calculado a partir do conteúdo (hash do JSON). Quando o
+cliente reenvia o ETag em If-None-Match e nada mudou, a rota devolve 304 sem corpo.
+O navegador faz isso sozinho com `Cache-Control: private, no-cache`: guarda a resposta,
+revalida a cada refetch e reaproveita o corpo em cache quando recebe 304.
+"""
+import hashlib
+import json
+from typing import Any, Optional
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+CACHE_CONTROL_PADRAO = "private, no-cache"
+
+
+def serializar(dados: Any) -> bytes:
+    return json.dumps(jsonable_encoder(dados), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def calcular_etag(*partes) -> str:
+    """ETag forte a partir de bytes/strings (ex.: o corpo serializado, ou um hash de versão + parâmetros)."""
+    h = hashlib.sha256()
+    for parte in partes:
+        h.update(parte if isinstance(parte, bytes) else str(parte).encode("utf-8"))
+        h.update(b"\x1f")
+    return f'"{h.hexdigest()[:32]}"'
+
+
+def etag_confere(request: Request, etag: str) -> bool:
+    """Compara com If-None-Match (lista separada por vírgulas, '*' ou ETags fracos W/)."""
+    cabecalho = request.headers.get("if-none-match")
+    if not cabecalho:
+        return False
+    for candidato in cabecalho.split(","):
+        candidato = candidato.strip()
+        if candidato == "*" or candidato.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def nao_modificado(etag: str, cache_control: str = CACHE_CONTROL_PADRAO, cabecalhos: Optional[dict] = None) -> Response:
+    return Response(status_code=304, headers={**(cabecalhos or {}), "ETag": etag, "Cache-Control": cache_control})
+
+
+def resposta_condicional(request: Request, dados: Any, etag: Optional[str] = None,
+                         cache_control: str = CACHE_CONTROL_PADRAO, cabecalhos: Optional[dict] = None) -> Response:
+    """
+    Devolve `dados` como JSON com ETag, ou 304 se o cliente já tem a mesma versão.
+    Se `etag` for informado (ex.: derivado da versão do catálogo), o 304 sai sem
+    serializar nada; senão o ETag é o hash do corpo (e dos `cabecalhos` extras, como
+    o cursor da próxima página, que também fazem parte da resposta).
+    """
+    if etag is not None and etag_confere(request, etag):
+        return nao_modificado(etag, cache_control, cabecalhos)
+    corpo = serializar(dados)
+    etag = etag or calcular_etag(corpo, *(f"{k}:{v}" for k, v in sorted((cabecalhos or {}).items())))
+    if etag_confere(request, etag):
+        return nao_modificado(etag, cache_control, cabecalhos)
+    return Response(content=corpo, media_type="application/json",
+                    headers={**(cabecalhos or {}), "ETag": etag, "Cache-Control": cache_control})
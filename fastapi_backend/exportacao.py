@@ -0,0 +1,119 @@
+# fastapi_backend/exportacao.py
+"""
+Exportação das respostas (notas e feedbacks) em CSV ou NDJSON, em streaming.
+
+As linhas saem de um gerador assíncrono que lê o banco em páginas: alunos em lotes
+(keyset por cpf, filtrados pela turma) e, para cada lote, as respostas paginadas por cursor
+(paginacao.py) com o título/tipo dos desafios da página e o módulo/aula do catálogo em
+memória. Cada página é formatada e escrita na resposta antes de a próxima ser buscada, então
+a memória fica constante qualquer que seja o tamanho da turma.
+"""
+import csv
+import io
+import json
+import os
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional
+from .catalogo import catalogo
+from .db import get_supabase_async
+from .paginacao import colunas_consulta, fatiar, paginar
+
+EXPORTACAO_LOTE = int(os.getenv("EXPORTACAO_LOTE", "500"))
+IDS_POR_CONSULTA = 200  # valores por filtro in.(...), para a URL não passar de poucos KB
+
+COLUNAS_RESPOSTA = ["id", "cpf", "desafio_id", "conteudo_id", "tentativa", "nota", "feedback", "resposta_ideal",
+                    "tentativa_finalizada", "status_avaliacao", "data_envio"]
+COLUNAS_EXPORTACAO = ["turma", "cpf", "nome", "modulo", "aula", "conteudo_id", "tipo", "titulo", "desafio_id",
+                      "resposta_id", "tentativa", "nota", "feedback", "resposta_ideal", "tentativa_finalizada",
+                      "status_avaliacao", "data_envio"]
+
+
+async def _alunos(supabase, turma: Optional[str]) -> AsyncIterator[List[dict]]:
+    ultimo = None
+    while True:
+        query = supabase.table("PBL - usuarios").select("cpf, nome, turma").not_.is_("cpf", "null")
+        if turma:
+            query = query.eq("turma", turma)
+        if ultimo is not None:
+            query = query.gt("cpf", ultimo)
+        lote = (await query.order("cpf").limit(IDS_POR_CONSULTA).execute()).data or []
+        if not lote:
+            return
+        yield lote
+        if len(lote) < IDS_POR_CONSULTA:
+            return
+        ultimo = lote[-1]["cpf"]
+
+
+async def linhas_respostas(turma: Optional[str] = None, modulo: Optional[str] = None,
+                           desde: Optional[datetime] = None, ate: Optional[datetime] = None,
+                           incluir_resposta: bool = False, lote: int = EXPORTACAO_LOTE) -> AsyncIterator[dict]:
+    """Respostas com aluno, desafio e conteúdo, uma página do banco por vez."""
+    supabase = await get_supabase_async()
+    conteudos = {str(c["id"]): c for c in await catalogo.linhas_async()}
+    conteudos_do_modulo = [cid for cid, c in conteudos.items() if c.get("modulo") == modulo] if modulo else None
+    if conteudos_do_modulo == []:
+        return
+    colunas = COLUNAS_RESPOSTA + (["texto_resposta"] if incluir_resposta else [])
+
+    async for alunos in _alunos(supabase, turma):
+        por_cpf = {a["cpf"]: a for a in alunos}
+        cursor = None
+        while True:
+            query = supabase.table("PBL - respostas").select(colunas_consulta(colunas, "data_envio")).in_("cpf", list(por_cpf))
+            if conteudos_do_modulo:
+                query = query.in_("conteudo_id", conteudos_do_modulo)
+            if desde:
+                query = query.gte("data_envio", desde.isoformat())
+            if ate:
+                query = query.lt("data_envio", ate.isoformat())
+            res = await paginar(query, "data_envio", cursor, lote).execute()
+            respostas, cursor = fatiar(res.data or [], colunas, "data_envio", lote)
+            desafios: Dict[str, dict] = {}
+            ids = list({str(r["desafio_id"]) for r in respostas if r.get("desafio_id")})
+            for i in range(0, len(ids), IDS_POR_CONSULTA):
+                res = await supabase.table("PBL - desafios").select("id, tipo, titulo").in_("id", ids[i:i + IDS_POR_CONSULTA]).execute()
+                desafios.update({str(d["id"]): d for d in res.data or []})
+
+            for r in respostas:
+                aluno = por_cpf.get(r["cpf"], {})
+                desafio = desafios.get(str(r.get("desafio_id")), {})
+                conteudo = conteudos.get(str(r.get("conteudo_id")), {})
+                linha = {
+                    "turma": aluno.get("turma"), "cpf": r["cpf"], "nome": aluno.get("nome"),
+                    "modulo": conteudo.get("modulo"), "aula": conteudo.get("aula"), "conteudo_id": r.get("conteudo_id"),
+                    "tipo": desafio.get("tipo"), "titulo": desafio.get("titulo"), "desafio_id": r.get("desafio_id"),
+                    "resposta_id": r.get("id"),
+                    **{c: r.get(c) for c in colunas if c not in ("id", "cpf", "desafio_id", "conteudo_id")},
+                }
+                yield linha
+            if not cursor:
+                break
+
+
+async def para_csv(linhas: AsyncIterator[dict], colunas: List[str], por_bloco: int = 200) -> AsyncIterator[bytes]:
+    """CSV em UTF-8 com BOM (o Excel reconhece a acentuação), em blocos de `por_bloco` linhas."""
+    buffer = io.StringIO()
+    escritor = csv.DictWriter(buffer, fieldnames=colunas, extrasaction="ignore")
+    buffer.write("\ufeff")
+    escritor.writeheader()
+    n = 0
+    async for linha in linhas:
+        escritor.writerow(linha)
+        n += 1
+        if n % por_bloco == 0:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode("utf-8")
+
+
+async def para_ndjson(linhas: AsyncIterator[dict], por_bloco: int = 200) -> AsyncIterator[bytes]:
+    bloco: List[str] = []
+    async for linha in linhas:
+        bloco.append(json.dumps(linha, ensure_ascii=False, default=str))
+        if len(bloco) >= por_bloco:
+            yield ("\n".join(bloco) + "\n").encode("utf-8")
+            bloco = []
+    if bloco:
+        yield ("\n".join(bloco) + "\n").encode("utf-8")
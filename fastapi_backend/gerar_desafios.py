@@ -1,132 +1,272 @@
 # fastapi_backend/gerar_desafios.py
 import os
+import asyncio
+import inspect
 import traceback
 from datetime import datetime, date
-from openai import OpenAI
-from .db import get_supabase_client
+from typing import Awaitable, Callable, Optional, Union
+from .db import get_supabase_client, executar_em_thread
+from .llm import completar
+from .catalogo import catalogo
+from .consumo_llm import consumo_llm, contexto_consumo, OrcamentoExcedidoError
 
 # --- Configuração Inicial ---
-OPENAI_KEY = os.getenv("OPENAI_API_KEY")
-if not OPENAI_KEY:
-    raise ValueError("A variável de ambiente OPENAI_API_KEY é necessária.")
-openai = OpenAI(api_key=OPENAI_KEY)
+# Máximo de chamadas simultâneas à OpenAI durante a geração de um aluno
+MAX_CONCORRENCIA = int(os.getenv("GERADOR_MAX_CONCORRENCIA", "8"))
+# Quantidade máxima de desafios gravados por upsert
+TAMANHO_LOTE_UPSERT = int(os.getenv("GERADOR_LOTE_UPSERT", "200"))
+
+# Callback de progresso: recebe (itens_feitos, itens_total)
+CallbackProgresso = Callable[[int, int], Union[None, Awaitable[None]]]
+
+
+class GeracaoIncompletaError(Exception):
+    """Levantada quando um ou mais desafios não puderam ser gerados."""
+
+
+class ContextoGeracao:
+    """Estado compartilhado entre as tarefas de geração de um mesmo aluno."""
+    def __init__(self, semaforo: asyncio.Semaphore, cpf: str, perfil: str,
+                 existentes: dict, feitos: int, total: int, progresso: Optional[CallbackProgresso] = None):
+        self.semaforo = semaforo
+        self.cpf = cpf
+        self.perfil = perfil
+        self.existentes = existentes
+        self.novos = []
+        self.falhas = []
+        # Primeira chamada recusada por orçamento (a geração é adiada, não conta como falha)
+        self.orcamento_excedido: Optional[OrcamentoExcedidoError] = None
+        self.total = total
+        self.feitos = feitos
+        self.progresso = progresso
+
+    def registrar_falha(self, descricao: str, erro: Exception):
+        self.falhas.append(descricao)
+        if isinstance(erro, OrcamentoExcedidoError) and self.orcamento_excedido is None:
+            self.orcamento_excedido = erro
+
+    async def item_concluido(self):
+        self.feitos += 1
+        await self.notificar_progresso()
+
+    async def notificar_progresso(self):
+        if self.progresso is None:
+            return
+        try:
+            resultado = self.progresso(self.feitos, self.total)
+            if inspect.isawaitable(resultado):
+                await resultado
+        except Exception as e:
+            print(f"[GERADOR] Aviso: falha ao reportar progresso: {e}")
 
 
 # --- Funções Auxiliares ---
-def gerar_titulo_microdesafio(texto_desafio: str, aula: str) -> str:
+async def _completar(ctx: ContextoGeracao, prompt: str, tipo: str, **kwargs) -> str:
+    """
+    Executa uma chamada ao gpt-4o respeitando o limite de concorrência do aluno.
+    Timeouts, novas tentativas e os limites globais de RPM/TPM ficam a cargo de llm.py.
+    """
+    async with ctx.semaforo:
+        return await completar(prompt, tipo=tipo, chave=ctx.cpf, **kwargs)
+
+
+async def _carregar_desafios_existentes(supabase, cpf: str) -> dict:
+    """Retorna os desafios já gerados para o CPF indexados por (conteudo_id, tipo)."""
+    res = await executar_em_thread(
+        supabase.table("PBL - desafios").select("id, conteudo_id, tipo, texto_desafio").eq("cpf", cpf)
+    )
+    linhas = res.data if res and res.data else []
+    return {(row["conteudo_id"], row["tipo"]): row for row in linhas}
+
+
+async def _gravar_desafios_em_lote(supabase, novos: list):
+    """
+    Grava os desafios novos em upserts em lote, usando (cpf, conteudo_id, tipo) como chave.
+    Linhas que já existirem (ex.: criadas por uma execução concorrente) são ignoradas.
+    """
+    for inicio in range(0, len(novos), TAMANHO_LOTE_UPSERT):
+        lote = novos[inicio:inicio + TAMANHO_LOTE_UPSERT]
+        await executar_em_thread(
+            supabase.table("PBL - desafios").upsert(lote, on_conflict="cpf,conteudo_id,tipo", ignore_duplicates=True)
+        )
+    if novos:
+        print(f"[GERADOR] {len(novos)} desafios gravados em lote.")
+
+
+async def gerar_titulo_microdesafio(ctx: ContextoGeracao, texto_desafio: str, aula: str) -> str:
     """Gera um título curto e atrativo para um microdesafio usando a IA."""
     prompt = f"""Gere um título curto e atrativo (máximo 6 palavras) para o microdesafio a seguir, contextualizado pela aula.
 Texto do microdesafio: {texto_desafio}
 Nome da aula: {aula}
 Título:"""
     try:
-        resposta = openai.chat.completions.create(
-            model="gpt-4o",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.7,
-            max_tokens=20
-        )
-        return resposta.choices[0].message.content.strip().replace('"', '')
+        titulo = await _completar(ctx, prompt, "titulo", temperature=0.7, max_tokens=20)
+        return titulo.replace('"', '')
     except Exception as e:
         print(f"[GERADOR_TITULO] Erro ao gerar título: {e}")
         return "Título não gerado"
 
 
+async def _gerar_micro(ctx: ContextoGeracao, nome_modulo: str, texto_macro: str, aula_info: dict):
+    """Gera (se necessário) o microdesafio de uma aula e o seu título."""
+    if (aula_info["id"], "micro") in ctx.existentes:
+        return
+
+    print(f"[GERADOR-IA] Criando Micro para '{aula_info['aula']}'...")
+    prompt_micro = f"Você é um gerador de desafios semanais (PBL). Continue a narrativa do cenário-problema, focando no tema da aula.\nCenário-Problema: {texto_macro}\nPerfil: {ctx.perfil}\nMódulo: {nome_modulo}\nAula: {aula_info['aula']}\nEmenta: {aula_info.get('ementa', '')}\nRegras: Escreva 3-4 parágrafos, com novos dados técnicos. No último parágrafo, formule uma tarefa prática de análise crítica. Não dê soluções."
+    texto_micro = await _completar(ctx, prompt_micro, "micro", temperature=0.7)
+    titulo = await gerar_titulo_microdesafio(ctx, texto_micro, aula_info['aula'])
+
+    # Desafios são criados como NÃO liberados por padrão
+    ctx.novos.append({
+        "cpf": ctx.cpf, "tipo": "micro", "conteudo_id": aula_info["id"],
+        "texto_desafio": texto_micro, "data_criacao": datetime.utcnow().isoformat(),
+        "desafio_liberado": False, "titulo": titulo, "status_gerado": "ok"
+    })
+    print(f"[GERADOR-IA] Micro para '{aula_info['aula']}' criado.")
+    await ctx.item_concluido()
+
+
+async def _gerar_modulo(ctx: ContextoGeracao, nome_modulo: str, info_modulo: dict):
+    """Gera o macrodesafio do módulo e, em seguida, todos os seus micros em paralelo."""
+    macro_info = info_modulo.get("macro_info")
+    if not macro_info:
+        print(f"[GERADOR] AVISO: Módulo '{nome_modulo}' pulado (sem conteúdo principal/macro).")
+        return
+
+    try:
+        # --- GERAÇÃO DO MACRODESAFIO ---
+        texto_macro = ""
+        macro_existente = ctx.existentes.get((macro_info["id"], "macro"))
+
+        if macro_existente:
+            texto_macro = macro_existente.get("texto_desafio") or ""
+            print(f"[GERADOR] Macro para '{nome_modulo}' já existe.")
+        else:
+            print(f"[GERADOR-IA] Criando Macro para '{nome_modulo}'...")
+            prompt_macro = f"Você é um gerador de desafios (PBL) para um MBA em Agronegócio. Crie um cenário-problema multifatorial.\nPerfil do Aluno: {ctx.perfil}\nTema do Módulo: {nome_modulo}\nEmenta: {macro_info.get('ementa', '')}\nRegras: Crie uma narrativa realista de 3-5 parágrafos no contexto do agro brasileiro em 2025. Apresente uma situação complexa e termine com um problema central claro, sem oferecer soluções."
+            texto_macro = await _completar(ctx, prompt_macro, "macro", temperature=0.7)
+
+            # Desafios são criados como NÃO liberados por padrão
+            ctx.novos.append({
+                "cpf": ctx.cpf, "tipo": "macro", "conteudo_id": macro_info["id"],
+                "texto_desafio": texto_macro, "data_criacao": datetime.utcnow().isoformat(),
+                "desafio_liberado": False, "status_gerado": "ok"
+            })
+            print(f"[GERADOR-IA] Macro para '{nome_modulo}' criado.")
+            await ctx.item_concluido()
+    except Exception as e:
+        print(f"[GERADOR] ERRO ao gerar macro do módulo '{nome_modulo}': {e!r}")
+        ctx.registrar_falha(nome_modulo, e)
+        return
+
+    if not texto_macro:
+        print(f"[GERADOR] AVISO: Texto do macro para '{nome_modulo}' está vazio. Pulando micros.")
+        return
+
+    # --- GERAÇÃO DOS MICRODESAFIOS (em paralelo, após o macro existir) ---
+    resultados = await asyncio.gather(
+        *(_gerar_micro(ctx, nome_modulo, texto_macro, aula_info) for aula_info in info_modulo["micros_info"]),
+        return_exceptions=True,
+    )
+    for aula_info, resultado in zip(info_modulo["micros_info"], resultados):
+        if isinstance(resultado, Exception):
+            print(f"[GERADOR] ERRO ao gerar micro '{aula_info.get('aula')}': {resultado!r}")
+            ctx.registrar_falha(f"{nome_modulo} / {aula_info.get('aula')}", resultado)
+
+
 # --- Função Principal de Geração ---
-def gerar_todos_os_desafios(cpf: str):
+async def gerar_todos_os_desafios_async(cpf: str, max_concorrencia: int = None,
+                                        progresso: Optional[CallbackProgresso] = None):
     """
     Processo completo para gerar todos os desafios (macros e micros) para um usuário
-    baseado em seu perfil e nos conteúdos ativos.
+    baseado em seu perfil e nos conteúdos ativos. Os módulos são gerados em paralelo e,
+    dentro de cada módulo, os micros são gerados em paralelo assim que o macro existe.
+    O número de chamadas simultâneas à OpenAI é limitado por `max_concorrencia`.
+
+    `progresso(feitos, total)` é chamado a cada desafio gerado. Levanta exceção se o
+    processo não puder ser concluído, para que o chamador possa tentar novamente.
     """
     print(f"--- [GERADOR] Iniciando geração COMPLETA para CPF: {cpf} ---")
     supabase = get_supabase_client()
-    try:
-        # 1. Busca Usuário
-        user_res = supabase.table("PBL - usuarios").select("nome, turma, cargo, regiao, cadeia, desafios, observacoes").eq("cpf", cpf).single().execute()
-        if not user_res or not user_res.data:
-            print(f"[GERADOR] ERRO FATAL: Falha ao buscar usuário {cpf} ou usuário não existe.")
-            return
-        usuario = user_res.data
-        turma = usuario.get("turma")
-        print(f"[GERADOR] Usuário encontrado: {usuario.get('nome')}, Turma: {turma}")
+    semaforo = asyncio.Semaphore(max_concorrencia or MAX_CONCORRENCIA)
+
+    # 1. Busca Usuário (leitura fresca, não o diretório em memória: o formulário pode ter acabado
+    #    de ser salvo em outro processo e o perfil é a entrada da IA)
+    user_res = await executar_em_thread(supabase.table("PBL - usuarios").select("nome, turma, cargo, regiao, cadeia, desafios, observacoes").eq("cpf", cpf).single())
+    if not user_res or not user_res.data:
+        raise ValueError(f"Falha ao buscar usuário {cpf} ou usuário não existe.")
+    usuario = user_res.data
+    turma = usuario.get("turma")
+    print(f"[GERADOR] Usuário encontrado: {usuario.get('nome')}, Turma: {turma}")
 
-        # 2. Monta o Perfil do Aluno para a IA
-        perfil = f"""- Cargo/função: {usuario.get("cargo", "N/A")}
+    # 2. Monta o Perfil do Aluno para a IA
+    perfil = f"""- Cargo/função: {usuario.get("cargo", "N/A")}
 - Região/cadeia ou cultura: {usuario.get("regiao", "N/A")} / {usuario.get("cadeia", "N/A")}
 - Desafios enfrentados: {usuario.get("desafios", "N/A")}
 - Observações: {usuario.get("observacoes", "N/A")}"""
 
-        # 3. Busca Conteúdos Ativos
-        conteudos_res = supabase.table("PBL - conteudo").select("*").eq("ativo", True).execute()
-        if not conteudos_res or not conteudos_res.data:
-            print("[GERADOR] ERRO FATAL: Nenhum conteúdo ativo encontrado no banco.")
-            return
-        print(f"[GERADOR] {len(conteudos_res.data)} conteúdos ativos encontrados.")
-
-        # 4. Agrupa Conteúdos por Módulo
-        modulos = {}
-        for c in conteudos_res.data:
-            nome_modulo = c.get("modulo")
-            if nome_modulo:
-                if nome_modulo not in modulos:
-                    modulos[nome_modulo] = {"macro_info": None, "micros_info": []}
-                if not c.get("aula"): # Se não tem nome de aula, é o macro
-                    modulos[nome_modulo]["macro_info"] = c
-                else: # Se tem nome de aula, é um micro
-                    modulos[nome_modulo]["micros_info"].append(c)
-
-        # 5. Itera sobre cada Módulo para gerar desafios
-        for nome_modulo, info_modulo in modulos.items():
-            macro_info = info_modulo.get("macro_info")
-            if not macro_info:
-                print(f"[GERADOR] AVISO: Módulo '{nome_modulo}' pulado (sem conteúdo principal/macro).")
-                continue
-
-            # --- GERAÇÃO DO MACRODESAFIO ---
-            texto_macro = ""
-            macro_existente_res = supabase.table("PBL - desafios").select("texto_desafio").eq("cpf", cpf).eq("conteudo_id", macro_info["id"]).eq("tipo", "macro").maybe_single().execute()
-            
-            if macro_existente_res and macro_existente_res.data:
-                texto_macro = macro_existente_res.data.get("texto_desafio", "")
-                print(f"[GERADOR] Macro para '{nome_modulo}' já existe.")
-            else:
-                print(f"[GERADOR-IA] Criando Macro para '{nome_modulo}'...")
-                prompt_macro = f"Você é um gerador de desafios (PBL) para um MBA em Agronegócio. Crie um cenário-problema multifatorial.\nPerfil do Aluno: {perfil}\nTema do Módulo: {nome_modulo}\nEmenta: {macro_info.get('ementa', '')}\nRegras: Crie uma narrativa realista de 3-5 parágrafos no contexto do agro brasileiro em 2025. Apresente uma situação complexa e termine com um problema central claro, sem oferecer soluções."
-                resposta_macro = openai.chat.completions.create(model="gpt-4o", messages=[{"role": "user", "content": prompt_macro}], temperature=0.7)
-                texto_macro = resposta_macro.choices[0].message.content.strip()
-                
-                # Desafios são criados como NÃO liberados por padrão
-                supabase.table("PBL - desafios").insert({
-                    "cpf": cpf, "tipo": "macro", "conteudo_id": macro_info["id"], 
-                    "texto_desafio": texto_macro, "data_criacao": datetime.utcnow().isoformat(), 
-                    "desafio_liberado": False, "status_gerado": "ok"
-                }).execute()
-                print(f"[GERADOR-IA] Macro para '{nome_modulo}' criado.")
-
-            if not texto_macro:
-                print(f"[GERADOR] AVISO: Texto do macro para '{nome_modulo}' está vazio. Pulando micros.")
-                continue
-
-            # --- GERAÇÃO DOS MICRODESAFIOS ---
-            for aula_info in info_modulo["micros_info"]:
-                micro_existente_res = supabase.table("PBL - desafios").select("id").eq("cpf", cpf).eq("conteudo_id", aula_info["id"]).eq("tipo", "micro").maybe_single().execute()
-                if not (micro_existente_res and micro_existente_res.data):
-                    print(f"[GERADOR-IA] Criando Micro para '{aula_info['aula']}'...")
-                    prompt_micro = f"Você é um gerador de desafios semanais (PBL). Continue a narrativa do cenário-problema, focando no tema da aula.\nCenário-Problema: {texto_macro}\nPerfil: {perfil}\nMódulo: {nome_modulo}\nAula: {aula_info['aula']}\nEmenta: {aula_info.get('ementa', '')}\nRegras: Escreva 3-4 parágrafos, com novos dados técnicos. No último parágrafo, formule uma tarefa prática de análise crítica. Não dê soluções."
-                    resposta_micro = openai.chat.completions.create(model="gpt-4o", messages=[{"role": "user", "content": prompt_micro}], temperature=0.7)
-                    texto_micro = resposta_micro.choices[0].message.content.strip()
-                    titulo = gerar_titulo_microdesafio(texto_micro, aula_info['aula'])
-                    
-                    # Desafios são criados como NÃO liberados por padrão
-                    supabase.table("PBL - desafios").insert({
-                        "cpf": cpf, "tipo": "micro", "conteudo_id": aula_info["id"], 
-                        "texto_desafio": texto_micro, "data_criacao": datetime.utcnow().isoformat(), 
-                        "desafio_liberado": False, "titulo": titulo, "status_gerado": "ok"
-                    }).execute()
-                    print(f"[GERADOR-IA] Micro para '{aula_info['aula']}' criado.")
+    # 3. Busca Conteúdos Ativos (catálogo em memória: a turma inteira compartilha a mesma leitura)
+    conteudos = await catalogo.ativos_async()
+    if not conteudos:
+        raise ValueError("Nenhum conteúdo ativo encontrado no banco.")
+    print(f"[GERADOR] {len(conteudos)} conteúdos ativos encontrados.")
 
-    except Exception as e:
+    # 4. Agrupa Conteúdos por Módulo
+    modulos = {}
+    for c in conteudos:
+        nome_modulo = c.get("modulo")
+        if nome_modulo:
+            if nome_modulo not in modulos:
+                modulos[nome_modulo] = {"macro_info": None, "micros_info": []}
+            if not c.get("aula"): # Se não tem nome de aula, é o macro
+                modulos[nome_modulo]["macro_info"] = c
+            else: # Se tem nome de aula, é um micro
+                modulos[nome_modulo]["micros_info"].append(c)
+
+    # 5. Carrega, em uma única consulta, os desafios já existentes do aluno
+    existentes = await _carregar_desafios_existentes(supabase, cpf)
+    print(f"[GERADOR] {len(existentes)} desafios já existentes para o CPF.")
+
+    esperados = [(m["macro_info"]["id"], "macro") for m in modulos.values() if m["macro_info"]]
+    esperados += [(a["id"], "micro") for m in modulos.values() if m["macro_info"] for a in m["micros_info"]]
+    feitos = sum(1 for chave in esperados if chave in existentes)
+
+    # 6. Gera todos os módulos em paralelo (consumo de tokens atribuído ao aluno e à turma)
+    ctx = ContextoGeracao(semaforo, cpf, perfil, existentes, feitos, len(esperados), progresso)
+    await ctx.notificar_progresso()
+    with contexto_consumo(cpf=cpf, turma=turma):
+        if feitos < len(esperados):
+            # Falha rápido (sem gerar nada) se o orçamento do dia já acabou
+            await consumo_llm.verificar_orcamento()
+        try:
+            await asyncio.gather(*(
+                _gerar_modulo(ctx, nome_modulo, info_modulo) for nome_modulo, info_modulo in modulos.items()
+            ))
+        finally:
+            # 7. Grava tudo o que foi gerado em upserts em lote (mesmo após falhas parciais)
+            await _gravar_desafios_em_lote(supabase, ctx.novos)
+
+    print(f"--- [GERADOR] Finalizado para CPF: {cpf} ---")
+    if ctx.orcamento_excedido is not None:
+        raise ctx.orcamento_excedido
+    if ctx.falhas:
+        raise GeracaoIncompletaError(f"{len(ctx.falhas)} desafio(s) não gerado(s): {', '.join(ctx.falhas)}")
+
+
+def gerar_todos_os_desafios(cpf: str):
+    """
+    Ponto de entrada síncrono (scripts e execução manual). Roda o motor assíncrono
+    em um event loop próprio e apenas registra eventuais erros.
+    """
+    async def gerar_e_gravar_consumo():
+        try:
+            await gerar_todos_os_desafios_async(cpf)
+        finally:
+            await consumo_llm.descarregar()
+
+    try:
+        asyncio.run(gerar_e_gravar_consumo())
+    except Exception:
         print(f"[GERADOR] ERRO CRÍTICO no processo de geração:")
         traceback.print_exc()
-    
-    print(f"--- [GERADOR] Finalizado para CPF: {cpf} ---")
\ No newline at end of file
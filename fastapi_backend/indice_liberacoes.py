@@ -0,0 +1,174 @@
+# fastapi_backend/indice_liberacoes.py
+"""
+Índice em memória do cronograma de liberações por turma.
+
+"PBL - liberacoes_agendadas" é lida inteira de uma vez; para cada turma, as datas de
+liberação são convertidas e ordenadas uma única vez. Saber o que já está liberado
+vira uma busca binária (bisect) contra o horário atual, e o conjunto resultante é
+memorizado por posição — entre duas liberações a resposta é sempre a mesma.
+
+O índice é reconstruído quando a tabela muda por esta API (invalidar(), e em todos os
+processos pela mensagem de controle "indice_liberacoes" do broker do WebSocket) e, para
+alterações feitas por fora (ex.: painel pbl_admin), a cada INDICE_LIBERACOES_TTL_SEGUNDOS.
+"""
+import os
+import asyncio
+import time
+from bisect import bisect_right
+from datetime import datetime, time as dtime
+from typing import Dict, FrozenSet, List, Optional, Tuple
+from .db import get_supabase_async
+
+TABELA_LIBERACOES = "PBL - liberacoes_agendadas"
+INDICE_LIBERACOES_TTL_SEGUNDOS = float(os.getenv("INDICE_LIBERACOES_TTL_SEGUNDOS", "60"))
+PAGINA_CARGA = 1000  # max-rows padrão do PostgREST no Supabase
+
+
+def instante_liberacao(row: dict) -> Optional[datetime]:
+    """Data + hora de liberação do agendamento (None se não for possível interpretar)."""
+    try:
+        d_obj = datetime.fromisoformat(row.get("data_liberacao", "").split("T")[0]).date()
+        t_obj = dtime.fromisoformat(row.get("hora_liberacao") or "00:00:00")
+    except Exception:
+        return None
+    return datetime.combine(d_obj, t_obj)
+
+
+class IndiceTurma:
+    """Liberações de uma turma: instantes ordenados + conteúdos já marcados como liberados."""
+    __slots__ = ("instantes", "conteudos", "forcados", "_prefixos")
+
+    def __init__(self, agendados: List[Tuple[datetime, str]], forcados: FrozenSet[str]):
+        agendados.sort(key=lambda par: par[0])
+        self.instantes = [instante for instante, _ in agendados]
+        self.conteudos = [conteudo for _, conteudo in agendados]
+        self.forcados = forcados
+        self._prefixos: Dict[int, FrozenSet[str]] = {}
+
+    def liberados(self, agora: datetime) -> FrozenSet[str]:
+        k = bisect_right(self.instantes, agora)
+        conjunto = self._prefixos.get(k)
+        if conjunto is None:
+            conjunto = self._prefixos[k] = self.forcados | frozenset(self.conteudos[:k])
+        return conjunto
+
+    def proxima_liberacao(self, agora: datetime) -> Optional[datetime]:
+        k = bisect_right(self.instantes, agora)
+        return self.instantes[k] if k < len(self.instantes) else None
+
+
+def construir_indice(agendamentos: List[dict]) -> Dict[str, IndiceTurma]:
+    agendados: Dict[str, List[Tuple[datetime, str]]] = {}
+    forcados: Dict[str, set] = {}
+    for row in agendamentos:
+        instante = instante_liberacao(row)
+        if instante is None:
+            continue
+        conteudo_id = row.get("conteudo_id")
+        for turma in row.get("turmas") or []:
+            if row.get("liberado"):
+                forcados.setdefault(turma, set()).add(conteudo_id)
+            else:
+                agendados.setdefault(turma, []).append((instante, conteudo_id))
+    turmas = set(agendados) | set(forcados)
+    return {t: IndiceTurma(agendados.get(t, []), frozenset(forcados.get(t, ()))) for t in turmas}
+
+
+class IndiceLiberacoes:
+    def __init__(self, ttl: float = INDICE_LIBERACOES_TTL_SEGUNDOS):
+        self.ttl = ttl
+        self._turmas: Optional[Dict[str, IndiceTurma]] = None
+        self._construido_em = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+        self._lock_loop: Optional[asyncio.AbstractEventLoop] = None
+        # Loop dono do índice: invalidações vindas de threads são entregues a ele
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.reconstrucoes = 0
+        self.invalidacoes = 0
+        self.consultas = 0
+
+    def _valido(self) -> bool:
+        return self._turmas is not None and time.monotonic() - self._construido_em < self.ttl
+
+    def _obter_lock(self) -> asyncio.Lock:
+        loop = asyncio.get_running_loop()
+        if self._lock is None or self._lock_loop is not loop:
+            self._lock, self._lock_loop = asyncio.Lock(), loop
+        return self._lock
+
+    async def _carregar(self) -> List[dict]:
+        """Tabela inteira em páginas por id (uma consulta só pararia no max-rows do PostgREST)."""
+        supabase = await get_supabase_async()
+        linhas, ultimo = [], None
+        while True:
+            query = supabase.table(TABELA_LIBERACOES).select("id, conteudo_id, turmas, data_liberacao, hora_liberacao, liberado")
+            if ultimo is not None:
+                query = query.gt("id", ultimo)
+            pagina = (await query.order("id").limit(PAGINA_CARGA).execute()).data or []
+            linhas.extend(pagina)
+            if len(pagina) < PAGINA_CARGA:
+                return linhas
+            ultimo = pagina[-1]["id"]
+
+    async def turmas(self) -> Dict[str, IndiceTurma]:
+        self._loop = asyncio.get_running_loop()
+        turmas = self._turmas
+        if turmas is not None and self._valido():
+            return turmas
+        async with self._obter_lock():
+            turmas = self._turmas
+            # Quem esperou o lock encontra o índice já reconstruído
+            if turmas is None or not self._valido():
+                geracao = self.invalidacoes
+                turmas = construir_indice(await self._carregar())
+                self._turmas = turmas
+                # Invalidado durante a leitura: usa o resultado agora, mas reconstrói na próxima
+                self._construido_em = time.monotonic() if geracao == self.invalidacoes else float("-inf")
+                self.reconstrucoes += 1
+        return turmas
+
+    async def liberados(self, turma: str, agora: Optional[datetime] = None) -> FrozenSet[str]:
+        """Conteúdos já liberados para a turma (O(log n) com o índice em memória)."""
+        self.consultas += 1
+        indice = (await self.turmas()).get(turma)
+        return indice.liberados(agora or datetime.now()) if indice else frozenset()
+
+    def invalidar(self):
+        """
+        Chamado após qualquer escrita em "PBL - liberacoes_agendadas" feita por esta API.
+        De uma thread (ex.: forcar_liberacao_imediata via asyncio.to_thread), a invalidação é
+        entregue ao loop do índice, que é quem lê e reconstrói `_turmas`.
+        """
+        loop = self._loop
+        if loop is not None and loop.is_running() and not loop.is_closed():
+            try:
+                no_loop = asyncio.get_running_loop() is loop
+            except RuntimeError:
+                no_loop = False
+            if not no_loop:
+                loop.call_soon_threadsafe(self._descartar)
+                return
+        self._descartar()
+
+    def _descartar(self):
+        self._turmas = None
+        self.invalidacoes += 1
+
+    def aplicar(self, dados: dict):
+        """Mensagem de controle "indice_liberacoes" recebida pelo broker (de qualquer processo)."""
+        self.invalidar()
+
+    def estatisticas(self) -> dict:
+        return {
+            "construido": self._turmas is not None,
+            "turmas": len(self._turmas or {}),
+            "agendamentos": sum(len(t.instantes) + len(t.forcados) for t in (self._turmas or {}).values()),
+            "idade_segundos": round(time.monotonic() - self._construido_em, 1) if self._valido() else None,
+            "ttl_segundos": self.ttl,
+            "consultas": self.consultas,
+            "reconstrucoes": self.reconstrucoes,
+            "invalidacoes": self.invalidacoes,
+        }
+
+
+indice_liberacoes = IndiceLiberacoes()
@@ -0,0 +1,350 @@
+# fastapi_backend/jobs.py
+"""
+Fila persistente de jobs de geração de desafios.
+
+Cada CPF possui um único registro em "PBL - geracao_jobs". O registro guarda o estado
+do job (pendente, executando, concluido, erro), o número de tentativas e o progresso
+(itens_feitos / itens_total). Os jobs são executados por um pool de workers assíncronos,
+separado do threadpool que atende as requisições HTTP.
+"""
+import os
+import asyncio
+import time
+import traceback
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+from .db import get_supabase_client, get_supabase_async, executar_em_thread
+from .gerar_desafios import gerar_todos_os_desafios_async
+from .consumo_llm import OrcamentoExcedidoError
+
+TABELA_JOBS = "PBL - geracao_jobs"
+
+STATUS_PENDENTE = "pendente"
+STATUS_EXECUTANDO = "executando"
+STATUS_CONCLUIDO = "concluido"
+STATUS_ERRO = "erro"
+STATUS_EM_ANDAMENTO = (STATUS_PENDENTE, STATUS_EXECUTANDO)
+
+# Configuração do pool (ver .env.example)
+JOBS_WORKERS = int(os.getenv("JOBS_WORKERS", "2"))
+JOBS_MAX_TENTATIVAS = int(os.getenv("JOBS_MAX_TENTATIVAS", "3"))
+JOBS_BACKOFF_SEGUNDOS = float(os.getenv("JOBS_BACKOFF_SEGUNDOS", "30"))
+JOBS_POLL_SEGUNDOS = float(os.getenv("JOBS_POLL_SEGUNDOS", "5"))
+# Um job "executando" sem atualização há mais tempo que isso é considerado abandonado
+# (verificado no startup e a cada metade desse tempo)
+JOBS_TIMEOUT_SEGUNDOS = float(os.getenv("JOBS_TIMEOUT_SEGUNDOS", "600"))
+# Intervalo mínimo entre gravações de progresso no banco
+JOBS_INTERVALO_PROGRESSO = float(os.getenv("JOBS_INTERVALO_PROGRESSO", "1"))
+# Quantidade de CPFs por consulta/upsert nas operações em lote
+TAMANHO_BLOCO_CPFS = 200
+
+
+def _agora() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _backoff(tentativa: int) -> float:
+    """Backoff exponencial: base, 2*base, 4*base, ..."""
+    return JOBS_BACKOFF_SEGUNDOS * (2 ** max(0, tentativa - 1))
+
+
+# --- API usada pelas rotas ---
+def obter_job(cpf: str) -> Optional[dict]:
+    """Retorna o registro de job do CPF (ou None se nunca houve geração)."""
+    supabase = get_supabase_client()
+    res = supabase.table(TABELA_JOBS).select("*").eq("cpf", cpf).limit(1).execute()
+    return res.data[0] if res and res.data else None
+
+
+async def obter_job_async(cpf: str) -> Optional[dict]:
+    """Versão assíncrona de `obter_job`, usada pelas rotas `async def`."""
+    supabase = await get_supabase_async()
+    res = await supabase.table(TABELA_JOBS).select("*").eq("cpf", cpf).limit(1).execute()
+    return res.data[0] if res and res.data else None
+
+
+async def contar_jobs_por_status() -> dict:
+    """Tamanho da fila de jobs no banco (todos os processos), por status em andamento."""
+    supabase = await get_supabase_async()
+    contagens = await asyncio.gather(*(
+        supabase.table(TABELA_JOBS).select("id", count="exact").eq("status", status).limit(1).execute()
+        for status in STATUS_EM_ANDAMENTO
+    ))
+    return {status: res.count or 0 for status, res in zip(STATUS_EM_ANDAMENTO, contagens)}
+
+
+def _enfileirar(cpfs: List[str]) -> List[dict]:
+    """
+    (Re)enfileira, numa única instrução (pbl_enfileirar_geracao, sql/008), os CPFs sem job
+    em andamento. Retorna só os jobs enfileirados: os pendentes/executando não são tocados,
+    mesmo com pedidos simultâneos para o mesmo CPF.
+    """
+    supabase = get_supabase_client()
+    res = supabase.rpc("pbl_enfileirar_geracao", {"p_cpfs": cpfs}).execute()
+    return (res.data or []) if res else []
+
+
+def enfileirar_geracao(cpf: str) -> Tuple[dict, bool]:
+    """
+    Enfileira a geração de desafios do CPF. Se já existir um job pendente ou em
+    execução para o mesmo CPF, ele é reaproveitado (nenhum job duplicado é criado).
+    Retorna (registro do job, True se um novo job foi enfileirado).
+    """
+    enfileirados = _enfileirar([cpf])
+    if enfileirados:
+        pool.notificar()
+        return enfileirados[0], True
+    return obter_job(cpf), False
+
+
+def _buscar_jobs(cpfs: List[str]) -> List[dict]:
+    """Busca os jobs de vários CPFs (em blocos, para não estourar o tamanho da URL)."""
+    supabase = get_supabase_client()
+    jobs = []
+    for inicio in range(0, len(cpfs), TAMANHO_BLOCO_CPFS):
+        bloco = cpfs[inicio:inicio + TAMANHO_BLOCO_CPFS]
+        res = supabase.table(TABELA_JOBS).select("*").in_("cpf", bloco).execute()
+        jobs.extend((res.data or []) if res else [])
+    return jobs
+
+
+def enfileirar_geracao_em_lote(cpfs: List[str]) -> dict:
+    """
+    Enfileira a geração para vários CPFs (ex.: uma turma inteira) com poucas
+    consultas. CPFs que já possuem job em andamento são mantidos como estão.
+    """
+    cpfs = list(dict.fromkeys(cpfs))
+    enfileirados = 0
+    for inicio in range(0, len(cpfs), TAMANHO_BLOCO_CPFS):
+        enfileirados += len(_enfileirar(cpfs[inicio:inicio + TAMANHO_BLOCO_CPFS]))
+    if enfileirados:
+        pool.notificar()
+    return {"enfileirados": enfileirados, "ja_em_andamento": len(cpfs) - enfileirados}
+
+
+def resumir_progresso(cpfs: List[str]) -> dict:
+    """
+    Consolida o progresso dos jobs de um grupo de CPFs: contagem por status,
+    itens gerados, vazão (itens por minuto desde o início do primeiro job) e ETA.
+    """
+    jobs = _buscar_jobs(cpfs)
+    por_status = {}
+    for job in jobs:
+        por_status[job.get("status")] = por_status.get(job.get("status"), 0) + 1
+
+    totais_conhecidos = [j["itens_total"] for j in jobs if j.get("itens_total")]
+    media_itens = sum(totais_conhecidos) / len(totais_conhecidos) if totais_conhecidos else 0
+    itens_total = sum(j.get("itens_total") or media_itens for j in jobs)
+    itens_feitos = sum(j.get("itens_feitos") or 0 for j in jobs)
+
+    inicios = [datetime.fromisoformat(j["iniciado_em"]) for j in jobs if j.get("iniciado_em")]
+    vazao = 0.0
+    eta_segundos = None
+    if inicios:
+        minutos = max((_agora() - min(inicios)).total_seconds() / 60.0, 1 / 60.0)
+        vazao = itens_feitos / minutos
+        restantes = max(itens_total - itens_feitos, 0)
+        if vazao > 0:
+            eta_segundos = round(restantes / vazao * 60)
+
+    return {
+        "alunos": len(cpfs),
+        "alunos_sem_job": len(set(cpfs) - {j["cpf"] for j in jobs}),
+        "por_status": por_status,
+        "itens_feitos": itens_feitos,
+        "itens_total": round(itens_total),
+        "itens_por_minuto": round(vazao, 2),
+        "eta_segundos": eta_segundos,
+    }
+
+
+# --- Pool de workers ---
+class WorkerPool:
+    """
+    Pool de workers assíncronos que consome a fila de jobs do banco.
+    Pode rodar dentro do processo da API (ver lifespan em main.py) ou em um
+    processo dedicado (`python -m fastapi_backend.worker`).
+    """
+    def __init__(self):
+        self._tarefas: list = []
+        self._sinal: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.em_execucao = 0
+
+    @property
+    def ativo(self) -> bool:
+        return bool(self._tarefas)
+
+    async def iniciar(self, workers: int = JOBS_WORKERS):
+        if self.ativo or workers <= 0:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._sinal = asyncio.Event()
+        await self.recuperar_jobs_abandonados()
+        self._tarefas = [asyncio.create_task(self._executar_worker(i)) for i in range(workers)]
+        self._tarefas.append(asyncio.create_task(self._recuperar_periodicamente()))
+        print(f"[JOBS] Pool iniciado com {workers} worker(s).")
+
+    async def parar(self):
+        for tarefa in self._tarefas:
+            tarefa.cancel()
+        await asyncio.gather(*self._tarefas, return_exceptions=True)
+        self._tarefas = []
+        print("[JOBS] Pool finalizado.")
+
+    def notificar(self):
+        """Acorda os workers (pode ser chamado de qualquer thread)."""
+        if self._loop is not None and self._sinal is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._sinal.set)
+
+    async def recuperar_jobs_abandonados(self) -> int:
+        """Devolve à fila jobs que ficaram 'executando' após um restart ou queda do worker."""
+        supabase = get_supabase_client()
+        limite = (_agora() - timedelta(seconds=JOBS_TIMEOUT_SEGUNDOS)).isoformat()
+        res = await executar_em_thread(
+            supabase.table(TABELA_JOBS)
+            .update({"status": STATUS_PENDENTE, "proxima_tentativa": _agora().isoformat()})
+            .eq("status", STATUS_EXECUTANDO)
+            .lt("atualizado_em", limite)
+        )
+        if res and res.data:
+            print(f"[JOBS] {len(res.data)} job(s) abandonado(s) devolvido(s) à fila.")
+        return len(res.data or []) if res else 0
+
+    async def _recuperar_periodicamente(self):
+        """
+        Depois de um restart rápido, o job que o processo anterior executava ainda não passou do
+        timeout no startup (e o CPF ficaria bloqueado em "executando"): esta tarefa o devolve à fila.
+        """
+        while True:
+            await asyncio.sleep(JOBS_TIMEOUT_SEGUNDOS / 2)
+            try:
+                if await self.recuperar_jobs_abandonados():
+                    self._sinal.set()
+            except Exception as e:
+                print(f"[JOBS] Aviso: não foi possível verificar jobs abandonados: {e}")
+
+    async def _executar_worker(self, indice: int):
+        while True:
+            try:
+                job = await self._reservar_proximo_job()
+                if job is None:
+                    self._sinal.clear()
+                    try:
+                        await asyncio.wait_for(self._sinal.wait(), timeout=JOBS_POLL_SEGUNDOS)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                self.em_execucao += 1
+                try:
+                    await self._executar_job(job)
+                finally:
+                    self.em_execucao -= 1
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                print(f"[JOBS] Erro inesperado no worker {indice}:")
+                traceback.print_exc()
+                await asyncio.sleep(JOBS_POLL_SEGUNDOS)
+
+    async def _reservar_proximo_job(self) -> Optional[dict]:
+        """
+        Busca o próximo job pendente e o reserva de forma atômica: o UPDATE só
+        afeta a linha se ela ainda estiver 'pendente', então dois workers (mesmo
+        em processos diferentes) nunca executam o mesmo job.
+        """
+        supabase = get_supabase_client()
+        agora = _agora().isoformat()
+        candidatos = await executar_em_thread(
+            supabase.table(TABELA_JOBS).select("*")
+            .eq("status", STATUS_PENDENTE)
+            .lte("proxima_tentativa", agora)
+            .order("proxima_tentativa")
+            .limit(5)
+        )
+        for job in (candidatos.data or []) if candidatos else []:
+            reservado = await executar_em_thread(
+                supabase.table(TABELA_JOBS)
+                .update({
+                    "status": STATUS_EXECUTANDO, "tentativas": (job.get("tentativas") or 0) + 1,
+                    "iniciado_em": job.get("iniciado_em") or agora, "atualizado_em": agora,
+                })
+                .eq("id", job["id"])
+                .eq("status", STATUS_PENDENTE)
+            )
+            if reservado and reservado.data:
+                return reservado.data[0]
+        return None
+
+    async def _executar_job(self, job: dict):
+        supabase = get_supabase_client()
+        cpf = job["cpf"]
+        ultima_gravacao = 0.0
+
+        async def progresso(feitos: int, total: int):
+            nonlocal ultima_gravacao
+            agora = time.monotonic()
+            if feitos < total and agora - ultima_gravacao < JOBS_INTERVALO_PROGRESSO:
+                return
+            ultima_gravacao = agora
+            await executar_em_thread(
+                supabase.table(TABELA_JOBS)
+                .update({"itens_feitos": feitos, "itens_total": total, "atualizado_em": _agora().isoformat()})
+                .eq("id", job["id"])
+            )
+
+        print(f"[JOBS] Executando job {job['id']} (CPF {cpf}, tentativa {job.get('tentativas')}).")
+        try:
+            await gerar_todos_os_desafios_async(cpf, progresso=progresso)
+        except asyncio.CancelledError:
+            # Worker encerrado (ex.: shutdown): devolve o job à fila
+            await executar_em_thread(
+                supabase.table(TABELA_JOBS)
+                .update({"status": STATUS_PENDENTE, "atualizado_em": _agora().isoformat()})
+                .eq("id", job["id"])
+            )
+            raise
+        except OrcamentoExcedidoError as e:
+            # Orçamento de IA esgotado: o job volta para a fila quando o orçamento renovar,
+            # sem consumir uma das tentativas
+            print(f"[JOBS] Job {job['id']} adiado: {e}")
+            await executar_em_thread(
+                supabase.table(TABELA_JOBS)
+                .update({
+                    "status": STATUS_PENDENTE, "ultimo_erro": str(e),
+                    "tentativas": max(0, (job.get("tentativas") or 1) - 1),
+                    "proxima_tentativa": (_agora() + timedelta(seconds=e.retry_after)).isoformat(),
+                    "atualizado_em": _agora().isoformat(),
+                })
+                .eq("id", job["id"])
+            )
+            return
+        except Exception as e:
+            tentativas = job.get("tentativas") or 1
+            erro = f"{type(e).__name__}: {e}"
+            if tentativas < JOBS_MAX_TENTATIVAS:
+                espera = _backoff(tentativas)
+                print(f"[JOBS] Job {job['id']} falhou ({erro}). Nova tentativa em {espera:.0f}s.")
+                atualizacao = {
+                    "status": STATUS_PENDENTE, "ultimo_erro": erro,
+                    "proxima_tentativa": (_agora() + timedelta(seconds=espera)).isoformat(),
+                }
+            else:
+                print(f"[JOBS] Job {job['id']} falhou definitivamente após {tentativas} tentativa(s): {erro}")
+                atualizacao = {"status": STATUS_ERRO, "ultimo_erro": erro, "finalizado_em": _agora().isoformat()}
+            atualizacao["atualizado_em"] = _agora().isoformat()
+            await executar_em_thread(supabase.table(TABELA_JOBS).update(atualizacao).eq("id", job["id"]))
+            return
+
+        await executar_em_thread(
+            supabase.table(TABELA_JOBS)
+            .update({
+                "status": STATUS_CONCLUIDO, "ultimo_erro": None,
+                "finalizado_em": _agora().isoformat(), "atualizado_em": _agora().isoformat(),
+            })
+            .eq("id", job["id"])
+        )
+        print(f"[JOBS] Job {job['id']} concluído.")
+
+
+pool = WorkerPool()
@@ -1,5 +1,43 @@
 # fastapi_backend/liberador.py
-from .db import get_supabase_client
+from typing import Set
+from .db import get_supabase_client, get_supabase_async
+from .conexoes import manager
+from .indice_liberacoes import indice_liberacoes
+
+
+async def conteudos_liberados_da_turma(turma: str) -> Set[str]:
+    """Conteúdos já liberados para a turma, a partir do índice em memória do cronograma."""
+    return await indice_liberacoes.liberados(turma)
+
+
+def tipo_do_agendamento(agendamento: dict) -> str:
+    """Agendamentos com aula liberam o micro-desafio; sem aula, o macro do módulo."""
+    return "micro" if agendamento.get("aula") else "macro"
+
+
+def _parametros_liberacao(agendamento: dict, reservar: bool) -> dict:
+    return {
+        "p_conteudo_id": str(agendamento.get("conteudo_id")),
+        "p_tipo": tipo_do_agendamento(agendamento),
+        "p_turmas": agendamento.get("turmas") or [],
+        "p_agendamento_id": str(agendamento["id"]) if reservar else None,
+    }
+
+
+async def liberar_agendamento(agendamento: dict) -> int:
+    """
+    Libera os desafios do agendamento para todas as turmas com uma única escrita
+    (função pbl_liberar_conteudo, sql/004). O agendamento é reservado na mesma
+    transação: retorna -1 se outro processo já o liberou.
+    """
+    supabase = await get_supabase_async()
+    res = await supabase.rpc("pbl_liberar_conteudo", _parametros_liberacao(agendamento, reservar=True)).execute()
+    indice_liberacoes.invalidar()
+    # Nos outros processos, antes do aviso "liberacao" (mesmo broker, em ordem): quem recebe o
+    # aviso e relê o painel já encontra o índice descartado
+    await manager.publicar_controle("indice_liberacoes", {})
+    return res.data if isinstance(res.data, int) else 0
+
 
 def forcar_liberacao_imediata(agendamento: dict):
     """
@@ -7,32 +45,14 @@ def forcar_liberacao_imediata(agendamento: dict):
     correspondentes para os alunos das turmas especificadas.
     """
     print(f"[LIBERADOR] Forçando liberação para agendamento ID: {agendamento.get('id')}")
-    supabase = get_supabase_client()
-    
-    conteudo_id = agendamento.get("conteudo_id")
-    turmas = agendamento.get("turmas", [])
-    aula = agendamento.get("aula")
-    tipo_desejado = "micro" if aula else "macro"
 
-    if not turmas or not conteudo_id:
+    if not agendamento.get("turmas") or not agendamento.get("conteudo_id"):
         print("[LIBERADOR] Aviso: Turmas ou ID do conteúdo ausentes. Nenhuma liberação forçada.")
         return
 
-    # 1. Encontrar os CPFs dos alunos nas turmas
-    alunos_res = supabase.table("PBL - usuarios").select("cpf").in_("turma", turmas).execute()
-    if not (alunos_res and alunos_res.data):
-        print(f"[LIBERADOR] Nenhum aluno encontrado para as turmas {turmas}.")
-        return
-    
-    cpfs = [aluno['cpf'] for aluno in alunos_res.data]
-    print(f"[LIBERADOR] Encontrados {len(cpfs)} alunos para liberar o desafio.")
-
-    # 2. Atualizar o status 'desafio_liberado' na tabela de desafios para esses alunos
-    update_res = supabase.table("PBL - desafios") \
-        .update({"desafio_liberado": True}) \
-        .in_("cpf", cpfs) \
-        .eq("conteudo_id", conteudo_id) \
-        .eq("tipo", tipo_desejado) \
-        .execute()
-
-    print(f"[LIBERADOR] {len(update_res.data)} desafios do tipo '{tipo_desejado}' foram liberados para o conteúdo '{conteudo_id}'.")
\ No newline at end of file
+    # O agendamento já foi gravado como liberado: só os desafios são atualizados (em lote)
+    supabase = get_supabase_client()
+    res = supabase.rpc("pbl_liberar_conteudo", _parametros_liberacao(agendamento, reservar=False)).execute()
+    indice_liberacoes.invalidar()
+
+    print(f"[LIBERADOR] {res.data} desafios do tipo '{tipo_do_agendamento(agendamento)}' foram liberados para o conteúdo '{agendamento.get('conteudo_id')}'.")
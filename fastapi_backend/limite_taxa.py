@@ -0,0 +1,295 @@
+# fastapi_backend/limite_taxa.py
+"""
+Limite de taxa e controle de admissão para as rotas caras.
+
+- /auth/token: cada tentativa consulta o banco; limitado por IP e por CPF (campo username).
+- /api/respostas/registrar: cada tentativa é uma chamada paga ao gpt-4o; limitado por CPF
+  (do token) e por IP, e com um teto de requisições simultâneas.
+
+Cada regra é um token bucket ("N/S" = N requisições a cada S segundos, com rajada de até N),
+configurável por variável de ambiente RATE_LIMIT_<NOME> ("0" desativa). Ao estourar, a
+resposta é 429 com Retry-After; acima do teto de simultâneas, 503 com Retry-After.
+
+Uma requisição só consome fichas se todas as regras da rota a permitirem: a rejeitada por
+uma regra não gasta as fichas das outras.
+
+O estado fica em memória (um processo) ou em um servidor Redis compartilhado
+(RATE_LIMIT_URL=redis://...), para que o limite valha somando todos os workers. Se o Redis
+falhar, o limite continua valendo com os buckets em memória do processo, até ele voltar.
+"""
+import os
+import json
+import math
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
+from .security import verify_token
+
+RATE_LIMIT_ATIVO = os.getenv("RATE_LIMIT_ATIVO", "true").lower() in ("1", "true", "sim", "yes")
+RATE_LIMIT_URL = os.getenv("RATE_LIMIT_URL", "")
+# Atrás de proxy reverso, o IP do cliente vem do X-Forwarded-For
+RATE_LIMIT_CONFIAR_PROXY = os.getenv("RATE_LIMIT_CONFIAR_PROXY", "false").lower() in ("1", "true", "sim", "yes")
+TAMANHO_MAXIMO_CORPO = 64 * 1024
+
+# Contadores do processo (expostos em /admin/limites)
+rejeitadas = {"limite_taxa": 0, "simultaneas": 0}
+falhas_backend = {"total": 0}
+
+
+@dataclass
+class RegraLimite:
+    nome: str
+    metodo: str
+    caminho: str
+    chave: str  # "ip" ou "cpf"
+    limite: str  # "N/S": N requisições a cada S segundos
+
+    @property
+    def capacidade_e_taxa(self) -> Optional[Tuple[float, float]]:
+        valor = os.getenv(f"RATE_LIMIT_{self.nome.upper()}", self.limite)
+        if not valor or valor == "0":
+            return None
+        n, _, s = valor.partition("/")
+        return float(n), float(n) / float(s or 60)
+
+
+REGRAS_PADRAO = [
+    RegraLimite("login_ip", "POST", "/auth/token", "ip", "20/60"),
+    RegraLimite("login_cpf", "POST", "/auth/token", "cpf", "5/60"),
+    RegraLimite("avaliacao_cpf", "POST", "/api/respostas/registrar", "cpf", "10/60"),
+    RegraLimite("avaliacao_ip", "POST", "/api/respostas/registrar", "ip", "60/60"),
+]
+# Teto de requisições simultâneas por rota (controle de admissão)
+SIMULTANEAS_PADRAO = {
+    ("POST", "/api/respostas/registrar"): int(os.getenv("RATE_LIMIT_SIMULTANEAS_AVALIACAO", "50")),
+}
+
+
+class LimitesMemoria:
+    """Token buckets em memória (um processo)."""
+    MAX_CHAVES = 100_000
+
+    def __init__(self):
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+
+    async def consumir(self, chave: str, capacidade: float, taxa: float) -> float:
+        """Consome uma ficha. Retorna 0 se permitido, ou os segundos até haver ficha."""
+        return await self.consumir_todos([(chave, capacidade, taxa)])
+
+    async def consumir_todos(self, buckets: List[Tuple[str, float, float]]) -> float:
+        """Consome uma ficha de cada bucket (chave, capacidade, taxa) só se todos tiverem ficha."""
+        agora = time.monotonic()
+        recarregados, espera = [], 0.0
+        for chave, capacidade, taxa in buckets:
+            fichas, atualizado = self._buckets.get(chave, (capacidade, agora))
+            fichas = min(capacidade, fichas + (agora - atualizado) * taxa)
+            if fichas < 1:
+                espera = max(espera, (1 - fichas) / taxa)
+            recarregados.append((chave, fichas))
+        if espera == 0:
+            for chave, fichas in recarregados:
+                self._buckets[chave] = (fichas - 1, agora)
+            if len(self._buckets) > self.MAX_CHAVES:
+                self._podar(agora)
+        return espera
+
+    def _podar(self, agora: float):
+        # Buckets parados há mais de 10 min já estariam cheios: podem ser esquecidos
+        for chave in [c for c, (_, t) in self._buckets.items() if agora - t > 600]:
+            del self._buckets[chave]
+
+
+class LimitesRedis:
+    """Token buckets em Redis: o limite vale para todos os workers/réplicas."""
+    # KEYS: um bucket por regra; ARGV: capacidade e taxa de cada um, na mesma ordem
+    _SCRIPT = """
+local t = redis.call('TIME')
+local agora = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local fichas, espera = {}, 0
+for i, chave in ipairs(KEYS) do
+  local cap, taxa = tonumber(ARGV[2 * i - 1]), tonumber(ARGV[2 * i])
+  local d = redis.call('HMGET', chave, 'f', 't')
+  local f = tonumber(d[1]) or cap
+  local antes = tonumber(d[2]) or agora
+  f = math.min(cap, f + (agora - antes) * taxa)
+  if f < 1 then espera = math.max(espera, (1 - f) / taxa) end
+  fichas[i] = f
+end
+if espera == 0 then
+  for i, chave in ipairs(KEYS) do
+    local cap, taxa = tonumber(ARGV[2 * i - 1]), tonumber(ARGV[2 * i])
+    redis.call('HSET', chave, 'f', fichas[i] - 1, 't', agora)
+    redis.call('EXPIRE', chave, math.ceil(cap / taxa) + 1)
+  end
+end
+return tostring(espera)
+"""
+
+    def __init__(self, url: str):
+        try:
+            import redis.asyncio as redis_async
+        except ImportError as e:
+            raise RuntimeError("RATE_LIMIT_URL definido, mas o pacote 'redis' não está instalado.") from e
+        self._cliente = redis_async.from_url(url)
+        self._script = self._cliente.register_script(self._SCRIPT)
+
+    async def consumir(self, chave: str, capacidade: float, taxa: float) -> float:
+        return await self.consumir_todos([(chave, capacidade, taxa)])
+
+    async def consumir_todos(self, buckets: List[Tuple[str, float, float]]) -> float:
+        chaves = [f"pbl:rl:{chave}" for chave, _, _ in buckets]
+        args = [valor for _, capacidade, taxa in buckets for valor in (capacidade, taxa)]
+        return float(await self._script(keys=chaves, args=args))
+
+
+def criar_backend(url: str = RATE_LIMIT_URL):
+    return LimitesRedis(url) if url else LimitesMemoria()
+
+
+def _cabecalho(scope, nome: bytes) -> Optional[str]:
+    for chave, valor in scope.get("headers") or []:
+        if chave == nome:
+            return valor.decode("latin-1")
+    return None
+
+
+def ip_do_cliente(scope) -> str:
+    if RATE_LIMIT_CONFIAR_PROXY:
+        encaminhado = _cabecalho(scope, b"x-forwarded-for")
+        if encaminhado:
+            return encaminhado.split(",")[0].strip()
+    cliente = scope.get("client")
+    return cliente[0] if cliente else "-"
+
+
+def cpf_do_token(scope) -> Optional[str]:
+    autorizacao = _cabecalho(scope, b"authorization") or ""
+    if not autorizacao.lower().startswith("bearer "):
+        return None
+    try:
+        return verify_token(autorizacao[7:], ValueError())
+    except ValueError:
+        return None  # a própria rota responde 401
+
+
+class LimiteTaxaMiddleware:
+    """Middleware ASGI: aplica as regras antes da rota (e antes de qualquer acesso ao banco/IA)."""
+    def __init__(self, app, regras: List[RegraLimite] = None, simultaneas: dict = None, backend=None):
+        self.app = app
+        self.regras: Dict[Tuple[str, str], List[RegraLimite]] = {}
+        for regra in (REGRAS_PADRAO if regras is None else regras):
+            self.regras.setdefault((regra.metodo, regra.caminho), []).append(regra)
+        self.simultaneas = SIMULTANEAS_PADRAO if simultaneas is None else simultaneas
+        self.em_andamento: Dict[Tuple[str, str], int] = {}
+        self.backend = backend or criar_backend()
+        # Usado enquanto o backend compartilhado (Redis) estiver falhando
+        self.reserva = LimitesMemoria()
+        self._backend_falhando = False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not RATE_LIMIT_ATIVO:
+            return await self.app(scope, receive, send)
+        rota = (scope["method"], scope["path"].rstrip("/") or "/")
+        regras = self.regras.get(rota)
+        teto = self.simultaneas.get(rota)
+        if not regras and not teto:
+            return await self.app(scope, receive, send)
+
+        if regras:
+            receive, corpo = await self._bufferizar_corpo(receive, regras)
+            espera = await self._verificar(scope, regras, corpo)
+            if espera > 0:
+                rejeitadas["limite_taxa"] += 1
+                return await self._rejeitar(send, 429, espera, "Muitas requisições. Tente novamente em instantes.")
+
+        if teto:
+            if self.em_andamento.get(rota, 0) >= teto:
+                rejeitadas["simultaneas"] += 1
+                return await self._rejeitar(send, 503, 1, "Servidor ocupado. Tente novamente em instantes.")
+            self.em_andamento[rota] = self.em_andamento.get(rota, 0) + 1
+            try:
+                return await self.app(scope, receive, send)
+            finally:
+                self.em_andamento[rota] -= 1
+        return await self.app(scope, receive, send)
+
+    async def _bufferizar_corpo(self, receive, regras):
+        """O CPF do login vem no corpo (form): lê o corpo e o devolve intacto para a rota."""
+        if not any(r.chave == "cpf" for r in regras):
+            return receive, b""
+        partes, mais = [], True
+        while mais:
+            mensagem = await receive()
+            if mensagem["type"] != "http.request":
+                break
+            partes.append(mensagem.get("body", b""))
+            mais = mensagem.get("more_body", False)
+        corpo = b"".join(partes)
+        entregue = False
+
+        async def receive_repetido():
+            nonlocal entregue
+            if not entregue:
+                entregue = True
+                return {"type": "http.request", "body": corpo, "more_body": False}
+            return await receive()
+
+        return receive_repetido, corpo
+
+    def _cpf(self, scope, corpo: bytes) -> Optional[str]:
+        cpf = cpf_do_token(scope)
+        if cpf is None and corpo and len(corpo) <= TAMANHO_MAXIMO_CORPO:
+            # Login: OAuth2PasswordRequestForm (username = CPF)
+            valores = parse_qs(corpo.decode("utf-8", "replace")).get("username")
+            cpf = valores[0].strip() if valores else None
+        return cpf
+
+    async def _verificar(self, scope, regras: List[RegraLimite], corpo: bytes) -> float:
+        buckets = []
+        for regra in regras:
+            config = regra.capacidade_e_taxa
+            if config is None:
+                continue
+            valor = ip_do_cliente(scope) if regra.chave == "ip" else self._cpf(scope, corpo)
+            if not valor:
+                continue
+            buckets.append((f"{regra.nome}:{valor}", *config))
+        if not buckets:
+            return 0.0
+        try:
+            espera = await self.backend.consumir_todos(buckets)
+        except Exception as e:
+            # Backend fora do ar: o login não pode virar 500; limita só neste processo até ele voltar
+            falhas_backend["total"] += 1
+            if not self._backend_falhando:
+                self._backend_falhando = True
+                print(f"[LIMITE] Aviso: backend de limite de taxa indisponível ({e}); usando buckets em memória.")
+            return await self.reserva.consumir_todos(buckets)
+        if self._backend_falhando:
+            self._backend_falhando = False
+            print("[LIMITE] Backend de limite de taxa restabelecido.")
+        return espera
+
+    async def _rejeitar(self, send, status: int, espera: float, mensagem: str):
+        corpo = json.dumps({"detail": mensagem}).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(corpo)).encode()),
+                (b"retry-after", str(max(1, math.ceil(espera))).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": corpo})
+
+
+def estatisticas() -> dict:
+    return {
+        "ativo": RATE_LIMIT_ATIVO,
+        "backend": "redis" if RATE_LIMIT_URL else "memoria",
+        "regras": {r.nome: os.getenv(f"RATE_LIMIT_{r.nome.upper()}", r.limite) for r in REGRAS_PADRAO},
+        "rejeitadas": dict(rejeitadas),
+        "falhas_backend": falhas_backend["total"],
+    }
@@ -0,0 +1,206 @@
+# fastapi_backend/llm.py
+"""
+Camada única de acesso à OpenAI, usada pelo gerador de desafios e pelo avaliador.
+
+- Cliente assíncrono compartilhado, com pool de conexões keep-alive ajustável;
+- timeout por chamada;
+- novas tentativas com backoff exponencial (e jitter) em 429, 5xx e falhas de rede;
+- circuit breaker: após falhas consecutivas, as chamadas falham rápido por um tempo;
+- transporte plugável (`configurar_transporte`) para testes contra um servidor local.
+"""
+import os
+import asyncio
+import random
+import time
+from typing import Optional
+import httpx
+from openai import AsyncOpenAI, APIConnectionError, APIStatusError, APITimeoutError, RateLimitError
+from .agendador_llm import agendador, estimar_tokens
+from .metricas import registrar_llm
+from .consumo_llm import consumo_llm
+
+MODELO_PADRAO = os.getenv("OPENAI_MODELO", "gpt-4o")
+# Permite apontar para um servidor compatível (ex.: stub local em testes de carga)
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+
+LLM_TIMEOUT_SEGUNDOS = float(os.getenv("LLM_TIMEOUT_SEGUNDOS", "60"))
+LLM_TIMEOUT_CONEXAO = float(os.getenv("LLM_TIMEOUT_CONEXAO", "10"))
+LLM_MAX_CONEXOES = int(os.getenv("LLM_MAX_CONEXOES", "100"))
+LLM_MAX_KEEPALIVE = int(os.getenv("LLM_MAX_KEEPALIVE", "20"))
+LLM_KEEPALIVE_SEGUNDOS = float(os.getenv("LLM_KEEPALIVE_SEGUNDOS", "60"))
+LLM_MAX_TENTATIVAS = int(os.getenv("LLM_MAX_TENTATIVAS", "4"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "1"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "30"))
+LLM_CIRCUITO_LIMIAR = int(os.getenv("LLM_CIRCUITO_LIMIAR", "5"))
+LLM_CIRCUITO_RESET_SEGUNDOS = float(os.getenv("LLM_CIRCUITO_RESET_SEGUNDOS", "30"))
+
+
+class LLMIndisponivelError(Exception):
+    """Levantada quando o circuit breaker está aberto."""
+
+
+class CircuitBreaker:
+    """
+    Fechado: chamadas normais. Após `limiar` falhas consecutivas, abre e rejeita
+    chamadas por `tempo_reset` segundos. Depois disso, deixa passar uma chamada de
+    teste (meio-aberto): sucesso fecha o circuito, falha o reabre.
+    """
+    def __init__(self, limiar: int = LLM_CIRCUITO_LIMIAR, tempo_reset: float = LLM_CIRCUITO_RESET_SEGUNDOS):
+        self.limiar = limiar
+        self.tempo_reset = tempo_reset
+        self.falhas = 0
+        self.aberto_ate = 0.0
+        self._teste_em_andamento = False
+
+    @property
+    def estado(self) -> str:
+        if self.falhas < self.limiar:
+            return "fechado"
+        return "aberto" if time.monotonic() < self.aberto_ate else "meio-aberto"
+
+    def verificar(self) -> bool:
+        """Levanta LLMIndisponivelError se aberto. Retorna True se esta chamada é a de teste."""
+        estado = self.estado
+        if estado == "aberto" or (estado == "meio-aberto" and self._teste_em_andamento):
+            raise LLMIndisponivelError("OpenAI indisponível no momento (circuito aberto).")
+        if estado == "meio-aberto":
+            self._teste_em_andamento = True
+            return True
+        return False
+
+    def encerrar_teste(self):
+        """Libera a vaga da chamada de teste em qualquer saída (inclusive cancelamento)."""
+        self._teste_em_andamento = False
+
+    def registrar_sucesso(self):
+        self.falhas = 0
+        self._teste_em_andamento = False
+
+    def registrar_falha(self):
+        self.falhas += 1
+        self._teste_em_andamento = False
+        if self.falhas >= self.limiar:
+            self.aberto_ate = time.monotonic() + self.tempo_reset
+
+
+circuito = CircuitBreaker()
+
+_transporte: Optional[httpx.AsyncBaseTransport] = None
+_cliente: Optional[AsyncOpenAI] = None
+_cliente_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def configurar_transporte(transporte: Optional[httpx.AsyncBaseTransport]):
+    """
+    Substitui o transporte HTTP do cliente (ex.: httpx.MockTransport ou um
+    ASGITransport apontando para um stub local). Passe None para voltar ao padrão.
+    """
+    global _transporte, _cliente
+    _transporte = transporte
+    _cliente = None
+
+
+def get_llm_client() -> AsyncOpenAI:
+    """
+    Retorna o cliente assíncrono compartilhado. O pool de conexões pertence ao event
+    loop em que foi criado, então um novo cliente é criado se o loop mudar.
+    """
+    global _cliente, _cliente_loop
+    loop = asyncio.get_running_loop()
+    if _cliente is None or _cliente_loop is not loop:
+        api_key = os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            raise ValueError("A variável de ambiente OPENAI_API_KEY é necessária.")
+        http_client = httpx.AsyncClient(
+            transport=_transporte,
+            timeout=httpx.Timeout(LLM_TIMEOUT_SEGUNDOS, connect=LLM_TIMEOUT_CONEXAO),
+            limits=httpx.Limits(
+                max_connections=LLM_MAX_CONEXOES,
+                max_keepalive_connections=LLM_MAX_KEEPALIVE,
+                keepalive_expiry=LLM_KEEPALIVE_SEGUNDOS,
+            ),
+        )
+        # As novas tentativas são feitas aqui (com circuit breaker), não pelo SDK
+        _cliente = AsyncOpenAI(api_key=api_key, base_url=OPENAI_BASE_URL, http_client=http_client, max_retries=0)
+        _cliente_loop = loop
+    return _cliente
+
+
+def _pode_tentar_novamente(erro: Exception) -> bool:
+    if isinstance(erro, (APITimeoutError, APIConnectionError, RateLimitError)):
+        return True
+    return isinstance(erro, APIStatusError) and erro.status_code >= 500
+
+
+def _espera_para(erro: Exception, tentativa: int) -> float:
+    """Respeita o Retry-After da API quando houver; senão, backoff exponencial com jitter."""
+    resposta = getattr(erro, "response", None)
+    retry_after = resposta.headers.get("retry-after") if resposta is not None else None
+    if retry_after:
+        try:
+            return min(float(retry_after), LLM_BACKOFF_MAX)
+        except ValueError:
+            pass
+    return min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * (2 ** tentativa)) * random.uniform(0.5, 1.0)
+
+
+async def completar(prompt: str, *, tipo: str, chave: Optional[str] = None, modelo: str = MODELO_PADRAO,
+                    temperature: float = 0.7, max_tokens: Optional[int] = None,
+                    timeout: Optional[float] = None) -> str:
+    """
+    Executa uma chamada de chat completion e retorna o texto gerado.
+
+    `tipo` identifica o ponto de chamada (macro, micro, titulo, avaliacao) e `chave`
+    o aluno, usado pelo agendador global para alternar entre alunos. Cada chamada é
+    registrada no livro de consumo; levanta OrcamentoExcedidoError se o aluno ou a
+    turma (ver consumo_llm.contexto_consumo) já esgotou o orçamento do dia.
+    """
+    await consumo_llm.verificar_orcamento(cpf=chave)
+    tokens_estimados = estimar_tokens(prompt, max_tokens)
+    parametros = {"model": modelo, "messages": [{"role": "user", "content": prompt}], "temperature": temperature}
+    if max_tokens is not None:
+        parametros["max_tokens"] = max_tokens
+
+    for tentativa in range(LLM_MAX_TENTATIVAS):
+        teste, espera = circuito.verificar(), None
+        try:
+            await agendador.aguardar_vez(chave, tokens_estimados)
+            inicio = time.perf_counter()
+            try:
+                resposta = await get_llm_client().chat.completions.create(
+                    **parametros, timeout=timeout or LLM_TIMEOUT_SEGUNDOS
+                )
+            except Exception as e:
+                registrar_llm(tipo, time.perf_counter() - inicio, type(e).__name__)
+                agendador.ajustar(tokens_estimados, 0)
+                if not _pode_tentar_novamente(e):
+                    # A API respondeu (ex.: 400): o serviço está de pé
+                    circuito.registrar_sucesso()
+                    raise
+                espera = _espera_para(e, tentativa)
+                if isinstance(e, RateLimitError):
+                    # Limite de uso não é indisponibilidade: a API respondeu (fecha o circuito,
+                    # se esta era a chamada de teste) e só o agendador pausa
+                    circuito.registrar_sucesso()
+                    agendador.pausar(espera)
+                else:
+                    circuito.registrar_falha()
+                if tentativa + 1 >= LLM_MAX_TENTATIVAS:
+                    raise
+                print(f"[LLM] {tipo}: {type(e).__name__}; nova tentativa em {espera:.1f}s ({tentativa + 1}/{LLM_MAX_TENTATIVAS}).")
+        finally:
+            # Qualquer saída (inclusive 429 ou cancelamento) libera a vaga da chamada de teste;
+            # senão o circuito ficaria meio-aberto com o teste "em andamento" para sempre
+            if teste:
+                circuito.encerrar_teste()
+        if espera is not None:
+            await asyncio.sleep(espera)
+            continue
+
+        circuito.registrar_sucesso()
+        uso = getattr(resposta, "usage", None)
+        registrar_llm(tipo, time.perf_counter() - inicio, "ok", uso)
+        if uso is not None:
+            consumo_llm.registrar(tipo, modelo, uso, cpf=chave)
+        agendador.ajustar(tokens_estimados, getattr(uso, "total_tokens", None))
+        return (resposta.choices[0].message.content or "").strip()
@@ -1,7 +1,9 @@
 # fastapi_backend/main.py
 import os
-from typing import Set
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from contextlib import asynccontextmanager
+from typing import Optional
+from fastapi import FastAPI, Header, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 
@@ -9,7 +11,52 @@ from dotenv import load_dotenv
 load_dotenv()
 
 # Importa todos os roteadores
-from .routers import auth, usuarios, desafios, respostas, admin, conteudos, liberacoes
+from .routers import auth, usuarios, desafios, respostas, admin, conteudos, liberacoes, painel
+from .jobs import pool as jobs_pool, JOBS_WORKERS, contar_jobs_por_status
+from .avaliacoes import pool as avaliacoes_pool, AVALIACAO_WORKERS
+from .agendador_liberacoes import agendador_liberacoes, AGENDADOR_LIBERACOES_ATIVO
+from .conexoes import manager
+from .broker import criar_broker
+from .security import verify_token
+from .diretorio import diretorio
+from .indice_liberacoes import indice_liberacoes
+from .catalogo import catalogo
+from .painel import turma_do_aluno
+from .db import fechar_supabase_async
+from .consumo_llm import consumo_llm
+from .limite_taxa import LimiteTaxaMiddleware
+from .metricas import MetricasHTTPMiddleware, registro
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Broker do WebSocket: em memória, ou Redis (WS_BROKER_URL) com vários workers
+    await manager.iniciar(criar_broker())
+    # Alterações de cadastro (papel, turma, formulário) feitas em qualquer worker invalidam
+    # o diretório de usuários de todos
+    manager.registrar_controle("usuario", diretorio.aplicar)
+    # Liberações (agendador, /admin/liberar) feitas em qualquer worker descartam o índice do
+    # cronograma de todos antes do aviso "liberacao" pelo WebSocket
+    manager.registrar_controle("indice_liberacoes", indice_liberacoes.aplicar)
+    # Catálogo de conteúdos alterado (invalidação pelo admin): todos os workers o descartam
+    manager.registrar_controle("catalogo", catalogo.aplicar)
+    # Livro de consumo da OpenAI (gravado em lote)
+    await consumo_llm.iniciar()
+    # Workers de geração de desafios (JOBS_WORKERS=0 quando rodam em processo dedicado)
+    await jobs_pool.iniciar(JOBS_WORKERS)
+    # Workers de avaliação assíncrona de respostas (entregam o resultado via /ws)
+    await avaliacoes_pool.iniciar(AVALIACAO_WORKERS)
+    # Liberações agendadas disparadas no horário exato (um UPDATE em lote por agendamento)
+    if AGENDADOR_LIBERACOES_ATIVO:
+        await agendador_liberacoes.iniciar()
+    yield
+    await agendador_liberacoes.parar()
+    await avaliacoes_pool.parar()
+    await jobs_pool.parar()
+    await manager.parar()
+    await consumo_llm.parar()
+    await fechar_supabase_async()
+
 
 # Define a versão e documentação da API
 ENV = os.getenv("ENV", "development")
@@ -18,35 +65,27 @@ app = FastAPI(
     version="2.0.0-refactored",
     docs_url="/docs" if ENV == "development" else None,
     redoc_url="/redoc" if ENV == "development" else None,
+    lifespan=lifespan,
 )
 
 # Configuração de CORS (Cross-Origin Resource Sharing)
 allowed_origins = os.getenv("ALLOWED_ORIGINS", "http://localhost:5173,http://127.0.0.1:5173").split(",")
 
+# Limite de taxa no login e na avaliação por IA (adicionado antes do CORS para que as
+# respostas 429/503 também levem os cabeçalhos de CORS)
+app.add_middleware(LimiteTaxaMiddleware)
+# Latência por rota e status (/metrics); fica por fora do limite de taxa para contar os 429
+app.add_middleware(MetricasHTTPMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=allowed_origins,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Retry-After", "X-Next-Cursor", "Link"],
 )
 
-# --- Gerenciador de WebSocket ---
-class ConnectionManager:
-    # ... (o código dentro da classe ConnectionManager não muda) ...
-    def __init__(self):
-        self.active_connections: Set[WebSocket] = set()
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.add(websocket)
-    def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
-    async def broadcast(self, message: str):
-        for connection in self.active_connections:
-            await connection.send_text(message)
-
-manager = ConnectionManager()
-
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     # Lógica de verificação de origem aprimorada
@@ -56,15 +95,30 @@ async def websocket_endpoint(websocket: WebSocket):
         print(f"Conexão WebSocket rejeitada da origem: {origin}")
         return
 
-    await manager.connect(websocket)
+    # Token obrigatório (?token=<JWT>): a conexão é inscrita nos canais do CPF e da turma
+    token = websocket.query_params.get("token")
+    try:
+        cpf = verify_token(token or "", ValueError("token inválido"))
+    except ValueError:
+        await websocket.close(code=1008)
+        print("Conexão WebSocket rejeitada: token ausente ou inválido")
+        return
+    try:
+        turma = await turma_do_aluno(cpf)
+    except Exception as e:
+        print(f"[WS] Aviso: turma de {cpf} indisponível ({e}); conexão só no canal do CPF.")
+        turma = None
+
+    conexao = await manager.connect(websocket, cpf, turma)
     print("Conexão WebSocket aceita")
     try:
         while True:
             data = await websocket.receive_text()
             if data.strip().lower() == "ping":
-                await websocket.send_text("pong")
+                conexao.enfileirar("pong")
     except WebSocketDisconnect:
         print("Conexão WebSocket fechada")
+    finally:
         manager.disconnect(websocket)
 
 # --- Inclusão dos Roteadores ---
@@ -78,11 +132,43 @@ app.include_router(desafios.router, prefix=api_prefix)
 app.include_router(respostas.router, prefix=api_prefix)
 app.include_router(conteudos.router, prefix=api_prefix)
 app.include_router(liberacoes.router, prefix=api_prefix)
+app.include_router(painel.router, prefix=api_prefix)
 
 # Roteadores do Painel Administrativo
 app.include_router(admin.router, prefix=f"{api_prefix}/admin")
 
 
+# --- Métricas (formato Prometheus) ---
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+_jobs_por_status: dict = {}
+
+registro.medidor("pbl_ws_conexoes", "Conexões WebSocket abertas neste processo.",
+                 lambda: {(): len(manager.conexoes)})
+registro.medidor("pbl_ws_alunos", "Alunos com ao menos uma conexão WebSocket neste processo.",
+                 lambda: {(): len(manager.por_cpf)})
+registro.medidor("pbl_ws_mensagens_enfileiradas", "Mensagens aguardando envio nas filas do WebSocket.",
+                 lambda: {(): sum(c.fila.qsize() for c in manager.conexoes.values())})
+registro.medidor("pbl_avaliacoes_fila", "Avaliações na fila dos workers deste processo.",
+                 lambda: {(): avaliacoes_pool.tamanho_fila})
+registro.medidor("pbl_jobs_em_execucao", "Jobs de geração em execução neste processo.",
+                 lambda: {(): jobs_pool.em_execucao})
+registro.medidor("pbl_jobs_fila", "Jobs de geração no banco por status (todos os processos).",
+                 lambda: {(status,): n for status, n in _jobs_por_status.items()}, ("status",))
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics(authorization: Optional[str] = Header(None)):
+    """ Métricas deste processo no formato de texto do Prometheus. """
+    if METRICS_TOKEN and authorization != f"Bearer {METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Token de métricas inválido")
+    global _jobs_por_status
+    try:
+        _jobs_por_status = await contar_jobs_por_status()
+    except Exception as e:
+        print(f"[METRICAS] Aviso: não foi possível contar os jobs: {e}")
+    return PlainTextResponse(registro.exportar(), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/", tags=["Root"])
 def read_root():
     """ Endpoint principal para verificar se a API está online. """
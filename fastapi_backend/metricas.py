@@ -0,0 +1,232 @@
+# fastapi_backend/metricas.py
+"""
+Métricas no formato de texto do Prometheus, servidas em GET /metrics.
+
+- pbl_http_requisicao_segundos{metodo,rota,status}: latência das rotas (pelo template da
+  rota, ex. /api/respostas/{resposta_id}, para não explodir a cardinalidade);
+- pbl_supabase_consulta_segundos{tabela,operacao,status}: latência das chamadas ao PostgREST,
+  medida por event hooks nos clientes httpx do Supabase (síncrono e assíncrono);
+- pbl_llm_chamada_segundos{tipo,resultado} e pbl_llm_tokens_total{tipo,categoria}: latência
+  e tokens da OpenAI por ponto de chamada (macro, micro, titulo, avaliacao);
+- medidores de WebSocket e filas, lidos no momento da coleta.
+
+Os valores são por processo: com vários workers, o Prometheus agrega as séries de cada um
+(ou use um único worker por alvo de coleta).
+"""
+import bisect
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Tuple
+from urllib.parse import unquote
+
+BUCKETS_PADRAO = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+BUCKETS_LLM = (0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120)
+
+
+def _escapar(valor) -> str:
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _rotulos(nomes: Iterable[str], valores: Iterable, extra: str = "") -> str:
+    partes = [f'{n}="{_escapar(v)}"' for n, v in zip(nomes, valores)]
+    if extra:
+        partes.append(extra)
+    return "{" + ",".join(partes) + "}" if partes else ""
+
+
+def _numero(valor: float) -> str:
+    if valor == float("inf"):
+        return "+Inf"
+    return repr(float(valor)) if not float(valor).is_integer() else str(int(valor))
+
+
+class _Metrica:
+    tipo = ""
+
+    def __init__(self, nome: str, ajuda: str, rotulos: Tuple[str, ...] = ()):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = tuple(rotulos)
+        # Incrementos vêm do event loop e das threads do Supabase síncrono
+        self._lock = threading.Lock()
+
+    def _cabecalho(self) -> List[str]:
+        return [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} {self.tipo}"]
+
+
+class Contador(_Metrica):
+    tipo = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._valores: Dict[tuple, float] = {}
+
+    def inc(self, *rotulos, valor: float = 1):
+        with self._lock:
+            self._valores[rotulos] = self._valores.get(rotulos, 0) + valor
+
+    def valor(self, *rotulos) -> float:
+        return self._valores.get(rotulos, 0)
+
+    def exportar(self) -> List[str]:
+        with self._lock:
+            itens = sorted(self._valores.items())
+        return self._cabecalho() + [f"{self.nome}{_rotulos(self.rotulos, r)} {_numero(v)}" for r, v in itens]
+
+
+class Histograma(_Metrica):
+    tipo = "histogram"
+
+    def __init__(self, nome: str, ajuda: str, rotulos: Tuple[str, ...] = (), buckets: Tuple[float, ...] = BUCKETS_PADRAO):
+        super().__init__(nome, ajuda, rotulos)
+        self.buckets = tuple(sorted(buckets))
+        # rótulos -> [contagem por bucket (não cumulativa, último = +Inf), soma]
+        self._series: Dict[tuple, list] = {}
+
+    def observar(self, valor: float, *rotulos):
+        indice = bisect.bisect_left(self.buckets, valor)
+        with self._lock:
+            serie = self._series.get(rotulos)
+            if serie is None:
+                serie = self._series[rotulos] = [[0] * (len(self.buckets) + 1), 0.0]
+            serie[0][indice] += 1
+            serie[1] += valor
+
+    def contagem(self, *rotulos) -> int:
+        serie = self._series.get(rotulos)
+        return sum(serie[0]) if serie else 0
+
+    def exportar(self) -> List[str]:
+        with self._lock:
+            series = sorted((r, (list(c), s)) for r, (c, s) in self._series.items())
+        linhas = self._cabecalho()
+        for rotulos, (contagens, soma) in series:
+            acumulado = 0
+            for limite, contagem in zip(self.buckets + (float("inf"),), contagens):
+                acumulado += contagem
+                le = f'le="{_numero(limite)}"'
+                linhas.append(f"{self.nome}_bucket{_rotulos(self.rotulos, rotulos, le)} {acumulado}")
+            linhas.append(f"{self.nome}_sum{_rotulos(self.rotulos, rotulos)} {_numero(soma)}")
+            linhas.append(f"{self.nome}_count{_rotulos(self.rotulos, rotulos)} {acumulado}")
+        return linhas
+
+
+class Medidor(_Metrica):
+    """Gauge lido no momento da coleta: `ler` retorna {tupla de rótulos: valor}."""
+    tipo = "gauge"
+
+    def __init__(self, nome: str, ajuda: str, rotulos: Tuple[str, ...], ler: Callable[[], Dict[tuple, float]]):
+        super().__init__(nome, ajuda, rotulos)
+        self.ler = ler
+
+    def exportar(self) -> List[str]:
+        try:
+            valores = self.ler()
+        except Exception:
+            valores = {}
+        return self._cabecalho() + [f"{self.nome}{_rotulos(self.rotulos, r)} {_numero(v)}" for r, v in sorted(valores.items())]
+
+
+class Registro:
+    def __init__(self):
+        self._metricas: Dict[str, _Metrica] = {}
+
+    def registrar(self, metrica: _Metrica) -> _Metrica:
+        self._metricas[metrica.nome] = metrica
+        return metrica
+
+    def medidor(self, nome: str, ajuda: str, ler: Callable[[], Dict[tuple, float]], rotulos: Tuple[str, ...] = ()):
+        return self.registrar(Medidor(nome, ajuda, rotulos, ler))
+
+    def exportar(self) -> str:
+        linhas: List[str] = []
+        for metrica in self._metricas.values():
+            linhas.extend(metrica.exportar())
+        return "\n".join(linhas) + "\n"
+
+
+registro = Registro()
+
+http_latencia = registro.registrar(Histograma(
+    "pbl_http_requisicao_segundos", "Latência das requisições HTTP por rota e status.", ("metodo", "rota", "status")))
+supabase_latencia = registro.registrar(Histograma(
+    "pbl_supabase_consulta_segundos", "Latência das chamadas ao PostgREST por tabela e operação.", ("tabela", "operacao", "status")))
+llm_latencia = registro.registrar(Histograma(
+    "pbl_llm_chamada_segundos", "Latência das chamadas à OpenAI por ponto de chamada.", ("tipo", "resultado"), BUCKETS_LLM))
+llm_tokens = registro.registrar(Contador(
+    "pbl_llm_tokens_total", "Tokens consumidos na OpenAI por ponto de chamada.", ("tipo", "categoria")))
+
+ROTA_NAO_MAPEADA = "<nao_mapeada>"
+# Operação do PostgREST pelo método HTTP (POST com "Prefer: resolution=..." = upsert)
+_OPERACOES = {"GET": "select", "HEAD": "count", "POST": "insert", "PATCH": "update", "DELETE": "delete"}
+
+
+class MetricasHTTPMiddleware:
+    """Middleware ASGI que mede cada requisição HTTP (o template da rota só existe após o roteamento)."""
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        inicio = time.perf_counter()
+        status = 500
+
+        async def send_com_status(mensagem):
+            nonlocal status
+            if mensagem["type"] == "http.response.start":
+                status = mensagem["status"]
+            await send(mensagem)
+
+        try:
+            await self.app(scope, receive, send_com_status)
+        finally:
+            rota = getattr(scope.get("route"), "path", None) or ROTA_NAO_MAPEADA
+            http_latencia.observar(time.perf_counter() - inicio, scope["method"], rota, str(status))
+
+
+def _tabela_e_operacao(request) -> Tuple[str, str]:
+    partes = request.url.path.split("/rest/v1/", 1)
+    if len(partes) < 2:
+        return "-", request.method.lower()
+    alvo = unquote(partes[1]).strip("/")
+    if alvo.startswith("rpc/"):
+        return alvo[4:], "rpc"
+    operacao = _OPERACOES.get(request.method, request.method.lower())
+    if operacao == "insert" and "resolution=" in request.headers.get("prefer", ""):
+        operacao = "upsert"
+    return alvo, operacao
+
+
+def _registrar_supabase(response):
+    request = response.request
+    inicio = request.extensions.get("pbl_inicio")
+    if inicio is None:
+        return
+    tabela, operacao = _tabela_e_operacao(request)
+    supabase_latencia.observar(time.perf_counter() - inicio, tabela, operacao, str(response.status_code))
+
+
+def _marcar_inicio(request):
+    request.extensions["pbl_inicio"] = time.perf_counter()
+
+
+async def _marcar_inicio_async(request):
+    _marcar_inicio(request)
+
+
+async def _registrar_supabase_async(response):
+    _registrar_supabase(response)
+
+
+# event_hooks para os clientes httpx do Supabase (mede até a chegada dos cabeçalhos)
+HOOKS_SUPABASE = {"request": [_marcar_inicio], "response": [_registrar_supabase]}
+HOOKS_SUPABASE_ASYNC = {"request": [_marcar_inicio_async], "response": [_registrar_supabase_async]}
+
+
+def registrar_llm(tipo: str, segundos: float, resultado: str, uso=None):
+    llm_latencia.observar(segundos, tipo, resultado)
+    if uso is not None:
+        llm_tokens.inc(tipo, "prompt", valor=getattr(uso, "prompt_tokens", 0) or 0)
+        llm_tokens.inc(tipo, "completion", valor=getattr(uso, "completion_tokens", 0) or 0)
+
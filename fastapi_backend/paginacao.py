@@ -0,0 +1,86 @@
+# fastapi_backend/paginacao.py
+"""
+Paginação por keyset (cursor) e projeção de colunas para as rotas de listagem.
+
+A ordem é sempre (coluna de data desc, id desc). O cursor é opaco para o cliente: o par
+(data, id) da última linha devolvida, em base64. A página seguinte pede só as linhas
+estritamente "antes" dele, então o custo da consulta não cresce com o número de páginas
+(sem OFFSET) e nenhuma linha é pulada ou repetida quando entram linhas novas no topo.
+
+O próximo cursor vai no cabeçalho X-Next-Cursor (e em Link rel="next"); o corpo continua
+sendo a lista de linhas. Sem o cabeçalho, não há mais páginas.
+"""
+import base64
+import json
+import os
+from typing import Iterable, List, Optional, Tuple
+from fastapi import HTTPException, Request
+
+LIMITE_PADRAO = int(os.getenv("PAGINACAO_LIMITE_PADRAO", "100"))
+LIMITE_MAXIMO = int(os.getenv("PAGINACAO_LIMITE_MAXIMO", "500"))
+CABECALHO_CURSOR = "X-Next-Cursor"
+
+
+def projecao(fields: Optional[str], permitidos: Iterable[str], padrao: Iterable[str]) -> List[str]:
+    """Colunas pedidas em `fields` (separadas por vírgula) que estão na lista permitida."""
+    permitidos = set(permitidos)
+    cols = [f.strip() for f in (fields or "").split(",") if f.strip() in permitidos]
+    return list(dict.fromkeys(cols)) or list(padrao)
+
+
+def codificar_cursor(valor, id_) -> str:
+    bruto = json.dumps([valor, id_], separators=(",", ":"), default=str).encode("utf-8")
+    return base64.urlsafe_b64encode(bruto).decode("ascii").rstrip("=")
+
+
+def decodificar_cursor(cursor: str) -> Tuple[Optional[str], str]:
+    try:
+        bruto = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        valor, id_ = json.loads(bruto)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Cursor inválido.")
+    if id_ is None:
+        raise HTTPException(status_code=400, detail="Cursor inválido.")
+    return (None if valor is None else str(valor)), str(id_)
+
+
+def _literal(valor: str) -> str:
+    """Valor entre aspas para os filtros lógicos do PostgREST (datas têm ':' '.' e '+')."""
+    return '"' + valor.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def colunas_consulta(colunas: List[str], ordem: str) -> str:
+    """Select com as colunas pedidas mais as do cursor (removidas da resposta depois)."""
+    return ", ".join(dict.fromkeys([*colunas, ordem, "id"]))
+
+
+def paginar(query, ordem: str, cursor: Optional[str], limite: int):
+    """Aplica ordem (ordem desc, id desc), o filtro do cursor e limite+1 a um select."""
+    # Linhas antigas sem data ficam no fim (e continuam alcançáveis pelo id)
+    query = query.order(ordem, desc=True, nullsfirst=False).order("id", desc=True)
+    if cursor:
+        valor, id_ = decodificar_cursor(cursor)
+        if valor is None:
+            query = query.or_(f"and({ordem}.is.null,id.lt.{_literal(id_)})")
+        else:
+            query = query.or_(f"{ordem}.lt.{_literal(valor)},and({ordem}.eq.{_literal(valor)},id.lt.{_literal(id_)}),"
+                              f"{ordem}.is.null")
+    # Uma linha a mais só para saber se existe próxima página
+    return query.limit(limite + 1)
+
+
+def fatiar(linhas: List[dict], colunas: List[str], ordem: str, limite: int) -> Tuple[List[dict], Optional[str]]:
+    """Corta a linha extra, projeta as colunas pedidas e devolve (página, próximo cursor)."""
+    proximo = None
+    if len(linhas) > limite:
+        linhas = linhas[:limite]
+        ultima = linhas[-1]
+        proximo = codificar_cursor(ultima.get(ordem), ultima.get("id"))
+    return [{c: linha.get(c) for c in colunas} for linha in linhas], proximo
+
+
+def cabecalhos_pagina(request: Request, proximo: Optional[str]) -> dict:
+    if not proximo:
+        return {}
+    url = request.url.include_query_params(cursor=proximo)
+    return {CABECALHO_CURSOR: proximo, "Link": f'<{url}>; rel="next"'}
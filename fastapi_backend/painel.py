@@ -0,0 +1,72 @@
+# fastapi_backend/painel.py
+"""
+Painel do aluno: desafios agrupados por módulo, com metadados da aula e status de
+liberação já calculados no servidor.
+
+Substitui as três chamadas que a página de desafios fazia (/api/liberacoes,
+/api/desafios, /api/conteudos) e o join no navegador. As consultas são independentes
+e rodam em paralelo; o catálogo de conteúdos vem da memória.
+"""
+import asyncio
+from typing import Optional
+from .catalogo import catalogo
+from .db import get_supabase_async
+from .diretorio import diretorio
+from .liberador import conteudos_liberados_da_turma
+
+MODULO_DESCONHECIDO = "Desconhecido"
+
+
+async def _buscar_desafios(cpf: str, incluir_texto: bool) -> list:
+    supabase = await get_supabase_async()
+    colunas = "id, tipo, conteudo_id" + (", texto_desafio" if incluir_texto else "")
+    r = await supabase.table("PBL - desafios").select(colunas).eq("cpf", cpf).execute()
+    return r.data or []
+
+
+async def turma_do_aluno(cpf: str) -> Optional[str]:
+    return await diretorio.turma_async(cpf)
+
+
+async def _liberados(cpf: str, turma: Optional[str]) -> set:
+    turma = turma or await turma_do_aluno(cpf)
+    return await conteudos_liberados_da_turma(turma) if turma else set()
+
+
+def agrupar_por_modulo(desafios: list, conteudos: dict, liberados: set) -> list:
+    """Monta a lista de módulos ({nome, macro, micros}) ordenada por módulo e aula."""
+    modulos = {}
+    for d in desafios:
+        conteudo = conteudos.get(d.get("conteudo_id")) or {}
+        desafio = {
+            **d,
+            "modulo": conteudo.get("modulo") or MODULO_DESCONHECIDO,
+            "aula": conteudo.get("aula") or "",
+            # A liberação depende da tabela de agendamentos da turma
+            "desafio_liberado": d.get("conteudo_id") in liberados,
+        }
+        modulo = modulos.setdefault(desafio["modulo"], {"nome": desafio["modulo"], "macro": None, "micros": []})
+        if desafio.get("tipo") == "macro":
+            modulo["macro"] = desafio
+        else:
+            modulo["micros"].append(desafio)
+
+    ordenados = sorted(modulos.values(), key=lambda m: m["nome"])
+    for m in ordenados:
+        m["micros"].sort(key=lambda d: d["aula"])
+    return ordenados
+
+
+async def montar_painel(cpf: str, turma: Optional[str] = None, incluir_texto: bool = True) -> dict:
+    desafios, conteudos, liberados = await asyncio.gather(
+        _buscar_desafios(cpf, incluir_texto),
+        catalogo.ativos_async(),
+        _liberados(cpf, turma),
+    )
+    por_id = {c["id"]: c for c in conteudos}
+    modulos = agrupar_por_modulo(desafios, por_id, liberados)
+    return {
+        "modulos": modulos,
+        "total_desafios": len(desafios),
+        "total_liberados": sum(1 for d in desafios if d.get("conteudo_id") in liberados),
+    }
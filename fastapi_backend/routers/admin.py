@@ -1,10 +1,25 @@
 # fastapi_backend/routers/admin.py
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List
+import asyncio
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
 from pydantic import BaseModel
-from datetime import datetime
-from ..db import get_supabase_client
+from datetime import datetime, timedelta, timezone
+from ..db import get_supabase_client, executar_em_thread
 from ..liberador import forcar_liberacao_imediata
+from ..jobs import enfileirar_geracao_em_lote, resumir_progresso
+from ..agendador_llm import agendador
+from ..cache_avaliacao import cache_avaliacoes
+from ..catalogo import catalogo
+from ..diretorio import diretorio
+from ..indice_liberacoes import indice_liberacoes
+from ..agendador_liberacoes import agendador_liberacoes, mensagem_liberacao
+from ..conexoes import manager
+from .. import limite_taxa
+from ..consumo_llm import consumo_llm, resumo_consumo
+from .. import analytics
+from ..exportacao import COLUNAS_EXPORTACAO, linhas_respostas, para_csv, para_ndjson
+from ..paginacao import LIMITE_MAXIMO, LIMITE_PADRAO, cabecalhos_pagina, colunas_consulta, fatiar, paginar, projecao
 from ..security import get_current_admin_user # Importa a dependência de segurança
 
 router = APIRouter(tags=["admin"], dependencies=[Depends(get_current_admin_user)]) # Protege todas as rotas deste router
@@ -16,6 +31,9 @@ class LiberarReq(BaseModel):
     turmas: List[str]
     data_iso: str
 
+class PapelReq(BaseModel):
+    role: Optional[str] = None
+
 def _parse_iso_to_date_time(iso_s: str):
     try:
         dt = datetime.fromisoformat(iso_s.strip().replace("Z", "+00:00"))
@@ -26,26 +44,99 @@ def _parse_iso_to_date_time(iso_s: str):
         raise HTTPException(status_code=400, detail="Formato de data_iso inválido")
 
 @router.get("/conteudos")
-def admin_get_conteudos():
-    supabase = get_supabase_client()
-    r = supabase.table("PBL - conteudo").select("id, modulo, aula, ativo").eq("ativo", True).order("modulo").order("aula").execute()
-    return r.data or []
+async def admin_get_conteudos():
+    return await catalogo.conteudos_async(["id", "modulo", "aula", "ativo"])
 
 @router.get("/turmas")
 def admin_get_turmas():
-    supabase = get_supabase_client()
     try:
-        r2 = supabase.table('PBL - usuarios').select('turma').execute()
-        turmas = sorted({row['turma'] for row in (r2.data or []) if row.get('turma')})
-        return turmas
+        return diretorio.turmas()
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+CAMPOS_HISTORICO = ["id", "conteudo_id", "modulo", "aula", "turmas", "data_liberacao", "hora_liberacao", "liberado", "created_at"]
+
 @router.get("/liberacoes-historico")
-def admin_get_historico():
+def admin_get_historico(
+    request: Request,
+    response: Response,
+    fields: Optional[str] = Query(None, description="Campos separados por vírgula"),
+    cursor: Optional[str] = Query(None, description="Valor de X-Next-Cursor da página anterior"),
+    limit: int = Query(LIMITE_PADRAO, ge=1, le=LIMITE_MAXIMO),
+):
+    """ Agendamentos do mais recente para o mais antigo, paginados por cursor. """
+    cols = projecao(fields, CAMPOS_HISTORICO, CAMPOS_HISTORICO)
     supabase = get_supabase_client()
-    r = supabase.table('PBL - liberacoes_agendadas').select('*').order('created_at', desc=True).limit(100).execute()
-    return r.data or []
+    query = supabase.table('PBL - liberacoes_agendadas').select(colunas_consulta(cols, "created_at"))
+    r = paginar(query, "created_at", cursor, limit).execute()
+    pagina, proximo = fatiar(r.data or [], cols, "created_at", limit)
+    response.headers.update(cabecalhos_pagina(request, proximo))
+    return pagina
+
+@router.get("/analytics/turmas")
+async def admin_analytics_turmas():
+    """ Média das notas, distribuição de tentativas e pendências de todas as turmas (agregados). """
+    try:
+        return await analytics.resumo_turmas()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao consultar indicadores: {e}")
+
+@router.get("/analytics/turmas/{turma}")
+async def admin_analytics_turma(turma: str):
+    """ Indicadores de uma turma, com média e taxa de conclusão por módulo. """
+    try:
+        resumo = await analytics.resumo_turma(turma)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao consultar indicadores: {e}")
+    if resumo is None:
+        raise HTTPException(status_code=404, detail="Turma sem dados.")
+    return resumo
+
+@router.post("/analytics/recalcular")
+async def admin_analytics_recalcular():
+    """ Reconstrói os agregados a partir das respostas, usuários e liberações (correção de divergência). """
+    try:
+        await analytics.recalcular()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao recalcular indicadores: {e}")
+    return {"status": "recalculado"}
+
+@router.get("/respostas/exportar")
+async def admin_exportar_respostas(
+    turma: Optional[str] = None,
+    modulo: Optional[str] = Query(None, description="Nome do módulo (ex.: 'Módulo 01')"),
+    desde: Optional[datetime] = Query(None, description="data_envio >= desde (ISO 8601)"),
+    ate: Optional[datetime] = Query(None, description="data_envio < ate (ISO 8601)"),
+    formato: str = Query("csv", pattern="^(csv|ndjson)$"),
+    incluir_resposta: bool = Query(False, description="Inclui o texto enviado pelo aluno"),
+):
+    """ Notas e feedbacks das respostas (com aluno, módulo e desafio) em CSV ou NDJSON, em streaming. """
+    linhas = linhas_respostas(turma, modulo, desde, ate, incluir_resposta)
+    if formato == "csv":
+        corpo = para_csv(linhas, COLUNAS_EXPORTACAO + (["texto_resposta"] if incluir_resposta else []))
+    else:
+        corpo = para_ndjson(linhas)
+    # O primeiro bloco é lido antes de responder: falha no banco ainda vira 500, não um arquivo truncado
+    try:
+        primeiro = await corpo.__anext__()
+    except StopAsyncIteration:
+        primeiro = b""
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao exportar respostas: {e}")
+
+    async def transmitir():
+        yield primeiro
+        try:
+            async for bloco in corpo:
+                yield bloco
+        except Exception as e:
+            print(f"[EXPORTACAO] Erro no meio da exportação (arquivo truncado): {e}")
+            raise
+
+    nome = f"respostas_{turma or 'todas'}_{datetime.now().strftime('%Y%m%d')}.{formato}"
+    tipo = "text/csv; charset=utf-8" if formato == "csv" else "application/x-ndjson"
+    return StreamingResponse(transmitir(), media_type=tipo,
+                             headers={"Content-Disposition": f'attachment; filename="{nome}"'})
 
 @router.get("/usuarios/total")
 def admin_get_total_usuarios():
@@ -56,8 +147,132 @@ def admin_get_total_usuarios():
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def _cpfs_da_turma(turma: str, apenas_formulario_finalizado: bool = False) -> List[str]:
+    return diretorio.cpfs_da_turma(turma, apenas_formulario_finalizado)
+
+@router.post("/turmas/{turma}/gerar-desafios")
+def admin_gerar_desafios_turma(turma: str, apenas_formulario_finalizado: bool = True):
+    """ Enfileira a geração de desafios para todos os alunos da turma. """
+    try:
+        cpfs = _cpfs_da_turma(turma, apenas_formulario_finalizado)
+        if not cpfs:
+            raise HTTPException(status_code=404, detail="Nenhum aluno encontrado para a turma.")
+        resultado = enfileirar_geracao_em_lote(cpfs)
+        return {"turma": turma, **resultado, "progresso": resumir_progresso(cpfs), "agendador": agendador.estatisticas()}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/turmas/{turma}/geracao")
+def admin_progresso_geracao_turma(turma: str):
+    """ Progresso da geração da turma: status dos jobs, vazão (itens/min) e ETA. """
+    try:
+        cpfs = _cpfs_da_turma(turma)
+        return {"turma": turma, "progresso": resumir_progresso(cpfs), "agendador": agendador.estatisticas()}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/cache/avaliacoes")
+def admin_estatisticas_cache_avaliacoes():
+    """ Estatísticas do cache de avaliações da IA (acertos, faltas, coalescidas...). """
+    return cache_avaliacoes.estatisticas()
+
+@router.get("/cache/conteudos")
+def admin_estatisticas_catalogo():
+    """ Estatísticas do catálogo de conteúdos em memória. """
+    return catalogo.estatisticas()
+
+@router.post("/cache/conteudos/invalidar")
+async def admin_invalidar_catalogo():
+    """ Descarta o catálogo em memória em todos os processos; chame após alterar "PBL - conteudo". """
+    await manager.publicar_controle("catalogo", {})
+    return catalogo.estatisticas()
+
+@router.get("/cache/usuarios")
+def admin_estatisticas_diretorio():
+    """ Estatísticas do diretório de usuários em memória (cpf → turma/papel/perfil). """
+    return diretorio.estatisticas()
+
+@router.post("/cache/usuarios/invalidar")
+async def admin_invalidar_diretorio():
+    """ Descarta o diretório em todos os processos; chame após alterar "PBL - usuarios" fora da API. """
+    await manager.publicar_controle("usuario", {})
+    return diretorio.estatisticas()
+
+@router.get("/cache/liberacoes")
+def admin_estatisticas_indice_liberacoes():
+    """ Estatísticas do índice em memória do cronograma de liberações. """
+    return indice_liberacoes.estatisticas()
+
+@router.post("/cache/liberacoes/invalidar")
+async def admin_invalidar_indice_liberacoes():
+    """ Força a reconstrução do índice em todos os processos; chame após alterar "PBL - liberacoes_agendadas" por fora da API. """
+    await manager.publicar_controle("indice_liberacoes", {})
+    return indice_liberacoes.estatisticas()
+
+@router.get("/liberacoes/agendador")
+async def admin_estado_agendador_liberacoes():
+    """ Agendamentos pendentes, próxima liberação e contadores do agendador. """
+    return agendador_liberacoes.estatisticas()
+
+@router.post("/liberacoes/agendador/recarregar")
+async def admin_recarregar_agendador_liberacoes():
+    """ Recarrega os agendamentos pendentes (ex.: após criar agendamentos pelo pbl_admin). """
+    await agendador_liberacoes.recarregar_pendentes()
+    return agendador_liberacoes.estatisticas()
+
+@router.get("/ws")
+async def admin_estatisticas_websocket():
+    """ Conexões WebSocket abertas, canais e clientes descartados por lentidão. """
+    return manager.estatisticas()
+
+@router.get("/limites")
+def admin_estatisticas_limites():
+    """ Regras de limite de taxa em vigor e requisições rejeitadas (429/503) neste processo. """
+    return limite_taxa.estatisticas()
+
+def _desde(dias: int) -> datetime:
+    return (datetime.now(timezone.utc) - timedelta(days=dias)).replace(hour=0, minute=0, second=0, microsecond=0)
+
+@router.get("/consumo")
+async def admin_consumo_llm(
+    dias: int = Query(30, ge=0, le=366, description="Período: hoje e os N dias anteriores"),
+    agrupar: str = Query("turma", pattern="^(turma|cpf|tipo)$"),
+):
+    """ Tokens e custo estimado da OpenAI por turma, aluno ou tipo de chamada. """
+    try:
+        grupos = await resumo_consumo(_desde(dias), agrupar)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return {"desde": _desde(dias).isoformat(), "agrupar": agrupar, "grupos": grupos, "registro": consumo_llm.estatisticas()}
+
+@router.get("/consumo/turmas/{turma}")
+async def admin_consumo_llm_turma(turma: str, dias: int = Query(30, ge=0, le=366)):
+    """ Consumo de uma turma, aluno por aluno. """
+    try:
+        alunos = await resumo_consumo(_desde(dias), "cpf", turma)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return {"turma": turma, "desde": _desde(dias).isoformat(), "alunos": alunos}
+
+@router.put("/usuarios/{cpf}/role")
+async def admin_alterar_papel(cpf: str, req: PapelReq):
+    """ Altera (ou revoga, com role=null) o papel do usuário, valendo já para os tokens emitidos. """
+    supabase = get_supabase_client()
+    try:
+        r = await executar_em_thread(supabase.table("PBL - usuarios").update({"role": req.role}).eq("cpf", cpf))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if not r.data:
+        raise HTTPException(status_code=404, detail="Usuário não encontrado.")
+    # O admin checa o papel no diretório: vale já aqui e, pelo broker, nos outros processos
+    diretorio.invalidar(cpf)
+    await manager.publicar_controle("usuario", {"cpf": cpf})
+    return {"cpf": cpf, "role": req.role}
+
 @router.post("/liberar")
-def admin_liberar_conteudo(req: LiberarReq):
+async def admin_liberar_conteudo(req: LiberarReq):
     supabase = get_supabase_client()
     data_liberacao, hora_liberacao = _parse_iso_to_date_time(req.data_iso)
     
@@ -69,7 +284,8 @@ def admin_liberar_conteudo(req: LiberarReq):
     }
 
     # Insere o registro de agendamento já como liberado
-    ins_res = supabase.table('PBL - liberacoes_agendadas').insert(payload).execute()
+    ins_res = await executar_em_thread(supabase.table('PBL - liberacoes_agendadas').insert(payload))
+    indice_liberacoes.invalidar()
     
     if not (ins_res and ins_res.data):
         raise HTTPException(status_code=500, detail="Falha ao criar o registro de agendamento.")
@@ -78,9 +294,17 @@ def admin_liberar_conteudo(req: LiberarReq):
     
     # Chama a função para forçar a liberação dos desafios associados
     try:
-        forcar_liberacao_imediata(novo_agendamento)
+        await asyncio.to_thread(forcar_liberacao_imediata, novo_agendamento)
     except Exception as e:
         # Retorna um erro informando sobre a falha na liberação imediata.
         raise HTTPException(status_code=500, detail=f"Agendamento criado, mas falha na liberação imediata: {e}")
 
+    # Avisa as turmas pelo WebSocket, como nas liberações agendadas (o índice dos outros
+    # processos é descartado antes, pelo mesmo broker)
+    try:
+        await manager.publicar_controle("indice_liberacoes", {})
+        await manager.enviar_para_turmas(req.turmas, mensagem_liberacao(novo_agendamento))
+    except Exception as e:
+        print(f"[LIBERACOES] Aviso: falha ao avisar as conexões WebSocket: {e}")
+
     return novo_agendamento
\ No newline at end of file
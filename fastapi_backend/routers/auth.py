@@ -2,7 +2,7 @@
 from fastapi import APIRouter, HTTPException, Depends
 from fastapi.security import OAuth2PasswordRequestForm
 from pydantic import BaseModel
-from ..db import get_supabase_client
+from ..diretorio import diretorio
 from ..security import create_access_token
 from datetime import timedelta
 
@@ -16,21 +16,21 @@ class CpfLogin(BaseModel):
     cpf: str
 
 @router.post("/token", response_model=Token)
-def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
     """
     Endpoint de login que recebe CPF no campo 'username' e retorna um token JWT.
     """
     cpf = form_data.username
-    supabase = get_supabase_client()
-
-    user_query = supabase.table("PBL - usuarios").select("cpf, nome, role").eq("cpf", cpf).limit(1).execute()
+    # Diretório em memória: o login não consulta "PBL - usuarios" (só um CPF desconhecido é buscado)
+    usuario = await diretorio.usuario_async(cpf)
     
-    if not user_query.data:
+    if not usuario:
         raise HTTPException(status_code=401, detail="CPF não encontrado ou inválido.")
     
     access_token_expires = timedelta(minutes=60 * 8) # 8 horas
+    # Claim informativo (para o frontend); a autorização de admin usa o diretório, não o token
     access_token = create_access_token(
-        data={"sub": cpf}, expires_delta=access_token_expires
+        data={"sub": cpf, "role": usuario.get("role")}, expires_delta=access_token_expires
     )
     
     return {"access_token": access_token, "token_type": "bearer"}
\ No newline at end of file
@@ -1,40 +1,74 @@
 # fastapi_backend/routers/desafios.py
-from fastapi import APIRouter, BackgroundTasks, HTTPException, Depends
-from ..gerar_desafios import gerar_todos_os_desafios
-from ..db import get_supabase_client
+import asyncio
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from ..db import get_supabase_async
+from ..etag import resposta_condicional
+from ..paginacao import LIMITE_MAXIMO, LIMITE_PADRAO, cabecalhos_pagina, colunas_consulta, fatiar, paginar, projecao
+from ..jobs import enfileirar_geracao, obter_job_async
 from ..security import get_current_user_cpf # Importar a segurança
 
 router = APIRouter(prefix="/desafios", tags=["desafios"])
 
+CAMPOS_DESAFIO = {"id", "tipo", "conteudo_id", "titulo", "texto_desafio", "desafio_liberado", "status_gerado", "data_criacao"}
+CAMPOS_DESAFIO_PADRAO = ["id", "tipo", "conteudo_id", "titulo", "desafio_liberado", "status_gerado", "data_criacao"]
+
 @router.get("")
 # AQUI ESTÁ A MUDANÇA: Usamos Depends(get_current_user_cpf)
-def listar_desafios_por_cpf(cpf: str = Depends(get_current_user_cpf)):
-    """ Lista todos os desafios gerados para o usuário logado. """
-    supabase = get_supabase_client()
+async def listar_desafios_por_cpf(
+    request: Request,
+    cpf: str = Depends(get_current_user_cpf),
+    fields: Optional[str] = Query(None, description="Campos separados por vírgula (texto_desafio só se pedido)"),
+    cursor: Optional[str] = Query(None, description="Valor de X-Next-Cursor da página anterior"),
+    limit: int = Query(LIMITE_PADRAO, ge=1, le=LIMITE_MAXIMO),
+):
+    """ Lista os desafios gerados para o usuário logado, do mais recente para o mais antigo. """
+    cols = projecao(fields, CAMPOS_DESAFIO, CAMPOS_DESAFIO_PADRAO)
+    supabase = await get_supabase_async()
     try:
-        resp = supabase.table("PBL - desafios").select("*").eq("cpf", cpf).execute()
-        return resp.data or []
+        query = supabase.table("PBL - desafios").select(colunas_consulta(cols, "data_criacao")).eq("cpf", cpf)
+        resp = await paginar(query, "data_criacao", cursor, limit).execute()
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao listar desafios: {e}")
+    pagina, proximo = fatiar(resp.data or [], cols, "data_criacao", limit)
+    return resposta_condicional(request, pagina, cabecalhos=cabecalhos_pagina(request, proximo))
 
 @router.post("/gerar/{cpf}")
-def gerar_desafios_endpoint(cpf: str, background_tasks: BackgroundTasks):
-    background_tasks.add_task(gerar_todos_os_desafios, cpf)
-    return {"status": "agendado", "mensagem": "Processo de geração de desafios iniciado."}
+def gerar_desafios_endpoint(cpf: str):
+    """ Enfileira a geração de desafios do CPF (um único job em andamento por CPF). """
+    try:
+        job, novo = enfileirar_geracao(cpf)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao agendar geração: {e}")
+    if not novo:
+        return {"status": "em_andamento", "mensagem": "A geração de desafios já está em andamento.", "job_id": job.get("id")}
+    return {"status": "agendado", "mensagem": "Processo de geração de desafios iniciado.", "job_id": job.get("id")}
 
 @router.get("/status/{cpf}")
-def status_desafios(cpf: str):
-    supabase = get_supabase_client()
+async def status_desafios(cpf: str):
+    supabase = await get_supabase_async()
     try:
-        resp = (
+        # As duas consultas são independentes: rodam em paralelo
+        resp, job = await asyncio.gather(
             supabase.table("PBL - desafios")
             .select("id", count="exact")
             .eq("cpf", cpf)
             .eq("desafio_liberado", True)
             .limit(1)
-            .execute()
+            .execute(),
+            obter_job_async(cpf),
         )
         liberado = resp.count > 0 if resp.count is not None else False
-        return {"liberado": liberado}
+        job = job or {}
+        return {
+            "liberado": liberado,
+            "status": job.get("status"),
+            "feitos": job.get("itens_feitos") or 0,
+            "total": job.get("itens_total") or 0,
+            "tentativas": job.get("tentativas") or 0,
+            "erro": job.get("ultimo_erro"),
+        }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao consultar desafios: {e}")
\ No newline at end of file
@@ -0,0 +1,22 @@
+# fastapi_backend/routers/painel.py
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from typing import Optional
+from ..etag import resposta_condicional
+from ..painel import montar_painel
+from ..security import get_current_user_cpf
+
+router = APIRouter(prefix="/painel", tags=["painel"])
+
+@router.get("")
+async def get_painel(
+    request: Request,
+    cpf: str = Depends(get_current_user_cpf),
+    turma: Optional[str] = Query(None, description="Turma do aluno (se omitida, é buscada no cadastro)"),
+    incluir_texto: bool = Query(True, description="Incluir o texto dos desafios"),
+):
+    """ Desafios do usuário logado agrupados por módulo, com aula e liberação já calculadas. """
+    try:
+        painel = await montar_painel(cpf, turma, incluir_texto)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao montar o painel: {e}")
+    return resposta_condicional(request, painel)
@@ -1,9 +1,16 @@
 # fastapi_backend/routers/respostas.py
-from fastapi import APIRouter, HTTPException, Depends # Adicione Depends
+import asyncio
+from fastapi import APIRouter, HTTPException, Depends, Query, Request # Adicione Depends
+from fastapi.responses import JSONResponse
 from typing import Optional # Adicione Optional
 from pydantic import BaseModel
 from ..avaliador import avaliar_resposta_com_ia
-from ..db import get_supabase_client
+from ..avaliacoes import registrar_resposta_pendente, mensagem_avaliacao, STATUS_AVALIADA
+from ..db import get_supabase_async
+from ..etag import resposta_condicional
+from ..consumo_llm import consumo_llm, OrcamentoExcedidoError
+from ..paginacao import LIMITE_MAXIMO, LIMITE_PADRAO, cabecalhos_pagina, colunas_consulta, fatiar, paginar, projecao
+from ..painel import turma_do_aluno
 from ..security import get_current_user_cpf # Importe a função de segurança
 from uuid import uuid4
 from datetime import datetime
@@ -16,33 +23,79 @@ class AvaliacaoRequest(BaseModel):
     resposta: str
     tentativa: int
 
+CAMPOS_RESPOSTA = {"id", "desafio_id", "conteudo_id", "tentativa", "texto_resposta", "nota", "feedback",
+                   "resposta_ideal", "data_envio", "tentativa_finalizada", "status_avaliacao"}
+CAMPOS_RESPOSTA_PADRAO = ["id", "desafio_id", "conteudo_id", "tentativa", "nota", "data_envio",
+                          "tentativa_finalizada", "status_avaliacao"]
+
 # ROTA NOVA - ADICIONE ESTE BLOCO
 @router.get("/resumo")
-def get_respostas_resumo(cpf: str = Depends(get_current_user_cpf)):
-    """ Retorna um resumo de todas as respostas enviadas pelo usuário logado. """
-    supabase = get_supabase_client()
+async def get_respostas_resumo(
+    request: Request,
+    cpf: str = Depends(get_current_user_cpf),
+    fields: Optional[str] = Query(None, description="Campos separados por vírgula (textos longos só se pedidos)"),
+    cursor: Optional[str] = Query(None, description="Valor de X-Next-Cursor da página anterior"),
+    limit: int = Query(LIMITE_PADRAO, ge=1, le=LIMITE_MAXIMO),
+):
+    """ Resumo das respostas enviadas pelo usuário logado, da mais recente para a mais antiga. """
+    cols = projecao(fields, CAMPOS_RESPOSTA, CAMPOS_RESPOSTA_PADRAO)
+    supabase = await get_supabase_async()
     try:
-        data = supabase.table("PBL - respostas").select("*").eq("cpf", cpf).execute()
-        return data.data or []
+        query = supabase.table("PBL - respostas").select(colunas_consulta(cols, "data_envio")).eq("cpf", cpf)
+        data = await paginar(query, "data_envio", cursor, limit).execute()
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    pagina, proximo = fatiar(data.data or [], cols, "data_envio", limit)
+    return resposta_condicional(request, pagina, cabecalhos=cabecalhos_pagina(request, proximo))
+
+@router.get("/{resposta_id}")
+async def get_resposta_por_id(resposta_id: str, cpf: str = Depends(get_current_user_cpf)):
+    """ Consulta o resultado de uma tentativa (fallback do envio via WebSocket). """
+    supabase = await get_supabase_async()
+    try:
+        r = await supabase.table("PBL - respostas").select("*").eq("id", resposta_id).eq("cpf", cpf).limit(1).execute()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if not r.data:
+        raise HTTPException(status_code=404, detail="Resposta não encontrada.")
+    return mensagem_avaliacao(r.data[0])
 
 @router.post("/registrar")
-def registrar_resposta_endpoint(payload: AvaliacaoRequest, cpf: str = Depends(get_current_user_cpf)):
-    """ Avalia e registra uma nova tentativa de resposta no banco de dados. """
-    supabase = get_supabase_client()
+async def registrar_resposta_endpoint(
+    payload: AvaliacaoRequest,
+    cpf: str = Depends(get_current_user_cpf),
+    assincrono: bool = Query(False, description="Aceita a tentativa e avalia em segundo plano (202 + id)"),
+):
+    """
+    Avalia e registra uma nova tentativa de resposta no banco de dados.
+    No modo assíncrono, a tentativa é gravada como pendente e o resultado é enviado
+    pelo WebSocket (/ws?token=...) ou consultado em GET /api/respostas/{id}.
+    """
+    supabase = await get_supabase_async()
     try:
-        # ... (o resto da função registrar_resposta_endpoint permanece igual)
-        desafio = supabase.table("PBL - desafios").select("texto_desafio, conteudo_id").eq("id", payload.desafio_id).single().execute().data
+        desafio, turma = await asyncio.gather(
+            supabase.table("PBL - desafios").select("texto_desafio, conteudo_id").eq("id", payload.desafio_id).maybe_single().execute(),
+            turma_do_aluno(cpf),
+        )
+        desafio = desafio.data if desafio else None
         if not desafio:
             raise HTTPException(status_code=404, detail="Desafio não encontrado.")
 
         texto_desafio = desafio["texto_desafio"]
         conteudo_id = desafio["conteudo_id"]
 
-        nota, feedback, sugestao = avaliar_resposta_com_ia(payload.resposta, texto_desafio, payload.tentativa)
+        # Recusa já na entrada quando o orçamento de IA do aluno/turma acabou
+        await consumo_llm.verificar_orcamento(cpf=cpf, turma=turma)
+
+        if assincrono:
+            registro = await registrar_resposta_pendente(cpf, payload.desafio_id, conteudo_id, payload.resposta, payload.tentativa)
+            return JSONResponse(status_code=202, content={"id": registro["id"], "status": registro["status_avaliacao"]})
+
+        nota, feedback, sugestao = await avaliar_resposta_com_ia(payload.resposta, texto_desafio, payload.tentativa, cpf, turma)
 
-        supabase.table("PBL - respostas").insert({
+        await supabase.table("PBL - respostas").insert({
             "id": str(uuid4()),
             "cpf": cpf, # Usa o CPF do cabeçalho seguro
             "desafio_id": payload.desafio_id,
@@ -53,9 +106,14 @@ def registrar_resposta_endpoint(payload: AvaliacaoRequest, cpf: str = Depends(ge
             "feedback": feedback,
             "resposta_ideal": sugestao,
             "data_envio": datetime.utcnow().isoformat(),
-            "tentativa_finalizada": payload.tentativa >= 3
+            "tentativa_finalizada": payload.tentativa >= 3,
+            "status_avaliacao": STATUS_AVALIADA,
         }).execute()
 
         return {"nota": nota, "feedback": feedback, "sugestao": sugestao}
+    except HTTPException:
+        raise
+    except OrcamentoExcedidoError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
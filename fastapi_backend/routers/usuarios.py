@@ -2,7 +2,8 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from typing import Optional, List
 from pydantic import BaseModel
-from ..db import get_supabase_client
+from ..db import get_supabase_client, executar_em_thread
+from ..conexoes import manager
 from ..security import get_current_user_cpf
 
 router = APIRouter(prefix="/usuarios", tags=["usuarios"])
@@ -16,18 +17,19 @@ class UsuarioPayload(BaseModel):
     formulario_finalizado: Optional[bool] = None
 
 @router.post("")
-def update_usuario_form(payload: UsuarioPayload, cpf: str = Depends(get_current_user_cpf)):
+async def update_usuario_form(payload: UsuarioPayload, cpf: str = Depends(get_current_user_cpf)):
     """ Atualiza os dados do formulário do usuário logado. """
+    data_to_update = payload.model_dump(exclude_unset=True)
+    if not data_to_update:
+        raise HTTPException(status_code=400, detail="Nenhum dado para atualizar.")
     supabase = get_supabase_client()
     try:
-        data_to_update = payload.model_dump(exclude_unset=True)
-        if not data_to_update:
-            raise HTTPException(status_code=400, detail="Nenhum dado para atualizar.")
-
-        response = supabase.table("PBL - usuarios").update(data_to_update).eq("cpf", cpf).execute()
-        return {"ok": True, "data": response.data}
+        response = await executar_em_thread(supabase.table("PBL - usuarios").update(data_to_update).eq("cpf", cpf))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    # O perfil (usado na geração de desafios) fica obsoleto no diretório de todos os processos
+    await manager.publicar_controle("usuario", {"cpf": cpf})
+    return {"ok": True, "data": response.data}
 
 @router.get("")
 def get_usuario_details(
@@ -6,6 +6,7 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from passlib.context import CryptContext
+from .diretorio import diretorio
 
 # Carrega as variáveis de ambiente
 JWT_SECRET = os.getenv("JWT_SECRET")
@@ -14,6 +15,7 @@ if not JWT_SECRET:
 
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 8  # 8 horas
+PAPEL_ADMIN = "admin"
 
 # Esquema de autenticação OAuth2
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token")
@@ -32,21 +34,26 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, JWT_SECRET, algorithm=ALGORITHM)
     return encoded_jwt
 
-def verify_token(token: str, credentials_exception: HTTPException):
-    """Verifica e decodifica um token JWT."""
+def decode_token(token: str, credentials_exception: Exception) -> dict:
+    """Verifica a assinatura/expiração do token JWT e retorna o payload."""
     try:
         payload = jwt.decode(token, JWT_SECRET, algorithms=[ALGORITHM])
-        cpf: str = payload.get("sub")
-        if cpf is None:
-            raise credentials_exception
-        return cpf
     except JWTError:
         raise credentials_exception
+    if payload.get("sub") is None:
+        raise credentials_exception
+    return payload
+
+def verify_token(token: str, credentials_exception: HTTPException):
+    """Verifica e decodifica um token JWT."""
+    return decode_token(token, credentials_exception)["sub"]
 
-def get_current_user_cpf(token: str = Depends(oauth2_scheme)) -> str:
+
+async def get_current_user_cpf(token: str = Depends(oauth2_scheme)) -> str:
     """
     Dependência para obter o CPF do usuário a partir do token JWT.
-    Usado para proteger as rotas.
+    Usado para proteger as rotas. É `async` para não ocupar uma thread do
+    threadpool só para validar o token.
     """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -55,16 +62,21 @@ def get_current_user_cpf(token: str = Depends(oauth2_scheme)) -> str:
     )
     return verify_token(token, credentials_exception)
 
-def get_current_admin_user(token: str = Depends(oauth2_scheme)):
+async def get_current_admin_user(token: str = Depends(oauth2_scheme)):
     """
     Dependência para rotas que exigem privilégios de administrador.
-    (Esta função precisaria de uma lógica para verificar a role do usuário no banco de dados)
+    O papel vem do diretório de usuários (carregado do banco, renovado por TTL e invalidado
+    em todos os processos quando o papel muda), não do claim "role" do token: um admin
+    rebaixado perde o acesso mesmo com um token ainda válido, após restart ou em outro worker.
     """
-    cpf = get_current_user_cpf(token)
-    # Exemplo: Adicionar uma verificação de role aqui
-    # from .db import get_supabase_client
-    # supabase = get_supabase_client()
-    # user = supabase.table("PBL - usuarios").select("role").eq("cpf", cpf).single().execute()
-    # if not user.data or user.data.get("role") != "admin":
-    #     raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Acesso negado. Requer privilégios de administrador.")
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Não foi possível validar as credenciais",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    payload = decode_token(token, credentials_exception)
+    cpf = payload["sub"]
+    usuario = await diretorio.usuario_async(cpf)
+    if not usuario or usuario.get("role") != PAPEL_ADMIN:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Acesso negado. Requer privilégios de administrador.")
     return cpf
\ No newline at end of file
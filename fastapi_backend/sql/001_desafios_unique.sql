@@ -0,0 +1,5 @@
+-- Garante um único desafio por (cpf, conteudo_id, tipo).
+-- Necessário para o upsert em lote do gerador (on_conflict = cpf,conteudo_id,tipo).
+-- Antes de aplicar, remova eventuais duplicatas já existentes.
+alter table "PBL - desafios"
+  add constraint "PBL - desafios_cpf_conteudo_tipo_key" unique (cpf, conteudo_id, tipo);
@@ -0,0 +1,18 @@
+-- Fila persistente de jobs de geração de desafios (um registro por CPF).
+create table if not exists "PBL - geracao_jobs" (
+  id uuid primary key default gen_random_uuid(),
+  cpf text not null unique,
+  status text not null default 'pendente',  -- pendente | executando | concluido | erro
+  tentativas integer not null default 0,
+  itens_feitos integer not null default 0,
+  itens_total integer not null default 0,
+  ultimo_erro text,
+  proxima_tentativa timestamptz not null default now(),
+  iniciado_em timestamptz,
+  finalizado_em timestamptz,
+  atualizado_em timestamptz not null default now(),
+  created_at timestamptz not null default now()
+);
+
+create index if not exists "PBL - geracao_jobs_fila_idx"
+  on "PBL - geracao_jobs" (status, proxima_tentativa);
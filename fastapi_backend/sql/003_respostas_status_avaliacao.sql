@@ -0,0 +1,7 @@
+-- Estado da avaliação de cada tentativa (modo assíncrono de /api/respostas/registrar).
+alter table "PBL - respostas"
+  add column if not exists status_avaliacao text not null default 'avaliada';  -- pendente | avaliando | avaliada | erro
+
+create index if not exists "PBL - respostas_pendentes_idx"
+  on "PBL - respostas" (status_avaliacao)
+  where status_avaliacao in ('pendente', 'avaliando');
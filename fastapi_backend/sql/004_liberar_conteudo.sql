@@ -0,0 +1,42 @@
+-- Liberação em lote: um único UPDATE (join com usuarios) libera os desafios de todas as
+-- turmas do agendamento. Com p_agendamento_id, o agendamento é reservado na mesma
+-- transação (liberado = true só se ainda estava pendente), então vários processos
+-- podem disparar o mesmo agendamento sem liberar duas vezes.
+-- Retorna o número de desafios liberados, ou -1 se o agendamento já tinha sido processado.
+create or replace function public.pbl_liberar_conteudo(
+  p_conteudo_id text,
+  p_tipo text,
+  p_turmas text[],
+  p_agendamento_id text default null
+) returns integer
+language plpgsql
+as $$
+declare
+  n integer;
+begin
+  if p_agendamento_id is not null then
+    update "PBL - liberacoes_agendadas"
+       set liberado = true
+     where id::text = p_agendamento_id
+       and liberado is not true;
+    if not found then
+      return -1;
+    end if;
+  end if;
+
+  update "PBL - desafios" d
+     set desafio_liberado = true
+    from "PBL - usuarios" u
+   where u.cpf = d.cpf
+     and u.turma = any(p_turmas)
+     and d.conteudo_id::text = p_conteudo_id
+     and d.tipo = p_tipo
+     and d.desafio_liberado is not true;
+  get diagnostics n = row_count;
+  return n;
+end;
+$$;
+
+create index if not exists "PBL - liberacoes_pendentes_idx"
+  on "PBL - liberacoes_agendadas" (data_liberacao, hora_liberacao)
+  where liberado is not true;
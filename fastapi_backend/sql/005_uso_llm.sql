@@ -0,0 +1,71 @@
+-- Livro de consumo da OpenAI: uma linha por chamada, só inserção (append-only).
+create table if not exists "PBL - uso_llm" (
+  id bigint generated always as identity primary key,
+  criado_em timestamptz not null default now(),
+  cpf text,
+  turma text,
+  tipo text not null,  -- macro | micro | titulo | avaliacao
+  modelo text not null,
+  prompt_tokens integer not null default 0,
+  completion_tokens integer not null default 0,
+  custo_usd numeric(12, 6) not null default 0
+);
+
+create index if not exists "PBL - uso_llm_cpf_idx" on "PBL - uso_llm" (cpf, criado_em);
+create index if not exists "PBL - uso_llm_turma_idx" on "PBL - uso_llm" (turma, criado_em);
+create index if not exists "PBL - uso_llm_criado_idx" on "PBL - uso_llm" (criado_em);
+
+-- Registros não podem ser alterados nem apagados
+create or replace function public.pbl_uso_llm_imutavel() returns trigger
+language plpgsql
+as $$
+begin
+  raise exception '"PBL - uso_llm" é somente inserção';
+end;
+$$;
+
+drop trigger if exists "PBL - uso_llm_imutavel" on "PBL - uso_llm";
+create trigger "PBL - uso_llm_imutavel"
+  before update or delete on "PBL - uso_llm"
+  for each row execute function public.pbl_uso_llm_imutavel();
+
+-- Tokens consumidos desde p_desde por um aluno (p_cpf) ou por uma turma (p_turma).
+create or replace function public.pbl_uso_llm_total(
+  p_desde timestamptz,
+  p_cpf text default null,
+  p_turma text default null
+) returns bigint
+language sql stable
+as $$
+  select coalesce(sum(prompt_tokens + completion_tokens), 0)::bigint
+    from "PBL - uso_llm"
+   where criado_em >= p_desde
+     and (p_cpf is null or cpf = p_cpf)
+     and (p_turma is null or turma = p_turma);
+$$;
+
+-- Consumo agregado por turma, cpf ou tipo (p_agrupar), opcionalmente só de uma turma.
+create or replace function public.pbl_uso_llm_resumo(
+  p_desde timestamptz,
+  p_agrupar text default 'turma',
+  p_turma text default null
+) returns table (
+  grupo text,
+  chamadas bigint,
+  prompt_tokens bigint,
+  completion_tokens bigint,
+  custo_usd numeric
+)
+language sql stable
+as $$
+  select case p_agrupar when 'cpf' then u.cpf when 'tipo' then u.tipo else u.turma end as grupo,
+         count(*)::bigint,
+         sum(u.prompt_tokens)::bigint,
+         sum(u.completion_tokens)::bigint,
+         sum(u.custo_usd)
+    from "PBL - uso_llm" u
+   where u.criado_em >= p_desde
+     and (p_turma is null or u.turma = p_turma)
+   group by 1
+   order by 5 desc;
+$$;
@@ -0,0 +1,10 @@
+-- Índices da paginação por cursor (fastapi_backend/paginacao.py): cada página é um range scan
+-- em (filtro, data desc, id desc), sem OFFSET, independente de quantas páginas vieram antes.
+create index if not exists "PBL - respostas_cpf_envio_idx"
+  on "PBL - respostas" (cpf, data_envio desc nulls last, id desc);
+
+create index if not exists "PBL - desafios_cpf_criacao_idx"
+  on "PBL - desafios" (cpf, data_criacao desc nulls last, id desc);
+
+create index if not exists "PBL - liberacoes_agendadas_criacao_idx"
+  on "PBL - liberacoes_agendadas" (created_at desc nulls last, id desc);
@@ -0,0 +1,336 @@
+-- Agregados do painel administrativo, mantidos por triggers a cada resposta avaliada, mudança de
+-- turma de um aluno e liberação/agendamento. O painel lê só estas tabelas (poucas linhas por turma)
+-- em vez de varrer "PBL - respostas" e o histórico de liberações.
+
+-- Estado de cada aluno em cada conteúdo (uma linha por cpf + conteúdo, não por tentativa)
+create table if not exists "PBL - analytics_aluno_conteudo" (
+  cpf text not null,
+  conteudo_id text not null,
+  turma text,
+  avaliadas integer not null default 0,  -- tentativas com status 'avaliada'
+  finalizado boolean not null default false,
+  primary key (cpf, conteudo_id)
+);
+
+-- Por turma e conteúdo
+create table if not exists "PBL - analytics_conteudo" (
+  turma text not null,
+  conteudo_id text not null,
+  respostas_avaliadas integer not null default 0,
+  soma_notas numeric not null default 0,
+  alunos_responderam integer not null default 0,  -- ao menos uma tentativa avaliada
+  alunos_finalizaram integer not null default 0,  -- tentativa_finalizada (ou 3 tentativas)
+  alunos_1_tentativa integer not null default 0,
+  alunos_2_tentativas integer not null default 0,
+  alunos_3_tentativas integer not null default 0,  -- 3 ou mais
+  atualizado_em timestamptz not null default now(),
+  primary key (turma, conteudo_id)
+);
+
+-- Por turma: alunos e agendamentos ainda não liberados
+create table if not exists "PBL - analytics_turma" (
+  turma text primary key,
+  alunos integer not null default 0,
+  liberacoes_pendentes integer not null default 0,
+  atualizado_em timestamptz not null default now()
+);
+
+-- Conteúdos já liberados por turma (denominador da taxa de conclusão)
+create table if not exists "PBL - analytics_liberados" (
+  turma text not null,
+  conteudo_id text not null,
+  liberado_em timestamptz not null default now(),
+  primary key (turma, conteudo_id)
+);
+
+-- Contadores globais (ex.: agendamentos pendentes, contando cada agendamento uma vez)
+create table if not exists "PBL - analytics_geral" (
+  chave text primary key,
+  valor bigint not null default 0
+);
+
+-- Índice usado para recalcular o estado de um aluno em um conteúdo (poucas linhas)
+create index if not exists "PBL - respostas_cpf_conteudo_idx"
+  on "PBL - respostas" (cpf, conteudo_id);
+
+
+-- Soma deltas na linha (turma, conteúdo), criando-a se preciso.
+create or replace function public.pbl_analytics_somar_conteudo(
+  p_turma text, p_conteudo_id text, p_respostas integer, p_notas numeric,
+  p_responderam integer, p_finalizaram integer, p_t1 integer, p_t2 integer, p_t3 integer
+) returns void
+language sql
+as $$
+  insert into "PBL - analytics_conteudo" as a
+    (turma, conteudo_id, respostas_avaliadas, soma_notas, alunos_responderam, alunos_finalizaram,
+     alunos_1_tentativa, alunos_2_tentativas, alunos_3_tentativas)
+  values (p_turma, p_conteudo_id, p_respostas, p_notas, p_responderam, p_finalizaram, p_t1, p_t2, p_t3)
+  on conflict (turma, conteudo_id) do update set
+    respostas_avaliadas = a.respostas_avaliadas + excluded.respostas_avaliadas,
+    soma_notas = a.soma_notas + excluded.soma_notas,
+    alunos_responderam = a.alunos_responderam + excluded.alunos_responderam,
+    alunos_finalizaram = a.alunos_finalizaram + excluded.alunos_finalizaram,
+    alunos_1_tentativa = a.alunos_1_tentativa + excluded.alunos_1_tentativa,
+    alunos_2_tentativas = a.alunos_2_tentativas + excluded.alunos_2_tentativas,
+    alunos_3_tentativas = a.alunos_3_tentativas + excluded.alunos_3_tentativas,
+    atualizado_em = now();
+$$;
+
+-- Recalcula o estado de um aluno em um conteúdo (só as tentativas dele) e aplica a diferença
+-- nos agregados da turma.
+create or replace function public.pbl_analytics_atualizar_aluno(p_cpf text, p_conteudo_id text)
+returns void
+language plpgsql
+as $$
+declare
+  antigo "PBL - analytics_aluno_conteudo"%rowtype;
+  v_avaliadas integer;
+  v_finalizado boolean;
+begin
+  insert into "PBL - analytics_aluno_conteudo" (cpf, conteudo_id, turma)
+  values (p_cpf, p_conteudo_id, (select turma from "PBL - usuarios" where cpf = p_cpf limit 1))
+  on conflict (cpf, conteudo_id) do nothing;
+  -- Trava a linha: tentativas simultâneas do mesmo aluno são aplicadas uma de cada vez
+  select * into antigo from "PBL - analytics_aluno_conteudo"
+   where cpf = p_cpf and conteudo_id = p_conteudo_id for update;
+
+  select count(*), coalesce(bool_or(tentativa_finalizada is true or tentativa >= 3), false)
+    into v_avaliadas, v_finalizado
+    from "PBL - respostas"
+   where cpf = p_cpf and conteudo_id::text = p_conteudo_id and status_avaliacao = 'avaliada';
+
+  if v_avaliadas = antigo.avaliadas and v_finalizado = antigo.finalizado then
+    return;
+  end if;
+  update "PBL - analytics_aluno_conteudo"
+     set avaliadas = v_avaliadas, finalizado = v_finalizado
+   where cpf = p_cpf and conteudo_id = p_conteudo_id;
+
+  if antigo.turma is null then
+    return;
+  end if;
+  perform public.pbl_analytics_somar_conteudo(
+    antigo.turma, p_conteudo_id, 0, 0,
+    (v_avaliadas > 0)::int - (antigo.avaliadas > 0)::int,
+    v_finalizado::int - antigo.finalizado::int,
+    (least(v_avaliadas, 3) = 1)::int - (least(antigo.avaliadas, 3) = 1)::int,
+    (least(v_avaliadas, 3) = 2)::int - (least(antigo.avaliadas, 3) = 2)::int,
+    (least(v_avaliadas, 3) = 3)::int - (least(antigo.avaliadas, 3) = 3)::int
+  );
+end;
+$$;
+
+create or replace function public.pbl_analytics_resposta() returns trigger
+language plpgsql
+as $$
+declare
+  v_turma text;
+begin
+  -- Notas: cada linha avaliada soma uma vez; reavaliação ajusta pela diferença
+  if tg_op in ('UPDATE', 'DELETE') and old.status_avaliacao = 'avaliada' then
+    select turma into v_turma from "PBL - analytics_aluno_conteudo"
+     where cpf = old.cpf and conteudo_id = old.conteudo_id::text;
+    if v_turma is not null then
+      perform public.pbl_analytics_somar_conteudo(v_turma, old.conteudo_id::text, -1, -coalesce(old.nota, 0), 0, 0, 0, 0, 0);
+    end if;
+  end if;
+  if tg_op in ('INSERT', 'UPDATE') and new.status_avaliacao = 'avaliada' then
+    perform public.pbl_analytics_atualizar_aluno(new.cpf, new.conteudo_id::text);
+    select turma into v_turma from "PBL - analytics_aluno_conteudo"
+     where cpf = new.cpf and conteudo_id = new.conteudo_id::text;
+    if v_turma is not null then
+      perform public.pbl_analytics_somar_conteudo(v_turma, new.conteudo_id::text, 1, coalesce(new.nota, 0), 0, 0, 0, 0, 0);
+    end if;
+  end if;
+  if tg_op in ('UPDATE', 'DELETE') and old.status_avaliacao = 'avaliada'
+     and (tg_op = 'DELETE' or new.status_avaliacao is distinct from 'avaliada'
+          or (new.cpf, new.conteudo_id::text) is distinct from (old.cpf, old.conteudo_id::text)) then
+    perform public.pbl_analytics_atualizar_aluno(old.cpf, old.conteudo_id::text);
+  end if;
+  return null;
+end;
+$$;
+
+drop trigger if exists "PBL - respostas_analytics" on "PBL - respostas";
+create trigger "PBL - respostas_analytics"
+  after insert or update of status_avaliacao, nota, tentativa, tentativa_finalizada, cpf, conteudo_id or delete
+  on "PBL - respostas"
+  for each row execute function public.pbl_analytics_resposta();
+
+
+create or replace function public.pbl_analytics_somar_turma(p_turma text, p_alunos integer, p_pendentes integer)
+returns void
+language sql
+as $$
+  insert into "PBL - analytics_turma" as a (turma, alunos, liberacoes_pendentes)
+  values (p_turma, p_alunos, p_pendentes)
+  on conflict (turma) do update set
+    alunos = a.alunos + excluded.alunos,
+    liberacoes_pendentes = a.liberacoes_pendentes + excluded.liberacoes_pendentes,
+    atualizado_em = now();
+$$;
+
+-- Move as contribuições de um aluno para a turma `p_turma` (null: não conta em nenhuma), conteúdo
+-- a conteúdo: deltas negativos nos agregados da turma antiga e positivos nos da nova. Mantém
+-- analytics_aluno_conteudo.turma igual à turma atual do aluno, como pbl_analytics_recalcular.
+create or replace function public.pbl_analytics_mover_aluno(p_cpf text, p_turma text)
+returns void
+language plpgsql
+as $$
+declare
+  r record;
+begin
+  for r in
+    select ac.conteudo_id, ac.turma, ac.avaliadas, ac.finalizado,
+           coalesce(s.n, 0)::int as n, coalesce(s.soma, 0) as soma
+      from "PBL - analytics_aluno_conteudo" ac
+      left join (select conteudo_id::text as conteudo_id, count(*) as n, sum(coalesce(nota, 0)) as soma
+                   from "PBL - respostas"
+                  where cpf = p_cpf and status_avaliacao = 'avaliada'
+                  group by conteudo_id::text) s on s.conteudo_id = ac.conteudo_id
+     where ac.cpf = p_cpf and ac.turma is distinct from p_turma
+     for update of ac
+  loop
+    if r.turma is not null then
+      perform public.pbl_analytics_somar_conteudo(
+        r.turma, r.conteudo_id, -r.n, -r.soma, -((r.avaliadas > 0)::int), -(r.finalizado::int),
+        -((least(r.avaliadas, 3) = 1)::int), -((least(r.avaliadas, 3) = 2)::int), -((least(r.avaliadas, 3) = 3)::int));
+    end if;
+    if p_turma is not null then
+      perform public.pbl_analytics_somar_conteudo(
+        p_turma, r.conteudo_id, r.n, r.soma, (r.avaliadas > 0)::int, r.finalizado::int,
+        (least(r.avaliadas, 3) = 1)::int, (least(r.avaliadas, 3) = 2)::int, (least(r.avaliadas, 3) = 3)::int);
+    end if;
+  end loop;
+  update "PBL - analytics_aluno_conteudo" set turma = p_turma
+   where cpf = p_cpf and turma is distinct from p_turma;
+end;
+$$;
+
+create or replace function public.pbl_analytics_usuario() returns trigger
+language plpgsql
+as $$
+begin
+  if tg_op in ('UPDATE', 'DELETE') and old.turma is not null then
+    perform public.pbl_analytics_somar_turma(old.turma, -1, 0);
+  end if;
+  if tg_op in ('INSERT', 'UPDATE') and new.turma is not null then
+    perform public.pbl_analytics_somar_turma(new.turma, 1, 0);
+  end if;
+  -- Respostas, notas e conclusões acompanham o aluno (inclusive as dadas antes de ter turma)
+  if tg_op = 'DELETE' then
+    perform public.pbl_analytics_mover_aluno(old.cpf, null);
+  elsif tg_op = 'INSERT' then
+    perform public.pbl_analytics_mover_aluno(new.cpf, new.turma);
+  elsif old.turma is distinct from new.turma or old.cpf is distinct from new.cpf then
+    if old.cpf is distinct from new.cpf then
+      perform public.pbl_analytics_mover_aluno(old.cpf, null);
+    end if;
+    perform public.pbl_analytics_mover_aluno(new.cpf, new.turma);
+  end if;
+  return null;
+end;
+$$;
+
+drop trigger if exists "PBL - usuarios_analytics" on "PBL - usuarios";
+create trigger "PBL - usuarios_analytics"
+  after insert or update of turma, cpf or delete on "PBL - usuarios"
+  for each row execute function public.pbl_analytics_usuario();
+
+
+create or replace function public.pbl_analytics_liberacao() returns trigger
+language plpgsql
+as $$
+declare
+  v_turma text;
+  v_delta integer := 0;
+begin
+  if tg_op in ('UPDATE', 'DELETE') and old.liberado is not true then
+    v_delta := v_delta - 1;
+    foreach v_turma in array coalesce(old.turmas, '{}') loop
+      perform public.pbl_analytics_somar_turma(v_turma, 0, -1);
+    end loop;
+  end if;
+  if tg_op in ('INSERT', 'UPDATE') then
+    if new.liberado is not true then
+      v_delta := v_delta + 1;
+      foreach v_turma in array coalesce(new.turmas, '{}') loop
+        perform public.pbl_analytics_somar_turma(v_turma, 0, 1);
+      end loop;
+    else
+      insert into "PBL - analytics_liberados" (turma, conteudo_id)
+      select t, new.conteudo_id::text from unnest(coalesce(new.turmas, '{}')) t
+      on conflict do nothing;
+    end if;
+  end if;
+  if v_delta <> 0 then
+    insert into "PBL - analytics_geral" as g (chave, valor) values ('liberacoes_pendentes', v_delta)
+    on conflict (chave) do update set valor = g.valor + excluded.valor;
+  end if;
+  return null;
+end;
+$$;
+
+drop trigger if exists "PBL - liberacoes_analytics" on "PBL - liberacoes_agendadas";
+create trigger "PBL - liberacoes_analytics"
+  after insert or update of liberado, turmas or delete on "PBL - liberacoes_agendadas"
+  for each row execute function public.pbl_analytics_liberacao();
+
+
+-- Reconstrói tudo a partir das tabelas de origem (carga inicial ou correção de divergência).
+create or replace function public.pbl_analytics_recalcular() returns void
+language plpgsql
+as $$
+begin
+  lock table "PBL - analytics_aluno_conteudo", "PBL - analytics_conteudo", "PBL - analytics_turma",
+             "PBL - analytics_liberados", "PBL - analytics_geral" in exclusive mode;
+  delete from "PBL - analytics_aluno_conteudo";
+  delete from "PBL - analytics_conteudo";
+  delete from "PBL - analytics_turma";
+  delete from "PBL - analytics_liberados";
+  delete from "PBL - analytics_geral";
+
+  insert into "PBL - analytics_aluno_conteudo" (cpf, conteudo_id, turma, avaliadas, finalizado)
+  select r.cpf, r.conteudo_id::text, min(u.turma), count(*),
+         bool_or(r.tentativa_finalizada is true or r.tentativa >= 3)
+    from "PBL - respostas" r
+    left join "PBL - usuarios" u on u.cpf = r.cpf
+   where r.status_avaliacao = 'avaliada'
+   group by r.cpf, r.conteudo_id::text;
+
+  insert into "PBL - analytics_conteudo"
+    (turma, conteudo_id, alunos_responderam, alunos_finalizaram, alunos_1_tentativa, alunos_2_tentativas, alunos_3_tentativas)
+  select turma, conteudo_id, count(*), count(*) filter (where finalizado),
+         count(*) filter (where least(avaliadas, 3) = 1), count(*) filter (where least(avaliadas, 3) = 2),
+         count(*) filter (where least(avaliadas, 3) = 3)
+    from "PBL - analytics_aluno_conteudo"
+   where turma is not null
+   group by turma, conteudo_id;
+
+  update "PBL - analytics_conteudo" a
+     set respostas_avaliadas = s.n, soma_notas = s.soma
+    from (select ac.turma, ac.conteudo_id, count(*) as n, coalesce(sum(r.nota), 0) as soma
+            from "PBL - respostas" r
+            join "PBL - analytics_aluno_conteudo" ac on ac.cpf = r.cpf and ac.conteudo_id = r.conteudo_id::text
+           where r.status_avaliacao = 'avaliada' and ac.turma is not null
+           group by ac.turma, ac.conteudo_id) s
+   where a.turma = s.turma and a.conteudo_id = s.conteudo_id;
+
+  insert into "PBL - analytics_turma" (turma, alunos)
+  select turma, count(*) from "PBL - usuarios" where turma is not null group by turma;
+
+  insert into "PBL - analytics_turma" as a (turma, liberacoes_pendentes)
+  select t, count(*) from "PBL - liberacoes_agendadas" l, unnest(coalesce(l.turmas, '{}')) t
+   where l.liberado is not true group by t
+  on conflict (turma) do update set liberacoes_pendentes = excluded.liberacoes_pendentes;
+
+  insert into "PBL - analytics_liberados" (turma, conteudo_id)
+  select distinct t, l.conteudo_id::text from "PBL - liberacoes_agendadas" l, unnest(coalesce(l.turmas, '{}')) t
+   where l.liberado is true;
+
+  insert into "PBL - analytics_geral" (chave, valor)
+  select 'liberacoes_pendentes', count(*) from "PBL - liberacoes_agendadas" where liberado is not true;
+end;
+$$;
+
+select public.pbl_analytics_recalcular();
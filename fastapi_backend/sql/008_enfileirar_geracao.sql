@@ -0,0 +1,22 @@
+-- Enfileiramento atômico de jobs de geração: um único INSERT ... ON CONFLICT (re)enfileira os
+-- CPFs sem job ou com job terminado (concluido/erro). Jobs pendentes ou em execução não são
+-- tocados, mesmo com dois pedidos simultâneos para o mesmo CPF (ler e depois fazer upsert
+-- podia devolver um job "executando" para "pendente" e executá-lo duas vezes).
+-- Retorna só os jobs efetivamente enfileirados.
+create or replace function public.pbl_enfileirar_geracao(p_cpfs text[])
+returns setof "PBL - geracao_jobs"
+language sql
+as $$
+  insert into "PBL - geracao_jobs" as j
+    (cpf, status, tentativas, itens_feitos, itens_total, ultimo_erro,
+     proxima_tentativa, iniciado_em, finalizado_em, atualizado_em)
+  select distinct u.cpf, 'pendente', 0, 0, 0, null, now(), null::timestamptz, null::timestamptz, now()
+    from unnest(p_cpfs) as u(cpf)
+   where u.cpf is not null
+  on conflict (cpf) do update
+     set status = 'pendente', tentativas = 0, itens_feitos = 0, itens_total = 0,
+         ultimo_erro = null, proxima_tentativa = now(), iniciado_em = null,
+         finalizado_em = null, atualizado_em = now()
+   where j.status not in ('pendente', 'executando')
+  returning j.*;
+$$;
@@ -0,0 +1,6 @@
+-- Início da avaliação em andamento: gravado quando um worker reserva a resposta ('avaliando').
+-- A recuperação do startup considera abandonadas as avaliações iniciadas há mais de
+-- AVALIACAO_TIMEOUT_SEGUNDOS — antes usava data_envio, e uma resposta que esperou na fila
+-- mais que isso era devolvida à fila enquanto ainda estava sendo avaliada por outro processo.
+alter table "PBL - respostas"
+  add column if not exists avaliacao_iniciada_em timestamptz;
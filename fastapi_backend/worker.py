@@ -0,0 +1,41 @@
+# fastapi_backend/worker.py
+"""
+Processo dedicado para executar os jobs de geração de desafios.
+
+Uso: python -m fastapi_backend.worker
+(defina JOBS_WORKERS=0 na API para que ela apenas enfileire os jobs)
+"""
+import os
+import asyncio
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from .jobs import pool
+from .consumo_llm import consumo_llm
+from .conexoes import manager
+from .broker import criar_broker
+from .catalogo import catalogo
+
+
+async def main():
+    workers = max(1, int(os.getenv("JOBS_WORKERS_DEDICADOS", "4")))
+    # Só mensagens de controle: o catálogo usado pelo gerador é invalidado junto com o da API
+    # (com WS_BROKER_URL; sem ele, vale o TTL)
+    await manager.iniciar(criar_broker())
+    manager.registrar_controle("catalogo", catalogo.aplicar)
+    await consumo_llm.iniciar()
+    await pool.iniciar(workers)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await pool.parar()
+        await consumo_llm.parar()
+        await manager.parar()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        print("[JOBS] Worker interrompido.")
@@ -1,7 +1,8 @@
 // frontend/src/hooks/useDesafiosData.ts
-import { useState, useEffect, useMemo } from 'react';
+import { useState, useEffect, useCallback } from 'react';
 import { apiJson } from '../lib/api';
 import { useAuth } from './useAuth';
+import { useBackendWS } from '../lib/useBackendWS';
 import toast from 'react-hot-toast';
 
 export interface Desafio {
@@ -20,11 +21,26 @@ export interface Modulo {
   micros: Desafio[];
 }
 
+interface Painel {
+  modulos: { nome: string; macro: Desafio | null; micros: Desafio[] }[];
+  total_desafios: number;
+  total_liberados: number;
+}
+
 export function useDesafiosData() {
   const { cpf, turma } = useAuth();
-  const [desafios, setDesafios] = useState<Desafio[]>([]);
+  const [modulos, setModulos] = useState<Modulo[]>([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
+  const [versao, setVersao] = useState(0);
+
+  // Uma liberação para a turma chega pelo WebSocket: recarrega o painel
+  const onMessage = useCallback((ev: MessageEvent) => {
+    try {
+      if (JSON.parse(ev.data)?.tipo === 'liberacao') setVersao(v => v + 1);
+    } catch {}
+  }, []);
+  useBackendWS(onMessage);
 
   useEffect(() => {
     if (!cpf || !turma) {
@@ -33,31 +49,13 @@ export function useDesafiosData() {
     }
 
     const fetchData = async () => {
-      setLoading(true);
+      // Recargas disparadas pelo WebSocket não voltam a mostrar o carregamento
+      if (versao === 0) setLoading(true);
       setError(null);
       try {
-        // Busca todas as informações em paralelo para mais performance
-        const [liberacoesRes, desafiosRes, conteudosRes] = await Promise.all([
-          apiJson<{ conteudo_id: string }[]>(`/api/liberacoes?turma=${turma}`),
-          apiJson<Desafio[]>(`/api/desafios`),
-          apiJson<{ id: string; modulo: string; aula: string }[]>(`/api/conteudos`)
-        ]);
-
-        const liberadosIds = new Set(liberacoesRes.map(l => l.conteudo_id));
-        const conteudosMap = new Map(conteudosRes.map(c => [c.id, c]));
-
-        const desafiosMapeados = desafiosRes.map(d => {
-          const conteudo = conteudosMap.get(d.conteudo_id);
-          return {
-            ...d,
-            modulo: conteudo?.modulo || 'Desconhecido',
-            aula: conteudo?.aula || '',
-            // LÓGICA CORRETA: a liberação depende da tabela de agendamentos
-            desafio_liberado: liberadosIds.has(d.conteudo_id),
-          };
-        });
-
-        setDesafios(desafiosMapeados);
+        // Uma única chamada: o backend agrupa por módulo e calcula aula e liberação
+        const painel = await apiJson<Painel>(`/api/painel?turma=${encodeURIComponent(turma)}`);
+        setModulos(painel.modulos.map(m => ({ nome: m.nome, macro: m.macro ?? undefined, micros: m.micros })));
       } catch (err: any) {
         toast.error("Falha ao carregar os desafios.");
         setError(err.message || "Erro desconhecido");
@@ -67,26 +65,7 @@ export function useDesafiosData() {
     };
 
     fetchData();
-  }, [cpf, turma]);
-
-  const modulos = useMemo(() => {
-    const agrupado: Record<string, Modulo> = {};
-    desafios.forEach(desafio => {
-      const moduloNome = desafio.modulo!;
-      if (!agrupado[moduloNome]) {
-        agrupado[moduloNome] = { nome: moduloNome, micros: [] };
-      }
-      if (desafio.tipo === 'macro') {
-        agrupado[moduloNome].macro = desafio;
-      } else {
-        agrupado[moduloNome].micros.push(desafio);
-      }
-    });
-    // Ordena os módulos e as aulas dentro deles para uma exibição consistente
-    const modulosOrdenados = Object.values(agrupado).sort((a, b) => a.nome.localeCompare(b.nome));
-    modulosOrdenados.forEach(m => m.micros.sort((a,b) => (a.aula || "").localeCompare(b.aula || "")));
-    return modulosOrdenados;
-  }, [desafios]);
+  }, [cpf, turma, versao]);
 
   return { modulos, loading, error };
-}
\ No newline at end of file
+}
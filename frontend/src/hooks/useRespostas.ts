@@ -1,6 +1,6 @@
 // frontend/src/hooks/useRespostas.ts
 import { useState, useEffect, useCallback } from 'react';
-import { apiJson, apiFetch } from '../lib/api';
+import { apiJson, apiJsonPaginado } from '../lib/api';
 import { useAuth } from './useAuth';
 import toast from 'react-hot-toast';
 
@@ -21,7 +21,9 @@ export function useRespostas() {
   const fetchRespostas = useCallback(async () => {
     if (!cpf) return;
     try {
-      const data = await apiJson<Resposta[]>(`/api/respostas/resumo`);
+      const data = await apiJsonPaginado<Resposta>(
+        `/api/respostas/resumo?fields=desafio_id,tentativa,tentativa_finalizada,nota,feedback,resposta_ideal&limit=500`
+      );
       const map = new Map<string, Resposta>();
       data.forEach(r => {
         // Guarda apenas a tentativa mais recente para cada desafio
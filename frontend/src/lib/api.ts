@@ -40,4 +40,21 @@ export async function apiJson<T = any>(path: string, init?: RequestInit): Promis
     throw new Error(String(msg));
   }
   return data as T;
-}
\ No newline at end of file
+}
+/** busca todas as páginas de uma listagem paginada por cursor (cabeçalho X-Next-Cursor) */
+export async function apiJsonPaginado<T = any>(path: string, init?: RequestInit): Promise<T[]> {
+  const itens: T[] = [];
+  let cursor: string | null = null;
+  do {
+    const sep = path.includes("?") ? "&" : "?";
+    const resp = await apiFetch(cursor ? `${path}${sep}cursor=${encodeURIComponent(cursor)}` : path, init);
+    const data = await resp.json().catch(() => ({}));
+    if (!resp.ok) {
+      const msg = (data && (data.detail || data.message)) || `HTTP ${resp.status}`;
+      throw new Error(String(msg));
+    }
+    itens.push(...(data as T[]));
+    cursor = resp.headers.get("X-Next-Cursor");
+  } while (cursor);
+  return itens;
+}
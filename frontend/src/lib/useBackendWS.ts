@@ -6,6 +6,8 @@ const HEARTBEAT_MS = 15_000;
 /**
  * Hook para abrir o WS do backend.
  * - Usa VITE_WS_URL se definida; senão deriva de VITE_API_URL + "/ws".
+ * - Autentica com o token JWT (?token=...): o servidor inscreve a conexão
+ *   nos canais do CPF e da turma do aluno. Sem token, não conecta.
  * - Heartbeat "ping"/"pong"
  * - Evita conexões duplicadas (OPEN/CONNECTING)
  * - Reconexão com backoff exponencial
@@ -37,7 +39,10 @@ export function useBackendWS(onMessage?: (ev: MessageEvent) => void) {
         return;
       }
 
-      const ws = new WebSocket(base);
+      const token = localStorage.getItem("token");
+      if (!token) return;
+
+      const ws = new WebSocket(`${base}?token=${encodeURIComponent(token)}`);
       wsRef.current = ws;
 
       ws.onopen = () => {
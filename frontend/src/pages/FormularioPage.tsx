@@ -63,6 +63,7 @@ export default function FormularioPage() {
   const [aceitaTermos, setAceitaTermos] = useState(false);
   const [showConfirmModal, setShowConfirmModal] = useState(false);
   const [confirmType, setConfirmType] = useState<"vazio" | "parcial" | null>(null);
+  const [progresso, setProgresso] = useState<{ feitos: number; total: number } | null>(null);
 
   const navigate = useNavigate();
   const cpf = localStorage.getItem("cpf");
@@ -121,7 +122,7 @@ export default function FormularioPage() {
   const startPolling = () => {
     const start = Date.now();
     let isFetching = false;
-    const MAX_POLLING_TIME = 90000;
+    const MAX_POLLING_TIME = 300000;
 
     const interval = setInterval(async () => {
       if (Date.now() - start > MAX_POLLING_TIME) {
@@ -136,12 +137,19 @@ export default function FormularioPage() {
       isFetching = true;
 
       try {
-        const res = await apiJson<any[]>(`/api/desafios`);
-        if (res && res.length > 0) {
+        const res = await apiJson<{ status: string | null; feitos: number; total: number; erro?: string }>(
+          `/api/desafios/status/${cpf}`
+        );
+        if (res.total > 0) setProgresso({ feitos: res.feitos, total: res.total });
+        if (res.status === "concluido") {
           clearInterval(interval);
           setLoading(false);
           toast.success("Seus desafios foram gerados!");
           navigate("/desafios");
+        } else if (res.status === "erro") {
+          clearInterval(interval);
+          setLoading(false);
+          toast.error("Não foi possível gerar todos os seus desafios. Tente novamente em instantes.", { duration: 6000 });
         }
       } catch (err) {
         // Silencia erros
@@ -204,7 +212,11 @@ export default function FormularioPage() {
               disabled={loading || !aceitaTermos}
             >
               {loading && <Spinner className="mr-2" />}
-              {loading ? "Gerando seus desafios..." : "Enviar e Iniciar Jornada"}
+              {loading
+                ? progresso
+                  ? `Gerando seus desafios... (${progresso.feitos}/${progresso.total})`
+                  : "Gerando seus desafios..."
+                : "Enviar e Iniciar Jornada"}
             </Button>
           </CardFooter>
         </Card>
@@ -30,18 +30,35 @@ col1, col2, col3 = st.columns(3)
 # Os dados agora vêm da API
 total_usuarios_data = get_data_from_api("usuarios/total")
 conteudos = get_data_from_api("conteudos")
-agendamentos = get_data_from_api("liberacoes-historico")
+# Pendências e indicadores por turma vêm dos agregados do backend (sem baixar o histórico)
+analytics = get_data_from_api("analytics/turmas")
 
 # Tratamento de erro caso a API não retorne dados
 total_usuarios = total_usuarios_data.get('total', 0) if total_usuarios_data else 0
-agendamentos_pendentes = [a for a in agendamentos if not a.get("liberado")] if agendamentos else []
+agendamentos_pendentes = analytics.get("liberacoes_pendentes", 0) if analytics else 0
 
 with col1:
     st.metric("👥 Total de Usuários", total_usuarios)
 with col2:
     st.metric("📚 Total de Conteúdos Ativos", len(conteudos) if conteudos else 0)
 with col3:
-    st.metric("⏳ Agendamentos Pendentes", len(agendamentos_pendentes))
+    st.metric("⏳ Agendamentos Pendentes", agendamentos_pendentes)
+
+if analytics and analytics.get("turmas"):
+    st.subheader("Turmas")
+    st.dataframe([
+        {
+            "Turma": t["turma"],
+            "Alunos": t["alunos"],
+            "Respostas avaliadas": t["respostas_avaliadas"],
+            "Média das notas": t["media_nota"],
+            "1 tentativa": t["distribuicao_tentativas"]["1"],
+            "2 tentativas": t["distribuicao_tentativas"]["2"],
+            "3+ tentativas": t["distribuicao_tentativas"]["3+"],
+            "Liberações pendentes": t["liberacoes_pendentes"],
+        }
+        for t in analytics["turmas"]
+    ], use_container_width=True)
 
 st.divider()
 st.info("💡 Use o menu lateral para agendar as liberações de conteúdo para as turmas.")
\ No newline at end of file
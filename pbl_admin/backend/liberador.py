@@ -1,6 +1,21 @@
 from backend.db import supabase
 from datetime import datetime
 
+def _liberar(agendamento):
+    """
+    Libera os desafios das turmas do agendamento e o marca como liberado numa única
+    transação (pbl_liberar_conteudo, fastapi_backend/sql/004): o join com os usuários é feito
+    no banco, sem buscar os CPFs das turmas. Retorna -1 se o agendamento já estava liberado.
+    """
+    tipo_desejado = "macro" if agendamento.get("aula") is None else "micro"
+    res = supabase.rpc("pbl_liberar_conteudo", {
+        "p_conteudo_id": str(agendamento["conteudo_id"]),
+        "p_tipo": tipo_desejado,
+        "p_turmas": agendamento.get("turmas") or [],
+        "p_agendamento_id": str(agendamento["id"]),
+    }).execute()
+    return res.data if isinstance(res.data, int) else 0
+
 def liberar_agendamentos_pendentes():
     """Processa agendamentos vencidos e atualiza os desafios correspondentes"""
     agora = datetime.now()
@@ -26,61 +41,20 @@ def liberar_agendamentos_pendentes():
             if agora < liberacao_datetime:
                 continue  # ainda não é hora
 
-            conteudo_id = agendamento["conteudo_id"]
-            turma_lista = agendamento.get("turmas", [])
-            aula = agendamento.get("aula")  # se for None, é macro
-
-            # Buscar CPFs das turmas
-            alunos = supabase.table("PBL - usuarios").select("cpf").in_("turma", turma_lista).execute().data
-            cpfs = [a["cpf"] for a in alunos]
-
-            if not cpfs:
-                print(f"⚠️ Nenhum aluno encontrado para turmas {turma_lista}")
-                continue
-
-            tipo_desejado = "macro" if aula is None else "micro"
-
-            for cpf in cpfs:
-                # Atualiza apenas os desafios relevantes
-                supabase.table("PBL - desafios").update({"desafio_liberado": True}) \
-                    .eq("cpf", cpf) \
-                    .eq("conteudo_id", conteudo_id) \
-                    .eq("tipo", tipo_desejado) \
-                    .execute()
-
-            # Marca agendamento como processado
-            supabase.table("PBL - liberacoes_agendadas").update({"liberado": True}) \
-                .eq("id", agendamento["id"]).execute()
+            n = _liberar(agendamento)
+            if n < 0:
+                continue  # já processado por outro processo (API ou agendador)
 
-            print(f"✅ Liberado {tipo_desejado} para {len(cpfs)} usuários (Agendamento ID {agendamento['id']})")
+            print(f"✅ Liberados {n} desafios (Agendamento ID {agendamento['id']})")
 
         except Exception as e:
             print(f"❌ Erro ao processar agendamento {agendamento.get('id')}: {e}")
 
 def forcar_liberacao_agendamento(agendamento):
     """Libera os desafios de um único agendamento, independente da data"""
-    conteudo_id = agendamento["conteudo_id"]
-    turma_lista = agendamento.get("turmas", [])
-    aula = agendamento.get("aula")
-    tipo_desejado = "macro" if aula is None else "micro"
-
-    alunos = supabase.table("PBL - usuarios").select("cpf").in_("turma", turma_lista).execute().data
-    cpfs = [a["cpf"] for a in alunos]
-
-    if not cpfs:
-        print(f"⚠️ Nenhum aluno encontrado para turmas {turma_lista}")
+    n = _liberar(agendamento)
+    if n < 0:
+        print(f"⚠️ Agendamento {agendamento.get('id')} já havia sido liberado")
         return
 
-    for cpf in cpfs:
-        supabase.table("PBL - desafios").update({"desafio_liberado": True}) \
-            .eq("cpf", cpf) \
-            .eq("conteudo_id", conteudo_id) \
-            .eq("tipo", tipo_desejado) \
-            .execute()
-
-    supabase.table("PBL - liberacoes_agendadas").update({"liberado": True}) \
-        .eq("id", agendamento["id"]) \
-        .execute()
-
-    print(f"✅ Desafios {tipo_desejado} liberados para {len(cpfs)} CPFs")
-
+    print(f"✅ {n} desafios liberados (Agendamento ID {agendamento.get('id')})")
@@ -0,0 +1,93 @@
+# scripts/pubsub_local.py
+"""
+Servidor pub/sub compatível com Redis (apenas PUBLISH/SUBSCRIBE/UNSUBSCRIBE/PING), para
+rodar o broker do WebSocket localmente sem instalar o Redis:
+
+    python scripts/pubsub_local.py --porta 6380
+    WS_BROKER_URL=redis://127.0.0.1:6380 uvicorn fastapi_backend.main:app --workers 4
+"""
+import argparse
+import asyncio
+from typing import Dict, Set
+
+
+def _bulk(valor: bytes) -> bytes:
+    return b"$%d\r\n%s\r\n" % (len(valor), valor)
+
+
+def _array(*itens: bytes) -> bytes:
+    return b"*%d\r\n" % len(itens) + b"".join(itens)
+
+
+class ServidorPubSub:
+    def __init__(self):
+        self.canais: Dict[bytes, Set[asyncio.StreamWriter]] = {}
+
+    async def _ler_comando(self, reader: asyncio.StreamReader):
+        linha = await reader.readline()
+        if not linha:
+            return None
+        if not linha.startswith(b"*"):
+            return linha.strip().split()  # comando inline (ex.: redis-cli / telnet)
+        partes = []
+        for _ in range(int(linha[1:])):
+            tamanho = int((await reader.readline())[1:])
+            partes.append((await reader.readexactly(tamanho + 2))[:-2])
+        return partes
+
+    async def atender(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        assinados: Set[bytes] = set()
+        try:
+            while True:
+                comando = await self._ler_comando(reader)
+                if comando is None:
+                    break
+                if not comando:
+                    continue
+                nome, args = comando[0].upper(), comando[1:]
+                if nome == b"PUBLISH":
+                    canal, mensagem = args
+                    destinos = list(self.canais.get(canal, ()))
+                    for destino in destinos:
+                        destino.write(_array(_bulk(b"message"), _bulk(canal), _bulk(mensagem)))
+                    writer.write(b":%d\r\n" % len(destinos))
+                elif nome in (b"SUBSCRIBE", b"UNSUBSCRIBE"):
+                    for canal in args or list(assinados):
+                        if nome == b"SUBSCRIBE":
+                            assinados.add(canal)
+                            self.canais.setdefault(canal, set()).add(writer)
+                        else:
+                            assinados.discard(canal)
+                            self.canais.get(canal, set()).discard(writer)
+                        writer.write(_array(_bulk(nome.lower()), _bulk(canal), b":%d\r\n" % len(assinados)))
+                elif nome == b"PING":
+                    writer.write(_array(_bulk(b"pong"), _bulk(b"")) if assinados else b"+PONG\r\n")
+                else:
+                    # CLIENT SETINFO, SELECT etc.: aceitos sem efeito
+                    writer.write(b"+OK\r\n")
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            for canal in assinados:
+                self.canais.get(canal, set()).discard(writer)
+            writer.close()
+
+
+async def iniciar_servidor(host: str = "127.0.0.1", porta: int = 6380) -> asyncio.AbstractServer:
+    return await asyncio.start_server(ServidorPubSub().atender, host, porta)
+
+
+async def _main(host: str, porta: int):
+    servidor = await iniciar_servidor(host, porta)
+    print(f"Pub/sub local em redis://{host}:{porta}")
+    async with servidor:
+        await servidor.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=6380)
+    args = parser.parse_args()
+    asyncio.run(_main(args.host, args.porta))
@@ -0,0 +1,116 @@
+# tests/conftest.py
+"""Fakes compartilhados pelos testes (importe com ``from conftest import ...``)."""
+import asyncio
+from types import SimpleNamespace
+
+from fastapi_backend.diretorio import DiretorioUsuarios
+
+
+class FakeWebSocket:
+    """WebSocket em memória: guarda os textos enviados e o código de fechamento."""
+    def __init__(self, atraso=0.0):
+        self.atraso, self.recebidas, self.fechado_com = atraso, [], None
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, texto):
+        await asyncio.sleep(self.atraso)
+        self.recebidas.append(texto)
+
+    async def close(self, code=1000):
+        self.fechado_com = code
+
+
+class DiretorioEmMemoria(DiretorioUsuarios):
+    """Diretório sobre uma lista de usuários, contando as idas ao "banco"."""
+    def __init__(self, usuarios, **kwargs):
+        super().__init__(**kwargs)
+        self.usuarios = usuarios
+        self.consultas = 0
+
+    def _carregar(self):
+        self.consultas += 1
+        return [dict(u) for u in self.usuarios]
+
+    def _buscar(self, cpfs):
+        self.consultas += 1
+        return [dict(u) for u in self.usuarios if u["cpf"] in cpfs]
+
+
+class FakeQuery:
+    """Query builder mínimo do supabase-py sobre ``FakeSupabase.tabelas``."""
+    def __init__(self, db, tabela):
+        self.db, self.tabela, self.filtros, self.modo, self.payload = db, tabela, [], "select", None
+        self.um = False
+
+    def select(self, *_args, **_kwargs):
+        return self
+
+    def eq(self, coluna, valor):
+        self.filtros.append((coluna, valor))
+        return self
+
+    def single(self):
+        self.um = True
+        return self
+
+    maybe_single = single
+
+    def insert(self, payload):
+        self.modo, self.payload = "insert", payload
+        return self
+
+    def upsert(self, payload, on_conflict="", ignore_duplicates=False):
+        self.modo, self.payload, self.chave = "upsert", payload, on_conflict.split(",")
+        return self
+
+    def _executar(self):
+        self.db.consultas += 1
+        if self.modo == "rpc":
+            return SimpleNamespace(data=self.db.rpcs[self.tabela](self.payload))
+        if self.modo != "select" and self.db.falhar_escrita:
+            raise RuntimeError("fora do ar")
+        linhas = self.db.tabelas.setdefault(self.tabela, [])
+        if self.modo == "insert":
+            linhas.extend(dict(l) for l in self.payload)
+            return SimpleNamespace(data=self.payload)
+        if self.modo == "upsert":
+            chaves = {tuple(l.get(c) for c in self.chave) for l in linhas}
+            novas = [dict(l) for l in self.payload if tuple(l.get(c) for c in self.chave) not in chaves]
+            linhas.extend(novas)
+            return SimpleNamespace(data=novas)
+        achados = [l for l in linhas if all(l.get(c) == v for c, v in self.filtros)]
+        if self.um:
+            return SimpleNamespace(data=achados[0] if achados else None)
+        return SimpleNamespace(data=achados)
+
+    def execute(self):
+        return self._executar()
+
+
+class FakeSupabase:
+    """Cliente Supabase em memória: tabelas como listas de dicts e RPCs como funções dos parâmetros."""
+    _query = FakeQuery
+
+    def __init__(self, tabelas=None, rpcs=None):
+        self.tabelas, self.rpcs, self.consultas = tabelas if tabelas is not None else {}, rpcs or {}, 0
+        self.falhar_escrita = False
+
+    def table(self, nome):
+        return self._query(self, nome)
+
+    def rpc(self, nome, parametros):
+        consulta = self._query(self, nome)
+        consulta.modo, consulta.payload = "rpc", parametros
+        return consulta
+
+
+class FakeQueryAsync(FakeQuery):
+    async def execute(self):
+        return self._executar()
+
+
+class FakeSupabaseAsync(FakeSupabase):
+    """Mesmo fake, com ``execute`` aguardável como no cliente assíncrono."""
+    _query = FakeQueryAsync
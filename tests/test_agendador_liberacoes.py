@@ -0,0 +1,112 @@
+# tests/test_agendador_liberacoes.py
+import asyncio
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from fastapi_backend import agendador_liberacoes as modulo
+
+
+class FakeAsyncQuery:
+    def __init__(self, linhas):
+        self.linhas = linhas
+
+    def select(self, *_args, **_kwargs):
+        return self
+
+    def eq(self, *_args):
+        return self
+
+    async def execute(self):
+        return SimpleNamespace(data=[dict(l) for l in self.linhas])
+
+
+def _agendamento(id_, instante, turmas=("T1",)):
+    return {
+        "id": id_, "conteudo_id": f"c{id_}", "aula": "Aula", "turmas": list(turmas), "liberado": False,
+        "data_liberacao": instante.date().isoformat(), "hora_liberacao": instante.time().isoformat(),
+    }
+
+
+def test_libera_no_horario_em_ordem_e_avisa_ws(monkeypatch):
+    agora = datetime.now()
+    linhas = [
+        _agendamento(2, agora + timedelta(seconds=0.4)),
+        _agendamento(1, agora - timedelta(minutes=5)),
+        _agendamento(3, agora + timedelta(days=1)),
+    ]
+    liberados, avisos = [], []
+
+    async def fake_supabase():
+        return SimpleNamespace(table=lambda _nome: FakeAsyncQuery(linhas))
+
+    async def fake_liberar(agendamento):
+        liberados.append((agendamento["id"], datetime.now()))
+        return 10
+
+    async def fake_enviar_para_turmas(turmas, mensagem):
+        avisos.append((turmas, mensagem))
+
+    monkeypatch.setattr(modulo, "get_supabase_async", fake_supabase)
+    monkeypatch.setattr(modulo, "liberar_agendamento", fake_liberar)
+    monkeypatch.setattr(modulo.manager, "enviar_para_turmas", fake_enviar_para_turmas)
+
+    async def cenario():
+        agendador = modulo.AgendadorLiberacoes()
+        await agendador.iniciar()
+        await asyncio.sleep(0.7)
+        estado = agendador.estatisticas()
+        await agendador.parar()
+        return estado
+
+    estado = asyncio.run(cenario())
+
+    assert [i for i, _ in liberados] == [1, 2]
+    # O agendamento futuro dispara no instante marcado, não antes
+    assert liberados[1][1] >= agora + timedelta(seconds=0.4)
+    assert len(avisos) == 2
+    assert avisos[0] == (["T1"], {**modulo.mensagem_liberacao(linhas[1]), "turmas": ["T1"]})
+    assert estado["pendentes"] == 1 and estado["desafios_liberados"] == 20
+
+
+def test_falha_respeita_backoff_mesmo_com_recargas(monkeypatch):
+    agora = datetime.now()
+    linhas = [_agendamento(1, agora - timedelta(minutes=5))]
+    tentativas = []
+
+    async def fake_supabase():
+        return SimpleNamespace(table=lambda _nome: FakeAsyncQuery(linhas))
+
+    async def fake_liberar(agendamento):
+        tentativas.append(datetime.now())
+        if len(tentativas) == 1:
+            raise RuntimeError("PostgREST indisponível")
+        linhas[0]["liberado"] = True
+        return 3
+
+    async def fake_enviar_para_turmas(turmas, mensagem):
+        pass
+
+    monkeypatch.setattr(modulo, "get_supabase_async", fake_supabase)
+    monkeypatch.setattr(modulo, "liberar_agendamento", fake_liberar)
+    monkeypatch.setattr(modulo.manager, "enviar_para_turmas", fake_enviar_para_turmas)
+    # Recarga a cada volta do laço: o agendamento (ainda pendente no banco) é reencontrado no
+    # instante original, já passado, e não pode furar o backoff
+    monkeypatch.setattr(modulo, "AGENDADOR_LIBERACOES_SYNC_SEGUNDOS", 0)
+    monkeypatch.setattr(modulo, "AGENDADOR_LIBERACOES_RETRY_SEGUNDOS", 0.4)
+    monkeypatch.setattr(modulo, "ESPERA_MAXIMA_SEGUNDOS", 0.05)
+
+    async def cenario():
+        agendador = modulo.AgendadorLiberacoes()
+        await agendador.iniciar()
+        await asyncio.sleep(0.3)
+        antes_do_backoff = len(tentativas)
+        await asyncio.sleep(0.4)
+        estado = agendador.estatisticas()
+        await agendador.parar()
+        return antes_do_backoff, estado
+
+    antes_do_backoff, estado = asyncio.run(cenario())
+
+    assert antes_do_backoff == 1
+    assert len(tentativas) == 2 and tentativas[1] - tentativas[0] >= timedelta(seconds=0.4)
+    assert estado["falhas"] == 1 and estado["liberados"] == 1
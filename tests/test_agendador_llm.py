@@ -0,0 +1,83 @@
+# tests/test_agendador_llm.py
+import asyncio
+
+from fastapi_backend.agendador_llm import AgendadorLLM
+
+
+def test_rodizio_entre_alunos():
+    async def cenario():
+        agendador = AgendadorLLM(rpm=60_000, tpm=60_000)
+        ordem = []
+
+        async def chamar(cpf):
+            await agendador.aguardar_vez(cpf, 10)
+            ordem.append(cpf)
+
+        # O aluno "a" chega primeiro com várias chamadas; "b" não deve esperar por todas
+        tarefas = [asyncio.create_task(chamar("a")) for _ in range(4)]
+        tarefas.append(asyncio.create_task(chamar("b")))
+        await asyncio.gather(*tarefas)
+        return ordem
+
+    ordem = asyncio.run(cenario())
+    assert ordem.index("b") <= 1
+
+
+def test_respeita_limite_de_tokens():
+    async def cenario():
+        # 6000 tokens/min = 100 tokens/s, com o balde inicialmente cheio
+        agendador = AgendadorLLM(rpm=60_000, tpm=6_000)
+        loop = asyncio.get_running_loop()
+        inicio = loop.time()
+        await agendador.aguardar_vez("a", 6_000)
+        await agendador.aguardar_vez("a", 20)
+        return loop.time() - inicio, agendador.estatisticas()
+
+    decorrido, stats = asyncio.run(cenario())
+    assert decorrido >= 0.15
+    assert stats["total_requisicoes"] == 2
+
+
+class BucketsFalsos:
+    """Buckets "compartilhados" (no lugar do Redis), que podem ser derrubados."""
+    def __init__(self):
+        self.reservas, self.ajustes, self.fora = [], [], False
+
+    async def reservar(self, tokens):
+        if self.fora:
+            raise ConnectionError("Redis indisponível")
+        self.reservas.append(tokens)
+        return 0.0
+
+    async def ajustar(self, diferenca):
+        self.ajustes.append(diferenca)
+
+
+def test_limites_compartilhados_e_queda_do_redis(capsys):
+    buckets = BucketsFalsos()
+
+    class AgendadorCompartilhado(AgendadorLLM):
+        def _criar_compartilhados(self):
+            return buckets
+
+    async def cenario():
+        # Buckets locais de 1 requisição/min: só o compartilhado deixa passar as duas primeiras
+        agendador = AgendadorCompartilhado(rpm=1, tpm=60_000, url="redis://fake")
+        await agendador.aguardar_vez("a", 10)
+        await agendador.aguardar_vez("b", 20)
+        agendador.ajustar(20, 25)
+        await asyncio.sleep(0)
+
+        # Redis fora: volta aos buckets do processo (a primeira passa; a segunda esperaria 1 min)
+        buckets.fora = True
+        await agendador.aguardar_vez("a", 10)
+        segunda = asyncio.create_task(agendador.aguardar_vez("a", 10))
+        await asyncio.sleep(0.05)
+        assert not segunda.done()
+        segunda.cancel()
+        return agendador.estatisticas()
+
+    stats = asyncio.run(cenario())
+    assert buckets.reservas == [10, 20] and buckets.ajustes == [5]
+    assert stats["limites"] == "memoria" and stats["total_requisicoes"] == 3
+    assert capsys.readouterr().out.count("limites compartilhados da OpenAI indisponíveis") == 1
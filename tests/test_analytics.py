@@ -0,0 +1,32 @@
+# tests/test_analytics.py
+from fastapi_backend.analytics import resumir_turma
+
+
+def test_resumo_da_turma_por_modulo():
+    conteudos = {
+        "m1": {"id": "m1", "modulo": "Módulo 01"},
+        "m1a1": {"id": "m1a1", "modulo": "Módulo 01"},
+        "m2a1": {"id": "m2a1", "modulo": "Módulo 02"},
+    }
+    agregados = [
+        {"conteudo_id": "m1", "respostas_avaliadas": 12, "soma_notas": 96, "alunos_responderam": 8,
+         "alunos_finalizaram": 2, "alunos_1_tentativa": 5, "alunos_2_tentativas": 2, "alunos_3_tentativas": 1},
+        {"conteudo_id": "m1a1", "respostas_avaliadas": 4, "soma_notas": 24, "alunos_responderam": 4,
+         "alunos_finalizaram": 0, "alunos_1_tentativa": 4, "alunos_2_tentativas": 0, "alunos_3_tentativas": 0},
+        # Respondido antes de ser liberado para a turma: entra na média, não na taxa de conclusão
+        {"conteudo_id": "m2a1", "respostas_avaliadas": 1, "soma_notas": 10, "alunos_responderam": 1,
+         "alunos_finalizaram": 0, "alunos_1_tentativa": 1, "alunos_2_tentativas": 0, "alunos_3_tentativas": 0},
+    ]
+    liberados = [{"conteudo_id": "m1"}, {"conteudo_id": "m1a1"}]
+    resumo = resumir_turma("T1", {"alunos": 10, "liberacoes_pendentes": 3}, agregados, liberados, conteudos)
+
+    assert resumo["media_nota"] == round(130 / 17, 2)
+    assert resumo["distribuicao_tentativas"] == {"1": 10, "2": 2, "3+": 1}
+    assert resumo["liberacoes_pendentes"] == 3
+    m1, m2 = resumo["modulos"]
+    assert (m1["modulo"], m1["conteudos_liberados"], m1["media_nota"]) == ("Módulo 01", 2, 7.5)
+    assert m1["taxa_conclusao"] == 0.6 and m1["taxa_finalizacao"] == 0.1
+    assert m2["conteudos_liberados"] == 0 and m2["taxa_conclusao"] is None
+
+    vazio = resumir_turma("T9", None, [], [], conteudos)
+    assert vazio["alunos"] == 0 and vazio["media_nota"] is None and vazio["modulos"] == []
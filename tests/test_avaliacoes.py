@@ -0,0 +1,164 @@
+# tests/test_avaliacoes.py
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from supabase import ClientOptions, create_client
+
+from benchmarks.fake_postgrest import criar_app
+from conftest import FakeWebSocket
+from fastapi_backend import avaliacoes, avaliador, llm
+from fastapi_backend.conexoes import ConnectionManager
+
+TABELA = avaliacoes.TABELA_RESPOSTAS
+
+
+def _resposta(id_, status, data_envio, iniciada_em=None, cpf="1"):
+    return {"id": id_, "cpf": cpf, "desafio_id": "d1", "conteudo_id": "c1", "tentativa": 1,
+            "texto_resposta": f"resposta {id_}", "data_envio": data_envio.isoformat(),
+            "status_avaliacao": status,
+            "avaliacao_iniciada_em": iniciada_em.isoformat() if iniciada_em else None}
+
+
+@pytest.fixture
+def banco(monkeypatch):
+    app = criar_app({TABELA: [], "PBL - desafios": [{"id": "d1", "texto_desafio": "Explique X."}]})
+    supabase = create_client("http://fake", "chave", options=ClientOptions(httpx_client=TestClient(app)))
+    monkeypatch.setattr(avaliacoes, "get_supabase_client", lambda: supabase)
+
+    async def fake_turma(cpf):
+        return "T1"
+
+    monkeypatch.setattr(avaliacoes, "turma_do_aluno", fake_turma)
+    return app.state.banco
+
+
+def _linha(banco, id_):
+    return next(r for r in banco.tabelas[TABELA] if r["id"] == id_)
+
+
+def test_workers_avaliam_e_entregam_pelo_websocket(banco, monkeypatch):
+    agora = datetime.utcnow()
+    banco.tabelas[TABELA] += [_resposta("r1", "pendente", agora), _resposta("r2", "pendente", agora)]
+    avaliadas = []
+
+    async def fake_avaliar(texto, desafio, tentativa, cpf, turma, propagar_erros=False):
+        assert propagar_erros
+        avaliadas.append((texto, desafio, turma))
+        if texto == "resposta r2":
+            raise RuntimeError("OpenAI fora")
+        return 8, "Bom.", "Ideal."
+
+    monkeypatch.setattr(avaliacoes, "avaliar_resposta_com_ia", fake_avaliar)
+    monkeypatch.setattr(avaliacoes, "manager", ConnectionManager())
+
+    async def cenario():
+        ws = FakeWebSocket()
+        await avaliacoes.manager.connect(ws, "1", "T1")
+        pool = avaliacoes.AvaliacaoPool()
+        await pool.iniciar(workers=2)  # o startup recoloca as pendentes na fila
+        await pool._fila.join()
+        pool.enfileirar("r1")  # já avaliada: a reserva falha e nada é reavaliado
+        await asyncio.sleep(0.05)
+        await pool._fila.join()
+        await asyncio.sleep(0.05)
+        await pool.parar()
+        return [json.loads(texto) for texto in ws.recebidas]
+
+    recebidas = asyncio.run(cenario())
+
+    assert sorted(avaliadas) == [("resposta r1", "Explique X.", "T1"), ("resposta r2", "Explique X.", "T1")]
+    r1, r2 = _linha(banco, "r1"), _linha(banco, "r2")
+    assert (r1["status_avaliacao"], r1["nota"], r1["feedback"]) == ("avaliada", 8, "Bom.")
+    assert r1["avaliacao_iniciada_em"] is not None
+    assert r2["status_avaliacao"] == "erro"
+    por_id = {m["id"]: m for m in recebidas}
+    assert len(recebidas) == 2
+    assert por_id["r1"] == {"tipo": "avaliacao", "id": "r1", "desafio_id": "d1", "tentativa": 1,
+                            "status": "avaliada", "nota": 8, "feedback": "Bom.", "sugestao": "Ideal."}
+    assert por_id["r2"]["status"] == "erro"
+
+
+def test_recuperacao_usa_o_inicio_da_avaliacao(banco, monkeypatch):
+    monkeypatch.setattr(avaliacoes, "AVALIACAO_TIMEOUT_SEGUNDOS", 300)
+    agora = datetime.utcnow()
+    antigo = agora - timedelta(minutes=10)
+    banco.tabelas[TABELA] += [
+        # Esperou na fila mais que o timeout, mas começou a ser avaliada agora: não é abandonada
+        _resposta("em_andamento", "avaliando", antigo, iniciada_em=agora),
+        _resposta("abandonada", "avaliando", agora, iniciada_em=antigo),
+        _resposta("sem_inicio", "avaliando", antigo),
+        _resposta("pendente", "pendente", agora - timedelta(minutes=1)),
+        _resposta("avaliada", "avaliada", antigo, iniciada_em=antigo),
+    ]
+
+    async def recuperar():
+        pool = avaliacoes.AvaliacaoPool()
+        pool._fila = asyncio.Queue()
+        await pool.recuperar_pendentes()
+        return [pool._fila.get_nowait() for _ in range(pool._fila.qsize())]
+
+    recolocadas = asyncio.run(recuperar())
+
+    assert sorted(recolocadas) == ["abandonada", "pendente", "sem_inicio"]
+    assert _linha(banco, "em_andamento")["status_avaliacao"] == "avaliando"
+    assert _linha(banco, "abandonada")["avaliacao_iniciada_em"] is None
+    assert _linha(banco, "avaliada")["status_avaliacao"] == "avaliada"
+
+
+def test_abandonada_recente_e_devolvida_depois_do_startup(banco, monkeypatch):
+    # Restart rápido: a avaliação que o processo anterior fazia ainda não passou do timeout
+    monkeypatch.setattr(avaliacoes, "AVALIACAO_TIMEOUT_SEGUNDOS", 0.2)
+    agora = datetime.utcnow()
+    banco.tabelas[TABELA].append(_resposta("r1", "avaliando", agora, iniciada_em=agora))
+
+    async def fake_avaliar(texto, desafio, tentativa, cpf, turma, propagar_erros=False):
+        return 7, "Ok.", "Ideal."
+
+    monkeypatch.setattr(avaliacoes, "avaliar_resposta_com_ia", fake_avaliar)
+    monkeypatch.setattr(avaliacoes, "manager", ConnectionManager())
+
+    async def cenario():
+        pool = avaliacoes.AvaliacaoPool()
+        await pool.iniciar(workers=1)
+        no_startup = _linha(banco, "r1")["status_avaliacao"]
+        for _ in range(50):
+            await asyncio.sleep(0.02)
+            if _linha(banco, "r1")["status_avaliacao"] == "avaliada":
+                break
+        await pool.parar()
+        return no_startup
+
+    assert asyncio.run(cenario()) == "avaliando"
+    assert (_linha(banco, "r1")["status_avaliacao"], _linha(banco, "r1")["nota"]) == ("avaliada", 7)
+
+
+def test_falha_da_ia_vira_erro_ou_adiamento_e_nao_nota_zero(banco, monkeypatch):
+    agora = datetime.utcnow()
+    banco.tabelas[TABELA] += [_resposta("falha", "pendente", agora), _resposta("fora", "pendente", agora)]
+    monkeypatch.setattr(avaliacoes, "LLM_CIRCUITO_RESET_SEGUNDOS", 60)
+    monkeypatch.setattr(avaliacoes, "manager", ConnectionManager())
+
+    async def fake_completar(prompt, **kwargs):
+        if "resposta falha" in prompt:
+            raise RuntimeError("OpenAI fora")
+        raise llm.LLMIndisponivelError("circuito aberto")
+
+    # Avaliador real: na rota síncrona a falha ainda vira nota 0 com feedback genérico
+    monkeypatch.setattr(avaliador, "completar", fake_completar)
+    assert asyncio.run(avaliador.avaliar_resposta_com_ia("resposta falha", "x", 1))[0] == 0.0
+
+    async def cenario():
+        pool = avaliacoes.AvaliacaoPool()
+        await pool.iniciar(workers=1)
+        await pool._fila.join()
+        await pool.parar()
+
+    asyncio.run(cenario())
+
+    falha, fora = _linha(banco, "falha"), _linha(banco, "fora")
+    assert falha["status_avaliacao"] == "erro" and falha.get("nota") is None
+    # Circuito aberto: volta a ficar pendente para quando a OpenAI voltar
+    assert fora["status_avaliacao"] == "pendente" and fora.get("nota") is None
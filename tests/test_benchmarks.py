@@ -0,0 +1,52 @@
+# tests/test_benchmarks.py
+import asyncio
+
+import httpx
+from supabase import AsyncClientOptions, acreate_client
+
+from benchmarks.dados import gerar_dados
+from benchmarks.fake_postgrest import criar_app
+from benchmarks.relatorio import percentil
+from benchmarks.websocket import tendencia_mb_por_hora
+
+
+def test_percentil_interpolado():
+    valores = list(range(1, 101))
+    assert percentil(valores, 50) == 50.5
+    assert percentil(valores, 99) == 99.01
+    assert percentil([], 95) == 0.0
+
+
+def test_tendencia_do_rss_usa_a_segunda_metade_do_soak():
+    # Aquecimento (primeira metade) não conta; depois cresce 1 MB a cada 60 s
+    amostras = [{"t": t, "rss_mb": 100.0} for t in range(0, 300, 60)]
+    amostras += [{"t": 300 + t, "rss_mb": 200.0 + t / 60} for t in range(0, 600, 60)]
+    assert tendencia_mb_por_hora(amostras) == 60.0
+    assert tendencia_mb_por_hora([{"t": 0, "rss_mb": None}]) == 0.0
+
+
+def test_postgrest_falso_atende_o_cliente_supabase():
+    app = criar_app(gerar_dados(turmas=2, alunos_por_turma=3, modulos=1, aulas_por_modulo=2))
+
+    async def cenario():
+        http = httpx.AsyncClient(transport=httpx.ASGITransport(app=app))
+        supabase = await acreate_client("http://fake", "chave", options=AsyncClientOptions(httpx_client=http))
+
+        r = await supabase.table("PBL - usuarios").select("cpf, turma", count="exact").eq("turma", "T2").order("cpf", desc=True).limit(2).execute()
+        assert r.count == 3 and [u["cpf"] for u in r.data] == ["00000000006", "00000000005"]
+
+        r = await supabase.table("PBL - usuarios").select("nome").eq("cpf", "00000000001").single().execute()
+        assert r.data == {"nome": "Aluno 1"}
+
+        r = await supabase.table("PBL - desafios").select("id").in_("cpf", ["00000000001", "00000000004"]).eq("tipo", "micro").execute()
+        assert len(r.data) == 4
+
+        await supabase.table("PBL - geracao_jobs").upsert({"cpf": "1", "status": "pendente"}, on_conflict="cpf").execute()
+        r = await supabase.table("PBL - geracao_jobs").upsert({"cpf": "1", "status": "concluido"}, on_conflict="cpf").execute()
+        assert len(app.state.banco.tabelas["PBL - geracao_jobs"]) == 1 and r.data[0]["status"] == "concluido"
+
+        r = await supabase.rpc("pbl_liberar_conteudo", {"p_conteudo_id": "m1a2", "p_tipo": "micro", "p_turmas": ["T1"], "p_agendamento_id": None}).execute()
+        assert r.data == 3
+        await http.aclose()
+
+    asyncio.run(cenario())
@@ -0,0 +1,56 @@
+# tests/test_cache_avaliacao.py
+import threading
+import time
+
+from fastapi_backend.cache_avaliacao import CacheAvaliacoes, chave_avaliacao
+
+
+def test_chave_ignora_espacos_e_agrupa_tentativas():
+    base = chave_avaliacao("Desafio", "Minha  resposta\n", 1, "1")
+    assert base == chave_avaliacao("Desafio", " Minha resposta", 2, "1")
+    assert base != chave_avaliacao("Desafio", "Minha resposta", 3, "1")
+    assert base != chave_avaliacao("Desafio", "Minha resposta", 1, "2")
+
+
+def test_chamadas_simultaneas_sao_coalescidas():
+    cache = CacheAvaliacoes(max_itens=10, ttl=60)
+    chamadas = []
+
+    def calcular():
+        chamadas.append(1)
+        time.sleep(0.05)
+        return (8.0, "ok", "")
+
+    resultados = []
+    threads = [threading.Thread(target=lambda: resultados.append(cache.obter_ou_calcular("k", calcular)))
+               for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(chamadas) == 1
+    assert resultados == [(8.0, "ok", "")] * 5
+    assert cache.obter_ou_calcular("k", calcular) == (8.0, "ok", "")
+    stats = cache.estatisticas()
+    assert stats["faltas"] == 1 and stats["acertos"] == 1 and stats["coalescidas"] == 4
+
+
+def test_limite_ttl_e_excecoes():
+    cache = CacheAvaliacoes(max_itens=2, ttl=0.05)
+    for chave in ("a", "b", "c"):
+        cache.obter_ou_calcular(chave, lambda: chave)
+    assert cache.obter("a") is None and cache.obter("c") == "c"
+
+    time.sleep(0.06)
+    assert cache.obter("c") is None
+
+    def falhar():
+        raise RuntimeError("falhou")
+
+    for _ in range(2):
+        try:
+            cache.obter_ou_calcular("x", falhar)
+        except RuntimeError:
+            pass
+    assert cache.estatisticas()["faltas"] == 5
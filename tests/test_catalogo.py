@@ -0,0 +1,81 @@
+# tests/test_catalogo.py
+import asyncio
+import threading
+import time
+
+from fastapi_backend.catalogo import CatalogoConteudos
+from fastapi_backend.conexoes import ConnectionManager
+
+
+class CatalogoLento(CatalogoConteudos):
+    """Catálogo sobre uma lista em memória cuja leitura demora `atraso` segundos."""
+    def __init__(self, linhas, atraso=0.0, **kwargs):
+        super().__init__(**kwargs)
+        self.tabela, self.atraso, self.leituras = linhas, atraso, 0
+
+    def _carregar(self):
+        self.leituras += 1
+        time.sleep(self.atraso)
+        return [dict(l) for l in self.tabela]
+
+
+def test_projecoes_memorizadas_e_invalidacao():
+    tabela = [{"id": "m1", "modulo": "Módulo 01", "aula": None, "ativo": True},
+              {"id": "m1a1", "modulo": "Módulo 01", "aula": "Aula 01", "ativo": False}]
+    catalogo = CatalogoLento(tabela, ttl=60)
+
+    ativos = catalogo.conteudos(["id"])
+    assert ativos == [{"id": "m1"}] and catalogo.conteudos(["id"]) is ativos
+    _, etag = asyncio.run(catalogo.conteudos_com_etag_async(["id"], apenas_ativos=False))
+    assert catalogo.leituras == 1
+
+    tabela[1]["ativo"] = True
+    catalogo.invalidar()
+    assert catalogo.conteudos(["id"]) == [{"id": "m1"}, {"id": "m1a1"}]
+    assert asyncio.run(catalogo.conteudos_com_etag_async(["id"], apenas_ativos=False))[1] != etag
+    assert catalogo.leituras == 2
+
+
+def test_recarga_nao_bloqueia_o_event_loop():
+    catalogo = CatalogoLento([{"id": "m1", "modulo": "Módulo 01", "ativo": True}], atraso=0.5, ttl=60)
+    recarga = threading.Thread(target=catalogo.linhas)
+    recarga.start()
+
+    async def medir():
+        # Uma thread carrega; as consultas async esperam sem travar o loop e não repetem a leitura
+        maior, anterior = 0.0, time.monotonic()
+
+        async def relogio():
+            nonlocal maior, anterior
+            while recarga.is_alive():
+                await asyncio.sleep(0.01)
+                agora = time.monotonic()
+                maior, anterior = max(maior, agora - anterior), agora
+
+        tarefa = asyncio.create_task(relogio())
+        await asyncio.sleep(0.05)
+        linhas = await asyncio.gather(*(catalogo.linhas_async() for _ in range(5)))
+        await tarefa
+        assert all(l is linhas[0] for l in linhas)
+        return maior
+
+    assert asyncio.run(medir()) < 0.2
+    recarga.join()
+    assert catalogo.leituras == 1
+
+
+def test_invalidacao_pelo_broker():
+    catalogo = CatalogoLento([{"id": "m1", "modulo": "Módulo 01", "ativo": True}], ttl=60)
+    catalogo.linhas()
+
+    async def publicar():
+        # Como em main.py/worker.py: a mensagem de controle descarta o catálogo de cada processo
+        manager = ConnectionManager()
+        await manager.iniciar()
+        manager.registrar_controle("catalogo", catalogo.aplicar)
+        await manager.publicar_controle("catalogo", {})
+        await manager.parar()
+
+    asyncio.run(publicar())
+    catalogo.linhas()
+    assert catalogo.invalidacoes == 1 and catalogo.leituras == 2
@@ -0,0 +1,97 @@
+# tests/test_conexoes.py
+import asyncio
+import importlib.util
+import pathlib
+
+import pytest
+
+from fastapi_backend import conexoes
+from conftest import FakeWebSocket
+from fastapi_backend.conexoes import ConnectionManager
+
+
+def test_canais_por_turma_e_cliente_lento_descartado(monkeypatch):
+    monkeypatch.setattr(conexoes, "WS_FILA_MAX", 2)
+
+    async def cenario():
+        manager = ConnectionManager()
+        rapido, outra_turma, lento = FakeWebSocket(), FakeWebSocket(), FakeWebSocket(atraso=10)
+        await manager.connect(rapido, "1", "T1")
+        await manager.connect(outra_turma, "2", "T2")
+        await manager.connect(lento, "3", "T1")
+
+        for i in range(5):
+            await manager.enviar_para_turmas(["T1"], {"n": i})
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.05)
+        estado = manager.estatisticas()
+        manager.disconnect(rapido)
+        manager.disconnect(rapido)  # idempotente
+        manager.disconnect(outra_turma)
+        return rapido, outra_turma, lento, estado, manager
+
+    rapido, outra_turma, lento, estado, manager = asyncio.run(cenario())
+
+    assert len(rapido.recebidas) == 5
+    assert outra_turma.recebidas == []
+    assert lento.fechado_com == conexoes.CODIGO_CLIENTE_LENTO
+    assert estado["descartadas_por_lentidao"] == 1 and estado["conexoes"] == 2
+    assert manager.por_turma == {} and manager.por_cpf == {}
+
+
+def test_broker_entrega_entre_processos():
+    """Dois managers (como dois workers) ligados ao mesmo pub/sub compatível com Redis."""
+    pytest.importorskip("redis")
+    from fastapi_backend.broker import BrokerRedis
+
+    caminho = pathlib.Path(__file__).resolve().parents[1] / "scripts" / "pubsub_local.py"
+    spec = importlib.util.spec_from_file_location("pubsub_local", caminho)
+    pubsub_local = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(pubsub_local)
+
+    async def cenario():
+        servidor = await pubsub_local.iniciar_servidor(porta=0)
+        porta = servidor.sockets[0].getsockname()[1]
+        worker_a, worker_b = ConnectionManager(), ConnectionManager()
+        await worker_a.iniciar(BrokerRedis(f"redis://127.0.0.1:{porta}"))
+        await worker_b.iniciar(BrokerRedis(f"redis://127.0.0.1:{porta}"))
+        aluno_em_b, outra_turma = FakeWebSocket(), FakeWebSocket()
+        await worker_b.connect(aluno_em_b, "1", "T1")
+        await worker_a.connect(outra_turma, "2", "T2")
+
+        # A liberação é disparada pelo worker A, mas o aluno está conectado no B
+        await worker_a.enviar_para_turmas(["T1"], {"tipo": "liberacao"})
+        await worker_a.enviar_para_cpf("1", {"tipo": "avaliacao"})
+        for _ in range(100):
+            if len(aluno_em_b.recebidas) == 2:
+                break
+            await asyncio.sleep(0.01)
+
+        await worker_a.parar()
+        await worker_b.parar()
+        servidor.close()
+        return aluno_em_b, outra_turma
+
+    aluno_em_b, outra_turma = asyncio.run(cenario())
+    assert aluno_em_b.recebidas == ['{"tipo": "liberacao"}', '{"tipo": "avaliacao"}']
+    assert outra_turma.recebidas == []
+
+
+def test_erro_em_controle_nao_chega_a_quem_publicou(capsys):
+    async def cenario():
+        manager = ConnectionManager()
+        await manager.iniciar()
+        aplicadas = []
+
+        def falhar(dados):
+            raise KeyError("cpf")
+
+        manager.registrar_controle("usuario", falhar)
+        manager.registrar_controle("catalogo", aplicadas.append)
+        await manager.publicar_controle("usuario", {})
+        await manager.publicar_controle("catalogo", {"n": 1})
+        await manager.parar()
+        return aplicadas
+
+    assert asyncio.run(cenario()) == [{"n": 1}]
+    assert "mensagem de controle 'usuario'" in capsys.readouterr().out
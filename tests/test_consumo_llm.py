@@ -0,0 +1,69 @@
+# tests/test_consumo_llm.py
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from conftest import FakeSupabaseAsync
+from fastapi_backend import consumo_llm as modulo
+from fastapi_backend.consumo_llm import OrcamentoExcedidoError, RegistroConsumo, contexto_consumo
+
+
+def _uso(prompt, resposta):
+    return SimpleNamespace(prompt_tokens=prompt, completion_tokens=resposta, total_tokens=prompt + resposta)
+
+
+@pytest.fixture
+def banco(monkeypatch):
+    consumo = {"111": 900, "T1": 0}
+    fake = FakeSupabaseAsync(rpcs={
+        "pbl_uso_llm_total": lambda p: consumo.get(p.get("p_cpf") or p.get("p_turma"), 0)})
+
+    async def get_supabase_async():
+        return fake
+
+    monkeypatch.setattr(modulo, "get_supabase_async", get_supabase_async)
+    monkeypatch.setattr(modulo, "ORCAMENTO_TOKENS_ALUNO_DIA", 1000)
+    monkeypatch.setattr(modulo, "ORCAMENTO_TOKENS_TURMA_DIA", 0)
+    return fake
+
+
+def test_orcamento_do_aluno_soma_banco_e_consumo_local(banco):
+    registro = RegistroConsumo()
+
+    async def cenario():
+        with contexto_consumo(cpf="111", turma="T1"):
+            await registro.verificar_orcamento()
+            registro.registrar("avaliacao", "gpt-4o", _uso(150, 50))
+            with pytest.raises(OrcamentoExcedidoError) as erro:
+                await registro.verificar_orcamento()
+        assert erro.value.escopo == "cpf" and erro.value.usado == 1100
+        assert erro.value.retry_after > 0
+        # Outro aluno não é afetado
+        await registro.verificar_orcamento(cpf="222")
+
+    asyncio.run(cenario())
+    assert registro.rejeitadas == 1
+
+
+def test_registros_sao_gravados_em_lote_e_mantidos_em_falha(banco):
+    registro = RegistroConsumo()
+
+    async def cenario():
+        with contexto_consumo(cpf="111", turma="T1"):
+            registro.registrar("micro", "gpt-4o", _uso(1000, 1000))
+        registro.registrar("avaliacao", "gpt-4o", _uso(10, 10), cpf="222")
+
+        banco.falhar_escrita = True
+        await registro.descarregar()
+        assert registro.estatisticas()["pendentes"] == 2
+
+        banco.falhar_escrita = False
+        await registro.descarregar()
+
+    asyncio.run(cenario())
+    assert registro.gravados == 2 and registro.estatisticas()["pendentes"] == 0
+    primeiro, segundo = banco.tabelas[modulo.TABELA_USO_LLM]
+    assert (primeiro["cpf"], primeiro["turma"], primeiro["tipo"]) == ("111", "T1", "micro")
+    assert primeiro["custo_usd"] == pytest.approx(0.0125)
+    assert (segundo["cpf"], segundo["turma"]) == ("222", None)
@@ -0,0 +1,78 @@
+# tests/test_diretorio.py
+import asyncio
+import threading
+import time
+
+from conftest import DiretorioEmMemoria
+
+
+def test_indices_invalidacao_e_ttl():
+    usuarios = [{"cpf": "00", "nome": "Admin", "turma": None, "role": "admin"}]
+    usuarios += [{"cpf": f"{i:02d}", "nome": f"Aluno {i}", "turma": f"T{1 + i % 2}", "role": None,
+                  "formulario_finalizado": False} for i in range(1, 7)]
+    diretorio = DiretorioEmMemoria(usuarios, ttl=60)
+
+    assert diretorio.turmas() == ["T1", "T2"]
+    assert diretorio.cpfs_da_turma("T2") == ["01", "03", "05"]
+    assert diretorio.usuario("00")["role"] == "admin"
+    assert asyncio.run(diretorio.turma_async("02")) == "T1"
+    assert diretorio.cpfs_da_turma("T2", apenas_formulario_finalizado=True) == []
+    assert diretorio.consultas == 1  # tudo da memória
+
+    # Formulário salvo e aluno trocado de turma: só a linha do CPF invalidado é relida
+    usuarios[1].update({"turma": "T1", "formulario_finalizado": True})
+    diretorio.aplicar({"cpf": "01"})
+    assert diretorio.cpfs_da_turma("T1", apenas_formulario_finalizado=True) == ["01"]
+    assert diretorio.cpfs_da_turma("T2") == ["03", "05"]
+    assert diretorio.consultas == 2
+
+    # CPF cadastrado depois da carga é buscado individualmente; inexistente, None
+    usuarios.append({"cpf": "99", "nome": "Nova", "turma": "T3", "role": None})
+    assert diretorio.usuario("99")["turma"] == "T3"
+    assert diretorio.usuario("88") is None
+    assert diretorio.turmas() == ["T1", "T2", "T3"]
+
+    # TTL vencido: recarga completa; invalidação sem CPF descarta tudo
+    diretorio._carregado_em -= 61
+    diretorio.turmas()
+    diretorio.aplicar({})
+    diretorio.turmas()
+    estatisticas = diretorio.estatisticas()
+    assert estatisticas["recargas"] == 3 and estatisticas["usuarios"] == len(usuarios)
+
+
+def test_recarga_nao_bloqueia_o_event_loop():
+    usuarios = [{"cpf": f"{i:02d}", "turma": "T1"} for i in range(5)]
+
+    class DiretorioLento(DiretorioEmMemoria):
+        def _carregar(self):
+            time.sleep(0.5)
+            return super()._carregar()
+
+    diretorio = DiretorioLento(usuarios, ttl=60)
+    diretorio.turmas()
+    diretorio.invalidar()
+    recarga = threading.Thread(target=diretorio.turmas)
+    recarga.start()
+
+    async def medir():
+        # Enquanto uma thread recarrega: invalidação (broker) e consultas async não travam o loop
+        maior, anterior = 0.0, time.monotonic()
+
+        async def relogio():
+            nonlocal maior, anterior
+            while recarga.is_alive():
+                await asyncio.sleep(0.01)
+                agora = time.monotonic()
+                maior, anterior = max(maior, agora - anterior), agora
+
+        tarefa = asyncio.create_task(relogio())
+        await asyncio.sleep(0.05)
+        diretorio.aplicar({"cpf": "01"})
+        assert (await diretorio.usuario_async("02"))["turma"] == "T1"
+        await tarefa
+        return maior
+
+    assert asyncio.run(medir()) < 0.2
+    recarga.join()
+    assert diretorio.estatisticas()["recargas"] == 2
@@ -0,0 +1,43 @@
+# tests/test_etag.py
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from fastapi_backend.etag import resposta_condicional
+
+app = FastAPI()
+DADOS = {"itens": [{"id": 1, "texto_desafio": "Texto longo " * 50}]}
+
+
+@app.get("/dados")
+def dados(request: Request):
+    return resposta_condicional(request, DADOS)
+
+
+@app.get("/versao")
+def versao(request: Request):
+    return resposta_condicional(request, DADOS, etag='"v1"')
+
+
+client = TestClient(app)
+
+
+def test_devolve_304_quando_etag_confere():
+    r = client.get("/dados")
+    assert r.status_code == 200
+    etag = r.headers["etag"]
+    assert etag.startswith('"') and r.json() == DADOS
+
+    r2 = client.get("/dados", headers={"If-None-Match": etag})
+    assert r2.status_code == 304
+    assert r2.content == b""
+    assert r2.headers["etag"] == etag
+
+    # Lista com outros valores e forma fraca também conferem
+    assert client.get("/dados", headers={"If-None-Match": f'"x", W/{etag}'}).status_code == 304
+    assert client.get("/dados", headers={"If-None-Match": '"outro"'}).status_code == 200
+
+
+def test_etag_informado_evita_serializacao():
+    assert client.get("/versao", headers={"If-None-Match": '"v1"'}).status_code == 304
+    r = client.get("/versao")
+    assert r.status_code == 200 and r.headers["etag"] == '"v1"'
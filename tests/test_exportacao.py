@@ -0,0 +1,55 @@
+# tests/test_exportacao.py
+import asyncio
+import csv
+import io
+
+import httpx
+from supabase import AsyncClientOptions, acreate_client
+
+from benchmarks.dados import gerar_dados
+from benchmarks.fake_postgrest import criar_app
+from fastapi_backend import exportacao
+
+
+def test_exporta_em_paginas_com_filtros(monkeypatch):
+    dados = gerar_dados(turmas=2, alunos_por_turma=3, modulos=2, aulas_por_modulo=1)
+    desafios = {(d["cpf"], d["conteudo_id"]): d for d in dados["PBL - desafios"]}
+    for i, usuario in enumerate(dados["PBL - usuarios"][1:]):
+        for conteudo_id in ("m1a1", "m2a1"):
+            for tentativa in (1, 2):
+                dados["PBL - respostas"].append({
+                    "id": f"{usuario['cpf']}-{conteudo_id}-{tentativa}", "cpf": usuario["cpf"],
+                    "desafio_id": desafios[(usuario["cpf"], conteudo_id)]["id"], "conteudo_id": conteudo_id,
+                    "tentativa": tentativa, "nota": 7.5, "feedback": "Bom, mas quantifique os riscos.",
+                    "texto_resposta": "...", "data_envio": f"2025-03-{10 + tentativa:02d}T10:00:{i:02d}",
+                })
+    app = criar_app(dados)
+    monkeypatch.setattr(exportacao.catalogo, "linhas_async", lambda: _valor(dados["PBL - conteudo"]))
+
+    async def exportar(**filtros):
+        http = httpx.AsyncClient(transport=httpx.ASGITransport(app=app))
+        supabase = await acreate_client("http://fake", "chave", options=AsyncClientOptions(httpx_client=http))
+        monkeypatch.setattr(exportacao, "get_supabase_async", lambda: _valor(supabase))
+        consultas = app.state.banco.consultas
+        # Páginas de 2 respostas: a exportação tem que juntar várias sem perder nem repetir
+        linhas = exportacao.linhas_respostas(lote=2, **filtros)
+        texto = b"".join([b async for b in exportacao.para_csv(linhas, exportacao.COLUNAS_EXPORTACAO, por_bloco=3)])
+        await http.aclose()
+        return list(csv.DictReader(io.StringIO(texto.decode("utf-8-sig")))), app.state.banco.consultas - consultas
+
+    linhas, consultas = asyncio.run(exportar(turma="T2"))
+    assert len(linhas) == 12 and len({l["resposta_id"] for l in linhas}) == 12
+    assert {l["turma"] for l in linhas} == {"T2"} and consultas > 6
+    assert linhas[0]["nome"].startswith("Aluno ") and linhas[0]["titulo"].startswith("Desafio m")
+    assert "texto_resposta" not in linhas[0]
+
+    linhas, _ = asyncio.run(exportar(modulo="Módulo 02", desde=exportacao.datetime(2025, 3, 12)))
+    assert len(linhas) == 6
+    assert {(l["conteudo_id"], l["aula"], l["tentativa"]) for l in linhas} == {("m2a1", "Aula 01", "2")}
+
+    linhas, _ = asyncio.run(exportar(modulo="Inexistente"))
+    assert linhas == []
+
+
+async def _valor(valor):
+    return valor
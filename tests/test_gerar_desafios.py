@@ -0,0 +1,163 @@
+# tests/test_gerar_desafios.py
+import asyncio
+import json
+import os
+
+import httpx
+
+os.environ.setdefault("OPENAI_API_KEY", "teste")
+
+from conftest import FakeSupabase
+from fastapi_backend import catalogo, gerar_desafios, llm
+
+
+class FakeOpenAI:
+    """Servidor OpenAI simulado (httpx.MockTransport) que registra o pico de chamadas simultâneas."""
+    ativos = 0
+    pico = 0
+    chamadas = 0
+
+    @classmethod
+    def instalar(cls):
+        cls.ativos = cls.pico = cls.chamadas = 0
+        llm.configurar_transporte(httpx.MockTransport(cls._responder))
+
+    @classmethod
+    async def _responder(cls, request):
+        corpo = json.loads(request.content)
+        cls.ativos += 1
+        cls.chamadas += 1
+        cls.pico = max(cls.pico, cls.ativos)
+        await asyncio.sleep(0.01)
+        cls.ativos -= 1
+        texto = "Título" if corpo.get("max_tokens") == 20 else "Texto gerado"
+        return httpx.Response(200, json={
+            "id": "chatcmpl-teste",
+            "object": "chat.completion",
+            "created": 0,
+            "model": corpo["model"],
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": texto}}],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15},
+        })
+
+
+def _banco(modulos=3, aulas=4):
+    conteudos = []
+    for m in range(modulos):
+        conteudos.append({"id": f"m{m}", "modulo": f"Módulo {m}", "aula": None, "ativo": True})
+        for a in range(aulas):
+            conteudos.append({"id": f"m{m}a{a}", "modulo": f"Módulo {m}", "aula": f"Aula {a}", "ativo": True})
+    return FakeSupabase({
+        "PBL - usuarios": [{"cpf": "1", "nome": "Aluno", "turma": "T1"}],
+        "PBL - conteudo": conteudos,
+    })
+
+
+def test_geracao_paralela_respeita_limite(monkeypatch):
+    db = _banco()
+    FakeOpenAI.instalar()
+    monkeypatch.setattr(gerar_desafios, "get_supabase_client", lambda: db)
+    monkeypatch.setattr(catalogo, "get_supabase_client", lambda: db)
+    catalogo.catalogo.invalidar()
+
+    asyncio.run(gerar_desafios.gerar_todos_os_desafios_async("1", max_concorrencia=5))
+
+    desafios = db.tabelas["PBL - desafios"]
+    assert len(desafios) == 3 + 3 * 4
+    assert FakeOpenAI.chamadas == 3 + 3 * 4 * 2
+    assert 1 < FakeOpenAI.pico <= 5
+
+
+def test_reaproveita_existentes_com_consultas_constantes(monkeypatch):
+    db = _banco(modulos=4, aulas=5)
+    db.tabelas["PBL - desafios"] = [
+        {"cpf": "1", "conteudo_id": "m0", "tipo": "macro", "texto_desafio": "Macro antigo"},
+        {"cpf": "1", "conteudo_id": "m0a0", "tipo": "micro", "texto_desafio": "Micro antigo"},
+    ]
+    FakeOpenAI.instalar()
+    monkeypatch.setattr(gerar_desafios, "get_supabase_client", lambda: db)
+    monkeypatch.setattr(catalogo, "get_supabase_client", lambda: db)
+    catalogo.catalogo.invalidar()
+
+    asyncio.run(gerar_desafios.gerar_todos_os_desafios_async("1"))
+
+    desafios = db.tabelas["PBL - desafios"]
+    assert len(desafios) == 4 + 4 * 5
+    assert len({(d["conteudo_id"], d["tipo"]) for d in desafios}) == len(desafios)
+    # usuário + conteúdos + desafios existentes + um único upsert
+    assert db.consultas == 4
+
+    # Uma segunda execução não gera nem grava nada novo, e o catálogo vem da memória
+    asyncio.run(gerar_desafios.gerar_todos_os_desafios_async("1"))
+    assert len(db.tabelas["PBL - desafios"]) == len(desafios)
+    assert db.consultas == 4 + 2
+
+
+def test_nova_tentativa_apos_erro_5xx(monkeypatch):
+    chamadas = []
+
+    def responder(request):
+        chamadas.append(request)
+        if len(chamadas) == 1:
+            return httpx.Response(503, json={"error": {"message": "indisponível"}})
+        return httpx.Response(200, json={
+            "id": "x", "object": "chat.completion", "created": 0, "model": "gpt-4o",
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": " ok "}}],
+        })
+
+    llm.configurar_transporte(httpx.MockTransport(responder))
+    monkeypatch.setattr(llm, "LLM_BACKOFF_BASE", 0.001)
+
+    assert asyncio.run(llm.completar("oi", tipo="teste")) == "ok"
+    assert len(chamadas) == 2
+    assert llm.circuito.estado == "fechado"
+    llm.configurar_transporte(None)
+
+
+def test_circuito_nao_trava_meio_aberto_apos_429_ou_cancelamento(monkeypatch):
+    respostas = []
+
+    async def responder(request):
+        acao = respostas.pop(0)
+        if acao == "lenta":
+            await asyncio.sleep(10)
+        if isinstance(acao, int):
+            return httpx.Response(acao, headers={"retry-after": "0"}, json={"error": {"message": "x"}})
+        return httpx.Response(200, json={
+            "id": "x", "object": "chat.completion", "created": 0, "model": "gpt-4o",
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "ok"}}],
+        })
+
+    llm.configurar_transporte(httpx.MockTransport(responder))
+    monkeypatch.setattr(llm, "circuito", llm.CircuitBreaker(limiar=1, tempo_reset=0))
+    monkeypatch.setattr(llm, "LLM_MAX_TENTATIVAS", 1)
+
+    async def cenario():
+        # Abre o circuito; a chamada de teste leva 429 (a API está de pé): fecha
+        respostas.extend([503, 429])
+        for _ in range(2):
+            try:
+                await llm.completar("oi", tipo="teste")
+            except Exception as e:
+                assert not isinstance(e, llm.LLMIndisponivelError)
+        assert llm.circuito.estado == "fechado"
+
+        # Reabre; a chamada de teste é cancelada no meio: a vaga é liberada para a próxima
+        respostas.extend([503, "lenta", "ok"])
+        try:
+            await llm.completar("oi", tipo="teste")
+        except Exception:
+            pass
+        assert llm.circuito.estado == "meio-aberto"
+        try:
+            await asyncio.wait_for(llm.completar("oi", tipo="teste"), timeout=0.1)
+        except asyncio.TimeoutError:
+            pass
+        return await llm.completar("oi", tipo="teste")
+
+    try:
+        assert asyncio.run(cenario()) == "ok"
+        assert llm.circuito.estado == "fechado"
+    finally:
+        llm.configurar_transporte(None)
@@ -0,0 +1,123 @@
+# tests/test_jobs.py
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+from supabase import ClientOptions, create_client
+
+from benchmarks.fake_postgrest import criar_app
+from fastapi_backend import jobs
+
+TABELA = jobs.TABELA_JOBS
+
+
+@pytest.fixture
+def banco(monkeypatch):
+    app = criar_app({TABELA: []})
+    supabase = create_client("http://fake", "chave", options=ClientOptions(httpx_client=TestClient(app)))
+    monkeypatch.setattr(jobs, "get_supabase_client", lambda: supabase)
+    return app.state.banco
+
+
+def _job(banco, cpf):
+    return next(j for j in banco.tabelas[TABELA] if j["cpf"] == cpf)
+
+
+def test_enfileirar_nao_duplica_nem_reinicia_job_em_andamento(banco):
+    job, novo = jobs.enfileirar_geracao("1")
+    assert novo and job["status"] == jobs.STATUS_PENDENTE
+    assert jobs.enfileirar_geracao("1") == (job, False)
+
+    # Pedido duplicado com o job já em execução: nada muda (antes voltava para "pendente")
+    _job(banco, "1").update({"status": jobs.STATUS_EXECUTANDO, "tentativas": 1})
+    job, novo = jobs.enfileirar_geracao("1")
+    assert not novo and job["status"] == jobs.STATUS_EXECUTANDO and job["tentativas"] == 1
+
+    # Terminado: volta para a fila do zero
+    _job(banco, "1").update({"status": jobs.STATUS_ERRO, "tentativas": 3, "ultimo_erro": "x"})
+    job, novo = jobs.enfileirar_geracao("1")
+    assert novo and (job["status"], job["tentativas"], job["ultimo_erro"]) == (jobs.STATUS_PENDENTE, 0, None)
+
+    _job(banco, "1")["status"] = jobs.STATUS_EXECUTANDO
+    assert jobs.enfileirar_geracao_em_lote(["1", "2", "2", "3"]) == {"enfileirados": 2, "ja_em_andamento": 1}
+    assert len(banco.tabelas[TABELA]) == 3
+
+
+def test_reserva_respeita_status_e_horario(banco):
+    jobs.enfileirar_geracao_em_lote(["1", "2", "3"])
+    futuro = (datetime.now(timezone.utc) + timedelta(minutes=5)).isoformat()
+    _job(banco, "3")["proxima_tentativa"] = futuro
+
+    async def reservar_todos():
+        return await asyncio.gather(*(jobs.pool._reservar_proximo_job() for _ in range(3)))
+
+    reservados = asyncio.run(reservar_todos())
+    # Reservas concorrentes: cada job vai para um só worker; o adiado fica na fila
+    assert sorted(j["cpf"] for j in reservados if j) == ["1", "2"]
+    assert all(j["status"] == jobs.STATUS_EXECUTANDO and j["tentativas"] == 1 for j in reservados if j)
+    assert _job(banco, "3")["status"] == jobs.STATUS_PENDENTE
+
+
+def test_falha_com_backoff_e_progresso(banco, monkeypatch):
+    monkeypatch.setattr(jobs, "JOBS_MAX_TENTATIVAS", 2)
+    monkeypatch.setattr(jobs, "JOBS_BACKOFF_SEGUNDOS", 30)
+    monkeypatch.setattr(jobs, "JOBS_INTERVALO_PROGRESSO", 3600)
+    jobs.enfileirar_geracao("1")
+    gravacoes = []
+
+    async def falhar(cpf, progresso=None):
+        raise RuntimeError("OpenAI fora")
+
+    async def gerar(cpf, progresso=None):
+        for feitos in range(1, 4):
+            await progresso(feitos, 3)
+            gravacoes.append(_job(banco, "1")["itens_feitos"])
+
+    async def executar(gerador):
+        monkeypatch.setattr(jobs, "gerar_todos_os_desafios_async", gerador)
+        job = await jobs.pool._reservar_proximo_job()
+        await jobs.pool._executar_job(job)
+        return _job(banco, "1")
+
+    job = asyncio.run(executar(falhar))
+    espera = datetime.fromisoformat(job["proxima_tentativa"]) - datetime.now(timezone.utc)
+    assert job["status"] == jobs.STATUS_PENDENTE and timedelta(seconds=25) < espera <= timedelta(seconds=30)
+    assert job["ultimo_erro"] == "RuntimeError: OpenAI fora"
+
+    job["proxima_tentativa"] = datetime.now(timezone.utc).isoformat()
+    job = asyncio.run(executar(falhar))
+    assert job["status"] == jobs.STATUS_ERRO and job["tentativas"] == 2
+
+    # Progresso: o primeiro e o último são gravados; os do meio respeitam o intervalo mínimo
+    jobs.enfileirar_geracao("1")
+    job = asyncio.run(executar(gerar))
+    assert gravacoes == [1, 1, 3]
+    assert (job["status"], job["itens_feitos"], job["itens_total"]) == (jobs.STATUS_CONCLUIDO, 3, 3)
+
+
+def test_job_abandonado_recente_e_devolvido_depois_do_startup(banco, monkeypatch):
+    # Restart rápido: o job que o processo anterior executava ainda não passou do timeout
+    monkeypatch.setattr(jobs, "JOBS_TIMEOUT_SEGUNDOS", 0.2)
+    jobs.enfileirar_geracao("1")
+    _job(banco, "1").update({"status": jobs.STATUS_EXECUTANDO, "tentativas": 1,
+                             "atualizado_em": datetime.now(timezone.utc).isoformat()})
+
+    async def gerar(cpf, progresso=None):
+        await progresso(1, 1)
+
+    monkeypatch.setattr(jobs, "gerar_todos_os_desafios_async", gerar)
+
+    async def cenario():
+        pool = jobs.WorkerPool()
+        await pool.iniciar(workers=1)
+        no_startup = _job(banco, "1")["status"]
+        for _ in range(50):
+            await asyncio.sleep(0.02)
+            if _job(banco, "1")["status"] == jobs.STATUS_CONCLUIDO:
+                break
+        await pool.parar()
+        return no_startup
+
+    assert asyncio.run(cenario()) == jobs.STATUS_EXECUTANDO
+    assert _job(banco, "1")["status"] == jobs.STATUS_CONCLUIDO
@@ -0,0 +1,101 @@
+# tests/test_limite_taxa.py
+import asyncio
+import os
+
+from fastapi import FastAPI, Form
+from fastapi.testclient import TestClient
+
+os.environ.setdefault("JWT_SECRET", "teste")
+
+from fastapi_backend.limite_taxa import LimitesMemoria, LimiteTaxaMiddleware, RegraLimite
+from fastapi_backend.security import create_access_token
+
+
+def _cliente(simultaneas=None, backend=None):
+    app = FastAPI()
+
+    @app.post("/auth/token")
+    async def login(username: str = Form(...)):
+        return {"cpf": username}
+
+    @app.post("/api/respostas/registrar")
+    async def registrar():
+        await asyncio.sleep(0.2)
+        return {"ok": True}
+
+    regras = [
+        RegraLimite("t_login_ip", "POST", "/auth/token", "ip", "5/60"),
+        RegraLimite("t_login_cpf", "POST", "/auth/token", "cpf", "2/60"),
+        RegraLimite("t_avaliacao_cpf", "POST", "/api/respostas/registrar", "cpf", "3/60"),
+    ]
+    app.add_middleware(LimiteTaxaMiddleware, regras=regras, simultaneas=simultaneas or {}, backend=backend or LimitesMemoria())
+    return TestClient(app)
+
+
+def test_login_limitado_por_cpf_e_ip():
+    client = _cliente()
+    assert client.post("/auth/token", data={"username": "111", "password": "x"}).json() == {"cpf": "111"}
+    assert client.post("/auth/token", data={"username": "111", "password": "x"}).status_code == 200
+
+    r = client.post("/auth/token", data={"username": "111", "password": "x"})
+    assert r.status_code == 429
+    assert int(r.headers["Retry-After"]) >= 1
+
+    # Outro CPF ainda passa, até esgotar o bucket do IP (5 requisições aceitas: a rejeitada
+    # pelo CPF não gastou ficha do IP)
+    assert client.post("/auth/token", data={"username": "222", "password": "x"}).status_code == 200
+    assert client.post("/auth/token", data={"username": "222", "password": "x"}).status_code == 200
+    assert client.post("/auth/token", data={"username": "333", "password": "x"}).status_code == 200
+    assert client.post("/auth/token", data={"username": "444", "password": "x"}).status_code == 429
+
+
+def test_avaliacao_limitada_pelo_cpf_do_token():
+    client = _cliente()
+    aluno = {"Authorization": f"Bearer {create_access_token({'sub': '111'})}"}
+    outro = {"Authorization": f"Bearer {create_access_token({'sub': '222'})}"}
+    codigos = [client.post("/api/respostas/registrar", headers=aluno).status_code for _ in range(4)]
+    assert codigos == [200, 200, 200, 429]
+    assert client.post("/api/respostas/registrar", headers=outro).status_code == 200
+
+
+def test_bucket_recarrega_com_o_tempo():
+    limites = LimitesMemoria()
+
+    async def cenario():
+        assert await limites.consumir("k", 1, 20.0) == 0
+        espera = await limites.consumir("k", 1, 20.0)
+        assert 0 < espera <= 0.05
+        await asyncio.sleep(espera + 0.01)
+        assert await limites.consumir("k", 1, 20.0) == 0
+
+    asyncio.run(cenario())
+
+
+def test_rejeitada_nao_consome_fichas_das_outras_regras():
+    limites = LimitesMemoria()
+
+    async def cenario():
+        assert await limites.consumir("cpf", 1, 0.01) == 0
+        for _ in range(5):
+            assert await limites.consumir_todos([("ip", 2, 0.01), ("cpf", 1, 0.01)]) > 0
+        assert await limites.consumir_todos([("ip", 2, 0.01), ("outro_cpf", 1, 0.01)]) == 0
+        assert await limites.consumir("ip", 2, 0.01) == 0
+
+    asyncio.run(cenario())
+
+
+class BackendFora:
+    chamadas = 0
+
+    async def consumir_todos(self, buckets):
+        self.chamadas += 1
+        raise ConnectionError("Redis indisponível")
+
+
+def test_backend_fora_do_ar_limita_em_memoria(capsys):
+    backend = BackendFora()
+    client = _cliente(backend=backend)
+    codigos = [client.post("/auth/token", data={"username": "111", "password": "x"}).status_code for _ in range(3)]
+    assert codigos == [200, 200, 429]
+    assert backend.chamadas == 3
+    assert capsys.readouterr().out.count("backend de limite de taxa indisponível") == 1
@@ -0,0 +1,48 @@
+# tests/test_metricas.py
+import httpx
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from fastapi_backend import metricas
+from fastapi_backend.metricas import Histograma, MetricasHTTPMiddleware
+
+
+def test_histograma_no_formato_prometheus():
+    h = Histograma("t_latencia", "teste", ("rota",), buckets=(0.1, 1))
+    h.observar(0.05, "/a")
+    h.observar(0.5, "/a")
+    h.observar(3, "/a")
+    linhas = h.exportar()
+    assert '# TYPE t_latencia histogram' in linhas
+    assert 't_latencia_bucket{rota="/a",le="0.1"} 1' in linhas
+    assert 't_latencia_bucket{rota="/a",le="1"} 2' in linhas
+    assert 't_latencia_bucket{rota="/a",le="+Inf"} 3' in linhas
+    assert 't_latencia_count{rota="/a"} 3' in linhas
+
+
+def test_latencia_por_template_da_rota():
+    app = FastAPI()
+
+    @app.get("/itens/{item_id}")
+    async def item(item_id: int):
+        return {"id": item_id}
+
+    app.add_middleware(MetricasHTTPMiddleware)
+    client = TestClient(app)
+    antes = metricas.http_latencia.contagem("GET", "/itens/{item_id}", "200")
+    client.get("/itens/1")
+    client.get("/itens/2")
+    client.get("/nao-existe")
+    assert metricas.http_latencia.contagem("GET", "/itens/{item_id}", "200") == antes + 2
+    assert metricas.http_latencia.contagem("GET", metricas.ROTA_NAO_MAPEADA, "404") >= 1
+
+
+def test_hooks_do_supabase_medem_tabela_e_operacao():
+    transporte = httpx.MockTransport(lambda request: httpx.Response(200, json=[]))
+    with httpx.Client(transport=transporte, event_hooks=metricas.HOOKS_SUPABASE) as client:
+        client.get("http://db/rest/v1/PBL%20-%20desafios?select=id")
+        client.post("http://db/rest/v1/PBL%20-%20desafios", json={}, headers={"Prefer": "resolution=merge-duplicates"})
+        client.post("http://db/rest/v1/rpc/pbl_liberar_conteudo", json={})
+    assert metricas.supabase_latencia.contagem("PBL - desafios", "select", "200") >= 1
+    assert metricas.supabase_latencia.contagem("PBL - desafios", "upsert", "200") >= 1
+    assert metricas.supabase_latencia.contagem("pbl_liberar_conteudo", "rpc", "200") >= 1
@@ -0,0 +1,52 @@
+# tests/test_paginacao.py
+import asyncio
+
+import httpx
+import pytest
+from fastapi import HTTPException
+from supabase import AsyncClientOptions, acreate_client
+
+from benchmarks.fake_postgrest import criar_app
+from fastapi_backend.paginacao import (
+    codificar_cursor, colunas_consulta, decodificar_cursor, fatiar, paginar, projecao,
+)
+
+
+def test_projecao_filtra_pela_lista_permitida():
+    assert projecao("nota, feedback,senha,nota", {"nota", "feedback"}, ["id"]) == ["nota", "feedback"]
+    assert projecao("senha", {"nota"}, ["id", "nota"]) == ["id", "nota"]
+    assert projecao(None, {"nota"}, ["id"]) == ["id"]
+
+
+def test_cursor_invalido_vira_400():
+    assert decodificar_cursor(codificar_cursor("2025-01-01T10:00:00+00:00", "abc")) == ("2025-01-01T10:00:00+00:00", "abc")
+    with pytest.raises(HTTPException) as erro:
+        decodificar_cursor("nao-e-um-cursor")
+    assert erro.value.status_code == 400
+
+
+def test_paginas_cobrem_todas_as_linhas_uma_vez():
+    # Datas repetidas (desempate pelo id), uma linha sem data e inserções no topo durante a leitura
+    respostas = [{"id": f"r{i:02d}", "cpf": "1", "data_envio": f"2025-01-01T10:00:{i // 3:02d}.5+00:00",
+                  "feedback": "longo"} for i in range(10)]
+    respostas.append({"id": "r99", "cpf": "1", "data_envio": None, "feedback": "antigo"})
+    respostas.append({"id": "x", "cpf": "2", "data_envio": "2025-01-01T10:00:00+00:00"})
+    app = criar_app({"PBL - respostas": respostas})
+
+    async def cenario():
+        http = httpx.AsyncClient(transport=httpx.ASGITransport(app=app))
+        supabase = await acreate_client("http://fake", "chave", options=AsyncClientOptions(httpx_client=http))
+        vistos, cursor = [], None
+        while True:
+            query = supabase.table("PBL - respostas").select(colunas_consulta(["id"], "data_envio")).eq("cpf", "1")
+            r = await paginar(query, "data_envio", cursor, 4).execute()
+            pagina, cursor = fatiar(r.data, ["id"], "data_envio", 4)
+            vistos += [linha["id"] for linha in pagina]
+            respostas.append({"id": f"n{len(vistos)}", "cpf": "1", "data_envio": "2026-01-01T00:00:00+00:00"})
+            if not cursor:
+                break
+        await http.aclose()
+        return vistos
+
+    vistos = asyncio.run(cenario())
+    assert vistos == ["r09", "r08", "r07", "r06", "r05", "r04", "r03", "r02", "r01", "r00", "r99"]
@@ -0,0 +1,111 @@
+# tests/test_painel.py
+import asyncio
+from datetime import datetime
+
+import httpx
+from supabase import AsyncClientOptions, acreate_client
+
+from benchmarks.fake_postgrest import criar_app
+from fastapi_backend import indice_liberacoes as modulo_indice, liberador
+from fastapi_backend.conexoes import ConnectionManager
+from fastapi_backend.indice_liberacoes import IndiceLiberacoes, construir_indice
+from fastapi_backend.painel import agrupar_por_modulo
+
+
+def test_agrupa_por_modulo_com_aula_e_liberacao():
+    conteudos = {
+        "m1": {"id": "m1", "modulo": "B", "aula": None},
+        "m1a2": {"id": "m1a2", "modulo": "B", "aula": "Aula 2"},
+        "m1a1": {"id": "m1a1", "modulo": "B", "aula": "Aula 1"},
+        "m0a1": {"id": "m0a1", "modulo": "A", "aula": "Aula 1"},
+    }
+    desafios = [
+        {"id": "1", "tipo": "macro", "conteudo_id": "m1"},
+        {"id": "2", "tipo": "micro", "conteudo_id": "m1a2"},
+        {"id": "3", "tipo": "micro", "conteudo_id": "m1a1"},
+        {"id": "4", "tipo": "micro", "conteudo_id": "m0a1"},
+        {"id": "5", "tipo": "micro", "conteudo_id": "removido"},
+    ]
+    modulos = agrupar_por_modulo(desafios, conteudos, {"m1", "m1a1"})
+
+    assert [m["nome"] for m in modulos] == ["A", "B", "Desconhecido"]
+    b = modulos[1]
+    assert b["macro"]["id"] == "1" and b["macro"]["desafio_liberado"]
+    assert [d["aula"] for d in b["micros"]] == ["Aula 1", "Aula 2"]
+    assert [d["desafio_liberado"] for d in b["micros"]] == [True, False]
+    assert modulos[0]["macro"] is None
+
+
+def test_indice_de_liberacoes_por_turma():
+    agendamentos = [
+        {"conteudo_id": "c3", "turmas": ["T1"], "data_liberacao": "2025-03-12", "hora_liberacao": "08:00:00"},
+        {"conteudo_id": "c1", "turmas": ["T1", "T2"], "data_liberacao": "2025-03-01", "hora_liberacao": "08:00:00"},
+        {"conteudo_id": "c2", "turmas": ["T1"], "data_liberacao": "2025-03-10", "hora_liberacao": "12:00:00"},
+        {"conteudo_id": "c9", "turmas": ["T1"], "data_liberacao": "2025-05-01", "liberado": True},
+    ]
+    indice = construir_indice(agendamentos)
+
+    t1 = indice["T1"]
+    assert t1.liberados(datetime(2025, 3, 10, 11, 59)) == {"c1", "c9"}
+    assert t1.liberados(datetime(2025, 3, 10, 12, 0)) == {"c1", "c2", "c9"}
+    assert t1.proxima_liberacao(datetime(2025, 3, 10, 12, 0)) == datetime(2025, 3, 12, 8, 0)
+    assert indice["T2"].liberados(datetime(2025, 3, 10)) == {"c1"}
+    # Mesma resposta para o mesmo intervalo entre liberações: conjunto reaproveitado
+    assert t1.liberados(datetime(2025, 3, 5)) is t1.liberados(datetime(2025, 3, 6))
+
+
+def test_indice_carrega_em_paginas_e_invalida_no_loop(monkeypatch):
+    agendamentos = [{"id": i, "conteudo_id": f"c{i}", "turmas": ["T1"], "data_liberacao": "2025-03-01",
+                     "hora_liberacao": "08:00:00", "liberado": False} for i in range(1, 6)]
+    app = criar_app({modulo_indice.TABELA_LIBERACOES: agendamentos})
+    # Páginas de 2: o índice não pode parar no max-rows do PostgREST
+    monkeypatch.setattr(modulo_indice, "PAGINA_CARGA", 2)
+
+    async def executar():
+        http = httpx.AsyncClient(transport=httpx.ASGITransport(app=app))
+        supabase = await acreate_client("http://fake", "chave", options=AsyncClientOptions(httpx_client=http))
+
+        async def cliente():
+            return supabase
+
+        monkeypatch.setattr(modulo_indice, "get_supabase_async", cliente)
+        indice = IndiceLiberacoes(ttl=60)
+        liberados = await indice.liberados("T1", datetime(2025, 3, 2))
+
+        # Invalidação feita numa thread (forcar_liberacao_imediata) é entregue ao loop,
+        # antes de a rota retomar após o asyncio.to_thread
+        await asyncio.to_thread(indice.invalidar)
+        descartado = indice._turmas is None
+        await indice.turmas()
+        await http.aclose()
+        return liberados, descartado, indice.reconstrucoes
+
+    liberados, descartado, reconstrucoes = asyncio.run(executar())
+    assert liberados == {"c1", "c2", "c3", "c4", "c5"}
+    assert descartado and reconstrucoes == 2
+
+
+def test_liberacao_descarta_o_indice_de_todos_os_processos(monkeypatch):
+    agendamento = {"id": 1, "conteudo_id": "c1", "aula": "Aula", "turmas": ["T1"], "liberado": False,
+                   "data_liberacao": "2025-03-01", "hora_liberacao": "08:00:00"}
+    app = criar_app({modulo_indice.TABELA_LIBERACOES: [agendamento], "PBL - desafios": []})
+
+    async def executar():
+        http = httpx.AsyncClient(transport=httpx.ASGITransport(app=app))
+        supabase = await acreate_client("http://fake", "chave", options=AsyncClientOptions(httpx_client=http))
+
+        async def cliente():
+            return supabase
+
+        monkeypatch.setattr(liberador, "get_supabase_async", cliente)
+        # O índice de outro worker recebe a mensagem de controle pelo broker
+        manager, outro = ConnectionManager(), IndiceLiberacoes(ttl=60)
+        await manager.iniciar()
+        manager.registrar_controle("indice_liberacoes", outro.aplicar)
+        monkeypatch.setattr(liberador, "manager", manager)
+        await liberador.liberar_agendamento(agendamento)
+        await manager.parar()
+        await http.aclose()
+        return outro.invalidacoes
+
+    assert asyncio.run(executar()) == 1
@@ -0,0 +1,51 @@
+# tests/test_security.py
+import os
+
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+
+os.environ.setdefault("JWT_SECRET", "teste")
+
+from conftest import DiretorioEmMemoria
+from fastapi_backend import security
+from fastapi_backend.security import create_access_token, get_current_admin_user
+
+app = FastAPI()
+
+
+@app.get("/admin")
+async def rota_admin(cpf: str = Depends(get_current_admin_user)):
+    return {"cpf": cpf}
+
+
+client = TestClient(app)
+
+
+def _get(cpf, role=None):
+    token = create_access_token({"sub": cpf, "role": role})
+    return client.get("/admin", headers={"Authorization": f"Bearer {token}"})
+
+
+def test_papel_vem_do_banco_e_alteracoes_valem_na_hora(monkeypatch):
+    usuarios = [{"cpf": "1", "role": "admin"}, {"cpf": "2", "role": "aluno"}, {"cpf": "3", "role": None}]
+    diretorio = DiretorioEmMemoria(usuarios, ttl=60)
+    monkeypatch.setattr(security, "diretorio", diretorio)
+
+    assert _get("1", "admin").status_code == 200
+    assert _get("2", "aluno").status_code == 403
+    assert _get("3").status_code == 403
+    # O claim do token não basta: vale o papel gravado no banco
+    assert _get("2", "admin").status_code == 403
+    assert _get("9", "admin").status_code == 403
+    assert client.get("/admin", headers={"Authorization": "Bearer invalido"}).status_code == 401
+
+    # Revogação e promoção (invalidadas pelo broker) valem para tokens já emitidos
+    usuarios[0]["role"], usuarios[1]["role"] = None, "admin"
+    diretorio.aplicar({"cpf": "1"})
+    diretorio.aplicar({"cpf": "2"})
+    assert _get("1", "admin").status_code == 403
+    assert _get("2", "aluno").status_code == 200
+
+    # Após um restart (diretório novo, carregado do banco) a revogação continua valendo
+    monkeypatch.setattr(security, "diretorio", DiretorioEmMemoria(usuarios, ttl=60))
+    assert _get("1", "admin").status_code == 403